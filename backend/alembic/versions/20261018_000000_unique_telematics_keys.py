@@ -0,0 +1,72 @@
+"""unique (vehicle_id, time) keys for telematics tables
+
+Revision ID: 20261018_000000
+Revises: 1216d34a1c28, add_system_settings
+Create Date: 2026-10-18 00:00:00.000000
+
+Уникальные индексы (vehicle_id, timestamp) и (vehicle_id, refuel_date) нужны
+для идемпотентной потоковой загрузки через COPY + ON CONFLICT DO NOTHING.
+Миграция также объединяет две существующие ветки миграций.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000000'
+down_revision = ('1216d34a1c28', 'add_system_settings')
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Удаляем накопившиеся дубликаты, оставляя самую раннюю запись
+    op.execute("""
+        DELETE FROM vehicle_locations a
+        USING vehicle_locations b
+        WHERE a.vehicle_id = b.vehicle_id
+          AND a.timestamp = b.timestamp
+          AND a.id > b.id
+    """)
+    # Результаты анализа, ссылающиеся на дубликаты заправок, переводим на оставляемую запись
+    op.execute("""
+        UPDATE fuel_card_analysis_results r
+        SET refuel_id = keep.keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY vehicle_id, refuel_date) AS keep_id
+            FROM vehicle_refuels
+        ) keep
+        WHERE r.refuel_id = keep.id
+          AND keep.id <> keep.keep_id
+    """)
+    op.execute("""
+        DELETE FROM vehicle_refuels a
+        USING vehicle_refuels b
+        WHERE a.vehicle_id = b.vehicle_id
+          AND a.refuel_date = b.refuel_date
+          AND a.id > b.id
+    """)
+
+    op.drop_index('idx_vehicle_location_vehicle_timestamp', table_name='vehicle_locations', if_exists=True)
+    op.create_index(
+        'idx_vehicle_location_vehicle_timestamp',
+        'vehicle_locations',
+        ['vehicle_id', 'timestamp'],
+        unique=True
+    )
+
+    op.drop_index('idx_vehicle_refuel_vehicle_date', table_name='vehicle_refuels', if_exists=True)
+    op.create_index(
+        'idx_vehicle_refuel_vehicle_date',
+        'vehicle_refuels',
+        ['vehicle_id', 'refuel_date'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_vehicle_refuel_vehicle_date', table_name='vehicle_refuels')
+    op.create_index('idx_vehicle_refuel_vehicle_date', 'vehicle_refuels', ['vehicle_id', 'refuel_date'])
+
+    op.drop_index('idx_vehicle_location_vehicle_timestamp', table_name='vehicle_locations')
+    op.create_index('idx_vehicle_location_vehicle_timestamp', 'vehicle_locations', ['vehicle_id', 'timestamp'])
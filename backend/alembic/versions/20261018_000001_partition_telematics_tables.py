@@ -0,0 +1,191 @@
+"""partition vehicle_locations and vehicle_refuels by month
+
+Revision ID: 20261018_000001
+Revises: 20261018_000000
+Create Date: 2026-10-18 00:00:01.000000
+
+Таблицы телематики пересоздаются как секционированные по месяцам (RANGE по времени):
+- первичный ключ (id, <время>), уникальный индекс (vehicle_id, <время>);
+- BRIN-индекс по времени вместо B-tree;
+- секции с месяца самой ранней записи до текущего месяца + 3, плюс секция DEFAULT.
+Внешний ключ fuel_card_analysis_results.refuel_id удаляется: в секционированной
+таблице id уникален только вместе с refuel_date.
+На больших объемах миграцию следует выполнять в окно обслуживания: данные копируются.
+Для СУБД, отличных от PostgreSQL, миграция ничего не делает.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000001'
+down_revision = '20261018_000000'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+TABLES = {
+    'vehicle_locations': {
+        'time_column': 'timestamp',
+        'unique_index': 'idx_vehicle_location_vehicle_timestamp',
+        'brin_index': 'idx_vehicle_location_timestamp_brin',
+        'indexes': [
+            ('ix_vehicle_locations_id', ['id']),
+            ('ix_vehicle_locations_source', ['source']),
+        ],
+        'old_indexes': [
+            ('idx_vehicle_location_timestamp', ['timestamp']),
+            ('ix_vehicle_locations_timestamp', ['timestamp']),
+            ('ix_vehicle_locations_vehicle_id', ['vehicle_id']),
+        ],
+    },
+    'vehicle_refuels': {
+        'time_column': 'refuel_date',
+        'unique_index': 'idx_vehicle_refuel_vehicle_date',
+        'brin_index': 'idx_vehicle_refuel_date_brin',
+        'indexes': [
+            ('ix_vehicle_refuels_id', ['id']),
+            ('idx_vehicle_refuel_source', ['source_system', 'source_id']),
+            ('ix_vehicle_refuels_fuel_type', ['fuel_type']),
+            ('ix_vehicle_refuels_source_system', ['source_system']),
+            ('ix_vehicle_refuels_source_id', ['source_id']),
+        ],
+        'old_indexes': [
+            ('ix_vehicle_refuels_refuel_date', ['refuel_date']),
+            ('ix_vehicle_refuels_vehicle_id', ['vehicle_id']),
+        ],
+    },
+}
+
+
+def _columns_sql(columns):
+    return ', '.join(f'"{column}"' for column in columns)
+
+
+def _strip_constraints_and_indexes(table):
+    """Освобождает имена ограничений и индексов старой таблицы"""
+    op.execute(f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN SELECT conname FROM pg_constraint
+                     WHERE conrelid = '{table}'::regclass AND contype IN ('p', 'f', 'u')
+            LOOP
+                EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', r.conname);
+            END LOOP;
+            FOR r IN SELECT indexrelid::regclass::text AS name FROM pg_index
+                     WHERE indrelid = '{table}'::regclass
+            LOOP
+                EXECUTE format('DROP INDEX %s', r.name);
+            END LOOP;
+        END $$;
+    """)
+
+
+def _partition_table(table, spec):
+    time_column = spec['time_column']
+    old_table = f'{table}_unpartitioned'
+
+    op.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    _strip_constraints_and_indexes(old_table)
+
+    op.execute(
+        f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING COMMENTS) '
+        f'PARTITION BY RANGE ("{time_column}")'
+    )
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, "{time_column}")')
+    op.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_vehicle_id_fkey '
+        f'FOREIGN KEY (vehicle_id) REFERENCES vehicles (id)'
+    )
+
+    # Месячные секции: от самой ранней записи до текущего месяца + MONTHS_AHEAD
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start date;
+            last_month date;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(MIN("{time_column}"), now()))::date
+              INTO month_start FROM {old_table};
+            last_month := (date_trunc('month', now()) + interval '{MONTHS_AHEAD} months')::date;
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(month_start, 'YYYYMM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+    op.execute(f'DROP TABLE {old_table}')
+
+    op.execute(
+        f'CREATE UNIQUE INDEX {spec["unique_index"]} ON {table} (vehicle_id, "{time_column}")'
+    )
+    op.execute(f'CREATE INDEX {spec["brin_index"]} ON {table} USING brin ("{time_column}")')
+    for name, columns in spec['indexes']:
+        op.execute(f'CREATE INDEX {name} ON {table} ({_columns_sql(columns)})')
+    op.execute(f'ANALYZE {table}')
+
+
+def _unpartition_table(table, spec):
+    time_column = spec['time_column']
+    partitioned_table = f'{table}_partitioned'
+
+    op.execute(f'ALTER TABLE {table} RENAME TO {partitioned_table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.execute(f'ALTER TABLE {partitioned_table} DROP CONSTRAINT {table}_pkey')
+    op.execute(f'ALTER TABLE {partitioned_table} DROP CONSTRAINT {table}_vehicle_id_fkey')
+    op.execute(f'DROP INDEX {spec["unique_index"]}')
+    op.execute(f'DROP INDEX {spec["brin_index"]}')
+    for name, _ in spec['indexes']:
+        op.execute(f'DROP INDEX {name}')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {partitioned_table} INCLUDING DEFAULTS INCLUDING COMMENTS)')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned_table}')
+    op.execute(f'DROP TABLE {partitioned_table} CASCADE')
+
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+    op.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_vehicle_id_fkey '
+        f'FOREIGN KEY (vehicle_id) REFERENCES vehicles (id)'
+    )
+    op.execute(
+        f'CREATE UNIQUE INDEX {spec["unique_index"]} ON {table} (vehicle_id, "{time_column}")'
+    )
+    for name, columns in spec['indexes'] + spec['old_indexes']:
+        op.execute(f'CREATE INDEX {name} ON {table} ({_columns_sql(columns)})')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        'ALTER TABLE fuel_card_analysis_results '
+        'DROP CONSTRAINT IF EXISTS fuel_card_analysis_results_refuel_id_fkey'
+    )
+    for table, spec in TABLES.items():
+        _partition_table(table, spec)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, spec in TABLES.items():
+        _unpartition_table(table, spec)
+    op.execute(
+        'ALTER TABLE fuel_card_analysis_results '
+        'ADD CONSTRAINT fuel_card_analysis_results_refuel_id_fkey '
+        'FOREIGN KEY (refuel_id) REFERENCES vehicle_refuels (id) NOT VALID'
+    )
@@ -0,0 +1,50 @@
+"""add anomaly_stats_daily rollup table
+
+Revision ID: 20261018_000002
+Revises: 20261018_000001
+Create Date: 2026-10-18 00:00:02.000000
+
+Дневные счетчики аномалий (день × организация × тип аномалии × статус),
+которые поддерживает сервис анализа топливных карт. Таблица заполняется
+по существующим результатам анализа одним запросом GROUP BY.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000002'
+down_revision = '20261018_000001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'anomaly_stats_daily',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('day', sa.Date(), nullable=False, comment='День анализа'),
+        sa.Column('organization_id', sa.Integer(), nullable=True, comment='ID организации транзакции'),
+        sa.Column('anomaly_type', sa.String(length=50), nullable=True, comment='Тип аномалии'),
+        sa.Column('match_status', sa.String(length=50), nullable=False, comment='Статус соответствия'),
+        sa.Column('anomaly_count', sa.Integer(), nullable=False, server_default='0', comment='Количество аномалий'),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='Дата обновления записи'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_anomaly_stats_daily_day_org', 'anomaly_stats_daily', ['day', 'organization_id'], unique=False)
+    op.create_index('idx_anomaly_stats_daily_org_day', 'anomaly_stats_daily', ['organization_id', 'day'], unique=False)
+
+    op.execute("""
+        INSERT INTO anomaly_stats_daily (day, organization_id, anomaly_type, match_status, anomaly_count)
+        SELECT date(r.analysis_date), t.organization_id, r.anomaly_type, r.match_status, count(*)
+        FROM fuel_card_analysis_results r
+        JOIN transactions t ON t.id = r.transaction_id
+        WHERE r.is_anomaly = true
+        GROUP BY date(r.analysis_date), t.organization_id, r.anomaly_type, r.match_status
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_anomaly_stats_daily_org_day', table_name='anomaly_stats_daily')
+    op.drop_index('idx_anomaly_stats_daily_day_org', table_name='anomaly_stats_daily')
+    op.drop_table('anomaly_stats_daily')
@@ -0,0 +1,99 @@
+"""add geohash columns to gas_stations and vehicle_locations
+
+Revision ID: 20261018_000003
+Revises: 20261018_000002
+Create Date: 2026-10-18 00:00:03.000000
+
+Геохеш координат используется для пространственного поиска АЗС
+(ближайшие АЗС, АЗС вдоль маршрута, дубликаты по координатам).
+Для gas_stations геохеш вычисляется в миграции; для vehicle_locations
+существующие записи заполняются скриптом scripts/backfill_geohash.py пакетами.
+Кодировщик встроен в миграцию (тот же алгоритм, что в app/utils/geohash_utils.py),
+чтобы миграция не зависела от кода приложения.
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000003'
+down_revision = '20261018_000002'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def _geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Геохеш точки (None для некорректных координат)"""
+    if not (math.isfinite(latitude) and math.isfinite(longitude)) or abs(latitude) > 90 or abs(longitude) > 180:
+        return None
+    total_bits = precision * 5
+    lon_bits, lat_bits = (total_bits + 1) // 2, total_bits // 2
+    lat_cell = min(max(math.floor((latitude + 90.0) / 180.0 * (1 << lat_bits)), 0), (1 << lat_bits) - 1)
+    lon_cell = min(max(math.floor((longitude + 180.0) / 360.0 * (1 << lon_bits)), 0), (1 << lon_bits) - 1)
+
+    # Чередование бит: старший бит - долгота, затем широта
+    code = 0
+    lon_shift, lat_shift = lon_bits, lat_bits
+    for bit in range(total_bits):
+        code <<= 1
+        if bit % 2 == 0:
+            lon_shift -= 1
+            code |= (lon_cell >> lon_shift) & 1
+        else:
+            lat_shift -= 1
+            code |= (lat_cell >> lat_shift) & 1
+    return ''.join(
+        GEOHASH_ALPHABET[(code >> ((precision - 1 - position) * 5)) & 31] for position in range(precision)
+    )
+
+
+def _create_geohash_index(name, table):
+    if op.get_bind().dialect.name == 'postgresql':
+        # varchar_pattern_ops позволяет использовать индекс для LIKE 'префикс%'
+        op.execute(f'CREATE INDEX {name} ON {table} (geohash varchar_pattern_ops)')
+    else:
+        op.create_index(name, table, ['geohash'], unique=False)
+
+
+def upgrade() -> None:
+    op.add_column('gas_stations', sa.Column('geohash', sa.String(length=12), nullable=True, comment='Геохеш координат'))
+    op.add_column('vehicle_locations', sa.Column('geohash', sa.String(length=12), nullable=True, comment='Геохеш координат'))
+
+    connection = op.get_bind()
+    stations = sa.table(
+        'gas_stations',
+        sa.column('id', sa.Integer),
+        sa.column('latitude', sa.Numeric),
+        sa.column('longitude', sa.Numeric),
+        sa.column('geohash', sa.String)
+    )
+    rows = connection.execute(
+        sa.select(stations.c.id, stations.c.latitude, stations.c.longitude).where(
+            stations.c.latitude.isnot(None),
+            stations.c.longitude.isnot(None)
+        )
+    ).all()
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        hashes = [_geohash_encode(float(row[1]), float(row[2])) for row in batch]
+        connection.execute(
+            stations.update().where(stations.c.id == sa.bindparam('row_id')).values(geohash=sa.bindparam('new_geohash')),
+            [{'row_id': row[0], 'new_geohash': value} for row, value in zip(batch, hashes)]
+        )
+
+    _create_geohash_index('idx_gas_station_geohash', 'gas_stations')
+    _create_geohash_index('idx_vehicle_location_geohash', 'vehicle_locations')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_vehicle_location_geohash', table_name='vehicle_locations')
+    op.drop_index('idx_gas_station_geohash', table_name='gas_stations')
+    op.drop_column('vehicle_locations', 'geohash')
+    op.drop_column('gas_stations', 'geohash')
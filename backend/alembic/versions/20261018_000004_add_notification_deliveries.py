@@ -0,0 +1,49 @@
+"""add notification_deliveries queue table
+
+Revision ID: 20261018_000004
+Revises: 20261018_000003
+Create Date: 2026-10-18 00:00:04.000000
+
+Очередь доставки уведомлений по внешним каналам: send_notification сохраняет
+задачи, воркеры каналов отправляют их с повторами и переводом в dead.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000004'
+down_revision = '20261018_000003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_deliveries',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('notification_id', sa.Integer(), nullable=True, comment='ID in-app уведомления (если создано)'),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='ID пользователя'),
+        sa.Column('channel', sa.String(length=20), nullable=False, comment='Канал: email, telegram, push'),
+        sa.Column('title', sa.String(length=200), nullable=False, comment='Заголовок уведомления'),
+        sa.Column('message', sa.Text(), nullable=False, comment='Текст уведомления'),
+        sa.Column('notification_type', sa.String(length=50), nullable=True, comment='Тип уведомления: info, success, warning, error'),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending', comment='Статус: pending, sending, sent, disabled, dead'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0', comment='Количество попыток отправки'),
+        sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='Время следующей попытки'),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True, comment='Время захвата задачи воркером'),
+        sa.Column('last_error', sa.Text(), nullable=True, comment='Последняя ошибка отправки'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True, comment='Дата постановки в очередь'),
+        sa.Column('sent_at', sa.DateTime(), nullable=True, comment='Дата отправки'),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_deliveries_notification_id', 'notification_deliveries', ['notification_id'], unique=False)
+    op.create_index('idx_notification_deliveries_queue', 'notification_deliveries', ['channel', 'status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notification_deliveries_queue', table_name='notification_deliveries')
+    op.drop_index('ix_notification_deliveries_notification_id', table_name='notification_deliveries')
+    op.drop_table('notification_deliveries')
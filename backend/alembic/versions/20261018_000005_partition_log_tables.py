@@ -0,0 +1,207 @@
+"""partition system_logs and user_action_logs by month, trigram search indexes
+
+Revision ID: 20261018_000005
+Revises: 20261018_000004
+Create Date: 2026-10-18 00:00:05.000000
+
+Журналы пересоздаются как секционированные по месяцам created_at (RANGE):
+- первичный ключ (id, created_at), пустые created_at заполняются текущим временем;
+- секции с месяца самой ранней записи до текущего месяца + 3, плюс секция DEFAULT;
+- индекс (created_at, id) для постраничного просмотра по курсору;
+- остальные индексы пересоздаются по списку TABLES, совпадающему с индексами
+  моделей; idx_user_action_logs_user_timestamp из add_performance_indexes
+  дублирует idx_user_action_logs_user_created и не восстанавливается;
+  индексы, которых нет в моделях (например, ix_* от create_all), удаляются;
+- GIN-индексы pg_trgm по тексту сообщения вместо последовательного ILIKE.
+Устаревшие секции удаляются PartitionService по срокам хранения
+(SYSTEM_LOGS_RETENTION_MONTHS, USER_ACTION_LOGS_RETENTION_MONTHS).
+Для СУБД, отличных от PostgreSQL, миграция ничего не делает.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000005'
+down_revision = '20261018_000004'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# Индексы секционированных таблиц совпадают с объявленными в app/models.py
+# (SystemLog, UserActionLog); created_id и ix_* по action_category, entity_id,
+# ip_address создаются этой миграцией
+TABLES = {
+    'system_logs': {
+        'text_column': 'message',
+        'trgm_index': 'idx_system_logs_message_trgm',
+        'foreign_keys': [],
+        'indexes': [
+            ('ix_system_logs_id', ['id']),
+            ('idx_system_logs_created_at', ['created_at']),
+            ('idx_system_logs_created_id', ['created_at', 'id']),
+            ('idx_system_logs_level', ['level']),
+            ('idx_system_logs_event_type', ['event_type']),
+            ('idx_system_logs_event_category', ['event_category']),
+            ('idx_system_logs_level_created', ['level', 'created_at']),
+            ('idx_system_logs_timestamp_level', ['created_at', 'level']),
+        ],
+        'new_indexes': ['idx_system_logs_created_id'],
+        # Дублируют оставшиеся индексы и не восстанавливаются (возвращаются при откате)
+        'superseded_indexes': [],
+    },
+    'user_action_logs': {
+        'text_column': 'action_description',
+        'trgm_index': 'idx_user_action_logs_description_trgm',
+        'foreign_keys': [('user_id', 'users')],
+        'indexes': [
+            ('ix_user_action_logs_id', ['id']),
+            ('idx_user_action_logs_created_at', ['created_at']),
+            ('idx_user_action_logs_created_id', ['created_at', 'id']),
+            ('idx_user_action_logs_user_id', ['user_id']),
+            ('idx_user_action_logs_action_type', ['action_type']),
+            ('idx_user_action_logs_entity_type', ['entity_type']),
+            ('idx_user_action_logs_status', ['status']),
+            ('idx_user_action_logs_user_created', ['user_id', 'created_at']),
+            ('ix_user_action_logs_username', ['username']),
+            ('ix_user_action_logs_action_category', ['action_category']),
+            ('ix_user_action_logs_entity_id', ['entity_id']),
+            ('ix_user_action_logs_ip_address', ['ip_address']),
+        ],
+        'new_indexes': [
+            'idx_user_action_logs_created_id',
+            'ix_user_action_logs_action_category',
+            'ix_user_action_logs_entity_id',
+            'ix_user_action_logs_ip_address',
+        ],
+        'superseded_indexes': [
+            # Те же колонки, что у idx_user_action_logs_user_created (add_performance_indexes)
+            ('idx_user_action_logs_user_timestamp', ['user_id', 'created_at']),
+        ],
+    },
+}
+
+
+def _columns_sql(columns):
+    return ', '.join(f'"{column}"' for column in columns)
+
+
+def _strip_constraints_and_indexes(table):
+    """Освобождает имена ограничений и индексов старой таблицы"""
+    op.execute(f"""
+        DO $$
+        DECLARE r record;
+        BEGIN
+            FOR r IN SELECT conname FROM pg_constraint
+                     WHERE conrelid = '{table}'::regclass AND contype IN ('p', 'f', 'u')
+            LOOP
+                EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', r.conname);
+            END LOOP;
+            FOR r IN SELECT indexrelid::regclass::text AS name FROM pg_index
+                     WHERE indrelid = '{table}'::regclass
+            LOOP
+                EXECUTE format('DROP INDEX %s', r.name);
+            END LOOP;
+        END $$;
+    """)
+
+
+def _add_foreign_keys(table, spec):
+    for column, target in spec['foreign_keys']:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES {target} (id)'
+        )
+
+
+def _partition_table(table, spec):
+    old_table = f'{table}_unpartitioned'
+
+    op.execute(f'ALTER TABLE {table} RENAME TO {old_table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    _strip_constraints_and_indexes(old_table)
+    op.execute(f'UPDATE {old_table} SET created_at = now() WHERE created_at IS NULL')
+
+    op.execute(
+        f'CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS INCLUDING COMMENTS) '
+        f'PARTITION BY RANGE (created_at)'
+    )
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+    _add_foreign_keys(table, spec)
+
+    # Месячные секции: от самой ранней записи до текущего месяца + MONTHS_AHEAD
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month_start date;
+            last_month date;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(MIN(created_at), now()))::date
+              INTO month_start FROM {old_table};
+            last_month := (date_trunc('month', now()) + interval '{MONTHS_AHEAD} months')::date;
+            WHILE month_start <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(month_start, 'YYYYMM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+                month_start := (month_start + interval '1 month')::date;
+            END LOOP;
+        END $$;
+    """)
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old_table}')
+    op.execute(f'DROP TABLE {old_table}')
+
+    for name, columns in spec['indexes']:
+        op.execute(f'CREATE INDEX {name} ON {table} ({_columns_sql(columns)})')
+    op.execute(
+        f'CREATE INDEX {spec["trgm_index"]} ON {table} '
+        f'USING gin ("{spec["text_column"]}" gin_trgm_ops)'
+    )
+    op.execute(f'ANALYZE {table}')
+
+
+def _unpartition_table(table, spec):
+    partitioned_table = f'{table}_partitioned'
+
+    op.execute(f'ALTER TABLE {table} RENAME TO {partitioned_table}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.execute(f'ALTER TABLE {partitioned_table} DROP CONSTRAINT {table}_pkey')
+    for column, _ in spec['foreign_keys']:
+        op.execute(f'ALTER TABLE {partitioned_table} DROP CONSTRAINT {table}_{column}_fkey')
+    op.execute(f'DROP INDEX {spec["trgm_index"]}')
+    for name, _ in spec['indexes']:
+        op.execute(f'DROP INDEX {name}')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {partitioned_table} INCLUDING DEFAULTS INCLUDING COMMENTS)')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned_table}')
+    op.execute(f'DROP TABLE {partitioned_table} CASCADE')
+
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+    _add_foreign_keys(table, spec)
+    for name, columns in spec['indexes'] + spec['superseded_indexes']:
+        if name in spec['new_indexes']:
+            continue
+        op.execute(f'CREATE INDEX {name} ON {table} ({_columns_sql(columns)})')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, spec in TABLES.items():
+        _partition_table(table, spec)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, spec in TABLES.items():
+        _unpartition_table(table, spec)
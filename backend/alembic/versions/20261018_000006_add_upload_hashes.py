@@ -0,0 +1,50 @@
+"""add content and row hashes for idempotent uploads
+
+Revision ID: 20261018_000006
+Revises: 20261018_000005
+Create Date: 2026-10-18 00:00:06.000000
+
+Хэш содержимого файла и хэши его строк сохраняются в upload_events:
+повторная загрузка того же файла завершается без разбора, если все его
+строки уже есть в transactions. Хэш исходной строки хранится в
+transactions.row_hash: строки пересекающихся файлов, уже загруженные
+ранее, отбрасываются до проверки дубликатов и вставки. Для существующих
+транзакций row_hash не заполняется (они проверяются на дубликаты как раньше),
+поэтому индекс по нему частичный.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000006'
+down_revision = '20261018_000005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column(
+        'row_hash', sa.String(length=32), nullable=True,
+        comment='Хэш исходной строки загрузки (повторно загруженные строки пропускаются)'
+    ))
+    op.add_column('upload_events', sa.Column(
+        'content_hash', sa.String(length=64), nullable=True, comment='SHA-256 содержимого загруженного файла'
+    ))
+    op.add_column('upload_events', sa.Column(
+        'row_hashes', sa.LargeBinary(), nullable=True, comment='Хэши строк файла (по 16 байт)'
+    ))
+
+    op.create_index(
+        'idx_transaction_provider_row_hash', 'transactions', ['provider_id', 'row_hash'],
+        unique=False, postgresql_where=sa.text('row_hash IS NOT NULL')
+    )
+    op.create_index('idx_upload_events_content_hash', 'upload_events', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_upload_events_content_hash', table_name='upload_events')
+    op.drop_index('idx_transaction_provider_row_hash', table_name='transactions')
+    op.drop_column('upload_events', 'row_hashes')
+    op.drop_column('upload_events', 'content_hash')
+    op.drop_column('transactions', 'row_hash')
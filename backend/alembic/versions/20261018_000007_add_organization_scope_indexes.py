@@ -0,0 +1,36 @@
+"""add indexes for organization scoped transaction queries
+
+Revision ID: 20261018_000007
+Revises: 20261018_000006
+Create Date: 2026-10-18 00:00:07.000000
+
+Списки транзакций пользователя фильтруются условием
+organization_id IN (...) OR organization_id IS NULL и сортируются по дате.
+Составной индекс (organization_id, transaction_date) и частичный индекс по
+дате для транзакций без организации позволяют PostgreSQL выполнять такие
+выборки через BitmapOr двух индексов вместо последовательного сканирования.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_000007'
+down_revision = '20261018_000006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_transaction_org_date', 'transactions', ['organization_id', 'transaction_date'], unique=False
+    )
+    op.create_index(
+        'idx_transaction_null_org_date', 'transactions', ['transaction_date'],
+        unique=False, postgresql_where=sa.text('organization_id IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_transaction_null_org_date', table_name='transactions')
+    op.drop_index('idx_transaction_org_date', table_name='transactions')
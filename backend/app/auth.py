@@ -485,6 +485,10 @@ def get_user_organization_ids(db: Session, user: User) -> list[int]:
     """
     Получение списка ID организаций, к которым у пользователя есть доступ
     
+    Суперпользователь имеет доступ ко всем активным организациям, обычный
+    пользователь - только к назначенным. Результат кэшируется
+    (см. organization_scope_service).
+    
     Args:
         db: Сессия базы данных
         user: Пользователь
@@ -492,14 +496,8 @@ def get_user_organization_ids(db: Session, user: User) -> list[int]:
     Returns:
         Список ID организаций
     """
-    if user.is_superuser:
-        # Суперпользователь имеет доступ ко всем организациям
-        from app.models import Organization
-        all_orgs = db.query(Organization.id).filter(Organization.is_active == True).all()
-        return [org.id for org in all_orgs]
-    
-    # Обычный пользователь - только к назначенным организациям
-    return [org.id for org in user.organizations if org.is_active]
+    from app.services.organization_scope_service import get_user_organization_scope
+    return get_user_organization_scope(db, user)
 
 
 def filter_by_user_organizations(query, db: Session, user: User, organization_id_column):
@@ -527,6 +525,5 @@ def filter_by_user_organizations(query, db: Session, user: User, organization_id
         return query.filter(False)
     
     # Фильтруем по доступным организациям (включая NULL для обратной совместимости)
-    return query.filter(
-        (organization_id_column.in_(org_ids)) | (organization_id_column.is_(None))
-    )
+    from app.utils.organization_scope import organization_scope_clause
+    return query.filter(organization_scope_clause(organization_id_column, org_ids))
@@ -2,11 +2,18 @@
 Модуль для работы с базой данных
 """
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Callable, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 from app.config import get_settings
 from app.logger import logger
+from app.utils.db_pool import PoolMonitor, pool_options
 
 settings = get_settings()
 
@@ -69,20 +76,169 @@ if "/gsm_db" not in DATABASE_URL and DATABASE_URL.endswith("/gsm_db") == False:
         logger.error(f"DATABASE_URL (без пароля): {DATABASE_URL.split('@')[0].split(':')[0]}://***@{DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL}")
         raise ValueError("DATABASE_URL содержит неправильное имя базы данных 'gsm_user' вместо 'gsm_db'")
 
-# Создаем engine с настройками пула соединений
-# pool_pre_ping=True проверяет соединение перед использованием
+# Создаем engine с настройками пула соединений из конфигурации (DB_POOL_*)
 # connect_args для явного указания параметров подключения
 engine = create_engine(
     DATABASE_URL, 
     echo=False,
-    pool_pre_ping=True,  # Проверяет соединение перед использованием
-    pool_recycle=3600,   # Переиспользует соединения каждый час
+    **pool_options(DATABASE_URL, "primary"),
     connect_args={
         "options": "-c search_path=public -c client_encoding=UTF8"  # Явно указываем схему и кодировку
     }
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронные драйверы для диалектов (sync URL -> async URL)
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def make_async_url(database_url: str) -> str:
+    """
+    Преобразование URL синхронного подключения в URL для асинхронного драйвера
+    (postgresql://... -> postgresql+asyncpg://...)
+    """
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Нет асинхронного драйвера для БД {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+# Асинхронный engine для read-heavy эндпоинтов: запросы не блокируют event loop.
+# Работает с той же БД, что и синхронный engine; соединения создаются при первом запросе
+async_engine = create_async_engine(
+    make_async_url(DATABASE_URL),
+    echo=False,
+    **pool_options(DATABASE_URL, "primary_async", is_async=True),
+    connect_args={
+        "server_settings": {"search_path": "public"}  # asyncpg всегда использует UTF8
+    } if make_url(DATABASE_URL).get_backend_name() == "postgresql" else {}
+)
+# expire_on_commit=False: объекты остаются доступными после commit без повторной загрузки
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Реплика для чтения: отдельные engine; без DATABASE_READ_URL чтение идет с основной БД
+READ_DATABASE_URL = settings.database_read_url.strip() or None
+
+if READ_DATABASE_URL:
+    _read_is_postgresql = make_url(READ_DATABASE_URL).get_backend_name() == "postgresql"
+    read_engine = create_engine(
+        READ_DATABASE_URL,
+        echo=False,
+        **pool_options(READ_DATABASE_URL, "replica"),
+        connect_args={
+            "options": "-c search_path=public -c client_encoding=UTF8"
+        } if _read_is_postgresql else {}
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    async_read_engine = create_async_engine(
+        make_async_url(READ_DATABASE_URL),
+        echo=False,
+        **pool_options(READ_DATABASE_URL, "replica_async", is_async=True),
+        connect_args={"server_settings": {"search_path": "public"}} if _read_is_postgresql else {}
+    )
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+    logger.info(f"Чтение отчетов и интеграций с реплики: {READ_DATABASE_URL.split('@')[-1]}")
+else:
+    read_engine = None
+    ReadSessionLocal = SessionLocal
+    async_read_engine = None
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+# Отслеживание выдачи соединений и метрики пулов (запускается в lifespan)
+pool_monitor = PoolMonitor.get_instance()
+pool_monitor.register("primary", engine)
+pool_monitor.register("primary_async", async_engine.sync_engine)
+if read_engine is not None:
+    pool_monitor.register("replica", read_engine)
+    pool_monitor.register("replica_async", async_read_engine.sync_engine)
+
+# Отставание реплики в секундах; 0 - реплика догнала основную БД (или это не реплика)
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaLagMonitor:
+    """
+    Проверка отставания реплики с кэшированием результата на check_interval секунд
+
+    Реплика используется, пока отставание не превышает max_lag_seconds;
+    при ошибке проверки (реплика недоступна) чтение переключается на основную БД.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], float],
+        max_lag_seconds: float,
+        check_interval: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.probe = probe
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._usable = False
+        self.last_lag: Optional[float] = None
+
+    def needs_check(self) -> bool:
+        return self._checked_at is None or self._clock() - self._checked_at >= self.check_interval
+
+    def is_usable(self) -> bool:
+        if not self.needs_check():
+            return self._usable
+        with self._lock:
+            if not self.needs_check():
+                return self._usable
+            try:
+                lag = float(self.probe() or 0)
+                usable = lag <= self.max_lag_seconds
+                self.last_lag = lag
+                if not usable and self._usable:
+                    logger.warning(
+                        f"Отставание реплики {lag:.1f} с превышает {self.max_lag_seconds} с, чтение с основной БД"
+                    )
+            except Exception as e:
+                usable = False
+                self.last_lag = None
+                if self._usable or self._checked_at is None:
+                    logger.warning(f"Реплика недоступна, чтение с основной БД: {e}")
+            self._usable = usable
+            self._checked_at = self._clock()
+            return usable
+
+
+def _probe_replica_lag() -> float:
+    if read_engine.dialect.name != "postgresql":
+        return 0.0
+    with read_engine.connect() as connection:
+        return connection.execute(REPLICA_LAG_QUERY).scalar() or 0.0
+
+
+replica_monitor = ReplicaLagMonitor(
+    probe=_probe_replica_lag,
+    max_lag_seconds=settings.read_replica_max_lag_seconds,
+    check_interval=settings.read_replica_check_interval
+)
+
+
+def replica_available() -> bool:
+    """
+    Настроена ли реплика и можно ли сейчас читать с нее
+    """
+    return read_engine is not None and replica_monitor.is_usable()
+
+
 Base = declarative_base()
 
 
@@ -96,3 +252,45 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db():
+    """
+    Получение асинхронной сессии БД для dependency injection
+
+    Запросы выполняются через await db.execute(select(...)); существующий синхронный
+    код репозиториев вызывается через await db.run_sync(func, ...) - он работает
+    на том же асинхронном соединении и тоже не блокирует event loop
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """
+    Сессия только для чтения (отчеты, экспорт, интеграции) для dependency injection
+
+    С реплики, если она настроена и ее отставание в пределах
+    read_replica_max_lag_seconds, иначе с основной БД. Записывать через эту
+    сессию нельзя: для записи используйте get_db.
+    """
+    db = ReadSessionLocal() if replica_available() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db():
+    """
+    Асинхронная сессия только для чтения (см. get_read_db)
+    """
+    use_replica = False
+    if read_engine is not None:
+        # Проверка отставания выполняет запрос синхронным драйвером - не в event loop
+        if replica_monitor.needs_check():
+            use_replica = await run_in_threadpool(replica_monitor.is_usable)
+        else:
+            use_replica = replica_monitor.is_usable()
+    session_factory = AsyncReadSessionLocal if use_replica else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
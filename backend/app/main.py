@@ -14,6 +14,7 @@ from app.logger import logger
 from app.middleware import LoggingMiddleware
 from app.middleware.rate_limit import setup_rate_limiting
 from app.middleware.prometheus_metrics import setup_prometheus
+from app.middleware.query_profiling import setup_query_profiling
 from app.config import get_settings
 
 settings = get_settings()
@@ -42,7 +43,8 @@ from app.routers import (
     notifications,
     system_settings,
     backup,
-    health
+    health,
+    merge_jobs
 )
 
 from app.models import Provider, User
@@ -200,6 +202,20 @@ async def lifespan(app: FastAPI):
         except Exception as log_error:
             logger.error(f"Не удалось записать системный лог ошибки планировщика: {log_error}", exc_info=True)
     
+    # Метрики пулов соединений и поиск утечек соединений
+    try:
+        from app.utils.db_pool import PoolMonitor
+        PoolMonitor.get_instance().start()
+    except Exception as e:
+        logger.error(f"Ошибка при запуске мониторинга пулов соединений: {e}", extra={"error": str(e)}, exc_info=True)
+    
+    # Запускаем воркеры доставки уведомлений (email, telegram, push)
+    try:
+        from app.services.notification_delivery_service import NotificationDeliveryService
+        NotificationDeliveryService.get_instance().start()
+    except Exception as e:
+        logger.error(f"Ошибка при запуске воркеров доставки уведомлений: {e}", extra={"error": str(e)}, exc_info=True)
+    
     # Создаем базу данных gsm_user, если она не существует
     # Это нужно для устранения ошибок в логах PostgreSQL
     try:
@@ -384,6 +400,29 @@ async def lifespan(app: FastAPI):
         logger.info("Планировщик автоматической загрузки остановлен")
     except Exception as e:
         logger.error(f"Ошибка при остановке планировщика: {e}", extra={"error": str(e)}, exc_info=True)
+    
+    try:
+        from app.services.notification_delivery_service import NotificationDeliveryService
+        NotificationDeliveryService.get_instance().shutdown()
+        logger.info("Воркеры доставки уведомлений остановлены")
+    except Exception as e:
+        logger.error(f"Ошибка при остановке воркеров доставки уведомлений: {e}", extra={"error": str(e)}, exc_info=True)
+    
+    try:
+        from app.utils.db_pool import PoolMonitor
+        PoolMonitor.get_instance().shutdown()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке мониторинга пулов соединений: {e}", extra={"error": str(e)}, exc_info=True)
+    
+    try:
+        from app.utils.provider_sessions import get_provider_session_registry
+        await get_provider_session_registry().aclose()
+    except Exception as e:
+        logger.error(f"Ошибка при закрытии HTTP-клиентов провайдеров: {e}", extra={"error": str(e)}, exc_info=True)
+
+    # Записываем накопленные системные логи последним шагом
+    from app.utils.log_batch_writer import shutdown_system_log_writer
+    shutdown_system_log_writer()
 
 
 app = FastAPI(
@@ -635,6 +674,10 @@ setup_rate_limiting(app)
 # Настройка Prometheus метрик
 setup_prometheus(app)
 
+# Профилирование SQL запросов (QUERY_PROFILING_ENABLED)
+if settings.query_profiling_enabled:
+    setup_query_profiling(app)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[origin.strip() for origin in allowed_origins],
@@ -669,6 +712,7 @@ app.include_router(notifications.router)
 app.include_router(system_settings.router)
 app.include_router(backup.router)
 app.include_router(health.router)
+app.include_router(merge_jobs.router)
 
 
 
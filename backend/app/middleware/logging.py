@@ -1,178 +1,210 @@
 """
 Middleware для логирования запросов
+
+Режим access (по умолчанию): одна структурированная строка access-лога на запрос
+(логгер gsm_converter.access), в system_logs сохраняются только ошибки (5xx и
+исключения), медленные запросы (дольше request_log_slow_ms) и выборка по маршрутам.
+Режим full: в system_logs сохраняются все запросы.
+Запись в system_logs выполняется пакетно фоновым потоком (SystemLogBatchWriter),
+сессия БД в потоке запроса не открывается.
 """
+import logging
+import random
 import time
-import traceback
+from typing import Callable, List, Optional, Tuple
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
+from app.config import Settings, get_settings
 from app.logger import logger
-from app.services.logging_service import logging_service
-from app.database import SessionLocal
+from app.utils.log_batch_writer import SystemLogBatchWriter, build_system_log_row, get_system_log_writer
+
+access_logger = logging.getLogger("gsm_converter.access")
+
+# Служебные endpoints, которые не логируются
+SKIP_PATHS = ("/health", "/api/v1/config", "/docs", "/openapi.json", "/redoc")
+
+# Запросы, для которых на уровне DEBUG выводятся заголовки
+VERBOSE_PATHS = ("/api/public-api/v2", "/api/ppr")
+
+# Заголовки, значения которых не выводятся в лог
+SENSITIVE_HEADERS = {"authorization", "cookie", "x-api-key", "x-api-secret"}
+
+REQUEST_LOG_MODES = ("access", "full")
+
+
+def parse_route_sample_rates(value: str) -> List[Tuple[str, float]]:
+    """
+    Разбор строки "/prefix=0.1,/other=1" в список (префикс, доля),
+    отсортированный по убыванию длины префикса
+    """
+    rates = []
+    for item in (value or "").split(","):
+        prefix, separator, rate = item.strip().partition("=")
+        if not separator or not prefix.strip():
+            continue
+        try:
+            rates.append((prefix.strip(), min(max(float(rate), 0.0), 1.0)))
+        except ValueError:
+            logger.warning(f"Некорректная доля выборки журнала запросов: {item!r}")
+    return sorted(rates, key=lambda item: len(item[0]), reverse=True)
+
+
+class RequestLogPolicy:
+    """
+    Правила сохранения запросов в system_logs
+    """
+
+    def __init__(
+        self,
+        mode: str = "access",
+        slow_ms: float = 1000,
+        sample_rate: float = 0.0,
+        route_sample_rates: Optional[List[Tuple[str, float]]] = None,
+        random_func: Callable[[], float] = random.random
+    ):
+        if mode not in REQUEST_LOG_MODES:
+            raise ValueError(f"Неизвестный режим журнала запросов: {mode}")
+        self.mode = mode
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.route_sample_rates = route_sample_rates or []
+        self._random = random_func
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RequestLogPolicy":
+        return cls(
+            mode=settings.request_log_mode,
+            slow_ms=settings.request_log_slow_ms,
+            sample_rate=settings.request_log_sample_rate,
+            route_sample_rates=parse_route_sample_rates(settings.request_log_route_sample_rates)
+        )
+
+    def sample_rate_for(self, path: str) -> float:
+        for prefix, rate in self.route_sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.sample_rate
+
+    def persist_level(self, path: str, status_code: int, process_time_ms: float) -> Optional[str]:
+        """
+        Уровень записи в system_logs или None, если запрос сохранять не нужно
+        """
+        if status_code >= 500:
+            return "ERROR"
+        if process_time_ms >= self.slow_ms:
+            return "WARNING"
+        if self.mode == "full":
+            return "INFO"
+        rate = self.sample_rate_for(path)
+        if rate > 0 and self._random() < rate:
+            return "INFO"
+        return None
+
+
+def _masked_headers(request: Request) -> dict:
+    return {
+        name: "***" if name.lower() in SENSITIVE_HEADERS else value
+        for name, value in request.headers.items()
+    }
 
 
 class LoggingMiddleware(BaseHTTPMiddleware):
     """
     Middleware для логирования всех HTTP запросов
     """
+
+    def __init__(
+        self,
+        app,
+        policy: Optional[RequestLogPolicy] = None,
+        writer: Optional[SystemLogBatchWriter] = None
+    ):
+        super().__init__(app)
+        self.policy = policy or RequestLogPolicy.from_settings(get_settings())
+        self._writer = writer
+
+    @property
+    def writer(self) -> SystemLogBatchWriter:
+        return self._writer or get_system_log_writer()
+
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Получаем IP адрес клиента
+        start_time = time.perf_counter()
+        path = request.url.path
+        method = request.method
+        should_log = not path.startswith(SKIP_PATHS)
         client_ip = request.client.host if request.client else "unknown"
-        
-        # Пропускаем логирование для health check и других служебных endpoints
-        skip_paths = ["/health", "/api/v1/config", "/docs", "/openapi.json", "/redoc"]
-        should_log = not any(request.url.path.startswith(path) for path in skip_paths)
-        
-        # Специальная обработка для PPR API - всегда логируем
-        is_ppr_api = request.url.path.startswith("/api/public-api/v2") or request.url.path.startswith("/api/ppr")
-        if is_ppr_api:
-            import sys
-            print(f"\n{'!'*80}", file=sys.stdout, flush=True)
-            print(f"!!! MIDDLEWARE: PPR API ЗАПРОС ПОЛУЧЕН !!!", file=sys.stdout, flush=True)
-            print(f"Path: {request.url.path}", file=sys.stdout, flush=True)
-            print(f"Method: {request.method}", file=sys.stdout, flush=True)
-            print(f"Client IP: {client_ip}", file=sys.stdout, flush=True)
-            print(f"Full URL: {request.url}", file=sys.stdout, flush=True)
-            print(f"Headers: {dict(request.headers)}", file=sys.stdout, flush=True)
-            print(f"{'!'*80}\n", file=sys.stdout, flush=True)
-        
-        # Логируем начало запроса
-        if should_log:
-            # Специальная обработка для всех POST запросов к /api/v1/templates
-            if request.url.path.startswith("/api/v1/templates") and request.method == "POST":
-                import sys
-                print(f"\n{'='*80}", file=sys.stdout, flush=True)
-                print(f"MIDDLEWARE: POST {request.url.path} ЗАПРОС ПОЛУЧЕН", file=sys.stdout, flush=True)
-                print(f"Client IP: {client_ip}", file=sys.stdout, flush=True)
-                print(f"Full URL: {request.url}", file=sys.stdout, flush=True)
-                print(f"Headers: {dict(request.headers)}", file=sys.stdout, flush=True)
-                print(f"{'='*80}\n", file=sys.stdout, flush=True)
-                logger.info(f"MIDDLEWARE: POST {request.url.path} ЗАПРОС ПОЛУЧЕН", extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "full_url": str(request.url),
-                    "client_ip": client_ip,
-                    "headers": dict(request.headers),
-                    "event_type": "request",
-                    "event_category": "templates_post"
-                })
-            
-            # Специальная обработка для auto-load endpoint
-            if request.url.path == "/api/v1/templates/auto-load" and request.method == "POST":
-                import sys
-                print(f"\n{'!'*80}", file=sys.stdout, flush=True)
-                print(f"!!! MIDDLEWARE: POST /api/v1/templates/auto-load ЗАПРОС ПОЛУЧЕН !!!", file=sys.stdout, flush=True)
-                print(f"Client IP: {client_ip}", file=sys.stdout, flush=True)
-                print(f"Headers: {dict(request.headers)}", file=sys.stdout, flush=True)
-                print(f"{'!'*80}\n", file=sys.stdout, flush=True)
-                logger.info("!!! MIDDLEWARE: POST /api/v1/templates/auto-load ЗАПРОС ПОЛУЧЕН !!!", extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "client_ip": client_ip,
-                    "headers": dict(request.headers),
-                    "event_type": "request",
-                    "event_category": "auto_load_manual"
-                })
-            
-            logger.info(
-                f"Входящий запрос: {request.method} {request.url.path}",
-                extra={
-                    "method": request.method,
-                    "path": request.url.path,
-                    "client_ip": client_ip,
-                    "query_params": str(request.query_params) if request.query_params else None
-                }
-            )
-        
-        db = SessionLocal()
+
+        if should_log and logger.isEnabledFor(logging.DEBUG) and (
+            path.startswith(VERBOSE_PATHS) or (path.startswith("/api/v1/templates") and method == "POST")
+        ):
+            logger.debug(f"Запрос {method} {path}", extra={
+                "method": method,
+                "path": path,
+                "full_url": str(request.url),
+                "client_ip": client_ip,
+                "headers": _masked_headers(request)
+            })
+
         try:
-            # Выполняем запрос
             response = await call_next(request)
-            
-            # Вычисляем время выполнения
-            process_time = time.time() - start_time
-            
-            # Логируем успешный ответ
-            if should_log:
-                logger.info(
-                    f"Запрос выполнен: {request.method} {request.url.path}",
-                    extra={
-                        "method": request.method,
-                        "path": request.url.path,
-                        "status_code": response.status_code,
-                        "process_time_ms": round(process_time * 1000, 2),
-                        "client_ip": client_ip
-                    }
-                )
-                
-                # Логируем системное событие в БД
-                try:
-                    # Логируем все запросы для отладки (можно ограничить только важными)
-                    log_level = "ERROR" if response.status_code >= 500 else "INFO"
-                    logging_service.log_system_event(
-                        db=db,
-                        level=log_level,
-                        message=f"HTTP {request.method} {request.url.path} - {response.status_code}",
-                        module="middleware",
-                        function="dispatch",
-                        event_type="request",
-                        event_category="http",
-                        extra_data={
-                            "method": request.method,
-                            "path": request.url.path,
-                            "status_code": response.status_code,
-                            "client_ip": client_ip,
-                            "process_time_ms": round(process_time * 1000, 2)
-                        }
-                    )
-                except Exception as log_error:
-                    # Не прерываем выполнение, если логирование не удалось
-                    logger.error(f"Ошибка при записи системного лога: {log_error}", exc_info=True)
-            
-            # Добавляем заголовок с временем выполнения
-            response.headers["X-Process-Time"] = str(round(process_time * 1000, 2))
-            
-            return response
-            
         except Exception as e:
-            # Логируем ошибку
-            process_time = time.time() - start_time
+            process_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
             logger.error(
-                f"Ошибка при обработке запроса: {request.method} {request.url.path}",
+                f"Ошибка при обработке запроса: {method} {path}",
                 extra={
-                    "method": request.method,
-                    "path": request.url.path,
+                    "method": method,
+                    "path": path,
                     "error": str(e),
-                    "process_time_ms": round(process_time * 1000, 2),
+                    "process_time_ms": process_time_ms,
                     "client_ip": client_ip
                 },
                 exc_info=True
             )
-            
-            # Логируем системное событие в БД
             if should_log:
-                try:
-                    logging_service.log_system_event(
-                        db=db,
-                        level="ERROR",
-                        message=f"Ошибка при обработке запроса: {request.method} {request.url.path}",
-                        module="middleware",
-                        function="dispatch",
-                        event_type="request",
-                        event_category="http",
-                        extra_data={
-                            "method": request.method,
-                            "path": request.url.path,
-                            "client_ip": client_ip,
-                            "process_time_ms": round(process_time * 1000, 2)
-                        },
-                        exception=e
-                    )
-                except Exception as log_error:
-                    logger.error(f"Ошибка при записи системного лога: {log_error}", exc_info=True)
-            
+                self._persist(
+                    "ERROR",
+                    f"Ошибка при обработке запроса: {method} {path}",
+                    {"method": method, "path": path, "client_ip": client_ip, "process_time_ms": process_time_ms},
+                    exception=e
+                )
             raise
-        finally:
-            db.close()
 
+        process_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+        if should_log:
+            status_code = response.status_code
+            extra_data = {
+                "method": method,
+                "path": path,
+                "status_code": status_code,
+                "client_ip": client_ip,
+                "process_time_ms": process_time_ms
+            }
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    f"method={method} path={path} status={status_code} "
+                    f"duration_ms={process_time_ms} client_ip={client_ip}",
+                    extra=extra_data
+                )
+            level = self.policy.persist_level(path, status_code, process_time_ms)
+            if level:
+                self._persist(level, f"HTTP {method} {path} - {status_code}", extra_data)
+
+        # Добавляем заголовок с временем выполнения
+        response.headers["X-Process-Time"] = str(process_time_ms)
+        return response
+
+    def _persist(self, level: str, message: str, extra_data: dict, exception: Optional[BaseException] = None) -> None:
+        try:
+            self.writer.submit(build_system_log_row(
+                level=level,
+                message=message,
+                module="middleware",
+                function="dispatch",
+                event_type="request",
+                event_category="http",
+                extra_data=extra_data,
+                exception=exception
+            ))
+        except Exception as log_error:
+            # Не прерываем выполнение, если логирование не удалось
+            logger.error(f"Ошибка при записи системного лога: {log_error}")
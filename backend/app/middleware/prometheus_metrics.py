@@ -85,6 +85,60 @@ DB_CONNECTIONS_ACTIVE = Gauge(
     registry=registry
 )
 
+# Пулы соединений с БД
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "gsm_db_pool_checkout_wait_seconds",
+    "Время получения соединения из пула, секунд",
+    ["pool"],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0],
+    registry=registry
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "gsm_db_pool_connections",
+    "Соединения пула по состоянию",
+    ["pool", "state"],  # checked_out, idle, overflow, size
+    registry=registry
+)
+
+DB_POOL_LEAKED_CONNECTIONS = Gauge(
+    "gsm_db_pool_leaked_connections",
+    "Соединения, не возвращенные в пул дольше порога утечки",
+    ["pool"],
+    registry=registry
+)
+
+# Профилирование SQL запросов (QUERY_PROFILING_ENABLED)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "gsm_db_queries_per_request",
+    "Количество SQL запросов на HTTP запрос",
+    ["method", "endpoint"],
+    buckets=[0, 1, 2, 5, 10, 20, 50, 100, 250, 1000],
+    registry=registry
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "gsm_db_time_per_request_seconds",
+    "Суммарное время SQL запросов на HTTP запрос, секунд",
+    ["method", "endpoint"],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0],
+    registry=registry
+)
+
+DB_SLOW_QUERIES_TOTAL = Counter(
+    "gsm_db_slow_queries_total",
+    "Количество SQL запросов дольше порога",
+    ["endpoint"],
+    registry=registry
+)
+
+DB_N_PLUS_ONE_TOTAL = Counter(
+    "gsm_db_n_plus_one_total",
+    "Количество HTTP запросов с повторяющимся SELECT (N+1)",
+    ["endpoint"],
+    registry=registry
+)
+
 BACKUP_LAST_SUCCESS = Gauge(
     "gsm_backup_last_success_timestamp",
     "Время последнего успешного бэкапа (unix timestamp)",
@@ -117,6 +171,29 @@ RATE_LIMIT_EXCEEDED_TOTAL = Counter(
     registry=registry
 )
 
+# Очередь доставки уведомлений
+NOTIFICATION_DELIVERIES_TOTAL = Counter(
+    "gsm_notification_deliveries_total",
+    "Количество обработанных задач доставки уведомлений",
+    ["channel", "status"],  # sent, retry, dead, disabled, failed
+    registry=registry
+)
+
+NOTIFICATION_DELIVERY_LATENCY = Histogram(
+    "gsm_notification_delivery_latency_seconds",
+    "Время от постановки уведомления в очередь до отправки, секунд",
+    ["channel"],
+    buckets=[0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0],
+    registry=registry
+)
+
+NOTIFICATION_QUEUE_BACKLOG = Gauge(
+    "gsm_notification_queue_backlog",
+    "Количество задач доставки, ожидающих отправки",
+    ["channel"],
+    registry=registry
+)
+
 
 def normalize_endpoint(path: str) -> str:
     """
@@ -232,6 +309,18 @@ def record_rate_limit_exceeded(endpoint: str):
     RATE_LIMIT_EXCEEDED_TOTAL.labels(endpoint=normalize_endpoint(endpoint)).inc()
 
 
+def record_notification_delivery(channel: str, status: str, latency_seconds: float = None):
+    """Записать метрику обработки задачи доставки уведомления"""
+    NOTIFICATION_DELIVERIES_TOTAL.labels(channel=channel, status=status).inc()
+    if latency_seconds is not None:
+        NOTIFICATION_DELIVERY_LATENCY.labels(channel=channel).observe(latency_seconds)
+
+
+def update_notification_backlog(channel: str, count: int):
+    """Обновить размер очереди доставки уведомлений канала"""
+    NOTIFICATION_QUEUE_BACKLOG.labels(channel=channel).set(count)
+
+
 def update_active_users(count: int):
     """Обновить количество активных пользователей"""
     ACTIVE_USERS.set(count)
@@ -242,6 +331,35 @@ def update_db_connections(count: int):
     DB_CONNECTIONS_ACTIVE.set(count)
 
 
+def record_db_pool_checkout(pool: str, wait_seconds: float):
+    """Записать время получения соединения из пула"""
+    DB_POOL_CHECKOUT_WAIT.labels(pool=pool).observe(wait_seconds)
+
+
+def update_db_pool_stats(pool: str, stats: dict):
+    """Обновить состояние пула соединений (checked_out, idle, overflow, size, leaked)"""
+    for state in ("checked_out", "idle", "overflow", "size"):
+        if stats.get(state) is not None:
+            DB_POOL_CONNECTIONS.labels(pool=pool, state=state).set(stats[state])
+    DB_POOL_LEAKED_CONNECTIONS.labels(pool=pool).set(stats.get("leaked", 0))
+
+
+def record_request_db_profile(method: str, endpoint: str, query_count: int, db_seconds: float):
+    """Записать количество и время SQL запросов HTTP запроса"""
+    DB_QUERIES_PER_REQUEST.labels(method=method, endpoint=endpoint).observe(query_count)
+    DB_TIME_PER_REQUEST.labels(method=method, endpoint=endpoint).observe(db_seconds)
+
+
+def record_slow_query(endpoint: str):
+    """Записать медленный SQL запрос"""
+    DB_SLOW_QUERIES_TOTAL.labels(endpoint=endpoint).inc()
+
+
+def record_n_plus_one(endpoint: str):
+    """Записать HTTP запрос с признаками N+1"""
+    DB_N_PLUS_ONE_TOTAL.labels(endpoint=endpoint).inc()
+
+
 def update_scheduler_jobs(count: int):
     """Обновить количество запланированных задач"""
     SCHEDULER_JOBS_TOTAL.set(count)
@@ -0,0 +1,83 @@
+"""
+Middleware профилирования SQL запросов HTTP запроса
+
+Добавляет заголовки X-DB-Query-Count и X-DB-Time (мс), пишет гистограммы
+gsm_db_queries_per_request / gsm_db_time_per_request_seconds по нормализованному
+endpoint и предупреждает о повторяющихся SELECT (N+1).
+"""
+from typing import Callable, Optional
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.config import get_settings
+from app.logger import logger
+from app.middleware.prometheus_metrics import normalize_endpoint, record_n_plus_one, record_request_db_profile
+from app.utils.query_profiler import QueryProfile, get_query_profiler, profile_queries
+
+SKIP_PATHS = ("/metrics",)
+
+
+class QueryProfilingMiddleware(BaseHTTPMiddleware):
+    """Счетчики SQL запросов на HTTP запрос"""
+
+    def __init__(self, app, n_plus_one_threshold: Optional[int] = None):
+        super().__init__(app)
+        if n_plus_one_threshold is None:
+            n_plus_one_threshold = get_settings().query_profiling_n_plus_one_threshold
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if request.url.path in SKIP_PATHS:
+            return await call_next(request)
+
+        method = request.method
+        endpoint = normalize_endpoint(request.url.path)
+        with profile_queries(f"{method} {endpoint}") as profile:
+            response = await call_next(request)
+
+        response.headers["X-DB-Query-Count"] = str(profile.query_count)
+        response.headers["X-DB-Time"] = str(round(profile.total_seconds * 1000, 2))
+        record_request_db_profile(method, endpoint, profile.query_count, profile.total_seconds)
+        self._check_n_plus_one(profile, endpoint)
+        return response
+
+    def _check_n_plus_one(self, profile: QueryProfile, endpoint: str) -> None:
+        repeated = profile.repeated_selects(self.n_plus_one_threshold)
+        if not repeated:
+            return
+        record_n_plus_one(endpoint)
+        statement, count = repeated[0]
+        logger.warning(
+            f"Возможный N+1 в {profile.endpoint}: SELECT выполнен {count} раз "
+            f"(всего запросов: {profile.query_count})",
+            extra={
+                "event_type": "database",
+                "event_category": "n_plus_one",
+                "endpoint": profile.endpoint,
+                "repeat_count": count,
+                "statement": statement[:500],
+                "repeated_statements": len(repeated),
+            }
+        )
+
+
+def setup_query_profiling(app: FastAPI) -> None:
+    """
+    Включение профилирования: обработчики событий на всех engine и middleware
+    """
+    from app.database import async_engine, async_read_engine, engine, read_engine
+
+    profiler = get_query_profiler()
+    targets = [engine, async_engine.sync_engine]
+    if read_engine is not None:
+        targets += [read_engine, async_read_engine.sync_engine]
+    for target in targets:
+        profiler.install(target)
+    app.add_middleware(QueryProfilingMiddleware)
+
+    logger.info("Профилирование SQL запросов включено", extra={
+        "slow_ms": profiler.slow_ms,
+        "explain": profiler.explain,
+        "event_type": "system",
+        "event_category": "startup"
+    })
@@ -1,10 +1,11 @@
 """
 Модели базы данных для транзакций ГСМ
 """
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, Index, ForeignKey, Text, Boolean, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Date, Index, ForeignKey, Text, Boolean, Table, LargeBinary, event, text
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.utils.geohash_utils import geohash_encode
 
 # Таблица связи many-to-many между пользователями и организациями
 user_organizations = Table(
@@ -62,6 +63,7 @@ class Transaction(Base):
     created_at = Column(DateTime, server_default=func.now(), comment="Дата создания записи")
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="Дата обновления записи")
     source_file = Column(String(500), comment="Исходный файл")
+    row_hash = Column(String(32), nullable=True, comment="Хэш исходной строки загрузки (повторно загруженные строки пропускаются)")
     organization = Column(String(200), comment="Организация (старое поле, для обратной совместимости)")
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete='SET NULL'), index=True, nullable=True, comment="ID организации")
     
@@ -74,6 +76,12 @@ class Transaction(Base):
         Index('idx_unique_transaction', 
               'transaction_date', 'card_number', 'azs_number', 'quantity', 'product',
               unique=False),  # Не unique, чтобы можно было проверять вручную
+        Index('idx_transaction_provider_row_hash', 'provider_id', 'row_hash',
+              postgresql_where=text("row_hash IS NOT NULL")),
+        # Выборки по области видимости организаций (см. organization_scope_clause)
+        Index('idx_transaction_org_date', 'organization_id', 'transaction_date'),
+        Index('idx_transaction_null_org_date', 'transaction_date',
+              postgresql_where=text("organization_id IS NULL")),
     )
 
 
@@ -274,6 +282,8 @@ class GasStation(Base):
     # Координаты местоположения
     latitude = Column(Numeric(10, 8), comment="Широта")
     longitude = Column(Numeric(11, 8), comment="Долгота")
+    # Геохеш координат для пространственного поиска (заполняется автоматически)
+    geohash = Column(String(12), comment="Геохеш координат")
     
     # Статус валидации
     is_validated = Column(String(10), default="pending", comment="Статус: pending, valid, invalid")
@@ -289,6 +299,7 @@ class GasStation(Base):
     # Уникальность по исходному наименованию
     __table_args__ = (
         Index('idx_gas_station_original', 'original_name', unique=True),
+        Index('idx_gas_station_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
     )
 
 
@@ -451,6 +462,8 @@ class UploadEvent(Base):
     transactions_failed = Column(Integer, default=0, comment="Ошибочных транзакций")
     duration_ms = Column(Integer, comment="Длительность обработки, мс")
     message = Column(Text, comment="Сообщение/предупреждения по загрузке")
+    content_hash = Column(String(64), nullable=True, comment="SHA-256 содержимого загруженного файла")
+    row_hashes = deferred(Column(LargeBinary, nullable=True, comment="Хэши строк файла (по 16 байт)"))
 
     # Метаданные
     created_at = Column(DateTime, server_default=func.now(), comment="Дата создания записи")
@@ -465,6 +478,7 @@ class UploadEvent(Base):
         Index('idx_upload_events_created_at', 'created_at'),
         Index('idx_upload_events_status', 'status'),
         Index('idx_upload_events_source', 'source_type'),
+        Index('idx_upload_events_content_hash', 'content_hash'),
         Index('idx_upload_events_scheduled', 'is_scheduled'),
     )
 
@@ -472,13 +486,19 @@ class UploadEvent(Base):
 class SystemLog(Base):
     """
     Логи системных событий
+
+    В PostgreSQL таблица секционирована по месяцам created_at
+    (первичный ключ (id, created_at)), см. app/services/partition_service.py.
+    В модели первичный ключ - id: id уникален (последовательность), а составной
+    ключ лишил бы id автоинкремента в SQLite. Индексы совпадают с миграцией
+    20261018_000005_partition_log_tables.
     """
     __tablename__ = "system_logs"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
     # Уровень логирования
-    level = Column(String(20), nullable=False, index=True, comment="Уровень: DEBUG, INFO, WARNING, ERROR, CRITICAL")
+    level = Column(String(20), nullable=False, comment="Уровень: DEBUG, INFO, WARNING, ERROR, CRITICAL")
     
     # Основная информация
     message = Column(Text, nullable=False, comment="Сообщение лога")
@@ -487,8 +507,8 @@ class SystemLog(Base):
     line_number = Column(Integer, comment="Номер строки кода")
     
     # Контекст события
-    event_type = Column(String(100), index=True, comment="Тип события: request, database, service, scheduler, etc.")
-    event_category = Column(String(100), index=True, comment="Категория: auth, upload, transaction, etc.")
+    event_type = Column(String(100), comment="Тип события: request, database, service, scheduler, etc.")
+    event_category = Column(String(100), comment="Категория: auth, upload, transaction, etc.")
     
     # Дополнительные данные (JSON)
     extra_data = Column(Text, comment="Дополнительные данные в формате JSON")
@@ -499,7 +519,7 @@ class SystemLog(Base):
     stack_trace = Column(Text, comment="Трассировка стека")
     
     # Метаданные
-    created_at = Column(DateTime, server_default=func.now(), index=True, comment="Дата и время создания")
+    created_at = Column(DateTime, server_default=func.now(), comment="Дата и время создания")
     
     __table_args__ = (
         Index('idx_system_logs_created_at', 'created_at'),
@@ -507,6 +527,11 @@ class SystemLog(Base):
         Index('idx_system_logs_event_type', 'event_type'),
         Index('idx_system_logs_event_category', 'event_category'),
         Index('idx_system_logs_level_created', 'level', 'created_at'),
+        Index('idx_system_logs_timestamp_level', 'created_at', 'level'),
+        # Постраничный просмотр по курсору (created_at, id)
+        Index('idx_system_logs_created_id', 'created_at', 'id'),
+        # Поиск по подстроке (ILIKE) через pg_trgm
+        Index('idx_system_logs_message_trgm', 'message', postgresql_using='gin', postgresql_ops={'message': 'gin_trgm_ops'}),
     )
 
 
@@ -615,22 +640,28 @@ class CardInfoSchedule(Base):
 class UserActionLog(Base):
     """
     Логи действий пользователей
+
+    В PostgreSQL таблица секционирована по месяцам created_at
+    (первичный ключ (id, created_at)), см. app/services/partition_service.py.
+    В модели первичный ключ - id: id уникален (последовательность), а составной
+    ключ лишил бы id автоинкремента в SQLite. Индексы совпадают с миграцией
+    20261018_000005_partition_log_tables.
     """
     __tablename__ = "user_action_logs"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
     # Связь с пользователем
-    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=True, comment="ID пользователя")
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, comment="ID пользователя")
     username = Column(String(100), index=True, comment="Имя пользователя (на случай удаления пользователя)")
     
     # Действие пользователя
-    action_type = Column(String(100), nullable=False, index=True, comment="Тип действия: login, logout, create, update, delete, view, export, etc.")
+    action_type = Column(String(100), nullable=False, comment="Тип действия: login, logout, create, update, delete, view, export, etc.")
     action_category = Column(String(100), index=True, comment="Категория: auth, transaction, vehicle, organization, etc.")
     action_description = Column(Text, nullable=False, comment="Описание действия")
     
     # Объект действия
-    entity_type = Column(String(100), index=True, comment="Тип сущности: Transaction, Vehicle, Organization, etc.")
+    entity_type = Column(String(100), comment="Тип сущности: Transaction, Vehicle, Organization, etc.")
     entity_id = Column(Integer, index=True, comment="ID сущности")
     
     # Дополнительные данные (JSON)
@@ -645,11 +676,11 @@ class UserActionLog(Base):
     request_path = Column(String(500), comment="Путь запроса")
     
     # Результат действия
-    status = Column(String(20), default="success", index=True, comment="Статус: success, failed, partial")
+    status = Column(String(20), default="success", comment="Статус: success, failed, partial")
     error_message = Column(Text, comment="Сообщение об ошибке (если есть)")
     
     # Метаданные
-    created_at = Column(DateTime, server_default=func.now(), index=True, comment="Дата и время создания")
+    created_at = Column(DateTime, server_default=func.now(), comment="Дата и время создания")
     
     # Связи
     user = relationship("User", lazy="joined")
@@ -661,6 +692,11 @@ class UserActionLog(Base):
         Index('idx_user_action_logs_entity_type', 'entity_type'),
         Index('idx_user_action_logs_status', 'status'),
         Index('idx_user_action_logs_user_created', 'user_id', 'created_at'),
+        Index('idx_user_action_logs_created_id', 'created_at', 'id'),
+        Index(
+            'idx_user_action_logs_description_trgm', 'action_description',
+            postgresql_using='gin', postgresql_ops={'action_description': 'gin_trgm_ops'}
+        ),
     )
 
 
@@ -668,16 +704,19 @@ class VehicleRefuel(Base):
     """
     Данные о фактических заправках транспортных средств
     Получаются из внешних систем (GLONASS, телематика и т.д.)
+    
+    В PostgreSQL таблица секционирована по месяцам refuel_date
+    (первичный ключ (id, refuel_date)), см. app/services/partition_service.py
     """
     __tablename__ = "vehicle_refuels"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
     # Связь с ТС
-    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False, index=True, comment="ID транспортного средства")
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False, comment="ID транспортного средства")
     
     # Данные о заправке
-    refuel_date = Column(DateTime, nullable=False, index=True, comment="Дата и время заправки")
+    refuel_date = Column(DateTime, nullable=False, comment="Дата и время заправки")
     fuel_type = Column(String(200), index=True, comment="Тип топлива")
     quantity = Column(Numeric(10, 2), nullable=False, comment="Количество заправленного топлива (литры)")
     
@@ -703,8 +742,11 @@ class VehicleRefuel(Base):
     vehicle = relationship("Vehicle", backref="refuels")
     
     __table_args__ = (
-        Index('idx_vehicle_refuel_vehicle_date', 'vehicle_id', 'refuel_date'),
+        # Уникальность нужна для идемпотентной потоковой загрузки (ON CONFLICT DO NOTHING)
+        Index('idx_vehicle_refuel_vehicle_date', 'vehicle_id', 'refuel_date', unique=True),
         Index('idx_vehicle_refuel_source', 'source_system', 'source_id'),
+        # BRIN-индекс по времени: компактен и эффективен для данных, поступающих в хронологическом порядке
+        Index('idx_vehicle_refuel_date_brin', 'refuel_date', postgresql_using='brin'),
     )
 
 
@@ -712,16 +754,19 @@ class VehicleLocation(Base):
     """
     История местоположений транспортных средств
     Данные из систем GLONASS/GPS/телематики
+    
+    В PostgreSQL таблица секционирована по месяцам timestamp
+    (первичный ключ (id, timestamp)), см. app/services/partition_service.py
     """
     __tablename__ = "vehicle_locations"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
     # Связь с ТС
-    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False, index=True, comment="ID транспортного средства")
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id"), nullable=False, comment="ID транспортного средства")
     
     # Данные о местоположении
-    timestamp = Column(DateTime, nullable=False, index=True, comment="Дата и время фиксации местоположения")
+    timestamp = Column(DateTime, nullable=False, comment="Дата и время фиксации местоположения")
     latitude = Column(Numeric(10, 8), nullable=False, comment="Широта")
     longitude = Column(Numeric(11, 8), nullable=False, comment="Долгота")
     
@@ -729,6 +774,8 @@ class VehicleLocation(Base):
     speed = Column(Numeric(6, 2), comment="Скорость движения (км/ч)")
     heading = Column(Numeric(5, 2), comment="Направление движения (градусы)")
     accuracy = Column(Numeric(8, 2), comment="Точность определения местоположения (метры)")
+    # Геохеш координат для пространственного поиска (заполняется автоматически)
+    geohash = Column(String(12), comment="Геохеш координат")
     
     # Источник данных
     source = Column(String(100), nullable=False, default="GLONASS", index=True, comment="Источник данных (GLONASS, GPS, телематика)")
@@ -740,8 +787,11 @@ class VehicleLocation(Base):
     vehicle = relationship("Vehicle", backref="locations")
     
     __table_args__ = (
-        Index('idx_vehicle_location_vehicle_timestamp', 'vehicle_id', 'timestamp'),
-        Index('idx_vehicle_location_timestamp', 'timestamp'),
+        # Уникальность нужна для идемпотентной потоковой загрузки (ON CONFLICT DO NOTHING)
+        Index('idx_vehicle_location_vehicle_timestamp', 'vehicle_id', 'timestamp', unique=True),
+        # BRIN-индекс по времени: компактен и эффективен для данных, поступающих в хронологическом порядке
+        Index('idx_vehicle_location_timestamp_brin', 'timestamp', postgresql_using='brin'),
+        Index('idx_vehicle_location_geohash', 'geohash', postgresql_ops={'geohash': 'varchar_pattern_ops'}),
     )
 
 
@@ -755,7 +805,8 @@ class FuelCardAnalysisResult(Base):
     
     # Связи с основными сущностями
     transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False, index=True, comment="ID транзакции по карте")
-    refuel_id = Column(Integer, ForeignKey("vehicle_refuels.id"), index=True, nullable=True, comment="ID заправки ТС (если найдено соответствие)")
+    # Без внешнего ключа: vehicle_refuels секционирована, и id в ней уникален только вместе с refuel_date
+    refuel_id = Column(Integer, index=True, nullable=True, comment="ID заправки ТС (если найдено соответствие)")
     fuel_card_id = Column(Integer, ForeignKey("fuel_cards.id"), index=True, nullable=True, comment="ID топливной карты")
     vehicle_id = Column(Integer, ForeignKey("vehicles.id"), index=True, nullable=True, comment="ID транспортного средства")
     
@@ -784,7 +835,11 @@ class FuelCardAnalysisResult(Base):
     
     # Связи
     transaction = relationship("Transaction", backref="analysis_results")
-    refuel = relationship("VehicleRefuel", backref="analysis_results")
+    refuel = relationship(
+        "VehicleRefuel",
+        primaryjoin="foreign(FuelCardAnalysisResult.refuel_id) == VehicleRefuel.id",
+        backref="analysis_results"
+    )
     fuel_card = relationship("FuelCard", backref="analysis_results")
     vehicle = relationship("Vehicle", backref="analysis_results")
     
@@ -796,6 +851,28 @@ class FuelCardAnalysisResult(Base):
     )
 
 
+class AnomalyStatsDaily(Base):
+    """
+    Накопительные счетчики аномалий анализа топливных карт:
+    день (по analysis_date) × организация × тип аномалии × статус соответствия.
+    Поддерживаются сервисом анализа при записи результатов
+    """
+    __tablename__ = "anomaly_stats_daily"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    day = Column(Date, nullable=False, comment="День анализа")
+    organization_id = Column(Integer, nullable=True, comment="ID организации транзакции")
+    anomaly_type = Column(String(50), nullable=True, comment="Тип аномалии")
+    match_status = Column(String(50), nullable=False, comment="Статус соответствия")
+    anomaly_count = Column(Integer, nullable=False, default=0, comment="Количество аномалий")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="Дата обновления записи")
+
+    __table_args__ = (
+        Index('idx_anomaly_stats_daily_day_org', 'day', 'organization_id'),
+        Index('idx_anomaly_stats_daily_org_day', 'organization_id', 'day'),
+    )
+
+
 class NotificationSettings(Base):
     """
     Настройки уведомлений пользователя
@@ -877,6 +954,33 @@ class Notification(Base):
     )
 
 
+class NotificationDelivery(Base):
+    """
+    Очередь доставки уведомлений по внешним каналам (email, telegram, push).
+    send_notification сохраняет задачи доставки, отправку выполняют воркеры каналов
+    """
+    __tablename__ = "notification_deliveries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    notification_id = Column(Integer, ForeignKey("notifications.id", ondelete='CASCADE'), nullable=True, index=True, comment="ID in-app уведомления (если создано)")
+    user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'), nullable=False, comment="ID пользователя")
+    channel = Column(String(20), nullable=False, comment="Канал: email, telegram, push")
+    title = Column(String(200), nullable=False, comment="Заголовок уведомления")
+    message = Column(Text, nullable=False, comment="Текст уведомления")
+    notification_type = Column(String(50), default="info", comment="Тип уведомления: info, success, warning, error")
+    status = Column(String(20), nullable=False, default="pending", comment="Статус: pending, sending, sent, disabled, dead")
+    attempts = Column(Integer, nullable=False, default=0, comment="Количество попыток отправки")
+    next_attempt_at = Column(DateTime, server_default=func.now(), comment="Время следующей попытки")
+    claimed_at = Column(DateTime, comment="Время захвата задачи воркером")
+    last_error = Column(Text, comment="Последняя ошибка отправки")
+    created_at = Column(DateTime, server_default=func.now(), comment="Дата постановки в очередь")
+    sent_at = Column(DateTime, comment="Дата отправки")
+
+    __table_args__ = (
+        Index('idx_notification_deliveries_queue', 'channel', 'status', 'next_attempt_at'),
+    )
+
+
 class SystemSettings(Base):
     """
     Глобальные системные настройки (SMTP, Telegram Bot и др.)
@@ -900,4 +1004,16 @@ class SystemSettings(Base):
     
     # Метаданные
     created_at = Column(DateTime, server_default=func.now(), comment="Дата создания")
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="Дата обновления")
\ No newline at end of file
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), comment="Дата обновления")
+
+
+def _assign_geohash(mapper, connection, target):
+    """
+    Пересчет геохеша при сохранении объекта с координатами
+    """
+    target.geohash = geohash_encode(target.latitude, target.longitude)
+
+
+for _model in (GasStation, VehicleLocation):
+    event.listen(_model, "before_insert", _assign_geohash)
+    event.listen(_model, "before_update", _assign_geohash)
@@ -4,9 +4,13 @@
 from .vehicle_refuel_repository import VehicleRefuelRepository
 from .vehicle_location_repository import VehicleLocationRepository
 from .fuel_card_analysis_repository import FuelCardAnalysisRepository
+from .anomaly_stats_repository import AnomalyStatsRepository
+from .notification_delivery_repository import NotificationDeliveryRepository
 
 __all__ = [
     "VehicleRefuelRepository",
     "VehicleLocationRepository",
-    "FuelCardAnalysisRepository"
+    "FuelCardAnalysisRepository",
+    "AnomalyStatsRepository",
+    "NotificationDeliveryRepository"
 ]
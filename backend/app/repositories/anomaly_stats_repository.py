@@ -0,0 +1,228 @@
+"""
+Репозиторий накопительной статистики аномалий анализа топливных карт
+"""
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from app.models import AnomalyStatsDaily, FuelCardAnalysisResult, Transaction
+
+# Ключ счетчика: (день, ID организации, тип аномалии, статус соответствия)
+AnomalyKey = Tuple[date, Optional[int], Optional[str], str]
+
+
+def anomaly_key(result: FuelCardAnalysisResult, organization_id: Optional[int]) -> Optional[AnomalyKey]:
+    """
+    Ключ счетчика для результата анализа (None, если результат не является аномалией)
+    """
+    if not result.is_anomaly or not result.match_status or result.analysis_date is None:
+        return None
+    return (result.analysis_date.date(), organization_id, result.anomaly_type, result.match_status)
+
+
+class AnomalyStatsRepository:
+    """
+    Репозиторий счетчиков аномалий по дням
+    Счетчики обновляются точечными UPDATE/INSERT без загрузки ORM-объектов,
+    статистика читается агрегатными запросами
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _key_filter(key: AnomalyKey):
+        day, organization_id, anomaly_type, match_status = key
+        return and_(
+            AnomalyStatsDaily.day == day,
+            AnomalyStatsDaily.organization_id.is_(None) if organization_id is None
+            else AnomalyStatsDaily.organization_id == organization_id,
+            AnomalyStatsDaily.anomaly_type.is_(None) if anomaly_type is None
+            else AnomalyStatsDaily.anomaly_type == anomaly_type,
+            AnomalyStatsDaily.match_status == match_status
+        )
+
+    def apply_delta(self, key: AnomalyKey, delta: int) -> None:
+        """
+        Изменение счетчика на delta (без commit - в транзакции вызывающего кода)
+        """
+        if not delta:
+            return
+        updated = self.db.execute(
+            update(AnomalyStatsDaily)
+            .where(self._key_filter(key))
+            .values(anomaly_count=AnomalyStatsDaily.anomaly_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if updated.rowcount:
+            return
+        day, organization_id, anomaly_type, match_status = key
+        self.db.execute(insert(AnomalyStatsDaily).values(
+            day=day,
+            organization_id=organization_id,
+            anomaly_type=anomaly_type,
+            match_status=match_status,
+            anomaly_count=delta
+        ))
+
+    def record_change(self, old_key: Optional[AnomalyKey], new_key: Optional[AnomalyKey]) -> None:
+        """
+        Учет изменения результата анализа: старый ключ уменьшается, новый увеличивается
+        """
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self.apply_delta(old_key, -1)
+        if new_key is not None:
+            self.apply_delta(new_key, 1)
+
+    def rebuild(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> int:
+        """
+        Пересчет счетчиков по результатам анализа за дни [date_from, date_to]
+
+        Returns:
+            Количество записанных строк счетчиков
+        """
+        delete_query = delete(AnomalyStatsDaily)
+        conditions = [FuelCardAnalysisResult.is_anomaly == True]
+        if date_from is not None:
+            delete_query = delete_query.where(AnomalyStatsDaily.day >= date_from)
+            conditions.append(FuelCardAnalysisResult.analysis_date >= datetime.combine(date_from, time.min))
+        if date_to is not None:
+            delete_query = delete_query.where(AnomalyStatsDaily.day <= date_to)
+            conditions.append(
+                FuelCardAnalysisResult.analysis_date < datetime.combine(date_to + timedelta(days=1), time.min)
+            )
+        self.db.execute(delete_query.execution_options(synchronize_session=False))
+
+        day = func.date(FuelCardAnalysisResult.analysis_date)
+        source = select(
+            day,
+            Transaction.organization_id,
+            FuelCardAnalysisResult.anomaly_type,
+            FuelCardAnalysisResult.match_status,
+            func.count()
+        ).join(
+            Transaction, Transaction.id == FuelCardAnalysisResult.transaction_id
+        ).where(*conditions).group_by(
+            day,
+            Transaction.organization_id,
+            FuelCardAnalysisResult.anomaly_type,
+            FuelCardAnalysisResult.match_status
+        )
+        result = self.db.execute(insert(AnomalyStatsDaily).from_select(
+            ["day", "organization_id", "anomaly_type", "match_status", "anomaly_count"],
+            source
+        ))
+        self.db.commit()
+        return result.rowcount or 0
+
+    def _rollup_counts(
+        self,
+        day_from: Optional[date],
+        day_to: Optional[date],
+        organization_id: Optional[int],
+        anomaly_type: Optional[str]
+    ):
+        """
+        Суммы счетчиков за полные дни [day_from, day_to)
+        """
+        query = self.db.query(
+            AnomalyStatsDaily.anomaly_type,
+            AnomalyStatsDaily.match_status,
+            func.sum(AnomalyStatsDaily.anomaly_count)
+        )
+        if day_from is not None:
+            query = query.filter(AnomalyStatsDaily.day >= day_from)
+        if day_to is not None:
+            query = query.filter(AnomalyStatsDaily.day < day_to)
+        if organization_id is not None:
+            query = query.filter(AnomalyStatsDaily.organization_id == organization_id)
+        if anomaly_type:
+            query = query.filter(AnomalyStatsDaily.anomaly_type == anomaly_type)
+        return query.group_by(AnomalyStatsDaily.anomaly_type, AnomalyStatsDaily.match_status).all()
+
+    def _raw_counts(
+        self,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        organization_id: Optional[int],
+        anomaly_type: Optional[str],
+        date_to_exclusive: bool = False
+    ):
+        """
+        Агрегация по самим результатам анализа (GROUP BY) для неполных дней
+        """
+        query = self.db.query(
+            FuelCardAnalysisResult.anomaly_type,
+            FuelCardAnalysisResult.match_status,
+            func.count(FuelCardAnalysisResult.id)
+        ).filter(FuelCardAnalysisResult.is_anomaly == True)
+        if organization_id is not None:
+            query = query.join(
+                Transaction, Transaction.id == FuelCardAnalysisResult.transaction_id
+            ).filter(Transaction.organization_id == organization_id)
+        if date_from is not None:
+            query = query.filter(FuelCardAnalysisResult.analysis_date >= date_from)
+        if date_to is not None:
+            query = query.filter(
+                FuelCardAnalysisResult.analysis_date < date_to if date_to_exclusive
+                else FuelCardAnalysisResult.analysis_date <= date_to
+            )
+        if anomaly_type:
+            query = query.filter(FuelCardAnalysisResult.anomaly_type == anomaly_type)
+        return query.group_by(FuelCardAnalysisResult.anomaly_type, FuelCardAnalysisResult.match_status).all()
+
+    def get_stats(
+        self,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        organization_id: Optional[int] = None,
+        anomaly_type: Optional[str] = None
+    ) -> dict:
+        """
+        Статистика аномалий за период (analysis_date в [date_from, date_to])
+
+        Полные дни периода читаются из счетчиков, неполные крайние дни
+        агрегируются по результатам анализа запросом GROUP BY
+        """
+        # Полные дни: [first_day, last_day)
+        first_day = None
+        if date_from is not None:
+            first_day = date_from.date() if date_from.time() == time.min else date_from.date() + timedelta(days=1)
+        last_day = None
+        if date_to is not None:
+            last_day = date_to.date() + timedelta(days=1) if date_to.time() == time.max else date_to.date()
+
+        rows = []
+        if first_day is not None and last_day is not None and first_day >= last_day:
+            rows.extend(self._raw_counts(date_from, date_to, organization_id, anomaly_type))
+        else:
+            rows.extend(self._rollup_counts(first_day, last_day, organization_id, anomaly_type))
+            if date_from is not None and datetime.combine(first_day, time.min) > date_from:
+                rows.extend(self._raw_counts(
+                    date_from, datetime.combine(first_day, time.min), organization_id, anomaly_type,
+                    date_to_exclusive=True
+                ))
+            if date_to is not None and datetime.combine(last_day, time.min) <= date_to:
+                rows.extend(self._raw_counts(
+                    datetime.combine(last_day, time.min), date_to, organization_id, anomaly_type
+                ))
+
+        total = 0
+        by_type: Dict[str, int] = {}
+        by_status: Dict[str, int] = {}
+        for row_type, row_status, count in rows:
+            count = int(count or 0)
+            if not count:
+                continue
+            total += count
+            if row_type:
+                by_type[row_type] = by_type.get(row_type, 0) + count
+            by_status[row_status] = by_status.get(row_status, 0) + count
+
+        return {
+            "total_anomalies": total,
+            "by_type": by_type,
+            "by_status": by_status
+        }
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Tuple
 from datetime import datetime
 from app.models import FuelCardAnalysisResult
+from app.repositories.anomaly_stats_repository import AnomalyStatsRepository
 
 
 class FuelCardAnalysisRepository:
@@ -107,35 +108,15 @@ class FuelCardAnalysisRepository:
         self,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
-        anomaly_type: Optional[str] = None
+        anomaly_type: Optional[str] = None,
+        organization_id: Optional[int] = None
     ) -> dict:
         """
-        Получение статистики по аномалиям
+        Получение статистики по аномалиям (из дневных счетчиков, без загрузки результатов)
         """
-        query = self.db.query(FuelCardAnalysisResult).filter(
-            FuelCardAnalysisResult.is_anomaly == True
+        return AnomalyStatsRepository(self.db).get_stats(
+            date_from=date_from,
+            date_to=date_to,
+            organization_id=organization_id,
+            anomaly_type=anomaly_type
         )
-        
-        if date_from is not None:
-            query = query.filter(FuelCardAnalysisResult.analysis_date >= date_from)
-        if date_to is not None:
-            query = query.filter(FuelCardAnalysisResult.analysis_date <= date_to)
-        if anomaly_type:
-            query = query.filter(FuelCardAnalysisResult.anomaly_type == anomaly_type)
-        
-        results = query.all()
-        
-        # Формируем статистику
-        by_type = {}
-        by_status = {}
-        
-        for result in results:
-            if result.anomaly_type:
-                by_type[result.anomaly_type] = by_type.get(result.anomaly_type, 0) + 1
-            by_status[result.match_status] = by_status.get(result.match_status, 0) + 1
-        
-        return {
-            "total_anomalies": len(results),
-            "by_type": by_type,
-            "by_status": by_status
-        }
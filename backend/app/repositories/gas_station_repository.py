@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Tuple
 from sqlalchemy import or_
 from app.models import GasStation
+from app.utils.organization_scope import organization_scope_clause
 
 
 class GasStationRepository:
@@ -28,9 +29,7 @@ class GasStationRepository:
         """
         query = self.db.query(GasStation).filter(GasStation.original_name == original_name)
         if organization_id is not None:
-            query = query.filter(
-                (GasStation.organization_id == organization_id) | (GasStation.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(GasStation.organization_id, [organization_id]))
         return query.first()
     
     def get_all(
@@ -84,13 +83,9 @@ class GasStationRepository:
         
         # Фильтрация по организациям
         if organization_ids is not None:
-            query = query.filter(
-                (GasStation.organization_id.in_(organization_ids)) | (GasStation.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(GasStation.organization_id, organization_ids))
         elif organization_id is not None:
-            query = query.filter(
-                (GasStation.organization_id == organization_id) | (GasStation.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(GasStation.organization_id, [organization_id]))
         
         # Сортировка
         valid_sort_fields = {
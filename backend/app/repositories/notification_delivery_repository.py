@@ -0,0 +1,186 @@
+"""
+Репозиторий очереди доставки уведомлений
+"""
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime, timedelta, timezone
+from app.models import NotificationDelivery
+
+# Статусы задач доставки
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_DEAD = "dead"
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время UTC без часового пояса (колонки очереди - DateTime без tz)
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class NotificationDeliveryRepository:
+    """
+    Репозиторий задач доставки уведомлений по внешним каналам
+    Методы не выполняют commit, кроме claim_batch: захват задач
+    фиксируется сразу, чтобы их не взял другой воркер
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(
+        self,
+        user_id: int,
+        channels: Iterable[str],
+        title: str,
+        message: str,
+        notification_type: str = "info",
+        notification_id: Optional[int] = None
+    ) -> List[NotificationDelivery]:
+        """
+        Постановка уведомления в очередь по каждому каналу
+        """
+        now = utcnow()
+        deliveries = [
+            NotificationDelivery(
+                notification_id=notification_id,
+                user_id=user_id,
+                channel=channel,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                status=STATUS_PENDING,
+                attempts=0,
+                next_attempt_at=now,
+                created_at=now
+            )
+            for channel in channels
+        ]
+        self.db.add_all(deliveries)
+        self.db.flush()
+        return deliveries
+
+    def claim_batch(self, channel: str, limit: int) -> List[NotificationDelivery]:
+        """
+        Захват готовых к отправке задач канала (статус sending)
+
+        В PostgreSQL строки выбираются с FOR UPDATE SKIP LOCKED, поэтому
+        воркеры нескольких процессов не получают одни и те же задачи.
+        """
+        now = utcnow()
+        deliveries = self.db.query(NotificationDelivery).filter(
+            NotificationDelivery.channel == channel,
+            NotificationDelivery.status == STATUS_PENDING,
+            NotificationDelivery.next_attempt_at <= now
+        ).order_by(
+            NotificationDelivery.next_attempt_at, NotificationDelivery.id
+        ).limit(limit).with_for_update(skip_locked=True).all()
+
+        for delivery in deliveries:
+            delivery.status = STATUS_SENDING
+            delivery.claimed_at = now
+            delivery.attempts = (delivery.attempts or 0) + 1
+        ids = [delivery.id for delivery in deliveries]
+        self.db.commit()
+        if ids:
+            # Объекты после commit устарели: загружаем их заново одним запросом
+            deliveries = self.db.query(NotificationDelivery).filter(
+                NotificationDelivery.id.in_(ids)
+            ).order_by(NotificationDelivery.next_attempt_at, NotificationDelivery.id).all()
+        return deliveries
+
+    def mark_sent(self, delivery: NotificationDelivery) -> None:
+        delivery.status = STATUS_SENT
+        delivery.sent_at = utcnow()
+        delivery.last_error = None
+
+    def mark_final(self, delivery: NotificationDelivery, status: str, error: Optional[str] = None) -> None:
+        """
+        Завершение без повторов (канал отключен, не реализован и т.п.)
+        """
+        delivery.status = status
+        delivery.last_error = error
+
+    def mark_failed(
+        self,
+        delivery: NotificationDelivery,
+        error: Optional[str],
+        max_attempts: int,
+        retry_delay: float
+    ) -> None:
+        """
+        Повтор через retry_delay секунд или перевод в dead после max_attempts попыток
+        """
+        delivery.last_error = error
+        if delivery.attempts >= max_attempts:
+            delivery.status = STATUS_DEAD
+        else:
+            delivery.status = STATUS_PENDING
+            delivery.next_attempt_at = utcnow() + timedelta(seconds=retry_delay)
+
+    def release_stale(self, older_than_seconds: int = 600) -> int:
+        """
+        Возврат в очередь задач, захваченных воркером, который не завершил отправку
+        (например, процесс был остановлен)
+        """
+        cutoff = utcnow() - timedelta(seconds=older_than_seconds)
+        result = self.db.execute(
+            update(NotificationDelivery)
+            .where(
+                NotificationDelivery.status == STATUS_SENDING,
+                NotificationDelivery.claimed_at < cutoff
+            )
+            .values(status=STATUS_PENDING, next_attempt_at=utcnow())
+        )
+        return result.rowcount or 0
+
+    def requeue_dead(self, channel: Optional[str] = None) -> int:
+        """
+        Повторная постановка в очередь задач из dead (счетчик попыток сбрасывается)
+        """
+        statement = update(NotificationDelivery).where(NotificationDelivery.status == STATUS_DEAD)
+        if channel:
+            statement = statement.where(NotificationDelivery.channel == channel)
+        result = self.db.execute(
+            statement.values(status=STATUS_PENDING, attempts=0, next_attempt_at=utcnow())
+        )
+        return result.rowcount or 0
+
+    def count_backlog(self, channel: str) -> int:
+        """
+        Количество задач канала, ожидающих отправки
+        """
+        return self.db.query(func.count(NotificationDelivery.id)).filter(
+            NotificationDelivery.channel == channel,
+            NotificationDelivery.status.in_([STATUS_PENDING, STATUS_SENDING])
+        ).scalar() or 0
+
+    def get_channel_statuses(self, notification_id: int) -> Dict[str, str]:
+        """
+        Статусы доставки уведомления по каналам
+        """
+        rows = self.db.query(NotificationDelivery.channel, NotificationDelivery.status).filter(
+            NotificationDelivery.notification_id == notification_id
+        ).all()
+        return {channel: status for channel, status in rows}
+
+    def get_status_counts(self) -> Dict[str, Dict[str, int]]:
+        """
+        Количество задач по каналам и статусам
+        """
+        rows = self.db.query(
+            NotificationDelivery.channel, NotificationDelivery.status, func.count(NotificationDelivery.id)
+        ).group_by(NotificationDelivery.channel, NotificationDelivery.status).all()
+        counts: Dict[str, Dict[str, int]] = {}
+        for channel, status, count in rows:
+            counts.setdefault(channel, {})[status] = count
+        return counts
+
+    def get_dead(self, channel: Optional[str] = None, limit: int = 100) -> List[NotificationDelivery]:
+        query = self.db.query(NotificationDelivery).filter(NotificationDelivery.status == STATUS_DEAD)
+        if channel:
+            query = query.filter(NotificationDelivery.channel == channel)
+        return query.order_by(NotificationDelivery.id.desc()).limit(limit).all()
@@ -2,10 +2,13 @@
 Репозиторий для работы с транзакциями
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from app.models import Transaction, Vehicle, Provider
+from sqlalchemy import delete, desc, func
+from typing import Callable, Optional, List, Dict, Any
+from datetime import date, datetime
+from app.models import AnomalyStatsDaily, FuelCardAnalysisResult, Transaction, Vehicle, Provider
+from app.repositories.anomaly_stats_repository import AnomalyStatsRepository
+from app.utils.chunked_delete import delete_in_chunks, truncate_tables
+from app.utils.organization_scope import organization_scope_clause
 
 
 class TransactionRepository:
@@ -75,13 +78,9 @@ class TransactionRepository:
         
         # Фильтрация по организациям
         if organization_ids is not None:
-            query = query.filter(
-                (Transaction.organization_id.in_(organization_ids)) | (Transaction.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(Transaction.organization_id, organization_ids))
         elif organization_id is not None:
-            query = query.filter(
-                (Transaction.organization_id == organization_id) | (Transaction.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(Transaction.organization_id, [organization_id]))
         
         # Получаем общее количество
         total = query.count()
@@ -129,17 +128,34 @@ class TransactionRepository:
         self.db.commit()
         return True
     
-    def delete_all(self) -> int:
+    def delete_all(
+        self,
+        chunk_size: int = 5000,
+        max_rows_per_second: Optional[float] = None,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> int:
         """
         Удаление всех транзакций
         
+        В PostgreSQL таблица очищается через TRUNCATE вместе с результатами
+        анализа карт и счетчиками аномалий (они целиком производны от
+        транзакций); если TRUNCATE недоступен - удаление порциями.
+        
         Returns:
             int: количество удаленных транзакций
         """
-        count = self.db.query(Transaction).count()
-        self.db.query(Transaction).delete()
-        self.db.commit()
-        return count
+        count = self.db.query(func.count(Transaction.id)).scalar() or 0
+        if not count:
+            return 0
+        if truncate_tables(self.db, [
+            FuelCardAnalysisResult.__tablename__,
+            AnomalyStatsDaily.__tablename__,
+            Transaction.__tablename__,
+        ]):
+            if on_chunk:
+                on_chunk(count)
+            return count
+        return self._delete_in_chunks([], chunk_size, max_rows_per_second, on_chunk)
     
     def count_by_provider_and_period(
         self,
@@ -192,30 +208,91 @@ class TransactionRepository:
         self,
         provider_id: int,
         date_from: Optional[datetime] = None,
-        date_to: Optional[datetime] = None
+        date_to: Optional[datetime] = None,
+        chunk_size: int = 5000,
+        max_rows_per_second: Optional[float] = None,
+        on_chunk: Optional[Callable[[int], None]] = None
     ) -> int:
         """
         Удаление транзакций по провайдеру и периоду
         
+        Транзакции удаляются порциями по id (каждая порция - отдельная
+        транзакция БД), результаты анализа карт удаляемых транзакций
+        удаляются в той же порции.
+        
         Args:
             provider_id: ID провайдера
             date_from: Начальная дата периода (включительно)
             date_to: Конечная дата периода (включительно)
+            chunk_size: Транзакций в порции
+            max_rows_per_second: Ограничение скорости удаления
+            on_chunk: Вызывается после каждой порции с числом удаленных строк
         
         Returns:
             int: количество удаленных транзакций
         """
-        query = self.db.query(Transaction).filter(Transaction.provider_id == provider_id)
-        
+        conditions = [Transaction.provider_id == provider_id]
         if date_from is not None:
-            query = query.filter(Transaction.transaction_date >= date_from)
+            conditions.append(Transaction.transaction_date >= date_from)
         if date_to is not None:
-            query = query.filter(Transaction.transaction_date <= date_to)
+            conditions.append(Transaction.transaction_date <= date_to)
         
-        count = query.count()
-        query.delete()
-        self.db.commit()
-        return count
+        return self._delete_in_chunks(conditions, chunk_size, max_rows_per_second, on_chunk)
+    
+    def _delete_in_chunks(
+        self,
+        conditions: List,
+        chunk_size: int,
+        max_rows_per_second: Optional[float],
+        on_chunk: Optional[Callable[[int], None]]
+    ) -> int:
+        """
+        Удаление транзакций порциями вместе с результатами анализа карт
+        """
+        return delete_in_chunks(
+            self.db,
+            Transaction,
+            conditions,
+            chunk_size=chunk_size,
+            max_rows_per_second=max_rows_per_second,
+            before_delete=self._delete_analysis_results,
+            on_chunk=on_chunk
+        )
+    
+    def _delete_analysis_results(self, transaction_ids: List[int]) -> None:
+        """
+        Удаление результатов анализа транзакций порции с вычитанием их из
+        счетчиков аномалий (в транзакции порции)
+        """
+        analysis = FuelCardAnalysisResult
+        day = func.date(analysis.analysis_date)
+        counters = self.db.query(
+            day,
+            Transaction.organization_id,
+            analysis.anomaly_type,
+            analysis.match_status,
+            func.count(analysis.id)
+        ).join(
+            Transaction, Transaction.id == analysis.transaction_id
+        ).filter(
+            analysis.transaction_id.in_(transaction_ids),
+            analysis.is_anomaly == True,
+            analysis.match_status.isnot(None),
+            analysis.analysis_date.isnot(None)
+        ).group_by(
+            day, Transaction.organization_id, analysis.anomaly_type, analysis.match_status
+        ).all()
+        
+        stats_repo = AnomalyStatsRepository(self.db)
+        for row_day, organization_id, anomaly_type, match_status, count in counters:
+            if isinstance(row_day, str):
+                row_day = date.fromisoformat(row_day)
+            stats_repo.apply_delta((row_day, organization_id, anomaly_type, match_status), -count)
+        
+        self.db.execute(
+            delete(analysis).where(analysis.transaction_id.in_(transaction_ids))
+            .execution_options(synchronize_session=False)
+        )
     
     def count(self) -> int:
         """
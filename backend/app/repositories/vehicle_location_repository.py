@@ -2,10 +2,15 @@
 Репозиторий для работы с местоположениями ТС
 """
 from sqlalchemy.orm import Session
-from typing import Optional, List, Tuple
-from datetime import datetime
-from sqlalchemy import func
+from typing import Optional, List, Tuple, Union
+from datetime import datetime, timedelta
+import pandas as pd
 from app.models import VehicleLocation
+from app.utils.bulk_copy import copy_insert_ignore_conflicts
+from app.utils.geohash_utils import geohash_encode_many
+
+# Уникальный ключ записи телематики, по которому пропускаются повторные загрузки
+CONFLICT_COLUMNS = ("vehicle_id", "timestamp")
 
 
 class VehicleLocationRepository:
@@ -32,6 +37,10 @@ class VehicleLocationRepository:
         """
         Получение ближайшего местоположения ТС к указанному времени
         
+        Выполняется двумя индексными запросами LIMIT 1 по (vehicle_id, timestamp):
+        последняя точка не позже target_time и первая точка после него.
+        Благодаря ограничению окна PostgreSQL затрагивает только нужные месячные секции
+        
         Args:
             vehicle_id: ID транспортного средства
             target_time: Целевое время
@@ -40,22 +49,26 @@ class VehicleLocationRepository:
         Returns:
             VehicleLocation или None
         """
-        from datetime import timedelta
+        window = timedelta(seconds=time_window_seconds)
         
-        time_from = target_time - timedelta(seconds=time_window_seconds)
-        time_to = target_time + timedelta(seconds=time_window_seconds)
+        before = self.db.query(VehicleLocation).filter(
+            VehicleLocation.vehicle_id == vehicle_id,
+            VehicleLocation.timestamp <= target_time,
+            VehicleLocation.timestamp >= target_time - window
+        ).order_by(VehicleLocation.timestamp.desc()).limit(1).first()
         
-        location = self.db.query(VehicleLocation).filter(
+        after = self.db.query(VehicleLocation).filter(
             VehicleLocation.vehicle_id == vehicle_id,
-            VehicleLocation.timestamp >= time_from,
-            VehicleLocation.timestamp <= time_to
-        ).order_by(
-            func.abs(
-                func.extract('epoch', VehicleLocation.timestamp - target_time)
-            )
-        ).first()
+            VehicleLocation.timestamp > target_time,
+            VehicleLocation.timestamp <= target_time + window
+        ).order_by(VehicleLocation.timestamp.asc()).limit(1).first()
         
-        return location
+        if before is None or after is None:
+            return before or after
+        
+        if after.timestamp - target_time < target_time - before.timestamp:
+            return after
+        return before
     
     def get_by_vehicle_and_date_range(
         self,
@@ -128,3 +141,29 @@ class VehicleLocationRepository:
             self.db.refresh(location)
         
         return created
+    
+    def bulk_insert(self, locations: Union[List[dict], pd.DataFrame]) -> int:
+        """
+        Массовая вставка местоположений без создания ORM-объектов
+        
+        Для PostgreSQL используется COPY, записи с уже существующим
+        ключом (vehicle_id, timestamp) пропускаются, поэтому повторная загрузка идемпотентна
+        
+        Returns:
+            Количество фактически вставленных записей
+        """
+        frame = locations if isinstance(locations, pd.DataFrame) else pd.DataFrame.from_records(locations)
+        if frame.empty:
+            return 0
+        
+        frame = frame.drop_duplicates(subset=list(CONFLICT_COLUMNS), keep="first").copy()
+        # Bulk-вставка минует ORM-события, поэтому геохеш вычисляется здесь векторно
+        frame["geohash"] = geohash_encode_many(
+            pd.to_numeric(frame["latitude"], errors="coerce"),
+            pd.to_numeric(frame["longitude"], errors="coerce")
+        )
+        inserted = copy_insert_ignore_conflicts(
+            self.db, VehicleLocation.__table__, frame, CONFLICT_COLUMNS
+        )
+        self.db.commit()
+        return inserted
@@ -2,9 +2,14 @@
 Репозиторий для работы с заправками ТС
 """
 from sqlalchemy.orm import Session
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Union
 from datetime import datetime
+import pandas as pd
 from app.models import VehicleRefuel
+from app.utils.bulk_copy import copy_insert_ignore_conflicts
+
+# Уникальный ключ записи телематики, по которому пропускаются повторные загрузки
+CONFLICT_COLUMNS = ("vehicle_id", "refuel_date")
 
 
 class VehicleRefuelRepository:
@@ -93,3 +98,24 @@ class VehicleRefuelRepository:
             self.db.refresh(refuel)
         
         return created
+    
+    def bulk_insert(self, refuels: Union[List[dict], pd.DataFrame]) -> int:
+        """
+        Массовая вставка заправок без создания ORM-объектов
+        
+        Для PostgreSQL используется COPY, записи с уже существующим
+        ключом (vehicle_id, refuel_date) пропускаются, поэтому повторная загрузка идемпотентна
+        
+        Returns:
+            Количество фактически вставленных записей
+        """
+        frame = refuels if isinstance(refuels, pd.DataFrame) else pd.DataFrame.from_records(refuels)
+        if frame.empty:
+            return 0
+        
+        frame = frame.drop_duplicates(subset=list(CONFLICT_COLUMNS), keep="first")
+        inserted = copy_insert_ignore_conflicts(
+            self.db, VehicleRefuel.__table__, frame, CONFLICT_COLUMNS
+        )
+        self.db.commit()
+        return inserted
@@ -4,6 +4,7 @@
 from sqlalchemy.orm import Session
 from typing import Optional, List, Tuple
 from app.models import Vehicle
+from app.utils.organization_scope import organization_scope_clause
 
 
 class VehicleRepository:
@@ -46,13 +47,9 @@ class VehicleRepository:
         
         # Фильтрация по организациям
         if organization_ids is not None:
-            query = query.filter(
-                (Vehicle.organization_id.in_(organization_ids)) | (Vehicle.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(Vehicle.organization_id, organization_ids))
         elif organization_id is not None:
-            query = query.filter(
-                (Vehicle.organization_id == organization_id) | (Vehicle.organization_id.is_(None))
-            )
+            query = query.filter(organization_scope_clause(Vehicle.organization_id, [organization_id]))
         
         total = query.count()
         vehicles = query.order_by(Vehicle.created_at.desc()).offset(skip).limit(limit).all()
@@ -3,10 +3,11 @@
 """
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, extract
 from typing import Optional
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.database import get_async_read_db
 from app.logger import logger
 from app.models import Transaction, Provider, Vehicle, ProviderTemplate
 from app.services.cache_service import CacheService
@@ -18,7 +19,7 @@ cache = CacheService.get_instance()
 @router.get("/stats")
 async def get_dashboard_stats(
     period: Optional[str] = Query("month", description="Период: day, month, year"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение детализированной статистики для дашборда
@@ -30,6 +31,19 @@ async def get_dashboard_stats(
         logger.debug("Cache hit для статистики дашборда", extra={"period": period})
         return cached_result
     
+    result = await db.run_sync(_collect_dashboard_stats, period)
+    
+    # Кэшируем результат (60 секунд)
+    cache.set(cache_key, result, ttl=60, prefix="")
+    logger.debug("Cache miss, сохранено в кэш", extra={"period": period})
+    
+    return result
+
+
+def _collect_dashboard_stats(db: Session, period: Optional[str]) -> dict:
+    """
+    Расчет статистики для дашборда (выполняется через AsyncSession.run_sync)
+    """
     # Определяем период
     now = datetime.now()
     if period == "day":
@@ -226,7 +240,7 @@ async def get_dashboard_stats(
     
     logger.debug("Статистика дашборда загружена", extra={"period": period})
     
-    result = {
+    return {
         "period": period,
         "period_data": period_data,
         "leaders_by_quantity": leaders,
@@ -235,21 +249,22 @@ async def get_dashboard_stats(
         "providers": providers_data,
         "period_providers": period_providers_data
     }
-    
-    # Кэшируем результат (60 секунд)
-    cache.set(cache_key, result, ttl=60, prefix="")
-    logger.debug("Cache miss, сохранено в кэш", extra={"period": period})
-    
-    return result
 
 
 @router.get("/errors-warnings")
 async def get_errors_warnings_stats(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение статистики по ошибкам и предупреждениям
     """
+    return await db.run_sync(_collect_errors_warnings_stats)
+
+
+def _collect_errors_warnings_stats(db: Session) -> dict:
+    """
+    Расчет статистики по ошибкам и предупреждениям (через AsyncSession.run_sync)
+    """
     # Статистика по транспортным средствам
     vehicles_invalid = db.query(func.count(Vehicle.id)).filter(
         Vehicle.is_validated == "invalid"
@@ -343,11 +358,18 @@ async def get_errors_warnings_stats(
 
 @router.get("/vehicles")
 async def get_vehicles_dashboard(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение детальной статистики по транспортным средствам для дашборда
     """
+    return await db.run_sync(_collect_vehicles_dashboard)
+
+
+def _collect_vehicles_dashboard(db: Session) -> dict:
+    """
+    Расчет статистики по транспортным средствам (через AsyncSession.run_sync)
+    """
     # Общая статистика
     total_vehicles = db.query(func.count(Vehicle.id)).scalar() or 0
     
@@ -505,10 +527,17 @@ async def get_vehicles_dashboard(
 
 @router.get("/auto-load-stats")
 async def get_auto_load_stats(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение статистики автоматических загрузок за последние 24 часа
+    """
+    return await db.run_sync(_collect_auto_load_stats)
+
+
+def _collect_auto_load_stats(db: Session) -> dict:
+    """
+    Расчет статистики автоматических загрузок (через AsyncSession.run_sync)
     Оптимизированная версия с агрегацией на уровне БД
     """
     from sqlalchemy import or_, and_
@@ -1,7 +1,7 @@
 """
 Роутер для анализа топливных карт
 """
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
@@ -22,9 +22,17 @@ from app.schemas import (
     VehicleLocationResponse,
     BulkRefuelsUploadRequest,
     BulkLocationsUploadRequest,
-    BulkUploadResponse
+    BulkUploadResponse,
+    BulkIngestResponse,
+    NearestGasStationResponse
 )
 from app.services.fuel_card_analysis_service import FuelCardAnalysisService
+from app.services.spatial_index_service import SpatialIndexService
+from app.services.telematics_ingest_service import (
+    TelematicsIngestService,
+    resolve_ingest_format,
+    DEFAULT_BATCH_SIZE
+)
 from app.repositories import (
     VehicleRefuelRepository,
     VehicleLocationRepository
@@ -177,42 +185,7 @@ async def get_anomaly_stats(
         from app.repositories import FuelCardAnalysisRepository
         
         repo = FuelCardAnalysisRepository(db)
-        stats = repo.get_anomaly_stats(date_from, date_to, anomaly_type)
-        
-        # Если указана организация, фильтруем по транзакциям
-        if organization_id:
-            from app.models import Transaction
-            transaction_ids = db.query(Transaction.id).filter(
-                Transaction.organization_id == organization_id
-            ).subquery()
-            results = db.query(FuelCardAnalysisResult).filter(
-                FuelCardAnalysisResult.is_anomaly == True,
-                FuelCardAnalysisResult.transaction_id.in_(
-                    db.query(transaction_ids.c.id)
-                )
-            )
-            if date_from:
-                results = results.filter(FuelCardAnalysisResult.analysis_date >= date_from)
-            if date_to:
-                results = results.filter(FuelCardAnalysisResult.analysis_date <= date_to)
-            if anomaly_type:
-                results = results.filter(FuelCardAnalysisResult.anomaly_type == anomaly_type)
-            
-            results = results.all()
-            
-            # Пересчитываем статистику
-            by_type = {}
-            by_status = {}
-            for result in results:
-                if result.anomaly_type:
-                    by_type[result.anomaly_type] = by_type.get(result.anomaly_type, 0) + 1
-                by_status[result.match_status] = by_status.get(result.match_status, 0) + 1
-            
-            stats = {
-                "total_anomalies": len(results),
-                "by_type": by_type,
-                "by_status": by_status
-            }
+        stats = repo.get_anomaly_stats(date_from, date_to, anomaly_type, organization_id)
         
         return {
             "total_anomalies": stats["total_anomalies"],
@@ -226,6 +199,23 @@ async def get_anomaly_stats(
         raise HTTPException(status_code=500, detail=f"Ошибка при получении статистики: {str(e)}")
 
 
+@router.get("/vehicles/{vehicle_id}/route-stations", response_model=List[NearestGasStationResponse])
+async def get_route_stations(
+    vehicle_id: int,
+    date_from: datetime = Query(..., description="Начало периода"),
+    date_to: datetime = Query(..., description="Конец периода"),
+    radius: float = Query(500, gt=0, le=10000, description="Радиус в метрах"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_auth_if_enabled)
+):
+    """
+    АЗС, мимо которых проезжало ТС за период (по треку GPS)
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to должна быть не раньше date_from")
+    return SpatialIndexService(db).stations_near_vehicle_route(vehicle_id, date_from, date_to, radius)
+
+
 @router.post("/refuels/upload", response_model=BulkUploadResponse)
 async def upload_refuels(
     request: BulkRefuelsUploadRequest,
@@ -238,10 +228,11 @@ async def upload_refuels(
     try:
         repo = VehicleRefuelRepository(db)
         refuels_data = [refuel_data.model_dump() for refuel_data in request.refuels]
-        created_refuels = repo.bulk_create(refuels_data)
+        created = repo.bulk_insert(refuels_data)
         
         return {
-            "created": len(created_refuels),
+            "created": created,
+            "skipped": len(refuels_data) - created,
             "errors": []
         }
     except Exception as e:
@@ -261,12 +252,76 @@ async def upload_locations(
     try:
         repo = VehicleLocationRepository(db)
         locations_data = [location_data.model_dump() for location_data in request.locations]
-        created_locations = repo.bulk_create(locations_data)
+        created = repo.bulk_insert(locations_data)
         
         return {
-            "created": len(created_locations),
+            "created": created,
+            "skipped": len(locations_data) - created,
             "errors": []
         }
     except Exception as e:
         logger.error(f"Ошибка при массовой загрузке местоположений: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении местоположений: {str(e)}")
+
+
+async def _ingest_telematics(
+    target: str,
+    request: Request,
+    format: Optional[str],
+    batch_size: int,
+    db: Session
+) -> dict:
+    """
+    Общая логика потоковой загрузки местоположений и заправок
+    """
+    try:
+        fmt = resolve_ingest_format(request.headers.get("content-type"), format)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    try:
+        service = TelematicsIngestService(db)
+        return await service.ingest(target, request.stream(), fmt, batch_size)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Ошибка при потоковой загрузке телематики ({target}): {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Ошибка при потоковой загрузке: {str(e)}. Уже записанные пакеты сохранены, повторная отправка безопасна"
+        )
+
+
+@router.post("/refuels/ingest", response_model=BulkIngestResponse)
+async def ingest_refuels(
+    request: Request,
+    format: Optional[str] = Query(None, description="Формат тела запроса: ndjson или csv (по умолчанию определяется по Content-Type)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=100, le=100000, description="Размер пакета записи в БД"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_auth_if_enabled)
+):
+    """
+    Потоковая загрузка заправок ТС в формате NDJSON или CSV
+    
+    Строки валидируются пакетами и записываются через COPY.
+    Записи с уже загруженной парой (vehicle_id, refuel_date) пропускаются,
+    в ответе возвращаются только счетчики
+    """
+    return await _ingest_telematics("refuels", request, format, batch_size, db)
+
+
+@router.post("/locations/ingest", response_model=BulkIngestResponse)
+async def ingest_locations(
+    request: Request,
+    format: Optional[str] = Query(None, description="Формат тела запроса: ndjson или csv (по умолчанию определяется по Content-Type)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=100, le=100000, description="Размер пакета записи в БД"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_auth_if_enabled)
+):
+    """
+    Потоковая загрузка местоположений ТС в формате NDJSON или CSV
+    
+    Строки валидируются пакетами и записываются через COPY.
+    Записи с уже загруженной парой (vehicle_id, timestamp) пропускаются,
+    в ответе возвращаются только счетчики
+    """
+    return await _ingest_telematics("locations", request, format, batch_size, db)
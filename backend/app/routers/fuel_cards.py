@@ -1,17 +1,21 @@
 """
 Роутер для работы с топливными картами
 """
+import time
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
 from typing import Optional
 from app.database import get_db
 from app.logger import logger
 from app.models import Vehicle, FuelCard, User, ProviderTemplate
-from app.services.normalization_service import normalize_owner_name, get_normalization_settings
+from app.services.normalization_service import (
+    normalize_owner_name, get_normalization_settings, renormalize_fuel_card_owners
+)
 from app.schemas import (
     FuelCardResponse, FuelCardUpdate, FuelCardListResponse,
     CardAssignmentRequest, CardAssignmentResponse, MergeRequest, MergeResponse,
-    CardInfoRequest, CardInfoResponse, NormalizeOwnerRequest, NormalizeOwnerResponse
+    CardInfoRequest, CardInfoResponse, NormalizeOwnerRequest, NormalizeOwnerResponse,
+    RenormalizeOwnersResponse
 )
 from app.services import assign_card_to_vehicle
 from app.auth import require_auth_if_enabled, require_admin
@@ -230,7 +234,7 @@ async def merge_fuel_cards(
     Все транзакции с card_id переносятся на target_id,
     после чего card_id удаляется
     """
-    from app.models import Transaction
+    from app.services.merge_service import MergePlan, MergeService
     
     source_card = db.query(FuelCard).filter(FuelCard.id == card_id).first()
     target_card = db.query(FuelCard).filter(FuelCard.id == merge_request.target_id).first()
@@ -244,24 +248,14 @@ async def merge_fuel_cards(
     if card_id == merge_request.target_id:
         raise HTTPException(status_code=400, detail="Нельзя объединить карту с самой собой")
     
+    source_card_number = source_card.card_number
     try:
-        # Обновляем все транзакции, связанные с source_card
-        transactions_updated = db.query(Transaction).filter(
-            Transaction.card_number == source_card.card_number
-        ).update({"card_number": target_card.card_number})
-        
-        # Обновляем связи, если они были пустыми в target_card
-        updated = False
-        if not target_card.provider_id and source_card.provider_id:
-            target_card.provider_id = source_card.provider_id
-            updated = True
-        if not target_card.vehicle_id and source_card.vehicle_id:
-            target_card.vehicle_id = source_card.vehicle_id
-            updated = True
-        
-        # Удаляем source_card
-        db.delete(source_card)
-        db.commit()
+        # Транзакции переносятся порциями, пустые связи целевой карты
+        # дополняются данными исходной, исходная карта удаляется
+        result = MergeService(db).merge_fuel_card_plan(
+            MergePlan(target_id=merge_request.target_id, source_ids=[card_id])
+        )
+        transactions_updated = result["updated"]["transactions"]
         db.refresh(target_card)
         
         logger.info(
@@ -281,7 +275,7 @@ async def merge_fuel_cards(
                     user_id=current_user.id,
                     username=current_user.username,
                     action_type="merge",
-                    action_description=f"Объединены карты: '{source_card.card_number}' с '{target_card.card_number}'",
+                    action_description=f"Объединены карты: '{source_card_number}' с '{target_card.card_number}'",
                     action_category="fuel_card",
                     entity_type="FuelCard",
                     entity_id=merge_request.target_id,
@@ -302,7 +296,7 @@ async def merge_fuel_cards(
         
         return MergeResponse(
             success=True,
-            message=f"Карта '{source_card.card_number}' успешно объединена с '{target_card.card_number}'",
+            message=f"Карта '{source_card_number}' успешно объединена с '{target_card.card_number}'",
             transactions_updated=transactions_updated
         )
     except Exception as e:
@@ -416,16 +410,14 @@ async def get_card_info(
         )
     
     try:
-        # Создаем сервис и адаптер
+        # Получаем информацию по карте (адаптер создается только при промахе кэша)
         api_service = ApiProviderService(db)
-        adapter = api_service.create_adapter(template)
-        
-        # Получаем информацию по карте
-        async with adapter:
-            card_info = await adapter.get_card_info(
-                card_number=request.card_number,
-                flags=request.flags or 23
-            )
+        card_info = await api_service.get_card_info(
+            template,
+            card_number=request.card_number,
+            flags=request.flags or 23,
+            use_cache=request.use_cache is not False
+        )
         
         # Обновляем топливную карту, если указано
         updated_card = None
@@ -552,3 +544,49 @@ async def normalize_owner(
             "owner_name": request.owner_name
         }, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Ошибка при нормализации владельца: {str(e)}")
+
+
+# Обычная функция: FastAPI выполняет ее в пуле потоков, долгий синхронный проход
+# по всем картам не блокирует цикл событий и другие запросы воркера
+@router.post("/renormalize-owners", response_model=RenormalizeOwnersResponse)
+def renormalize_owners(
+    batch_size: int = Query(1000, ge=100, le=10000, description="Размер пакета карт"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Повторная нормализация владельцев всех топливных карт
+    
+    Применяет текущие настройки нормализации (fuel_card_owner) к исходным
+    наименованиям владельцев и обновляет normalized_owner у изменившихся карт
+    """
+    started = time.monotonic()
+    try:
+        result = renormalize_fuel_card_owners(db, dictionary_type="fuel_card_owner", batch_size=batch_size)
+    except Exception as e:
+        db.rollback()
+        logger.error("Ошибка при повторной нормализации владельцев карт", extra={"error": str(e)}, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Ошибка при повторной нормализации владельцев: {str(e)}")
+    duration_ms = int((time.monotonic() - started) * 1000)
+    
+    if current_user:
+        try:
+            logging_service.log_user_action(
+                db=db,
+                user_id=current_user.id,
+                username=current_user.username,
+                action_type="update",
+                action_description=f"Повторная нормализация владельцев карт (изменено {result['updated']} из {result['processed']})",
+                action_category="fuel_card",
+                entity_type="FuelCard",
+                entity_id=None,
+                status="success",
+                extra_data=result
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при логировании действия пользователя: {e}", exc_info=True)
+    
+    if result["updated"]:
+        invalidate_fuel_cards_cache()
+    
+    return RenormalizeOwnersResponse(duration_ms=duration_ms, **result)
@@ -10,15 +10,22 @@ import io
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.logger import logger
 from app.models import GasStation, User, Provider
-from app.schemas import GasStationResponse, GasStationUpdate, GasStationListResponse
+from app.schemas import (
+    GasStationResponse,
+    GasStationUpdate,
+    GasStationListResponse,
+    NearestGasStationResponse,
+    GasStationDuplicateResponse
+)
 from app.services.gas_station_service import GasStationService
+from app.services.spatial_index_service import SpatialIndexService
 from app.auth import require_auth_if_enabled, require_admin
 from app.services.logging_service import logging_service
 from app.services.cache_service import cached
-from app.utils import validate_excel_file, create_temp_file, cleanup_temp_file
+from app.utils import validate_excel_file, spool_upload_to_temp_file, cleanup_temp_file
 from app.middleware.rate_limit import limiter
 from app.config import get_settings
 from fastapi import Request
@@ -80,12 +87,40 @@ async def get_gas_stations_stats(
     return stats
 
 
+@router.get("/nearest", response_model=List[NearestGasStationResponse])
+async def get_nearest_gas_stations(
+    latitude: float = Query(..., ge=-90, le=90, description="Широта точки"),
+    longitude: float = Query(..., ge=-180, le=180, description="Долгота точки"),
+    radius: float = Query(1000, gt=0, le=100000, description="Радиус поиска в метрах"),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_auth_if_enabled)
+):
+    """
+    Ближайшие к точке АЗС в радиусе (поиск по геохешу)
+    """
+    return SpatialIndexService(db).nearest_stations(latitude, longitude, radius, limit)
+
+
+@router.get("/duplicates", response_model=List[GasStationDuplicateResponse])
+async def get_gas_station_duplicates(
+    radius: float = Query(50, gt=0, le=1000, description="Максимальное расстояние между АЗС в метрах"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_auth_if_enabled)
+):
+    """
+    Пары АЗС с практически совпадающими координатами (кандидаты на объединение)
+    """
+    return SpatialIndexService(db).find_duplicate_stations(radius)
+
+
 @router.get("/export")
 async def export_gas_stations(
     is_validated: Optional[str] = Query(None, description="Фильтр по статусу валидации: pending, valid, invalid"),
     provider_id: Optional[int] = Query(None, description="Фильтр по ID провайдера"),
     search: Optional[str] = Query(None, description="Поиск по названию, номеру АЗС, местоположению"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(require_auth_if_enabled)
 ):
     """
@@ -190,7 +225,7 @@ async def export_gas_stations(
     if current_user:
         try:
             logging_service.log_user_action(
-                db=db,
+                db=write_db,
                 user_id=current_user.id,
                 username=current_user.username,
                 action_type="export",
@@ -440,15 +475,8 @@ async def import_gas_stations(
     # Сохраняем файл во временную директорию
     tmp_file_path = None
     try:
-        # Читаем содержимое файла
-        content = await file.read()
-        
-        # Валидация размера файла
-        from app.utils import validate_file_size
-        validate_file_size(content, settings.max_file_size)
-        
-        # Создаем временный файл
-        tmp_file_path = create_temp_file(content, file.filename)
+        # Сохраняем файл порциями с проверкой размера
+        tmp_file_path = (await spool_upload_to_temp_file(file, settings.max_upload_size, suffix=file.filename)).path
         
         # Читаем Excel файл
         try:
@@ -142,6 +142,13 @@ async def health_check(db: Session = Depends(get_db)):
     except Exception as e:
         scheduler_info = {"status": "error", "error": str(e)}
     
+    # Состояние пулов соединений (выдано, свободно, overflow, утечки)
+    try:
+        from app.utils.db_pool import PoolMonitor
+        pools_info = PoolMonitor.get_instance().collect()
+    except Exception as e:
+        pools_info = {"error": str(e)}
+    
     response = {
         "status": "healthy" if all_healthy else "degraded",
         "timestamp": datetime.utcnow().isoformat(),
@@ -149,6 +156,7 @@ async def health_check(db: Session = Depends(get_db)):
         "environment": settings.environment,
         "checks": checks,
         "scheduler": scheduler_info,
+        "database_pools": pools_info,
         "system": system_info
     }
     
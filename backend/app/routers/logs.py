@@ -1,17 +1,22 @@
 """
 Роутер для просмотра логов системы и действий пользователей
 """
-from typing import Optional
+import base64
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, desc, func, select, tuple_
 
 from app.auth import require_admin, get_current_user
+from app.config import get_settings
 from app.services.logging_service import logging_service
-from app.database import get_db
+from app.services.partition_service import PartitionService
+from app.database import get_db, get_async_read_db
 from app.logger import logger
+from app.utils.query_profiler import get_query_profiler
 from app.models import SystemLog, UserActionLog, User
 from app.schemas import (
     SystemLogListResponse,
@@ -23,18 +28,88 @@ from app.schemas import (
 router = APIRouter(prefix="/api/v1/logs", tags=["Логи"])
 
 
+def _encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Некорректный курсор")
+
+
+def _like_term(search: str) -> str:
+    """
+    Шаблон ILIKE для поиска подстроки (символы % и _ экранируются)
+    """
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def _fetch_page(
+    db: AsyncSession,
+    query,
+    model,
+    skip: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True
+):
+    """
+    Страница записей (новые первыми), общее количество и курсор следующей страницы
+
+    С курсором страница выбирается по индексу (created_at, id) без OFFSET,
+    а общее количество не вычисляется (клиент получает его с первой страницы).
+    """
+    total = None
+    if cursor:
+        created_at, log_id = _decode_cursor(cursor)
+        page_query = query.where(tuple_(model.created_at, model.id) < (created_at, log_id))
+    else:
+        page_query = query.offset(skip)
+        if include_total:
+            total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery())) or 0
+
+    result = await db.scalars(
+        page_query.order_by(desc(model.created_at), desc(model.id)).limit(limit + 1)
+    )
+    items = result.all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        if last.created_at is not None:
+            next_cursor = _encode_cursor(last.created_at, last.id)
+    return total, items, next_cursor
+
+
+def _purge_logs(db: Session, model, cutoff: datetime) -> Tuple[list, int]:
+    """
+    Удаление записей журнала старше cutoff: секции, целиком лежащие раньше cutoff,
+    удаляются без DELETE, остаток удаляется только из граничной секции
+    """
+    service = PartitionService(db)
+    dropped = []
+    if service.is_partitioned(model.__tablename__):
+        dropped = service.drop_partitions_before(model.__tablename__, cutoff.date())
+    deleted_count = db.query(model).filter(model.created_at < cutoff).delete()
+    db.commit()
+    return dropped, deleted_count
+
+
 @router.get("/test", response_model=SystemLogListResponse)
 async def test_logs(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Тестовый endpoint для проверки работы логирования (без авторизации)
     """
     logger.info("Тестовый запрос логов (без авторизации)")
     
-    query = db.query(SystemLog)
-    total = query.count()
-    logs = query.order_by(desc(SystemLog.created_at)).limit(10).all()
+    total, logs, _ = await _fetch_page(db, select(SystemLog), SystemLog, 0, 10)
     
     logger.info(f"Тест: найдено {total} логов, возвращаем {len(logs)}")
     
@@ -51,7 +126,9 @@ async def list_system_logs(
     date_to: Optional[datetime] = Query(None, description="Конечная дата (ISO format)"),
     skip: int = Query(0, ge=0, description="Смещение для пагинации"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (вместо skip)"),
+    include_total: bool = Query(True, description="Вычислять общее количество (только без курсора)"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[User] = Depends(require_admin)
 ):
     """
@@ -62,7 +139,7 @@ async def list_system_logs(
     else:
         logger.info("Запрос системных логов (аутентификация отключена)")
     
-    query = db.query(SystemLog)
+    query = select(SystemLog)
     
     # Фильтры
     if level:
@@ -75,8 +152,8 @@ async def list_system_logs(
         query = query.filter(SystemLog.event_category == event_category)
     
     if search:
-        term = f"%{search.lower()}%"
-        query = query.filter(SystemLog.message.ilike(term))
+        # ILIKE по подстроке использует GIN-индекс pg_trgm (idx_system_logs_message_trgm)
+        query = query.filter(SystemLog.message.ilike(_like_term(search), escape="\\"))
     
     if date_from:
         query = query.filter(SystemLog.created_at >= date_from)
@@ -90,22 +167,14 @@ async def list_system_logs(
     #     date_from_default = datetime.utcnow() - timedelta(days=30)
     #     query = query.filter(SystemLog.created_at >= date_from_default)
     
-    total = query.count()
-    logger.info(f"Найдено системных логов: {total} (skip={skip}, limit={limit})")
-    
-    logs = (
-        query
-        .order_by(desc(SystemLog.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    total, logs, next_cursor = await _fetch_page(db, query, SystemLog, skip, limit, cursor, include_total)
+    logger.info(f"Найдено системных логов: {total} (skip={skip}, limit={limit}, cursor={bool(cursor)})")
     
     logger.info(f"Возвращаем {len(logs)} системных логов")
     
     # Проверяем, что данные сериализуются правильно
     try:
-        response = SystemLogListResponse(total=total, items=logs)
+        response = SystemLogListResponse(total=total, items=logs, next_cursor=next_cursor)
         logger.debug(f"Ответ сформирован: total={response.total}, items_count={len(response.items)}")
         return response
     except Exception as e:
@@ -117,13 +186,13 @@ async def list_system_logs(
 @router.get("/system/{log_id}", response_model=SystemLogResponse)
 async def get_system_log(
     log_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[User] = Depends(require_admin)
 ):
     """
     Получение детальной информации о системном логе (только для администраторов)
     """
-    log = db.query(SystemLog).filter(SystemLog.id == log_id).first()
+    log = await db.get(SystemLog, log_id)
     
     if not log:
         raise HTTPException(
@@ -134,6 +203,24 @@ async def get_system_log(
     return log
 
 
+@router.get("/slow-queries")
+async def list_slow_queries(
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Последние медленные SQL запросы с планами EXPLAIN (только для администраторов)
+
+    Заполняется при включенном профилировании (QUERY_PROFILING_ENABLED)
+    """
+    settings = get_settings()
+    profiler = get_query_profiler()
+    return {
+        "enabled": settings.query_profiling_enabled,
+        "slow_ms": profiler.slow_ms,
+        "items": profiler.slow_queries()
+    }
+
+
 @router.get("/user-actions", response_model=UserActionLogListResponse)
 async def list_user_action_logs(
     user_id: Optional[int] = Query(None, description="Фильтр по ID пользователя"),
@@ -147,7 +234,9 @@ async def list_user_action_logs(
     date_to: Optional[datetime] = Query(None, description="Конечная дата (ISO format)"),
     skip: int = Query(0, ge=0, description="Смещение для пагинации"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (вместо skip)"),
+    include_total: bool = Query(True, description="Вычислять общее количество (только без курсора)"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[User] = Depends(require_admin)
 ):
     """
@@ -158,7 +247,7 @@ async def list_user_action_logs(
     else:
         logger.info("Запрос логов действий пользователей (аутентификация отключена)")
     
-    query = db.query(UserActionLog)
+    query = select(UserActionLog)
     
     # Фильтры
     if user_id:
@@ -180,8 +269,7 @@ async def list_user_action_logs(
         query = query.filter(UserActionLog.status == status_filter)
     
     if search:
-        term = f"%{search.lower()}%"
-        query = query.filter(UserActionLog.action_description.ilike(term))
+        query = query.filter(UserActionLog.action_description.ilike(_like_term(search), escape="\\"))
     
     if date_from:
         query = query.filter(UserActionLog.created_at >= date_from)
@@ -195,28 +283,21 @@ async def list_user_action_logs(
     #     date_from_default = datetime.utcnow() - timedelta(days=30)
     #     query = query.filter(UserActionLog.created_at >= date_from_default)
     
-    total = query.count()
-    logs = (
-        query
-        .order_by(desc(UserActionLog.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    total, logs, next_cursor = await _fetch_page(db, query, UserActionLog, skip, limit, cursor, include_total)
     
-    return UserActionLogListResponse(total=total, items=logs)
+    return UserActionLogListResponse(total=total, items=logs, next_cursor=next_cursor)
 
 
 @router.get("/user-actions/{log_id}", response_model=UserActionLogResponse)
 async def get_user_action_log(
     log_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: Optional[User] = Depends(require_admin)
 ):
     """
     Получение детальной информации о логе действия пользователя (только для администраторов)
     """
-    log = db.query(UserActionLog).filter(UserActionLog.id == log_id).first()
+    log = await db.get(UserActionLog, log_id)
     
     if not log:
         raise HTTPException(
@@ -238,13 +319,15 @@ async def list_my_action_logs(
     date_to: Optional[datetime] = Query(None, description="Конечная дата (ISO format)"),
     skip: int = Query(0, ge=0, description="Смещение для пагинации"),
     limit: int = Query(100, ge=1, le=1000, description="Количество записей"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (вместо skip)"),
+    include_total: bool = Query(True, description="Вычислять общее количество (только без курсора)"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Получение списка собственных действий пользователя
     """
-    query = db.query(UserActionLog).filter(UserActionLog.user_id == current_user.id)
+    query = select(UserActionLog).where(UserActionLog.user_id == current_user.id)
     
     # Фильтры
     if action_type:
@@ -260,8 +343,7 @@ async def list_my_action_logs(
         query = query.filter(UserActionLog.status == status_filter)
     
     if search:
-        term = f"%{search.lower()}%"
-        query = query.filter(UserActionLog.action_description.ilike(term))
+        query = query.filter(UserActionLog.action_description.ilike(_like_term(search), escape="\\"))
     
     if date_from:
         query = query.filter(UserActionLog.created_at >= date_from)
@@ -275,16 +357,9 @@ async def list_my_action_logs(
     #     date_from_default = datetime.utcnow() - timedelta(days=30)
     #     query = query.filter(UserActionLog.created_at >= date_from_default)
     
-    total = query.count()
-    logs = (
-        query
-        .order_by(desc(UserActionLog.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    total, logs, next_cursor = await _fetch_page(db, query, UserActionLog, skip, limit, cursor, include_total)
     
-    return UserActionLogListResponse(total=total, items=logs)
+    return UserActionLogListResponse(total=total, items=logs, next_cursor=next_cursor)
 
 
 @router.delete("/system", status_code=status.HTTP_204_NO_CONTENT)
@@ -298,10 +373,9 @@ async def delete_old_system_logs(
     """
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
-    deleted_count = db.query(SystemLog).filter(SystemLog.created_at < cutoff_date).delete()
-    db.commit()
+    dropped, deleted_count = _purge_logs(db, SystemLog, cutoff_date)
     
-    logger.info(f"Удалено {deleted_count} старых системных логов (старше {days} дней)")
+    logger.info(f"Удалено {deleted_count} старых системных логов (старше {days} дней), секций: {len(dropped)}")
     
     return None
 
@@ -317,10 +391,11 @@ async def delete_old_user_action_logs(
     """
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
-    deleted_count = db.query(UserActionLog).filter(UserActionLog.created_at < cutoff_date).delete()
-    db.commit()
+    dropped, deleted_count = _purge_logs(db, UserActionLog, cutoff_date)
     
-    logger.info(f"Удалено {deleted_count} старых логов действий пользователей (старше {days} дней)")
+    logger.info(
+        f"Удалено {deleted_count} старых логов действий пользователей (старше {days} дней), секций: {len(dropped)}"
+    )
     
     return None
 
@@ -343,9 +418,10 @@ async def clear_all_system_logs(
         )
     
     try:
-        total_count = db.query(SystemLog).count()
-        db.query(SystemLog).delete()
-        db.commit()
+        # Оценка без полного сканирования: таблица очищается целиком через TRUNCATE
+        partition_service = PartitionService(db)
+        total_count = partition_service.estimate_rows("system_logs")
+        partition_service.truncate("system_logs")
         
         # Логируем действие пользователя (в данном случае запись в UserActionLog все равно останется)
         if current_user:
@@ -355,7 +431,7 @@ async def clear_all_system_logs(
                     user_id=current_user.id,
                     username=current_user.username,
                     action_type="clear",
-                    action_description=f"Очищены все системные логи ({total_count} записей)",
+                    action_description=f"Очищены все системные логи (около {total_count} записей)",
                     action_category="system_log",
                     entity_type="SystemLog",
                     entity_id=None,
@@ -395,9 +471,10 @@ async def clear_all_user_action_logs(
         )
     
     try:
-        total_count = db.query(UserActionLog).count()
-        db.query(UserActionLog).delete()
-        db.commit()
+        # Оценка без полного сканирования: таблица очищается целиком через TRUNCATE
+        partition_service = PartitionService(db)
+        total_count = partition_service.estimate_rows("user_action_logs")
+        partition_service.truncate("user_action_logs")
         
         # После очистки логируем действие (если логирование еще работает)
         if current_user:
@@ -407,7 +484,7 @@ async def clear_all_user_action_logs(
                     user_id=current_user.id,
                     username=current_user.username,
                     action_type="clear",
-                    action_description=f"Очищены все логи действий пользователей ({total_count} записей)",
+                    action_description=f"Очищены все логи действий пользователей (около {total_count} записей)",
                     action_category="user_action_log",
                     entity_type="UserActionLog",
                     entity_id=None,
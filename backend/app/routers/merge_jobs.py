@@ -0,0 +1,85 @@
+"""
+Роутер пакетного слияния дублей ТС и топливных карт
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session, sessionmaker
+from typing import List, Optional
+from app.database import get_db
+from app.logger import logger
+from app.models import User
+from app.schemas import MergeJobCreate, MergeJobResponse
+from app.auth import require_admin
+from app.services.logging_service import logging_service
+from app.services.merge_service import MergeJobManager, MergePlan, MergeService
+
+router = APIRouter(prefix="/api/v1/merge-jobs", tags=["merge-jobs"])
+
+
+@router.post("", response_model=MergeJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_merge_job(
+    request: MergeJobCreate,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Постановка пакетного слияния в очередь
+
+    Каждый план переносит ссылки дублей на целевую запись порциями и удаляет
+    дубли. Прогресс - GET /api/v1/merge-jobs/{job_id}.
+    """
+    plans = [MergePlan(target_id=item.target_id, source_ids=list(item.source_ids)) for item in request.plans]
+    try:
+        MergeService(db).validate_plans(request.entity, plans)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Задача работает с той же БД, что и запрос, в собственных сессиях
+    job = MergeJobManager.get_instance().submit(
+        request.entity, plans, session_factory=sessionmaker(bind=db.get_bind(), autoflush=False)
+    )
+
+    if current_user:
+        try:
+            logging_service.log_user_action(
+                db=db,
+                user_id=current_user.id,
+                username=current_user.username,
+                action_type="merge",
+                action_description=f"Запущено пакетное слияние ({request.entity}): планов {len(plans)}",
+                action_category="vehicle" if request.entity == "vehicle" else "fuel_card",
+                entity_type="MergeJob",
+                status="success",
+                extra_data={
+                    "job_id": job.id,
+                    "plans": len(plans),
+                    "sources": sum(len(plan.source_ids) for plan in plans)
+                }
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при логировании действия пользователя: {e}", exc_info=True)
+
+    return MergeJobResponse(**job.to_dict())
+
+
+@router.get("", response_model=List[MergeJobResponse])
+async def list_merge_jobs(
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Задачи слияния текущего процесса, новые первыми
+    """
+    return [MergeJobResponse(**job) for job in MergeJobManager.get_instance().list_jobs()]
+
+
+@router.get("/{job_id}", response_model=MergeJobResponse)
+async def get_merge_job(
+    job_id: str,
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Состояние задачи слияния
+    """
+    job = MergeJobManager.get_instance().get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача слияния не найдена")
+    return MergeJobResponse(**job)
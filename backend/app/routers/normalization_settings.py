@@ -14,6 +14,7 @@ from app.schemas import (
 )
 from app.auth import require_auth_if_enabled, require_admin
 from app.services.logging_service import logging_service
+from app.services.normalization_service import invalidate_normalization_settings
 
 router = APIRouter(prefix="/api/v1/normalization-settings", tags=["normalization-settings"])
 
@@ -120,6 +121,7 @@ async def create_normalization_setting(
     db.add(db_setting)
     db.commit()
     db.refresh(db_setting)
+    invalidate_normalization_settings(setting_data.dictionary_type)
     
     logger.info(f"Созданы настройки нормализации: {setting_data.dictionary_type}", extra={
         "dictionary_type": setting_data.dictionary_type
@@ -180,6 +182,7 @@ async def update_normalization_setting(
     
     db.commit()
     db.refresh(setting)
+    invalidate_normalization_settings(dictionary_type)
     
     logger.info(f"Обновлены настройки нормализации: {dictionary_type}", extra={
         "dictionary_type": dictionary_type
@@ -244,6 +247,7 @@ async def delete_normalization_setting(
     setting_id = setting.id
     db.delete(setting)
     db.commit()
+    invalidate_normalization_settings(dictionary_type)
     
     logger.info(f"Удалены настройки нормализации: {dictionary_type}", extra={
         "dictionary_type": dictionary_type
@@ -6,7 +6,7 @@ import json
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from app.auth import require_auth_if_enabled
+from app.auth import require_auth_if_enabled, require_admin
 from app.database import get_db
 from app.logger import logger
 from app.models import User
@@ -368,6 +368,64 @@ async def register_push_subscription(
     return {"message": "Push subscription registered successfully"}
 
 
+@router.get("/queue", status_code=status.HTTP_200_OK)
+async def get_delivery_queue(
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Состояние очереди доставки уведомлений (email, telegram, push) и последние задачи в dead
+    """
+    from app.repositories.notification_delivery_repository import NotificationDeliveryRepository
+    from app.services.notification_delivery_service import get_queue_stats
+    
+    stats = get_queue_stats(db)
+    stats["dead"] = [
+        {
+            "id": delivery.id,
+            "user_id": delivery.user_id,
+            "channel": delivery.channel,
+            "title": delivery.title,
+            "attempts": delivery.attempts,
+            "last_error": delivery.last_error,
+            "created_at": delivery.created_at.isoformat() if delivery.created_at else None
+        }
+        for delivery in NotificationDeliveryRepository(db).get_dead(limit=50)
+    ]
+    return stats
+
+
+@router.post("/queue/requeue-dead", status_code=status.HTTP_200_OK)
+async def requeue_dead_deliveries(
+    channel: Optional[str] = Query(None, description="Канал (email, telegram, push); по умолчанию - все"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(require_admin)
+):
+    """
+    Повторная постановка в очередь недоставленных уведомлений (dead)
+    """
+    from app.repositories.notification_delivery_repository import NotificationDeliveryRepository
+    from app.services.notification_delivery_service import NotificationDeliveryService
+    from app.services.notification_service import QUEUED_CHANNELS
+    
+    if channel and channel not in QUEUED_CHANNELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный канал: {channel}"
+        )
+    
+    requeued = NotificationDeliveryRepository(db).requeue_dead(channel)
+    db.commit()
+    NotificationDeliveryService.get_instance().wake([channel] if channel else QUEUED_CHANNELS)
+    
+    logger.info("Недоставленные уведомления поставлены в очередь повторно", extra={
+        "channel": channel,
+        "requeued": requeued,
+        "user_id": current_user.id if current_user else None
+    })
+    return {"requeued": requeued}
+
+
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
     notification_id: int,
@@ -3,10 +3,10 @@
 Предоставляет API для получения данных в формате, ожидаемом модулем уатЗагрузкаПЦ
 """
 from fastapi import APIRouter, Query, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_read_db
 from app.logger import logger
 from app.services.onec_integration_service import OneCIntegrationService
 from app.utils import parse_date_range
@@ -67,7 +67,7 @@ async def get_transactions_for_1c(
     date_to: Optional[str] = Query(None, description="Конечная дата периода в формате YYYY-MM-DD или YYYY-MM-DD HH:MM:SS"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска (пагинация)"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей на странице"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     _: None = Depends(require_auth_if_enabled)
 ):
     """
@@ -92,7 +92,7 @@ async def get_transactions_for_1c(
     
     try:
         # Проверяем существование провайдера
-        provider = db.query(Provider).filter(Provider.id == provider_id).first()
+        provider = await db.get(Provider, provider_id)
         if not provider:
             return OneCTransactionsResponse(
                 Успех=False,
@@ -115,13 +115,14 @@ async def get_transactions_for_1c(
         )
         
         # Получаем данные через сервис
-        onec_service = OneCIntegrationService(db)
-        транзакции_1с, всего_записей = onec_service.get_transactions_for_1c(
-            provider_id=provider_id,
-            date_from=parsed_date_from,
-            date_to=parsed_date_to,
-            skip=skip,
-            limit=limit
+        транзакции_1с, всего_записей = await db.run_sync(
+            lambda session: OneCIntegrationService(session).get_transactions_for_1c(
+                provider_id=provider_id,
+                date_from=parsed_date_from,
+                date_to=parsed_date_to,
+                skip=skip,
+                limit=limit
+            )
         )
         
         # Преобразуем в формат ответа
@@ -6,9 +6,10 @@ from fastapi import APIRouter, Query, Depends, HTTPException, Header, Request
 from starlette.requests import Request as StarletteRequest
 from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.database import get_db, get_async_db, get_async_read_db
 from app.logger import logger
 from app.services.ppr_api_service import PPRAPIService
 from app.utils import parse_date_range
@@ -418,6 +419,42 @@ async def verify_ppr_auth(
     )
 
 
+def _load_english_transactions(
+    db: Session,
+    provider_id: int,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    skip: int,
+    limit: int
+) -> List[Dict[str, Any]]:
+    """
+    Транзакции в английском формате для другого модуля 1С (выполняется через AsyncSession.run_sync)
+    """
+    ppr_service = PPRAPIService(db)
+    db_transactions, _ = ppr_service.transaction_repo.get_all(
+        skip=skip,
+        limit=limit,
+        provider_id=provider_id,
+        date_from=date_from,
+        date_to=date_to,
+        sort_by="transaction_date",
+        sort_order="asc"
+    )
+    
+    import sys
+    print(f"Получено транзакций для английского формата: {len(db_transactions)}", file=sys.stdout, flush=True)
+    
+    транзакции_english = []
+    for db_transaction in db_transactions:
+        try:
+            транзакции_english.append(ppr_service._convert_transaction_to_english_format(db_transaction))
+        except Exception as e:
+            print(f"Ошибка при преобразовании транзакции {db_transaction.id} в английский формат: {str(e)}", file=sys.stdout, flush=True)
+            logger.error(f"Ошибка при преобразовании транзакции {db_transaction.id} в английский формат", exc_info=True)
+            continue
+    return транзакции_english
+
+
 @router.get("/transaction-list", response_model=PPRTransactionListResponse)
 async def ppr_get_transactions(
     auth_info: Dict[str, Any] = Depends(verify_ppr_auth),
@@ -427,7 +464,7 @@ async def ppr_get_transactions(
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
     format: Optional[str] = Query(None, description="Формат ответа (json, xml) - для совместимости"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение списка транзакций в формате ППР
@@ -478,13 +515,14 @@ async def ppr_get_transactions(
         )
         
         # Создаем сервис и получаем транзакции
-        ppr_service = PPRAPIService(db)
-        транзакции_русские, всего = ppr_service.get_transactions(
-            provider_id=provider_id,
-            date_from=parsed_date_from,
-            date_to=parsed_date_to,
-            skip=skip,
-            limit=limit
+        транзакции_русские, всего = await db.run_sync(
+            lambda session: PPRAPIService(session).get_transactions(
+                provider_id=provider_id,
+                date_from=parsed_date_from,
+                date_to=parsed_date_to,
+                skip=skip,
+                limit=limit
+            )
         )
         
         # Преобразуем в формат ответа (русский формат)
@@ -586,29 +624,16 @@ async def ppr_get_transactions(
         
         try:
             # Получаем транзакции из БД для преобразования в английский формат
-            db_transactions, _ = ppr_service.transaction_repo.get_all(
-                skip=skip,
-                limit=limit,
-                provider_id=provider_id,
-                date_from=parsed_date_from,
-                date_to=parsed_date_to,
-                sort_by="transaction_date",
-                sort_order="asc"
+            транзакции_english = await db.run_sync(
+                _load_english_transactions,
+                provider_id,
+                parsed_date_from,
+                parsed_date_to,
+                skip,
+                limit
             )
             
             import sys
-            print(f"Получено транзакций для английского формата: {len(db_transactions)}", file=sys.stdout, flush=True)
-            
-            for db_transaction in db_transactions:
-                try:
-                    english_format = ppr_service._convert_transaction_to_english_format(db_transaction)
-                    транзакции_english.append(english_format)
-                except Exception as e:
-                    import sys
-                    print(f"Ошибка при преобразовании транзакции {db_transaction.id} в английский формат: {str(e)}", file=sys.stdout, flush=True)
-                    logger.error(f"Ошибка при преобразовании транзакции {db_transaction.id} в английский формат", exc_info=True)
-                    continue
-            
             print(f"Успешно преобразовано в английский формат: {len(транзакции_english)}", file=sys.stdout, flush=True)
         except Exception as e:
             import sys
@@ -733,7 +758,7 @@ async def ppr_get_cards(
     provider_id: Optional[int] = Query(None, description="ID провайдера"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Получение списка топливных карт в формате ППР
@@ -763,11 +788,12 @@ async def ppr_get_cards(
         )
         
         # Создаем сервис и получаем карты
-        ppr_service = PPRAPIService(db)
-        карты, всего = ppr_service.get_cards(
-            provider_id=provider_id,
-            skip=skip,
-            limit=limit
+        карты, всего = await db.run_sync(
+            lambda session: PPRAPIService(session).get_cards(
+                provider_id=provider_id,
+                skip=skip,
+                limit=limit
+            )
         )
         
         # Преобразуем в формат ответа
@@ -971,7 +997,7 @@ async def ppr_get_transactions_original(
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
     format: Optional[str] = Query(None, description="Формат ответа (json, xml) - для совместимости, всегда возвращается JSON"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка транзакций в формате ППР (оригинальный путь)
@@ -1076,7 +1102,7 @@ async def ppr_get_cards_original(
     provider_id: Optional[int] = Query(None, description="ID провайдера"),
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(1000, ge=1, le=1000, description="Максимальное количество записей"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка топливных карт в формате ППР (оригинальный путь)
@@ -9,7 +9,7 @@ from datetime import date
 import io
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.logger import logger
 from app.models import Provider, ProviderTemplate, User, Transaction, GasStation, FuelCard, Vehicle
 from app.auth import require_auth_if_enabled
@@ -22,6 +22,7 @@ from app.schemas import (
 from app.services.provider_service import ProviderService
 from app.utils import serialize_template_json
 from app.services.cache_service import CacheService, invalidate_dashboard_cache
+from app.services.template_signature_index import invalidate_template_index
 import hashlib
 import json
 
@@ -131,6 +132,7 @@ async def create_provider(
         cache.delete_pattern("providers:*")
         invalidate_dashboard_cache()
         logger.debug("Кэш провайдеров и дашборда инвалидирован после создания провайдера")
+        invalidate_template_index()
         
         return db_provider
     except ValueError as e:
@@ -180,6 +182,7 @@ async def update_provider(
         cache.delete_pattern("providers:*")
         invalidate_dashboard_cache()
         logger.debug("Кэш провайдеров и дашборда инвалидирован после обновления провайдера")
+        invalidate_template_index()
         
         return db_provider
     except ValueError as e:
@@ -225,6 +228,7 @@ async def delete_provider(
     cache.delete_pattern("providers:*")
     invalidate_dashboard_cache()
     logger.debug("Кэш провайдеров и дашборда инвалидирован после удаления провайдера")
+    invalidate_template_index()
     
     return {"message": "Провайдер успешно удален"}
 
@@ -317,6 +321,7 @@ async def create_template(
     db.add(db_template)
     db.commit()
     db.refresh(db_template)
+    invalidate_template_index()
     
     logger.info("Шаблон создан", extra={"template_id": db_template.id, "provider_id": provider_id})
     
@@ -366,7 +371,8 @@ async def create_template(
 @router.get("/{provider_id}/export")
 async def export_provider_data(
     provider_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    write_db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(require_auth_if_enabled)
 ):
     """
@@ -604,7 +610,7 @@ async def export_provider_data(
     if current_user:
         try:
             logging_service.log_user_action(
-                db=db,
+                db=write_db,
                 user_id=current_user.id,
                 username=current_user.username,
                 action_type="export",
@@ -19,15 +19,18 @@ from app.schemas import (
 from app.services import analyze_template_structure
 from app.utils import (
     validate_excel_file,
-    create_temp_file,
+    spool_upload_to_temp_file,
     cleanup_temp_file,
     parse_template_json,
     serialize_template_json,
     get_firebird_service
 )
+from app.services.api_conversion_plan import invalidate_conversion_plan
 from app.services.api_provider_service import ApiProviderService
 from app.services.auto_load_service import AutoLoadService
 from app.services.cache_service import CacheService, invalidate_templates_cache
+from app.services.provider_card_cache import ProviderCardCache
+from app.services.template_signature_index import invalidate_template_index
 import hashlib
 import json
 
@@ -179,6 +182,12 @@ async def update_template(
     # Инвалидируем кэш шаблонов
     invalidate_templates_cache()
     logger.debug("Кэш шаблонов инвалидирован после обновления")
+    invalidate_conversion_plan(template_id)
+    invalidate_template_index()
+    
+    # Ответы провайдера (списки карт, информация по картам) получены со старыми настройками подключения
+    if template.connection_settings is not None or template.connection_type is not None:
+        ProviderCardCache.invalidate_template(template_id)
     
     # Перезагружаем расписания, если изменились настройки автозагрузки
     if (template.auto_load_enabled is not None or 
@@ -224,6 +233,9 @@ async def delete_template(
     
     db.delete(template)
     db.commit()
+    ProviderCardCache.invalidate_template(template_id)
+    invalidate_conversion_plan(template_id)
+    invalidate_template_index()
     
     # Логируем действие пользователя
     if current_user:
@@ -272,8 +284,7 @@ async def analyze_template(
     
     tmp_file_path = None
     try:
-        content = await file.read()
-        tmp_file_path = create_temp_file(content, suffix=".xlsx")
+        tmp_file_path = (await spool_upload_to_temp_file(file, settings.max_upload_size, suffix=".xlsx")).path
         
         structure = analyze_template_structure(tmp_file_path)
         
@@ -4,12 +4,13 @@
 from fastapi import APIRouter, UploadFile, File, Depends, Query, HTTPException, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime
 import io
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill
-from app.database import get_db
+from app.database import get_db, get_async_db, get_read_db
 from app.logger import logger
 from app.config import get_settings
 from app.models import Transaction, Provider, UploadPeriodLock, ProviderTemplate, User
@@ -22,16 +23,17 @@ from app.services.excel_processor import ExcelProcessor
 from app.services.transaction_batch_processor import TransactionBatchProcessor
 from app.services.api_provider_service import ApiProviderService
 from app.services.upload_event_service import UploadEventService
+from app.services.upload_fingerprint_service import UploadFingerprintService, pack_row_hashes
 from app.utils import (
     parse_date_range,
     validate_excel_file,
-    validate_file_size,
-    create_temp_file,
+    spool_upload_to_temp_file,
     cleanup_temp_file,
     parse_template_json,
     get_firebird_service,
-    match_fuel_type
+    compile_fuel_mapping
 )
+from app.services.api_conversion_plan import get_conversion_plan
 from app.middleware.rate_limit import limiter
 from app.auth import require_auth_if_enabled, require_admin
 from app.services.logging_service import logging_service
@@ -78,8 +80,6 @@ async def upload_file(
     )
     start_time = datetime.now()
     event_service = UploadEventService(db)
-    provider_id = None
-    template_id = None
     transactions_total = 0
     created_count = 0
     skipped_count = 0
@@ -98,18 +98,12 @@ async def upload_file(
         )
         raise
     
-    # Валидация размера файла из конфигурации
+    # Файл копируется во временный файл порциями: размер проверяется по мере чтения,
+    # хэш содержимого считается на лету, целиком в память файл не читается
     MAX_FILE_SIZE = settings.max_upload_size
     try:
-        content = await file.read()
-        file_size = len(content)
-        
-        logger.debug(
-            f"Размер загружаемого файла: {file_size / 1024 / 1024:.2f}MB",
-            extra={"file_size_bytes": file_size}
-        )
-        
-        validate_file_size(content, MAX_FILE_SIZE)
+        spooled = await spool_upload_to_temp_file(file, MAX_FILE_SIZE, suffix=".xlsx")
+        file_size = spooled.size
     except HTTPException as e:
         logger.error(
             "Ошибка валидации размера файла",
@@ -135,10 +129,53 @@ async def upload_file(
             detail=f"Ошибка при чтении файла: {str(e)}"
         )
     
-    # Сохраняем файл во временную директорию
-    tmp_file_path = None
+    tmp_file_path = spooled.path
+    file_content_hash = spooled.sha256
     try:
-        tmp_file_path = create_temp_file(content, suffix=".xlsx")
+        # Тот же файл уже загружен (тем же провайдером и шаблоном, если они указаны явно)
+        # и все его строки есть в БД - повторно не разбираем
+        loaded_event = UploadFingerprintService(db).find_loaded_upload(
+            file_content_hash, provider_id=provider_id, template_id=template_id
+        )
+        if loaded_event is not None:
+            message = "Файл уже был загружен ранее, новых транзакций нет"
+            logger.info(message, extra={
+                "file_name": file.filename,
+                "content_hash": file_content_hash,
+                "previous_event_id": loaded_event.id
+            })
+            event_service.log_event(
+                source_type="manual",
+                status="success",
+                is_scheduled=False,
+                file_name=file.filename,
+                provider_id=loaded_event.provider_id,
+                template_id=loaded_event.template_id,
+                user_id=current_user.id if current_user else None,
+                username=current_user.username if current_user else None,
+                transactions_total=loaded_event.transactions_total or 0,
+                transactions_created=0,
+                transactions_skipped=loaded_event.transactions_total or 0,
+                transactions_failed=0,
+                duration_ms=int((datetime.now() - start_time).total_seconds() * 1000),
+                message=message,
+                content_hash=file_content_hash
+            )
+            return JSONResponse(
+                status_code=200,
+                content=FileUploadResponse(
+                    message=message,
+                    transactions_created=0,
+                    transactions_skipped=loaded_event.transactions_total or 0,
+                    file_name=file.filename,
+                    validation_warnings=[],
+                    require_template_selection=False,
+                    available_templates=None,
+                    detected_provider_id=loaded_event.provider_id,
+                    detected_template_id=loaded_event.template_id,
+                    match_info=None
+                ).model_dump()
+            )
         
         match_info = {}
         auto_detected = False
@@ -146,7 +183,9 @@ async def upload_file(
         # Если провайдер и шаблон не указаны, пытаемся автоопределить
         if not provider_id or not template_id:
             logger.info("Определение провайдера и шаблона для файла", extra={"file_name": file.filename})
-            detected_provider_id, detected_template_id, match_info = detect_provider_and_template(tmp_file_path, db)
+            detected_provider_id, detected_template_id, match_info = detect_provider_and_template(
+                tmp_file_path, db, file_hash=file_content_hash
+            )
             
             # Используем автоопределенные значения, если они не были переданы
             if not provider_id:
@@ -223,91 +262,102 @@ async def upload_file(
                 }
             )
         
-        # Определяем стратегию обработки на основе размера файла
-        # Для файлов больше 10MB используем chunked reading
-        CHUNKED_THRESHOLD = 10 * 1024 * 1024  # 10MB
-        use_chunked = file_size > CHUNKED_THRESHOLD
-        chunk_size = 1000 if use_chunked else None
-        
         logger.info(
             "Обработка Excel файла",
             extra={
                 "file_name": file.filename,
                 "file_size_mb": round(file_size / 1024 / 1024, 2),
-                "use_chunked": use_chunked,
-                "chunk_size": chunk_size
+                "chunk_size": ExcelProcessor.BATCH_SIZE
             }
         )
         
-        # Используем оптимизированный процессор
         excel_processor = ExcelProcessor(db)
-        transactions_data = excel_processor.process_file(
-            tmp_file_path,
-            file.filename,
-            provider_id=provider_id,
-            template_id=template_id,
-            chunk_size=chunk_size
-        )
-        
-        if not transactions_data:
-            logger.warning("В файле не найдено транзакций", extra={"file_name": file.filename})
-            raise HTTPException(status_code=400, detail="Не найдено транзакций в файле")
-        
-        transactions_total = len(transactions_data)
-        logger.info(f"Найдено транзакций в файле: {len(transactions_data)}", extra={"transactions_count": len(transactions_data)})
+        batch_processor = TransactionBatchProcessor(db)
+        warnings = []
+        row_hashes = set()
         
-        # Проверяем дату закрытия периода загрузки
+        # Проверяем дату закрытия периода загрузки до записи в БД: пакеты фиксируются
+        # по мере загрузки, поэтому файл с закрытыми датами отклоняется целиком
+        # отдельным потоковым проходом (из строк сохраняются только даты)
         period_lock = db.query(UploadPeriodLock).first()
         if period_lock:
-            # Проверяем, есть ли транзакции с датами раньше даты закрытия периода
-            blocked_transactions = []
-            for trans_data in transactions_data:
-                trans_date = trans_data.get("transaction_date")
-                if trans_date and isinstance(trans_date, datetime):
-                    trans_date_only = trans_date.date()
-                    if trans_date_only < period_lock.lock_date:
-                        blocked_transactions.append(trans_date_only)
+            min_blocked_date = None
+            rows_total = 0
+            for transactions_data in excel_processor.iter_transaction_batches(
+                tmp_file_path,
+                file.filename,
+                provider_id=provider_id,
+                template_id=template_id
+            ):
+                rows_total += len(transactions_data)
+                for trans_data in transactions_data:
+                    trans_date = trans_data.get("transaction_date")
+                    if isinstance(trans_date, datetime) and trans_date.date() < period_lock.lock_date:
+                        if min_blocked_date is None or trans_date.date() < min_blocked_date:
+                            min_blocked_date = trans_date.date()
             
-            if blocked_transactions:
-                min_date = min(blocked_transactions)
+            if min_blocked_date is not None:
+                transactions_total = rows_total
                 raise HTTPException(
                     status_code=400,
                     detail=f"Нельзя загружать транзакции с датами раньше {period_lock.lock_date.strftime('%d.%m.%Y')}. "
-                           f"Найдены транзакции с датой {min_date.strftime('%d.%m.%Y')}"
+                           f"Найдены транзакции с датой {min_blocked_date.strftime('%d.%m.%Y')}"
                 )
         
-        # Создаем транзакции в БД с батчевой обработкой
-        logger.info("Создание транзакций в базе данных", extra={"transactions_count": len(transactions_data)})
-        
-        try:
-            batch_processor = TransactionBatchProcessor(db)
-            created_count, skipped_count, warnings = batch_processor.create_transactions(transactions_data)
+        # Файл читается потоково: каждый пакет строк сразу записывается в БД,
+        # целиком разобранный файл в памяти не держится
+        for transactions_data in excel_processor.iter_transaction_batches(
+            tmp_file_path,
+            file.filename,
+            provider_id=provider_id,
+            template_id=template_id
+        ):
+            if not transactions_data:
+                continue
+            transactions_total += len(transactions_data)
             
-            logger.info(
-                "Файл успешно обработан",
-                extra={
-                    "created_count": created_count,
-                    "skipped_count": skipped_count,
-                    "warnings_count": len(warnings),
-                    "file_name": file.filename
-                }
-            )
-        except Exception as e:
-            db.rollback()
-            logger.error(
-                "Ошибка при создании транзакций в БД",
-                extra={
-                    "file_name": file.filename,
-                    "transactions_count": len(transactions_data),
-                    "error": str(e)
-                },
-                exc_info=True
-            )
-            raise HTTPException(
-                status_code=500,
-                detail=f"Ошибка при создании транзакций в базе данных: {str(e)}"
+            # Строки, загруженные ранее, отбрасываются по row_hash внутри create_transactions
+            try:
+                batch_created, batch_skipped, batch_warnings = batch_processor.create_transactions(transactions_data)
+            except Exception as e:
+                db.rollback()
+                logger.error(
+                    "Ошибка при создании транзакций в БД",
+                    extra={
+                        "file_name": file.filename,
+                        "transactions_count": len(transactions_data),
+                        "transactions_created": created_count,
+                        "error": str(e)
+                    },
+                    exc_info=True
+                )
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Ошибка при создании транзакций в базе данных: {str(e)}"
+                )
+            
+            created_count += batch_created
+            skipped_count += batch_skipped
+            warnings.extend(batch_warnings)
+            row_hashes.update(
+                trans_data["row_hash"] for trans_data in transactions_data if trans_data.get("row_hash")
             )
         
+        if not transactions_total:
+            logger.warning("В файле не найдено транзакций", extra={"file_name": file.filename})
+            raise HTTPException(status_code=400, detail="Не найдено транзакций в файле")
+        
+        logger.info(
+            "Файл успешно обработан",
+            extra={
+                "transactions_count": transactions_total,
+                "created_count": created_count,
+                "skipped_count": skipped_count,
+                "warnings_count": len(warnings),
+                "file_name": file.filename
+            }
+        )
+        
         message = f"Файл успешно обработан. Создано транзакций: {created_count}"
         if skipped_count > 0:
             message += f", пропущено дубликатов: {skipped_count}"
@@ -353,7 +403,9 @@ async def upload_file(
                 transactions_skipped=skipped_count,
                 transactions_failed=0,
                 duration_ms=int((datetime.now() - start_time).total_seconds() * 1000),
-                message="; ".join(warnings) if warnings else message
+                message="; ".join(warnings) if warnings else message,
+                content_hash=file_content_hash,
+                row_hashes=pack_row_hashes(row_hashes)
             )
         except Exception as e:
             logger.error(f"Ошибка при логировании события загрузки: {e}", exc_info=True)
@@ -425,7 +477,8 @@ async def upload_file(
             transactions_skipped=skipped_count,
             transactions_failed=transactions_total - created_count - skipped_count if transactions_total else 0,
             duration_ms=int((datetime.now() - start_time).total_seconds() * 1000),
-            message=str(http_exc.detail)
+            message=str(http_exc.detail),
+            content_hash=file_content_hash
         )
         raise
     except Exception as e:
@@ -455,7 +508,8 @@ async def upload_file(
             transactions_skipped=skipped_count,
             transactions_failed=transactions_total - created_count - skipped_count if transactions_total else 0,
             duration_ms=int((datetime.now() - start_time).total_seconds() * 1000),
-            message=str(e)
+            message=str(e),
+            content_hash=file_content_hash
         )
         # Возвращаем более детальную информацию об ошибке
         error_detail = f"Ошибка при обработке файла: {str(e)}"
@@ -476,6 +530,7 @@ async def load_from_api(
     date_from: Optional[str] = Query(None, description="Начальная дата периода в формате YYYY-MM-DD"),
     date_to: Optional[str] = Query(None, description="Конечная дата периода в формате YYYY-MM-DD"),
     card_numbers: Optional[str] = Query(None, description="Список номеров карт через запятую (опционально)"),
+    refresh_cards: bool = Query(False, description="Запросить список карт у провайдера, не используя кэш"),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(require_auth_if_enabled)
 ):
@@ -565,7 +620,8 @@ async def load_from_api(
             template=template,
             date_from=parsed_date_from,
             date_to=parsed_date_to,
-            card_numbers=card_list
+            card_numbers=card_list,
+            use_card_cache=not refresh_cards
         )
         
         logger.info("ApiProviderService.fetch_transactions завершен", extra={
@@ -641,20 +697,16 @@ async def load_from_api(
             })
         
         # Применяем маппинг топлива к транзакциям (если указан)
-        if fuel_type_mapping and isinstance(fuel_type_mapping, dict):
+        # Нормализованный маппинг берется из плана преобразования шаблона
+        fuel_matcher = get_conversion_plan(template).fuel_mapping
+        if fuel_matcher is not None and fuel_type_mapping and isinstance(fuel_type_mapping, dict):
             from app import services as app_services
             mapped_count = 0
             for transaction in transactions_data:
                 if "product" in transaction:
                     raw_fuel = str(transaction["product"] or "").strip()
                     if raw_fuel:
-                        # Используем общую функцию маппинга
-                        mapped = match_fuel_type(
-                            raw_fuel,
-                            fuel_type_mapping,
-                            template_id=template.id if template else None,
-                            template_name=template.name if template else None
-                        )
+                        mapped = fuel_matcher.match(raw_fuel)
                         if mapped:
                             transaction["product"] = mapped
                             mapped_count += 1
@@ -1142,6 +1194,9 @@ async def load_from_firebird(
             }, exc_info=True)
             fuel_type_mapping = None
         
+        # Нормализованный маппинг строится один раз на загрузку, а не для каждой строки
+        fuel_matcher = compile_fuel_mapping(fuel_type_mapping)
+        
         # Парсим даты периода, если указаны
         parsed_date_from, parsed_date_to = parse_date_range(date_from, date_to)
         
@@ -1341,14 +1396,8 @@ async def load_from_firebird(
                 normalized_fuel = raw_fuel
                 mapping_applied = False
                 
-                if raw_fuel and fuel_type_mapping:
-                    # Используем общую функцию маппинга
-                    mapped = match_fuel_type(
-                        raw_fuel,
-                        fuel_type_mapping,
-                        template_id=template.id,
-                        template_name=template.name
-                    )
+                if raw_fuel and fuel_matcher is not None:
+                    mapped = fuel_matcher.match(raw_fuel)
                     
                     if mapped:
                         normalized_fuel = mapped
@@ -1580,7 +1629,7 @@ async def get_transactions(
     date_to: Optional[str] = Query(None, description="Конечная дата периода в формате YYYY-MM-DD или YYYY-MM-DD HH:MM:SS"),
     sort_by: Optional[str] = Query("transaction_date", description="Поле для сортировки"),
     sort_order: Optional[str] = Query("desc", regex="^(asc|desc)$", description="Направление сортировки"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: None = Depends(require_auth_if_enabled)
 ):
     """
@@ -1649,18 +1698,19 @@ async def get_transactions(
     
     # Используем сервисный слой
     try:
-        transaction_service = TransactionService(db)
-        result_items, total = transaction_service.get_transactions(
-            skip=skip,
-            limit=limit,
-            card_number=card_number,
-            azs_number=azs_number,
-            product=product,
-            provider_id=provider_id,
-            date_from=parsed_date_from,
-            date_to=parsed_date_to,
-            sort_by=sort_by,
-            sort_order=sort_order
+        result_items, total = await db.run_sync(
+            lambda session: TransactionService(session).get_transactions(
+                skip=skip,
+                limit=limit,
+                card_number=card_number,
+                azs_number=azs_number,
+                product=product,
+                provider_id=provider_id,
+                date_from=parsed_date_from,
+                date_to=parsed_date_to,
+                sort_by=sort_by,
+                sort_order=sort_order
+            )
         )
         
         logger.info(
@@ -1991,13 +2041,14 @@ async def clear_transactions_by_provider(
 @router.get("/{transaction_id}", response_model=TransactionResponse)
 async def get_transaction(
     transaction_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение транзакции по ID
     """
-    transaction_service = TransactionService(db)
-    transaction = transaction_service.get_transaction(transaction_id)
+    transaction = await db.run_sync(
+        lambda session: TransactionService(session).get_transaction(transaction_id)
+    )
     if not transaction:
         raise HTTPException(status_code=404, detail="Транзакция не найдена")
     return transaction
@@ -2045,13 +2096,14 @@ async def delete_transaction(
 @router.get("/stats/summary")
 async def get_stats_summary(
     provider_id: Optional[int] = Query(None, description="Фильтр по ID провайдера"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение статистики по транзакциям
     """
-    transaction_service = TransactionService(db)
-    stats = transaction_service.get_stats_summary(provider_id=provider_id)
+    stats = await db.run_sync(
+        lambda session: TransactionService(session).get_stats_summary(provider_id=provider_id)
+    )
     
     logger.debug("Статистика по транзакциям загружена", extra={"total_count": stats["total_transactions"]})
     
@@ -2069,13 +2121,13 @@ async def check_file_match(
     """
     validate_excel_file(file)
     
-    tmp_file_path = None
+    spooled = await spool_upload_to_temp_file(file, settings.max_upload_size, suffix=".xlsx")
+    tmp_file_path = spooled.path
     try:
-        content = await file.read()
-        tmp_file_path = create_temp_file(content, suffix=".xlsx")
-        
-        # Определяем провайдера и шаблон
-        provider_id, template_id, match_info = detect_provider_and_template(tmp_file_path, db)
+        # Определяем провайдера и шаблон (анализ файла переиспользуется при последующей загрузке)
+        provider_id, template_id, match_info = detect_provider_and_template(
+            tmp_file_path, db, file_hash=spooled.sha256
+        )
         
         # Проверяем, требуется ли выбор шаблона
         match_score = match_info.get("score", 0) if match_info else 0
@@ -2129,7 +2181,7 @@ async def export_transactions(
     date_from: Optional[str] = Query(None, description="Начальная дата периода в формате YYYY-MM-DD или YYYY-MM-DD HH:MM:SS"),
     date_to: Optional[str] = Query(None, description="Конечная дата периода в формате YYYY-MM-DD или YYYY-MM-DD HH:MM:SS"),
     format: str = Query("xlsx", regex="^(xlsx|csv)$", description="Формат экспорта"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Экспорт транзакций в Excel или CSV файл
@@ -19,6 +19,7 @@ from app.models import User
 from app.schemas import UserCreate, UserListResponse, UserResponse, UserUpdate
 from app.services.logging_service import logging_service
 from app.services.cache_service import CacheService
+from app.services.organization_scope_service import invalidate_organization_scopes
 import hashlib
 import json
 
@@ -203,6 +204,7 @@ async def update_user(
     
     # Инвалидируем кэш пользователей
     cache.delete_pattern("users:*")
+    invalidate_organization_scopes(user.id)
     logger.debug("Кэш пользователей инвалидирован после обновления")
 
     logger.info(
@@ -268,6 +270,7 @@ async def delete_user(
     
     # Инвалидируем кэш пользователей
     cache.delete_pattern("users:*")
+    invalidate_organization_scopes(user_id)
     logger.debug("Кэш пользователей инвалидирован после удаления")
 
     logger.info(
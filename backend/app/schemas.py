@@ -249,6 +249,28 @@ class GasStationListResponse(BaseModel):
     items: list[GasStationResponse]
 
 
+class NearestGasStationResponse(BaseModel):
+    """
+    Схема АЗС, найденной пространственным поиском
+    """
+    id: int
+    name: str
+    azs_number: Optional[str] = None
+    latitude: float
+    longitude: float
+    distance_meters: float = Field(..., description="Расстояние до точки поиска (метры)")
+    closest_at: Optional[datetime] = Field(None, description="Время наибольшего сближения ТС с АЗС")
+
+
+class GasStationDuplicateResponse(BaseModel):
+    """
+    Схема пары АЗС с совпадающими координатами
+    """
+    station_id: int
+    duplicate_id: int
+    distance_meters: float
+
+
 class FuelTypeBase(BaseModel):
     """
     Базовая схема вида топлива
@@ -402,6 +424,15 @@ class NormalizeOwnerResponse(BaseModel):
     company_name: Optional[str] = None
 
 
+class RenormalizeOwnersResponse(BaseModel):
+    """
+    Схема ответа на повторную нормализацию владельцев всех карт
+    """
+    processed: int = Field(..., description="Обработано карт")
+    updated: int = Field(..., description="Изменено карт")
+    duration_ms: int = Field(..., description="Длительность, мс")
+
+
 class NormalizationOptions(BaseModel):
     """
     Опции нормализации
@@ -547,6 +578,7 @@ class CardInfoRequest(BaseModel):
     flags: Optional[int] = Field(23, description="Битовая маска реквизитов (1=FirstName, 2=LastName, 4=Patronymic, 8=BirthDate, 16=PhoneNumber, 32=Sex)")
     provider_template_id: Optional[int] = Field(None, description="ID шаблона провайдера с настройками Web API")
     update_card: Optional[bool] = Field(True, description="Автоматически обновить топливную карту данными из API")
+    use_cache: Optional[bool] = Field(True, description="Использовать кэш ответов провайдера (false - запросить данные у провайдера)")
 
 
 class ProviderBase(BaseModel):
@@ -848,6 +880,41 @@ class MergeResponse(BaseModel):
     cards_updated: Optional[int] = None
 
 
+class MergePlanItem(BaseModel):
+    """
+    План слияния: дубли source_ids переносятся на target_id и удаляются
+    """
+    target_id: int = Field(..., description="ID целевой записи (останется после слияния)")
+    source_ids: List[int] = Field(..., min_length=1, description="ID дублей")
+
+
+class MergeJobCreate(BaseModel):
+    """
+    Схема запроса на пакетное слияние
+    """
+    entity: str = Field(..., pattern="^(vehicle|fuel_card)$", description="Тип записей: vehicle или fuel_card")
+    plans: List[MergePlanItem] = Field(..., min_length=1, max_length=10000)
+
+
+class MergeJobResponse(BaseModel):
+    """
+    Состояние фоновой задачи слияния
+    """
+    id: str
+    entity: str
+    status: str
+    plans_total: int
+    plans_done: int
+    total_rows: int
+    processed_rows: int
+    deleted: int
+    progress: float
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
 # ==================== Схемы аутентификации ====================
 
 class UserBase(BaseModel):
@@ -1106,8 +1173,9 @@ class SystemLogListResponse(BaseModel):
     """
     Схема ответа со списком системных логов
     """
-    total: int
+    total: Optional[int] = None  # Не вычисляется для страниц по курсору
     items: list[SystemLogResponse]
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страница последняя)
 
 
 class UserActionLogResponse(BaseModel):
@@ -1141,8 +1209,9 @@ class UserActionLogListResponse(BaseModel):
     """
     Схема ответа со списком логов действий пользователей
     """
-    total: int
+    total: Optional[int] = None  # Не вычисляется для страниц по курсору
     items: list[UserActionLogResponse]
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страница последняя)
 
 
 # ==================== Схемы для анализа топливных карт ====================
@@ -1301,9 +1370,21 @@ class BulkUploadResponse(BaseModel):
     Схема ответа для массовой загрузки
     """
     created: int = Field(..., description="Количество созданных записей")
+    skipped: int = Field(0, description="Количество пропущенных дубликатов")
     errors: List[Dict[str, Any]] = Field(default_factory=list, description="Ошибки при загрузке")
 
 
+class BulkIngestResponse(BaseModel):
+    """
+    Схема ответа для потоковой загрузки данных телематики (NDJSON/CSV)
+    """
+    received: int = Field(..., description="Количество полученных строк")
+    inserted: int = Field(..., description="Количество вставленных записей")
+    duplicates: int = Field(..., description="Количество пропущенных дубликатов (vehicle_id, время)")
+    invalid: int = Field(..., description="Количество отклоненных строк")
+    errors: List[Dict[str, Any]] = Field(default_factory=list, description="Первые ошибки валидации (номер строки и причина)")
+
+
 # ==================== Схемы для уведомлений ====================
 
 class NotificationCategories(BaseModel):
@@ -47,6 +47,15 @@ from app.services.entity_management_service import (
     check_card_overlap as _check_card_overlap,
     assign_card_to_vehicle as _assign_card_to_vehicle
 )
+from app.services.template_signature_index import (
+    CONFIDENT_MATCH_SCORE,
+    cache_file_analysis,
+    file_content_hash,
+    get_cached_file_analysis,
+    get_template_index,
+    header_key,
+)
+from app.utils.excel_stream import HEADER_SCAN_ROWS, read_excel_head
 
 
 # DEPRECATED: Используйте app.services.normalization_service.normalize_fuel
@@ -112,7 +121,8 @@ def analyze_template_structure(file_path: str) -> Dict[str, Any]:
     Возвращает словарь с найденными полями и их позициями
     """
     try:
-        df = pd.read_excel(file_path, header=None, engine="openpyxl")
+        # Для поиска заголовков достаточно первых строк листа
+        df = read_excel_head(file_path, HEADER_SCAN_ROWS)
     except Exception as e:
         raise ValueError(f"Ошибка чтения Excel файла: {str(e)}")
     
@@ -268,9 +278,26 @@ def analyze_template_structure(file_path: str) -> Dict[str, Any]:
     }
 
 
+def analyze_template_structure_cached(file_path: str, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Анализ структуры Excel файла с кэшированием по хэшу содержимого
+
+    Проверка соответствия файла и его последующая загрузка анализируют
+    заголовок один раз (см. file_analysis_cache_ttl). file_hash - SHA-256
+    содержимого, если уже посчитан при сохранении файла.
+    """
+    content_hash = file_hash or file_content_hash(file_path)
+    analysis = get_cached_file_analysis(content_hash)
+    if analysis is None:
+        analysis = analyze_template_structure(file_path)
+        cache_file_analysis(content_hash, analysis)
+    return analysis
+
+
 def detect_provider_and_template(
     file_path: str,
-    db: Session
+    db: Session,
+    file_hash: Optional[str] = None
 ) -> Tuple[Optional[int], Optional[int], Dict[str, Any]]:
     """
     Автоматическое определение провайдера и шаблона на основе структуры файла
@@ -282,7 +309,7 @@ def detect_provider_and_template(
     """
     try:
         # Анализируем структуру файла
-        file_analysis = analyze_template_structure(file_path)
+        file_analysis = analyze_template_structure_cached(file_path, file_hash)
         file_columns = [col.lower().strip() for col in file_analysis["columns"]]
         file_field_mapping = file_analysis["field_mapping"]
     except Exception as e:
@@ -309,96 +336,21 @@ def detect_provider_and_template(
             "error": str(e)
         }
     
-    # Получаем все активные провайдеры
-    providers = db.query(Provider).filter(Provider.is_active == True).all()
-    
-    best_match_score = 0
-    best_provider_id = None
-    best_template_id = None
-    best_match_info = {
-        "score": 0,
-        "matched_fields": [],
-        "provider_name": None,
-        "template_name": None
-    }
-    
-    # Проверяем каждый провайдер и его шаблоны
-    for provider in providers:
-        templates = db.query(ProviderTemplate).filter(
-            ProviderTemplate.provider_id == provider.id,
-            ProviderTemplate.is_active == True
-        ).all()
-        
-        for template in templates:
-            try:
-                template_mapping = json.loads(template.field_mapping) if isinstance(template.field_mapping, str) else template.field_mapping
-            except:
-                continue
-            
-            # Подсчитываем совпадения полей
-            matched_fields = []
-            match_score = 0
-            
-            # Проверяем каждое поле шаблона
-            for field_name, template_column in template_mapping.items():
-                template_col_lower = str(template_column).lower().strip()
-                
-                # Проверяем точное совпадение
-                if template_col_lower in file_columns:
-                    matched_fields.append(field_name)
-                    match_score += 10
-                else:
-                    # Проверяем частичное совпадение
-                    for file_col in file_columns:
-                        if template_col_lower in file_col or file_col in template_col_lower:
-                            matched_fields.append(field_name)
-                            match_score += 5
-                            break
-                
-                # Дополнительные бонусы за важные поля
-                if field_name in ["date", "quantity", "fuel"]:
-                    if field_name in matched_fields:
-                        match_score += 5
-            
-            # Бонус за совпадение header_row и data_start_row
-            if template.header_row == file_analysis["header_row"]:
-                match_score += 2
-            
-            # Если это лучшее совпадение
-            if match_score > best_match_score:
-                best_match_score = match_score
-                best_provider_id = provider.id
-                best_template_id = template.id
-                best_match_info = {
-                    "score": match_score,
-                    "matched_fields": matched_fields,
-                    "provider_name": provider.name,
-                    "template_name": template.name,
-                    "file_columns": file_columns,
-                    "template_columns": list(template_mapping.values())
-                }
-        
-        # Если нет шаблонов у провайдера, но есть базовое совпадение по названию провайдера в файле
-        if not templates:
-            # Проверяем, упоминается ли название провайдера в файле
-            file_text = " ".join(file_columns).lower()
-            provider_name_lower = provider.name.lower()
-            if provider_name_lower in file_text or provider.code.lower() in file_text:
-                if best_match_score < 5:  # Только если нет лучших совпадений
-                    best_match_score = 5
-                    best_provider_id = provider.id
-                    best_template_id = None
-                    best_match_info = {
-                        "score": 5,
-                        "matched_fields": [],
-                        "provider_name": provider.name,
-                        "template_name": None,
-                        "file_columns": file_columns,
-                        "template_columns": []
-                    }
+    # Поиск по индексу сигнатур шаблонов: запомненный результат для такого же заголовка,
+    # затем шаблоны с совпадающей сигнатурой и top-k по Жаккару; остальные шаблоны
+    # оцениваются, только если по верхней границе оценки могут их обойти
+    index = get_template_index(db)
+    detection_key = header_key(file_columns, file_analysis["header_row"])
+    best_match = index.remembered(detection_key)
+    if best_match is None:
+        candidates = index.candidates(file_columns, file_field_mapping)
+        best_match = index.best_match_from_candidates(file_columns, file_analysis["header_row"], candidates)
+        index.remember(detection_key, best_match)
+    best_provider_id, best_template_id, best_match_info = best_match
+    best_match_score = best_match_info["score"]
     
     # Если найдено хорошее совпадение (минимум 30 баллов), возвращаем его
-    if best_match_score >= 30:
+    if best_match_score >= CONFIDENT_MATCH_SCORE:
         return best_provider_id, best_template_id, best_match_info
     
     # Если совпадение слабое, но есть провайдер "РП-газпром" по умолчанию
@@ -22,6 +22,7 @@ process_excel_file = app_services_module.process_excel_file
 create_transactions = app_services_module.create_transactions
 detect_provider_and_template = app_services_module.detect_provider_and_template
 analyze_template_structure = app_services_module.analyze_template_structure
+analyze_template_structure_cached = app_services_module.analyze_template_structure_cached
 parse_excel_date = app_services_module.parse_excel_date
 convert_to_decimal = app_services_module.convert_to_decimal
 extract_azs_number = app_services_module.extract_azs_number
@@ -39,6 +40,7 @@ __all__ = [
     "create_transactions",
     "detect_provider_and_template",
     "analyze_template_structure",
+    "analyze_template_structure_cached",
     "parse_excel_date",
     "convert_to_decimal",
     "extract_azs_number",
@@ -0,0 +1,185 @@
+"""
+Скомпилированный план преобразования транзакций API провайдера
+
+ApiProviderService._convert_to_system_format вызывается для каждой транзакции
+загрузки. Все, что зависит только от шаблона (расшифрованные настройки
+подключения, тип провайдера, валюта, маппинг видов топлива), разбирается один
+раз при построении плана. Для каждого поля системы план хранит список ключей
+ответа API, которые реально встречаются в ответах провайдера (изучается по
+первой транзакции): преобразование строки сводится к нескольким обращениям
+к словарю вместо перебора всех известных вариантов названий полей.
+
+Планы кэшируются в памяти процесса по ID шаблона и перестраиваются, если
+изменились настройки подключения или маппинг топлива; при изменении или
+удалении шаблона план удаляется явно (invalidate_conversion_plan).
+"""
+import json
+import threading
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from app.logger import logger
+from app.models import ProviderTemplate
+from app.utils.encryption import decrypt_connection_settings
+from app.utils.fuel_mapping import CompiledFuelMapping, compile_fuel_mapping
+from app.utils.json_utils import parse_template_json
+
+GPN_PROVIDER_TYPES = ("gpn", "gazprom-neft", "gazpromneft")
+
+# Варианты ключей полей в ответах разных провайдеров в порядке приоритета
+# (стандартный API, XML API, РН-Карт, GPN API v1/v2)
+FIELD_CANDIDATES: Dict[str, Tuple[str, ...]] = {
+    "date": (
+        "timestamp", "utc_time", "transaction_date", "TransactionDatetime",
+        "Date", "date", "dateReg", "dateRec",
+    ),
+    "amount": ("amount", "Sum", "sum", "ShopCost", "PersonCost", "sum"),
+    "volume": (
+        "qty", "volume", "Volume", "value", "Value", "quantity", "Quantity", "amount", "Amount",
+    ),
+    "price": ("price", "Price", "price_per_liter", "pricePerLiter"),
+    "raw_amount": ("Sum", "sum", "ShopCost", "amount"),
+    "raw_volume": ("Value", "Volume", "volume"),
+    "pos_address": ("posAddress", "address"),
+    "azs_address": ("azs_address", "azsAddress"),
+    "full_address": ("fullAddress", "posFullAddress", "azs_address", "azsAddress", "Address"),
+    "region": ("region", "Region"),
+    "settlement": ("posTown", "settlement", "Settlement"),
+    "azs_name": (
+        "azs_name", "azsName", "AZS_NAME", "AZSName", "posName", "posBrand", "azsNumber",
+        "service_center",
+    ),
+    "azs_number": (
+        "poi_id", "service_center", "azs_number", "azs_id", "azsId", "COD_AZS", "AZS", "PosCode",
+        "azsNumber",
+    ),
+    "product": (
+        "product_name", "product", "product_category_name", "productCategoryName", "Product",
+        "GName", "ResourceName", "serviceName", "service",
+    ),
+    "pos_coord": ("PosCoord", "posCoord", "pos_coord"),
+    "location_code": ("posCode", "locationCode", "PosCode"),
+}
+
+
+def _parse_connection_settings(template: ProviderTemplate) -> Dict[str, Any]:
+    raw = template.connection_settings
+    if not raw:
+        return {}
+    try:
+        settings = json.loads(raw) if isinstance(raw, str) else raw
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    if not isinstance(settings, dict):
+        return {}
+    return decrypt_connection_settings(settings)
+
+
+class ConversionPlan:
+    """
+    Неизменяемая по шаблону часть преобразования транзакций API
+    """
+
+    def __init__(self, template: ProviderTemplate):
+        self.template_id = template.id
+        self.provider_id = template.provider_id
+        self.version = _template_version(template)
+
+        self.settings = _parse_connection_settings(template)
+        self.provider_type = str(self.settings.get("provider_type") or "").lower()
+        self.is_gpn = self.provider_type in GPN_PROVIDER_TYPES
+        # Как в _get_currency_from_settings: без настроек валюта не задана
+        self.currency = self.settings.get("currency", "RUB") if self.settings else None
+
+        self.fuel_mapping: Optional[CompiledFuelMapping] = None
+        try:
+            self.fuel_mapping = compile_fuel_mapping(
+                parse_template_json(template.fuel_type_mapping)
+            )
+        except Exception as e:
+            logger.warning("Не удалось разобрать маппинг видов топлива шаблона", extra={
+                "template_id": template.id,
+                "error": str(e)
+            })
+
+        # (известные ключи ответа, ключи каждого поля среди известных)
+        self._schema: Optional[Tuple[FrozenSet[str], Dict[str, Tuple[str, ...]]]] = None
+
+    def accessors(self, payload: Mapping[str, Any]) -> Dict[str, Tuple[str, ...]]:
+        """
+        Ключи полей, которые нужно проверять в транзакции payload
+
+        Ключи отбираются по первой транзакции. Пока набор ключей транзакции
+        входит в изученный, отсутствующие варианты можно не проверять: результат
+        совпадает с перебором всех вариантов. Транзакция с новыми ключами
+        расширяет изученный набор.
+        """
+        schema = self._schema
+        if schema is not None and payload.keys() <= schema[0]:
+            return schema[1]
+
+        known = frozenset(payload.keys()) if schema is None else schema[0].union(payload.keys())
+        fields = {
+            name: tuple(key for key in dict.fromkeys(candidates) if key in known)
+            for name, candidates in FIELD_CANDIDATES.items()
+        }
+        self._schema = (known, fields)
+        logger.debug("План преобразования транзакций API: изучены ключи ответа", extra={
+            "template_id": self.template_id,
+            "keys_count": len(known),
+            "fields": {name: keys for name, keys in fields.items() if keys}
+        })
+        return fields
+
+
+def pick(payload: Mapping[str, Any], keys: Tuple[str, ...], field_name: str) -> Any:
+    """
+    Первое непустое значение из keys
+
+    Эквивалент цепочки payload.get(a) or payload.get(b) or ... по всем
+    вариантам поля: если непустых значений нет, возвращается значение
+    последнего варианта.
+    """
+    for key in keys:
+        value = payload.get(key)
+        if value:
+            return value
+    return payload.get(FIELD_CANDIDATES[field_name][-1])
+
+
+def _template_version(template: ProviderTemplate) -> Tuple[Any, ...]:
+    settings = template.connection_settings
+    fuel_mapping = template.fuel_type_mapping
+    return (
+        template.provider_id,
+        settings if isinstance(settings, str) else json.dumps(settings, sort_keys=True, default=str),
+        fuel_mapping if isinstance(fuel_mapping, str) else json.dumps(fuel_mapping, sort_keys=True, default=str),
+    )
+
+
+_plans: Dict[int, ConversionPlan] = {}
+_plans_lock = threading.Lock()
+
+
+def get_conversion_plan(template: ProviderTemplate) -> ConversionPlan:
+    """
+    План преобразования шаблона (из кэша, если шаблон не менялся)
+    """
+    plan = _plans.get(template.id)
+    if plan is not None and plan.version == _template_version(template):
+        return plan
+    plan = ConversionPlan(template)
+    if template.id is not None:
+        with _plans_lock:
+            _plans[template.id] = plan
+    return plan
+
+
+def invalidate_conversion_plan(template_id: Optional[int] = None) -> None:
+    """
+    Удаление плана шаблона (всех планов, если template_id не указан)
+    """
+    with _plans_lock:
+        if template_id is None:
+            _plans.clear()
+        else:
+            _plans.pop(template_id, None)
@@ -1,6 +1,7 @@
 """
 Сервис для работы с API провайдеров (PetrolPlus и другие)
 """
+import logging
 from datetime import datetime, timezone, date, timedelta
 from decimal import Decimal
 from typing import Optional, List, Dict, Any
@@ -13,7 +14,10 @@ from sqlalchemy.orm import Session
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from app.logger import logger
 from app.models import Provider, ProviderTemplate
+from app.services.api_conversion_plan import ConversionPlan, get_conversion_plan, pick
+from app.services.provider_card_cache import ProviderCardCache
 from app.utils.circuit_breaker import get_circuit_breaker
+from app.utils.provider_sessions import CachedAuth, get_provider_session_registry, session_key
 
 
 class PetrolPlusAdapter:
@@ -33,7 +37,8 @@ class PetrolPlusAdapter:
         self.base_url = base_url.rstrip('/')
         self.api_token = api_token
         self.currency = currency
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Общий клиент (пул соединений) для базового URL, создается при входе в контекст
+        self.client: Optional[httpx.AsyncClient] = None
         # Circuit Breaker для защиты от каскадных сбоев
         self.circuit_breaker = get_circuit_breaker(
             "petrolplus_api",
@@ -43,10 +48,12 @@ class PetrolPlusAdapter:
         )
     
     async def __aenter__(self):
+        self.client = get_provider_session_registry().get_client(self.base_url)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        # Клиент общий для всех адаптеров с этим базовым URL и не закрывается
+        pass
     
     def _auth_headers(self) -> Dict[str, str]:
         """Формирование заголовков авторизации"""
@@ -349,11 +356,13 @@ class WebAdapter:
             "Pragma": "no-cache",
             "Connection": "keep-alive",
         }
-        self.client = httpx.AsyncClient(
-            timeout=30.0,
-            follow_redirects=True,
-            headers=default_headers,
-            cookies=None  # httpx автоматически сохраняет cookies между запросами
+        self._default_headers = default_headers
+        # Общий клиент создается при входе в контекст. Cookies сессии хранятся в клиенте,
+        # поэтому клиент общий только для адаптеров с тем же базовым URL и пользователем
+        self.client: Optional[httpx.AsyncClient] = None
+        self._client_key = session_key("web", self.base_url, username)
+        self._auth_key = session_key(
+            "web", self.base_url, username, password, use_xml_api, xml_api_certificate
         )
         # Circuit Breaker для защиты от каскадных сбоев
         self.circuit_breaker = get_circuit_breaker(
@@ -365,11 +374,36 @@ class WebAdapter:
         self.access_token: Optional[str] = None
     
     async def __aenter__(self):
-        await self._authenticate()
+        self.client = get_provider_session_registry().get_client(
+            self._client_key,
+            timeout=30.0,
+            follow_redirects=True,
+            headers=self._default_headers
+        )
+        await self._ensure_authenticated()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        # Клиент и авторизация общие для адаптеров с теми же учетными данными
+        pass
+    
+    async def _ensure_authenticated(self, stale_token: Optional[str] = None) -> None:
+        """
+        Токен и cookies из общего кэша; вход выполняется, если их нет,
+        срок хранения истек или провайдер отклонил stale_token (ответ 401)
+        """
+        async def login() -> CachedAuth:
+            await self._authenticate()
+            return CachedAuth(
+                token=self.access_token,
+                cookies={cookie.name: cookie.value for cookie in self.client.cookies.jar}
+            )
+        
+        auth = await get_provider_session_registry().authenticate(self._auth_key, login, stale_token=stale_token)
+        self.access_token = auth.token
+        for name, value in auth.cookies.items():
+            if name not in {cookie.name for cookie in self.client.cookies.jar}:
+                self.client.cookies.set(name, value)
     
     def _parse_xml_api_key(self, key: str) -> Dict[str, int]:
         """
@@ -1636,6 +1670,11 @@ class WebAdapter:
         
         try:
             response = await self.client.get(url, headers=headers, params=params)
+            if response.status_code == 401:
+                # Токен истек или отозван - повторный вход и повтор запроса
+                await self._ensure_authenticated(stale_token=self.access_token)
+                headers.update(self._auth_headers())
+                response = await self.client.get(url, headers=headers, params=params)
             response.raise_for_status()
             return response.json()
         except httpx.HTTPStatusError as e:
@@ -2430,9 +2469,12 @@ class RnCardAdapter:
         self.contract = contract
         self.currency = currency
         self.use_md5_hash = use_md5_hash
-        # Создаем клиент с настройками по умолчанию
+        # Список карт договора для get_card_info: запрашивается один раз на адаптер
+        # (или подставляется из кэша шаблона через ApiProviderService)
+        self.contract_cards: Optional[List[Dict[str, Any]]] = None
+        # Общий клиент (пул соединений) для базового URL, создается при входе в контекст
         # httpx автоматически добавляет необходимые заголовки (Host, Connection и т.д.)
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client: Optional[httpx.AsyncClient] = None
         # Circuit Breaker для защиты от каскадных сбоев
         self.circuit_breaker = get_circuit_breaker(
             "rncard_api",
@@ -2442,10 +2484,12 @@ class RnCardAdapter:
         )
     
     async def __aenter__(self):
+        self.client = get_provider_session_registry().get_client(self.base_url)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        # Клиент общий для всех адаптеров с этим базовым URL и не закрывается
+        pass
     
     def _prepare_password(self) -> str:
         """
@@ -2789,8 +2833,10 @@ class RnCardAdapter:
             - remark: Примечание (Rem)
         """
         try:
-            # Получаем список карт
-            cards = await self.list_cards()
+            # Получаем список карт (один раз на адаптер)
+            if self.contract_cards is None:
+                self.contract_cards = await self.list_cards()
+            cards = self.contract_cards
             
             # Ищем карту по номеру
             card_info = None
@@ -2972,7 +3018,9 @@ class GPNAdapter:
         self.session_id: Optional[str] = None
         self.contract_id: Optional[str] = None
         self.contracts: List[Dict[str, Any]] = []  # Список всех договоров
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Общий клиент (пул соединений) для базового URL, создается при входе в контекст
+        self.client: Optional[httpx.AsyncClient] = None
+        self._auth_key = session_key("gpn", self.base_url, api_key, login, password)
         # Circuit Breaker для защиты от каскадных сбоев
         self.circuit_breaker = get_circuit_breaker(
             "gpn_api",
@@ -2982,17 +3030,56 @@ class GPNAdapter:
         )
     
     async def __aenter__(self):
+        self.client = get_provider_session_registry().get_client(self.base_url)
         # Авторизуемся при входе в контекст
         await self.auth_user()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        # Клиент и сессия общие для адаптеров с теми же учетными данными
+        pass
     
-    async def auth_user(self) -> bool:
+    async def auth_user(self, stale_session_id: Optional[str] = None) -> bool:
         """
         Авторизация. Сохраняет session_id, все договоры и первый contract_id.
         
+        Сессия берется из общего кэша; вход выполняется, если ее нет,
+        срок хранения истек или провайдер отклонил stale_session_id (ответ 401).
+        
+        Returns:
+            True если авторизация успешна, False в противном случае
+        """
+        async def login() -> Optional[CachedAuth]:
+            if not await self._auth_user_request():
+                return None
+            return CachedAuth(
+                token=self.session_id,
+                data={"contracts": self.contracts, "contract_id": self.contract_id}
+            )
+        
+        auth = await get_provider_session_registry().authenticate(
+            self._auth_key, login, stale_token=stale_session_id
+        )
+        if auth is None:
+            return False
+        self.session_id = auth.token
+        self.contracts = auth.data.get("contracts", [])
+        self.contract_id = auth.data.get("contract_id")
+        return True
+    
+    async def _get_with_session(self, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        """
+        GET запрос с session_id; при ответе 401 сессия обновляется и запрос повторяется
+        """
+        resp = await self.client.get(url, params=params, headers=headers)
+        if resp.status_code == 401 and await self.auth_user(stale_session_id=headers.get("session_id")):
+            resp = await self.client.get(url, params=params, headers={**headers, "session_id": self.session_id})
+        return resp
+    
+    async def _auth_user_request(self) -> bool:
+        """
+        Запрос авторизации authUser
+        
         Returns:
             True если авторизация успешна, False в противном случае
         """
@@ -3114,7 +3201,7 @@ class GPNAdapter:
             }
             
             try:
-                resp = await self.client.get(url, params=params, headers=headers)
+                resp = await self._get_with_session(url, params=params, headers=headers)
                 resp.raise_for_status()
                 json_resp = resp.json()
                 
@@ -3203,7 +3290,7 @@ class GPNAdapter:
             }
             
             try:
-                resp = await self.client.get(url, params=params, headers=headers)
+                resp = await self._get_with_session(url, params=params, headers=headers)
                 resp.raise_for_status()
                 json_resp = resp.json()
                 
@@ -3299,7 +3386,7 @@ class GPNAdapter:
             headers_with_contract = {**headers, "contract_id": contract_id_value}
             
             try:
-                resp = await self.client.get(url, params=params, headers=headers_with_contract)
+                resp = await self._get_with_session(url, params=params, headers=headers_with_contract)
                 resp.raise_for_status()
                 json_resp = resp.json()
                 
@@ -3790,6 +3877,71 @@ class ApiProviderService:
         else:
             raise ValueError(f"Неподдерживаемый тип провайдера API: {provider_type}")
     
+    async def list_cards(self, adapter, template: ProviderTemplate, use_cache: bool = True) -> List[Any]:
+        """
+        Список карт шаблона с кэшированием
+        
+        Args:
+            adapter: Адаптер шаблона (контекст адаптера уже открыт)
+            template: Шаблон провайдера
+            use_cache: False - запросить список у провайдера и обновить кэш
+        """
+        card_cache = ProviderCardCache(template)
+        if use_cache:
+            cards = card_cache.get_card_list()
+            if cards is not None:
+                logger.debug("Список карт получен из кэша", extra={
+                    "template_id": template.id,
+                    "cards_count": len(cards)
+                })
+                return cards
+        
+        cards = await adapter.list_cards()
+        card_cache.set_card_list(cards)
+        return cards
+    
+    async def get_card_info(
+        self,
+        template: ProviderTemplate,
+        card_number: str,
+        flags: int = 23,
+        adapter=None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Информация по карте с кэшированием
+        
+        При попадании в кэш обращения к провайдеру (и авторизации) нет.
+        
+        Args:
+            template: Шаблон провайдера
+            card_number: Номер карты
+            flags: Битовая маска реквизитов
+            adapter: Открытый адаптер шаблона (если не указан, создается на время запроса)
+            use_cache: False - запросить данные у провайдера и обновить кэш
+        """
+        card_cache = ProviderCardCache(template)
+        if use_cache:
+            card_info = card_cache.get_card_info(card_number, flags)
+            if card_info is not None:
+                logger.debug("Информация по карте получена из кэша", extra={
+                    "template_id": template.id,
+                    "card_number": card_number
+                })
+                return card_info
+        
+        if adapter is None:
+            async with self.create_adapter(template) as adapter:
+                return await self.get_card_info(template, card_number, flags, adapter=adapter, use_cache=False)
+        
+        # РН-Карт ищет карту в списке карт договора: список берется из кэша шаблона
+        if isinstance(adapter, RnCardAdapter) and adapter.contract_cards is None:
+            adapter.contract_cards = await self.list_cards(adapter, template, use_cache=use_cache)
+        
+        card_info = await adapter.get_card_info(card_number=card_number, flags=flags)
+        card_cache.set_card_info(card_number, flags, card_info)
+        return card_info
+    
     async def test_connection(self, template: ProviderTemplate) -> Dict[str, Any]:
         """
         Тестирование подключения к API или веб-сервису
@@ -3987,7 +4139,8 @@ class ApiProviderService:
         template: ProviderTemplate,
         date_from: date,
         date_to: date,
-        card_numbers: Optional[List[str]] = None
+        card_numbers: Optional[List[str]] = None,
+        use_card_cache: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Загрузка транзакций через API или веб-сервис
@@ -3997,19 +4150,15 @@ class ApiProviderService:
             card_numbers: Список номеров карт (если None, загружаются все карты)
             date_from: Начальная дата периода
             date_to: Конечная дата периода
+            use_card_cache: False - запросить список карт у провайдера, не используя кэш
             
         Returns:
             Список транзакций в формате системы
         """
+        # План преобразования транзакций строится один раз на загрузку
+        plan = get_conversion_plan(template)
         # Определяем тип провайдера для логирования
-        import json
-        provider_type = "unknown"
-        try:
-            if template.connection_settings:
-                settings = json.loads(template.connection_settings) if isinstance(template.connection_settings, str) else template.connection_settings
-                provider_type = settings.get("provider_type", "unknown") if settings else "unknown"
-        except:
-            pass
+        provider_type = plan.settings.get("provider_type", "unknown") if plan.settings else "unknown"
         
         logger.info("Начало загрузки транзакций через API", extra={
             "template_id": template.id,
@@ -4063,7 +4212,7 @@ class ApiProviderService:
                         card_numbers = []  # Пустой список - метод fetch_card_transactions вернет все транзакции
                     else:
                         # Для других типов API пытаемся получить список карт
-                        cards_data = await adapter.list_cards()
+                        cards_data = await self.list_cards(adapter, template, use_cache=use_card_cache)
                         # Для WebAdapter list_cards возвращает список строк, для PetrolPlusAdapter - список словарей, 
                         # для RnCardAdapter - список словарей с полем "Num", для GPNAdapter - список словарей с полем "number"
                         if cards_data and len(cards_data) > 0:
@@ -4098,7 +4247,7 @@ class ApiProviderService:
                         for trans in transactions:
                             # Извлекаем номер карты из транзакции
                             card_num = trans.get("card_number", "")
-                            system_trans = self._convert_to_system_format(trans, template, card_num)
+                            system_trans = self._convert_to_system_format(trans, template, card_num, plan)
                             if system_trans:
                                 all_transactions.append(system_trans)
                         
@@ -4158,7 +4307,7 @@ class ApiProviderService:
                         for trans in transactions:
                             # Извлекаем номер карты из транзакции
                             card_num = str(trans.get("Card", "")).strip()
-                            system_trans = self._convert_to_system_format(trans, template, card_num)
+                            system_trans = self._convert_to_system_format(trans, template, card_num, plan)
                             if system_trans:
                                 all_transactions.append(system_trans)
                         
@@ -4199,7 +4348,7 @@ class ApiProviderService:
                             try:
                                 # Извлекаем номер карты из транзакции
                                 card_num = str(trans.get("card_number", "")).strip()
-                                system_trans = self._convert_to_system_format(trans, template, card_num)
+                                system_trans = self._convert_to_system_format(trans, template, card_num, plan)
                                 if system_trans:
                                     all_transactions.append(system_trans)
                                     converted_count += 1
@@ -4265,7 +4414,7 @@ class ApiProviderService:
                             
                             # Преобразуем транзакции в формат системы
                             for trans in transactions:
-                                system_trans = self._convert_to_system_format(trans, template, card_number)
+                                system_trans = self._convert_to_system_format(trans, template, card_number, plan)
                                 if system_trans:
                                     all_transactions.append(system_trans)
                             
@@ -4319,7 +4468,8 @@ class ApiProviderService:
         self,
         api_transaction: Dict[str, Any],
         template: ProviderTemplate,
-        card_number: str
+        card_number: str,
+        plan: Optional[ConversionPlan] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Преобразование транзакции из формата API в формат системы
@@ -4328,76 +4478,52 @@ class ApiProviderService:
             api_transaction: Транзакция из API
             template: Шаблон провайдера
             card_number: Номер карты
+            plan: План преобразования шаблона (строится один раз на загрузку)
             
         Returns:
             Транзакция в формате системы или None
         """
-        # Логируем все поля транзакции для отладки (только для GPN)
-        import json
-        try:
-            if isinstance(template.connection_settings, str):
-                settings = json.loads(template.connection_settings)
-            else:
-                settings = template.connection_settings
-            provider_type = settings.get("provider_type", "").lower() if settings else ""
-            is_gpn = provider_type in ["gpn", "gazprom-neft", "gazpromneft"]
-            
-            if is_gpn:
-                logger.debug("Обработка транзакции GPN", extra={
-                    "card_number": card_number,
-                    "api_transaction_keys": list(api_transaction.keys()),
-                    "api_transaction_sample": {k: str(v)[:100] for k, v in list(api_transaction.items())[:20]},
-                    "volume_fields": {
-                        "volume": api_transaction.get("volume"),
-                        "Volume": api_transaction.get("Volume"),
-                        "value": api_transaction.get("value"),
-                        "Value": api_transaction.get("Value"),
-                        "quantity": api_transaction.get("quantity"),
-                        "Quantity": api_transaction.get("Quantity")
-                    },
-                    "product_fields": {
-                        "product_name": api_transaction.get("product_name"),  # GPN API v2
-                        "product": api_transaction.get("product"),  # GPN API v1
-                        "product_category_name": api_transaction.get("product_category_name"),
-                        "productCategoryName": api_transaction.get("productCategoryName"),
-                        "product_category_id": api_transaction.get("product_category_id")
-                    },
-                    "azs_fields": {
-                        "poi_id": api_transaction.get("poi_id"),  # GPN API v2 - ID точки обслуживания
-                        "service_center": api_transaction.get("service_center"),  # GPN API v1
-                        "azs_id": api_transaction.get("azs_id"),
-                        "azsId": api_transaction.get("azsId"),
-                        "azs_number": api_transaction.get("azs_number"),
-                        "azs_name": api_transaction.get("azs_name"),
-                        "azsName": api_transaction.get("azsName"),
-                        "azs_address": api_transaction.get("azs_address"),
-                        "azsAddress": api_transaction.get("azsAddress")
-                    }
-                })
-        except Exception:
-            pass
+        if plan is None:
+            plan = get_conversion_plan(template)
+        fields = plan.accessors(api_transaction)
         
-        # Парсим маппинг полей
-        try:
-            if isinstance(template.field_mapping, str):
-                field_mapping = json.loads(template.field_mapping)
-            else:
-                field_mapping = template.field_mapping
-        except (json.JSONDecodeError, TypeError):
-            field_mapping = {}
+        # Логируем все поля транзакции для отладки (только для GPN)
+        if plan.is_gpn and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Обработка транзакции GPN", extra={
+                "card_number": card_number,
+                "api_transaction_keys": list(api_transaction.keys()),
+                "api_transaction_sample": {k: str(v)[:100] for k, v in list(api_transaction.items())[:20]},
+                "volume_fields": {
+                    "volume": api_transaction.get("volume"),
+                    "Volume": api_transaction.get("Volume"),
+                    "value": api_transaction.get("value"),
+                    "Value": api_transaction.get("Value"),
+                    "quantity": api_transaction.get("quantity"),
+                    "Quantity": api_transaction.get("Quantity")
+                },
+                "product_fields": {
+                    "product_name": api_transaction.get("product_name"),  # GPN API v2
+                    "product": api_transaction.get("product"),  # GPN API v1
+                    "product_category_name": api_transaction.get("product_category_name"),
+                    "productCategoryName": api_transaction.get("productCategoryName"),
+                    "product_category_id": api_transaction.get("product_category_id")
+                },
+                "azs_fields": {
+                    "poi_id": api_transaction.get("poi_id"),  # GPN API v2 - ID точки обслуживания
+                    "service_center": api_transaction.get("service_center"),  # GPN API v1
+                    "azs_id": api_transaction.get("azs_id"),
+                    "azsId": api_transaction.get("azsId"),
+                    "azs_number": api_transaction.get("azs_number"),
+                    "azs_name": api_transaction.get("azs_name"),
+                    "azsName": api_transaction.get("azsName"),
+                    "azs_address": api_transaction.get("azs_address"),
+                    "azsAddress": api_transaction.get("azsAddress")
+                }
+            })
         
         # Преобразуем дату (поддерживаем разные форматы: стандартный API, XML API, РН-Карт и GPN)
         # Для GPN API v2 используем timestamp или utc_time
-        transaction_date = self._parse_datetime(
-            api_transaction.get("timestamp") or  # GPN API v2 - дата по местному времени
-            api_transaction.get("utc_time") or  # GPN API v2 - дата по UTC
-            api_transaction.get("transaction_date") or  # XML API
-            api_transaction.get("TransactionDatetime") or  # XML API (оригинальное поле)
-            api_transaction.get("Date") or  # РН-Карт
-            api_transaction.get("date") or
-            api_transaction.get("dateReg") or
-            api_transaction.get("dateRec")
-        )
+        transaction_date = self._parse_datetime(pick(api_transaction, fields["date"], "date"))
         
         if not transaction_date:
             logger.warning("Не удалось определить дату транзакции", extra={
@@ -4407,12 +4533,7 @@ class ApiProviderService:
         
         # Преобразуем сумму и количество (поддерживаем разные форматы)
         amount = self._parse_decimal(
-            api_transaction.get("amount") or  # Стандартный формат или уже преобразованное
-            api_transaction.get("Sum") or  # РН-Карт
-            api_transaction.get("sum") or  # GPN, стандартный формат
-            api_transaction.get("ShopCost") or  # XML API
-            api_transaction.get("PersonCost") or  # XML API (альтернатива)
-            api_transaction.get("sum"),  # Стандартный формат
+            pick(api_transaction, fields["amount"], "amount"),
             default=Decimal("0")
         ) or Decimal("0")
         
@@ -4422,30 +4543,14 @@ class ApiProviderService:
         
         # Количество/объем (поддерживаем разные форматы)
         # Для GPN API v2 используется поле qty (не volume!)
-        volume_value = (
-            api_transaction.get("qty") or  # GPN API v2 - количество
-            api_transaction.get("volume") or
-            api_transaction.get("Volume") or
-            api_transaction.get("value") or
-            api_transaction.get("Value") or
-            api_transaction.get("quantity") or
-            api_transaction.get("Quantity") or
-            api_transaction.get("amount") or  # GPN API v1 - amount в transaction_items
-            api_transaction.get("Amount")
-        )
+        volume_value = pick(api_transaction, fields["volume"], "volume")
         
         quantity = self._parse_decimal(volume_value)
         
         # Если количество не найдено, пытаемся вычислить из суммы и цены
         if quantity is None or quantity == Decimal("0"):
             # Пытаемся получить цену
-            price_value = (
-                api_transaction.get("price") or
-                api_transaction.get("Price") or
-                api_transaction.get("price_per_liter") or
-                api_transaction.get("pricePerLiter")
-            )
-            price = self._parse_decimal(price_value)
+            price = self._parse_decimal(pick(api_transaction, fields["price"], "price"))
             
             # Если есть сумма и цена, вычисляем количество
             if amount and amount > 0 and price and price > 0:
@@ -4487,15 +4592,15 @@ class ApiProviderService:
         
         # Определяем тип операции на основе знака суммы/объема в исходных данных
         # Если в исходных данных было отрицательное значение, это возврат
-        raw_amount = api_transaction.get("Sum") or api_transaction.get("sum") or api_transaction.get("ShopCost") or api_transaction.get("amount") or 0
-        raw_volume = api_transaction.get("Value") or api_transaction.get("Volume") or api_transaction.get("volume") or 0
+        raw_amount = pick(api_transaction, fields["raw_amount"], "raw_amount") or 0
+        raw_volume = pick(api_transaction, fields["raw_volume"], "raw_volume") or 0
         operation_type = "Возврат" if (isinstance(raw_amount, (int, float)) and raw_amount < 0) or \
                                        (isinstance(raw_volume, (int, float)) and raw_volume < 0) else "Покупка"
         
         # Формируем адрес
         address_parts = [
-            api_transaction.get("posAddress") or api_transaction.get("address"),
-            api_transaction.get("azs_address") or api_transaction.get("azsAddress"),  # GPN
+            pick(api_transaction, fields["pos_address"], "pos_address"),
+            pick(api_transaction, fields["azs_address"], "azs_address"),  # GPN
             api_transaction.get("Address"),  # РН-Карт
             api_transaction.get("posTown"),
             api_transaction.get("posStreet"),
@@ -4503,16 +4608,13 @@ class ApiProviderService:
         ]
         address_candidates = [part for part in address_parts if part]
         resolved_address = (
-            api_transaction.get("fullAddress") or
-            api_transaction.get("posFullAddress") or
-            api_transaction.get("azs_address") or api_transaction.get("azsAddress") or  # GPN
-            api_transaction.get("Address") or  # РН-Карт
+            pick(api_transaction, fields["full_address"], "full_address") or
             ", ".join(dict.fromkeys(address_candidates))
         )
         
         # Парсим адрес из поля Address для РН-Карт, если Region и Settlement не указаны
-        parsed_region = api_transaction.get("region") or api_transaction.get("Region")
-        parsed_settlement = api_transaction.get("posTown") or api_transaction.get("settlement") or api_transaction.get("Settlement")
+        parsed_region = pick(api_transaction, fields["region"], "region")
+        parsed_settlement = pick(api_transaction, fields["settlement"], "settlement")
         parsed_location = resolved_address
         
         # Если адрес есть, но регион и населенный пункт не указаны, парсим из адреса
@@ -4531,31 +4633,11 @@ class ApiProviderService:
         
         # Получаем оригинальное название АЗС (поддерживаем разные форматы)
         # Для GPN API v2 нет прямого поля названия АЗС, только poi_id
-        azs_original_name = str(
-            api_transaction.get("azs_name") or  # XML API (уже преобразованное)
-            api_transaction.get("azsName") or api_transaction.get("azs_name") or  # GPN (если есть)
-            api_transaction.get("AZS_NAME") or  # XML API (оригинальное поле)
-            api_transaction.get("AZSName") or  # РН-Карт
-            api_transaction.get("posName") or
-            api_transaction.get("posBrand") or
-            api_transaction.get("azsNumber") or
-            api_transaction.get("service_center") or  # GPN API v1 - ID точки обслуживания
-            ""
-        )
+        azs_original_name = str(pick(api_transaction, fields["azs_name"], "azs_name") or "")
         
         # Номер АЗС (поддерживаем разные форматы)
         # Для GPN API v2 используется poi_id (ID точки обслуживания)
-        azs_number = str(
-            api_transaction.get("poi_id") or  # GPN API v2 - ID точки обслуживания
-            api_transaction.get("service_center") or  # GPN API v1 - ID точки обслуживания
-            api_transaction.get("azs_number") or  # XML API (уже преобразованное)
-            api_transaction.get("azs_id") or api_transaction.get("azsId") or  # GPN (если есть)
-            api_transaction.get("COD_AZS") or  # XML API (оригинальное поле)
-            api_transaction.get("AZS") or  # РН-Карт
-            api_transaction.get("PosCode") or  # РН-Карт (код точки продажи)
-            api_transaction.get("azsNumber") or
-            ""
-        )
+        azs_number = str(pick(api_transaction, fields["azs_number"], "azs_number") or "")
         
         # Если номер АЗС не найден напрямую, извлекаем из названия
         if not azs_number or azs_number.strip() == "":
@@ -4565,23 +4647,12 @@ class ApiProviderService:
             
             # Логируем, если azs_number все еще пустой (особенно для GPN)
             if not azs_number or azs_number.strip() == "":
-                # Определяем, является ли это GPN транзакцией
-                try:
-                    if isinstance(template.connection_settings, str):
-                        settings = json.loads(template.connection_settings)
-                    else:
-                        settings = template.connection_settings
-                    provider_type = settings.get("provider_type", "").lower() if settings else ""
-                    is_gpn = provider_type in ["gpn", "gazprom-neft", "gazpromneft"]
-                except:
-                    is_gpn = False
-                
                 logger.warning("Поле azs_number пустое в транзакции", extra={
                     "api_transaction_keys": list(api_transaction.keys()),
                     "card_number": card_number,
                     "transaction_date": transaction_date,
                     "azs_original_name": azs_original_name,
-                    "is_gpn": is_gpn,
+                    "is_gpn": plan.is_gpn,
                     "available_azs_fields": {
                         "poi_id": api_transaction.get("poi_id"),  # GPN API v2
                         "service_center": api_transaction.get("service_center"),  # GPN API v1
@@ -4597,30 +4668,10 @@ class ApiProviderService:
         
         # Название товара/топлива (поддерживаем разные форматы)
         # Для GPN API v2 используется product_name (не product_category_name!)
-        product = (
-            api_transaction.get("product_name") or  # GPN API v2 - наименование товара
-            api_transaction.get("product") or  # Стандартный формат или уже преобразованное, GPN API v1
-            api_transaction.get("product_category_name") or api_transaction.get("productCategoryName") or  # GPN (если есть)
-            api_transaction.get("Product") or  # РН-Карт
-            api_transaction.get("GName") or  # РН-Карт (название товара из GName)
-            api_transaction.get("ResourceName") or  # XML API (оригинальное поле)
-            api_transaction.get("serviceName") or
-            api_transaction.get("service") or
-            ""
-        )
+        product = pick(api_transaction, fields["product"], "product") or ""
         
         # Если product пустой для GPN, логируем для отладки
-        try:
-            if isinstance(template.connection_settings, str):
-                settings = json.loads(template.connection_settings)
-            else:
-                settings = template.connection_settings
-            provider_type = settings.get("provider_type", "").lower() if settings else ""
-            is_gpn = provider_type in ["gpn", "gazprom-neft", "gazpromneft"]
-        except:
-            is_gpn = False
-        
-        if not product or (is_gpn and not product.strip()):
+        if not product or (plan.is_gpn and not product.strip()):
             logger.warning("Поле product пустое в транзакции GPN", extra={
                 "card_number": card_number,
                 "transaction_date": transaction_date,
@@ -4661,7 +4712,7 @@ class ApiProviderService:
         # Парсим координаты из поля PosCoord (формат: "широта,долгота")
         latitude = None
         longitude = None
-        pos_coord = api_transaction.get("PosCoord") or api_transaction.get("posCoord") or api_transaction.get("pos_coord")
+        pos_coord = pick(api_transaction, fields["pos_coord"], "pos_coord")
         if pos_coord:
             try:
                 # Формат: "52.261365,104.35507"
@@ -4695,11 +4746,11 @@ class ApiProviderService:
             "region": parsed_region,  # Используем распарсенный регион
             "settlement": parsed_settlement,  # Используем распарсенный населенный пункт
             "location": parsed_location,  # Используем распарсенный адрес
-            "location_code": api_transaction.get("posCode") or api_transaction.get("locationCode") or api_transaction.get("PosCode"),  # РН-Карт
+            "location_code": pick(api_transaction, fields["location_code"], "location_code"),  # РН-Карт
             "product": product,
             "operation_type": operation_type,
             "quantity": quantity,
-            "currency": api_transaction.get("currency") or self._get_currency_from_settings(template) or "RUB",
+            "currency": api_transaction.get("currency") or plan.currency or "RUB",
             "exchange_rate": Decimal("1"),
             "amount": amount,
             "provider_id": template.provider_id,
@@ -10,8 +10,9 @@ from app.utils import (
     get_firebird_service,
     parse_template_json,
     parse_date_range,
-    match_fuel_type
+    compile_fuel_mapping
 )
+from app.services.api_conversion_plan import get_conversion_plan
 from app.services.api_provider_service import ApiProviderService
 from app.services.upload_event_service import UploadEventService
 from app import services as app_services
@@ -359,6 +360,9 @@ class AutoLoadService:
             }, exc_info=True)
             fuel_type_mapping = None
         
+        # Нормализованный маппинг строится один раз на загрузку, а не для каждой строки
+        fuel_matcher = compile_fuel_mapping(fuel_type_mapping)
+        
         # Читаем данные из Firebird
         firebird_service = firebird_service_class(self.db)
         firebird_data = firebird_service.read_data(
@@ -477,14 +481,8 @@ class AutoLoadService:
                 normalized_fuel = raw_fuel
                 mapping_applied = False
                 
-                if raw_fuel and fuel_type_mapping:
-                    # Используем общую функцию маппинга
-                    mapped = match_fuel_type(
-                        raw_fuel, 
-                        fuel_type_mapping,
-                        template_id=template.id,
-                        template_name=template.name
-                    )
+                if raw_fuel and fuel_matcher is not None:
+                    mapped = fuel_matcher.match(raw_fuel)
                     
                     if mapped:
                         normalized_fuel = mapped
@@ -663,18 +661,14 @@ class AutoLoadService:
                 "error": str(fuel_map_err)
             })
 
-        if fuel_type_mapping and isinstance(fuel_type_mapping, dict):
+        # Нормализованный маппинг берется из плана преобразования шаблона
+        fuel_matcher = get_conversion_plan(template).fuel_mapping
+        if fuel_matcher is not None and fuel_type_mapping and isinstance(fuel_type_mapping, dict):
             for item in api_data:
                 raw_product = str(item.get("product") or item.get("service") or item.get("serviceName") or "").strip()
                 if not raw_product:
                     continue
-                # Используем общую функцию маппинга
-                mapped = match_fuel_type(
-                    raw_product,
-                    fuel_type_mapping,
-                    template_id=template.id,
-                    template_name=template.name
-                )
+                mapped = fuel_matcher.match(raw_product)
                 if mapped:
                     item["product"] = mapped
                     logger.info("Маппинг топлива применен (API, автоматическая загрузка)", extra={
@@ -149,6 +149,39 @@ class CacheService:
             logger.error(f"Cache delete error: {e}")
             return False
     
+    def incr(self, key: str, prefix: str = "gsm") -> Optional[int]:
+        """
+        Увеличить счетчик (например, версию данных для сброса кэшей всех процессов)
+        
+        Returns:
+            Новое значение или None, если Redis недоступен
+        """
+        if self._client is None:
+            return None
+        
+        try:
+            return self._client.incr(self._make_key(key, prefix))
+        except Exception as e:
+            logger.error(f"Cache incr error: {e}")
+            return None
+    
+    def get_counters(self, keys: list, prefix: str = "gsm") -> Optional[list]:
+        """
+        Получить значения счетчиков одним запросом (отсутствующий счетчик - 0)
+        
+        Returns:
+            Список значений или None, если Redis недоступен
+        """
+        if self._client is None:
+            return None
+        
+        try:
+            values = self._client.mget([self._make_key(key, prefix) for key in keys])
+            return [int(value) if value else 0 for value in values]
+        except Exception as e:
+            logger.error(f"Cache get_counters error: {e}")
+            return None
+    
     def delete_pattern(self, pattern: str, prefix: str = "gsm") -> int:
         """
         Удалить все ключи по паттерну
@@ -129,10 +129,14 @@ class CardInfoScheduleService:
                 try:
                     cards_processed += 1
                     
-                    # Получаем информацию по карте
-                    card_info = await adapter.get_card_info(
+                    # Получаем информацию по карте: регламент всегда запрашивает актуальные
+                    # данные и обновляет кэш (список карт договора РН-Карт - один раз на регламент)
+                    card_info = await api_service.get_card_info(
+                        template,
                         card_number=card.card_number,
-                        flags=schedule.flags or 23
+                        flags=schedule.flags or 23,
+                        adapter=adapter,
+                        use_cache=False
                     )
                     
                     if not card_info:
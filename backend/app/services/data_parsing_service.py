@@ -5,7 +5,12 @@
 import pandas as pd
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
+
+# Строковые форматы дат, разбираемые векторно (как в parse_excel_date)
+EXCEL_DATE_FORMATS = ("%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M")
+# Начало отсчета дат Excel
+EXCEL_EPOCH = "1899-12-30"
 
 
 def parse_excel_date(date_value) -> Optional[datetime]:
@@ -103,3 +108,79 @@ def convert_to_decimal(value) -> Optional[Decimal]:
         return Decimal(str(value))
     except (ValueError, TypeError, ArithmeticError):
         return None
+
+
+def _to_python_datetimes(parsed: pd.Series) -> List[Optional[datetime]]:
+    mask = parsed.isna().to_numpy()
+    values = parsed.array.to_pydatetime()
+    return [None if missing else value for value, missing in zip(values, mask)]
+
+
+def parse_excel_dates(values: pd.Series) -> List[Optional[datetime]]:
+    """
+    Векторный вариант parse_excel_date для колонки DataFrame
+
+    Колонка datetime64 и числовые даты Excel преобразуются целиком, строки -
+    через pd.to_datetime с известными форматами; остальные значения (и строки
+    в других форматах) разбираются parse_excel_date поэлементно
+
+    Returns:
+        Список datetime или None (в порядке строк)
+    """
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return _to_python_datetimes(values)
+
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        serials = values.where(values != 0)
+        return _to_python_datetimes(
+            pd.to_datetime(serials, origin=EXCEL_EPOCH, unit="D", errors="coerce")
+        )
+
+    result: List[Optional[datetime]] = [None] * len(values)
+    kinds = values.map(type)
+    positions = pd.Series(range(len(values)), index=values.index)
+
+    is_string = (kinds == str).to_numpy()
+    if is_string.any():
+        strings = values[is_string].str.strip().str.replace("  ", " ", regex=False)
+        parsed = pd.Series(pd.NaT, index=strings.index, dtype="datetime64[ns]")
+        for date_format in EXCEL_DATE_FORMATS:
+            pending = parsed.isna() & (strings != "")
+            if not pending.any():
+                break
+            parsed[pending] = pd.to_datetime(strings[pending], format=date_format, errors="coerce")
+        for position, value, original in zip(
+            positions[is_string], _to_python_datetimes(parsed), values[is_string]
+        ):
+            result[position] = value if value is not None else parse_excel_date(original)
+
+    is_number = kinds.isin([int, float]).to_numpy()
+    if is_number.any():
+        numbers = pd.to_numeric(values[is_number], errors="coerce")
+        parsed = pd.to_datetime(numbers.where(numbers != 0), origin=EXCEL_EPOCH, unit="D", errors="coerce")
+        for position, value in zip(positions[is_number], _to_python_datetimes(parsed)):
+            result[position] = value
+
+    rest = ~(is_string | is_number)
+    for position, value in zip(positions[rest], values[rest].tolist()):
+        if isinstance(value, datetime):
+            result[position] = value if value is not pd.NaT else None
+        elif not pd.isna(value):
+            result[position] = parse_excel_date(value)
+    return result
+
+
+def convert_to_decimals(values: pd.Series) -> List[Optional[Decimal]]:
+    """
+    Векторный вариант convert_to_decimal для колонки DataFrame
+
+    Пустые значения (None, NaN) дают None
+    """
+    if pd.api.types.is_float_dtype(values.dtype):
+        return [None if value != value else Decimal(str(value)) for value in values.tolist()]
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return [Decimal(value) for value in values.tolist()]
+    return [
+        None if value is None or (isinstance(value, float) and value != value) else convert_to_decimal(value)
+        for value in values.tolist()
+    ]
@@ -3,13 +3,21 @@
 Поддерживает streaming для больших файлов и батчевую обработку
 """
 import pandas as pd
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 from decimal import Decimal
 from datetime import datetime
 from app.logger import logger
+from app.utils.excel_stream import (
+    HEADER_SCAN_ROWS,
+    read_excel_head,
+    iter_excel_batches,
+    remap_column_indices
+)
 # Импортируем функции из основного модуля services (не из папки services/)
 from app import services as app_services
+from app.services.data_parsing_service import convert_to_decimals, parse_excel_dates
+from app.services.normalization_service import extract_azs_numbers
 
 
 class ExcelProcessor:
@@ -32,35 +40,74 @@ class ExcelProcessor:
         chunk_size: Optional[int] = None
     ) -> List[Dict]:
         """
-        Обработка Excel файла с поддержкой chunked reading для больших файлов
+        Обработка Excel файла потоковым чтением
         
         Args:
             file_path: Путь к файлу
             file_name: Имя файла
             provider_id: ID провайдера
             template_id: ID шаблона
-            chunk_size: Размер чанка для чтения (None = читать весь файл)
+            chunk_size: Размер пакета строк при чтении (None = BATCH_SIZE)
         
         Returns:
             Список транзакций
         """
+        all_transactions = []
+        for batch in self.iter_transaction_batches(
+            file_path, file_name, provider_id, template_id, chunk_size or self.BATCH_SIZE
+        ):
+            all_transactions.extend(batch)
+        return all_transactions
+    
+    def iter_transaction_batches(
+        self,
+        file_path: str,
+        file_name: str,
+        provider_id: Optional[int] = None,
+        template_id: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Потоковая обработка Excel файла: книга читается за один проход,
+        только колонки из маппинга, транзакции отдаются пакетами
+        
+        Yields:
+            Списки транзакций (не более batch_size строк файла в пакете)
+        """
         try:
             # Определяем маппинг полей и маппинг видов топлива
             field_mapping, header_row, data_start_row, fuel_type_mapping = self._get_field_mapping(
                 file_path, template_id
             )
             
-            # Читаем файл по частям, если указан chunk_size
-            if chunk_size:
-                return self._process_file_chunked(
-                    file_path, file_name, field_mapping, header_row, 
-                    data_start_row, provider_id, chunk_size, fuel_type_mapping
+            # Заголовки берутся из первых строк листа, остальная книга не разбирается
+            header_df = read_excel_head(file_path, max(HEADER_SCAN_ROWS, header_row + 1))
+            if header_row < 0 or header_row >= len(header_df):
+                raise ValueError("Не найдена строка с заголовками")
+            column_indices = self._get_column_indices(header_df.iloc[header_row], field_mapping)
+            
+            selected_columns = [index for index in column_indices.values() if index >= 0]
+            batch_indices = remap_column_indices(column_indices, selected_columns)
+            
+            batch_num = 0
+            total = 0
+            for chunk_df in iter_excel_batches(
+                file_path, data_start_row, selected_columns, batch_size or self.BATCH_SIZE
+            ):
+                chunk_transactions = self._process_dataframe_chunk(
+                    chunk_df, file_name, batch_indices, provider_id, fuel_type_mapping
                 )
-            else:
-                return self._process_file_full(
-                    file_path, file_name, field_mapping, header_row,
-                    data_start_row, provider_id, fuel_type_mapping
+                batch_num += 1
+                total += len(chunk_transactions)
+                logger.debug(
+                    f"Обработан пакет строк {batch_num}",
+                    extra={
+                        "chunk_num": batch_num,
+                        "transactions_in_chunk": len(chunk_transactions),
+                        "total_transactions": total
+                    }
                 )
+                yield chunk_transactions
         except Exception as e:
             logger.error(f"Ошибка обработки Excel файла: {file_path}", extra={"error": str(e)}, exc_info=True)
             raise
@@ -102,105 +149,13 @@ class ExcelProcessor:
         
         # Если шаблон не найден, используем автоматический анализ
         if not field_mapping:
-            analysis = app_services.analyze_template_structure(file_path)
+            analysis = app_services.analyze_template_structure_cached(file_path)
             field_mapping = analysis["field_mapping"]
             header_row = analysis["header_row"]
             data_start_row = analysis["data_start_row"]
         
         return field_mapping, header_row, data_start_row, fuel_type_mapping
     
-    def _process_file_full(
-        self,
-        file_path: str,
-        file_name: str,
-        field_mapping: Dict,
-        header_row: int,
-        data_start_row: int,
-        provider_id: Optional[int],
-        fuel_type_mapping: Optional[Dict] = None
-    ) -> List[Dict]:
-        """
-        Обработка всего файла целиком (для небольших файлов)
-        """
-        df = pd.read_excel(file_path, header=None, engine="openpyxl")
-        return self._process_dataframe(
-            df, file_name, field_mapping, header_row, 
-            data_start_row, provider_id, fuel_type_mapping
-        )
-    
-    def _process_file_chunked(
-        self,
-        file_path: str,
-        file_name: str,
-        field_mapping: Dict,
-        header_row: int,
-        data_start_row: int,
-        provider_id: Optional[int],
-        chunk_size: int,
-        fuel_type_mapping: Optional[Dict] = None
-    ) -> List[Dict]:
-        """
-        Обработка файла по частям (для больших файлов)
-        """
-        all_transactions = []
-        
-        # Читаем заголовки отдельно
-        header_df = pd.read_excel(
-            file_path, 
-            header=None, 
-            nrows=header_row + 1,
-            engine="openpyxl"
-        )
-        
-        # Определяем индексы колонок
-        column_indices = self._get_column_indices(header_df.iloc[header_row], field_mapping)
-        
-        # Читаем данные по частям
-        skip_rows = data_start_row
-        chunk_num = 0
-        
-        while True:
-            try:
-                # Читаем чанк данных
-                chunk_df = pd.read_excel(
-                    file_path,
-                    header=None,
-                    skiprows=skip_rows,
-                    nrows=chunk_size,
-                    engine="openpyxl"
-                )
-                
-                if chunk_df.empty:
-                    break
-                
-                # Обрабатываем чанк
-                chunk_transactions = self._process_dataframe_chunk(
-                    chunk_df, file_name, column_indices, provider_id, fuel_type_mapping
-                )
-                all_transactions.extend(chunk_transactions)
-                
-                chunk_num += 1
-                logger.debug(
-                    f"Обработан чанк {chunk_num}",
-                    extra={
-                        "chunk_num": chunk_num,
-                        "transactions_in_chunk": len(chunk_transactions),
-                        "total_transactions": len(all_transactions)
-                    }
-                )
-                
-                # Если прочитали меньше записей, чем запрашивали - это последний чанк
-                if len(chunk_df) < chunk_size:
-                    break
-                
-                skip_rows += chunk_size
-                
-            except Exception as e:
-                logger.error(f"Ошибка обработки чанка {chunk_num}", extra={"error": str(e)}, exc_info=True)
-                break
-        
-        return all_transactions
-    
     def _get_column_indices(self, header_row: pd.Series, field_mapping: Dict) -> Dict[str, int]:
         """
         Определение индексов колонок по маппингу
@@ -243,24 +198,6 @@ class ExcelProcessor:
             "fuel": get_column_index("fuel")
         }
     
-    def _process_dataframe(
-        self,
-        df: pd.DataFrame,
-        file_name: str,
-        field_mapping: Dict,
-        header_row: int,
-        data_start_row: int,
-        provider_id: Optional[int],
-        fuel_type_mapping: Optional[Dict] = None
-    ) -> List[Dict]:
-        """
-        Обработка DataFrame с транзакциями
-        """
-        column_indices = self._get_column_indices(df.iloc[header_row], field_mapping)
-        return self._process_dataframe_chunk(
-            df.iloc[data_start_row:], file_name, column_indices, provider_id, fuel_type_mapping
-        )
-    
     def _process_dataframe_chunk(
         self,
         df: pd.DataFrame,
@@ -271,9 +208,10 @@ class ExcelProcessor:
     ) -> List[Dict]:
         """
         Обработка части DataFrame
-        """
-        transactions = []
         
+        Преобразование выполняется по колонкам (даты, количества, строки, номера АЗС,
+        виды топлива), построчно собираются только итоговые словари
+        """
         date_idx = column_indices.get("date", -1)
         qty_idx = column_indices.get("quantity", -1)
         fuel_idx = column_indices.get("fuel", -1)
@@ -281,54 +219,35 @@ class ExcelProcessor:
         if date_idx == -1 or qty_idx == -1 or fuel_idx == -1:
             raise ValueError("Не найдены обязательные колонки: Дата, Кол-во, Вид топлива")
         
-        for i, row in df.iterrows():
-            # Пропускаем пустые строки
-            if pd.isna(row.iloc[date_idx]):
-                continue
-            
-            # Получаем значения
-            date_value = app_services.parse_excel_date(row.iloc[date_idx])
-            if not date_value:
-                continue
-            
-            qty_value = app_services.convert_to_decimal(row.iloc[qty_idx])
-            if not qty_value:
+        if df.empty:
+            return []
+        
+        dates = parse_excel_dates(df.iloc[:, date_idx])
+        quantities = convert_to_decimals(df.iloc[:, qty_idx])
+        
+        users = self._text_column(df, column_indices.get("user", -1))
+        cards = self._text_column(df, column_indices.get("card", -1))
+        kazs_values = self._text_column(df, column_indices.get("kazs", -1))
+        fuels = self._text_column(df, fuel_idx)
+        orgs = self._text_column(df, column_indices.get("org", -1))
+        azs_numbers = extract_azs_numbers(kazs_values)
+        products = fuels.map(self._fuel_normalizer(fuel_type_mapping, fuels.unique()))
+        
+        transactions = []
+        for date_value, qty_value, user, card, kazs, azs_number, product, org in zip(
+            dates, quantities, users, cards, kazs_values, azs_numbers, products, orgs
+        ):
+            # Пропускаем строки без даты и с пустым или нулевым количеством
+            if not date_value or not qty_value:
                 continue
             
-            user_idx = column_indices.get("user", -1)
-            card_idx = column_indices.get("card", -1)
-            kazs_idx = column_indices.get("kazs", -1)
-            org_idx = column_indices.get("org", -1)
-            
-            user = str(row.iloc[user_idx]).strip() if user_idx >= 0 and not pd.isna(row.iloc[user_idx]) else ""
-            card = str(row.iloc[card_idx]).strip() if card_idx >= 0 and not pd.isna(row.iloc[card_idx]) else ""
-            kazs = str(row.iloc[kazs_idx]).strip() if kazs_idx >= 0 and not pd.isna(row.iloc[kazs_idx]) else ""
-            fuel = str(row.iloc[fuel_idx]).strip() if fuel_idx >= 0 and not pd.isna(row.iloc[fuel_idx]) else ""
-            org = str(row.iloc[org_idx]).strip() if org_idx >= 0 and not pd.isna(row.iloc[org_idx]) else ""
-            
-            # Нормализуем вид топлива с использованием маппинга из шаблона
-            normalized_fuel = fuel
-            if fuel and fuel_type_mapping:
-                # Ищем точное совпадение (регистронезависимо)
-                fuel_lower = fuel.strip().lower()
-                for source_name, target_name in fuel_type_mapping.items():
-                    if source_name.strip().lower() == fuel_lower:
-                        normalized_fuel = target_name
-                        break
-                # Если точного совпадения нет, используем стандартную нормализацию
-                if normalized_fuel == fuel:
-                    normalized_fuel = app_services.normalize_fuel(fuel)
-            elif fuel:
-                # Используем стандартную нормализацию, если маппинга нет
-                normalized_fuel = app_services.normalize_fuel(fuel)
-            
-            transaction_data = {
+            transactions.append({
                 "transaction_date": date_value,
                 "card_number": card,
                 "vehicle": user,
-                "azs_number": app_services.extract_azs_number(kazs),
+                "azs_number": azs_number,
                 "azs_original_name": kazs,  # Сохраняем оригинальное название АЗС для создания записи в справочнике
-                "product": normalized_fuel,
+                "product": product,
                 "operation_type": "Покупка",
                 "quantity": qty_value,
                 "currency": "RUB",
@@ -336,8 +255,40 @@ class ExcelProcessor:
                 "source_file": file_name,
                 "organization": org,
                 "provider_id": provider_id
-            }
-            
-            transactions.append(transaction_data)
+            })
         
         return transactions
+    
+    @staticmethod
+    def _text_column(df: pd.DataFrame, index: int) -> pd.Series:
+        """
+        Колонка как строки без пробелов по краям, пустые ячейки - ""
+        """
+        if index < 0:
+            return pd.Series([""] * len(df), index=df.index, dtype=object)
+        column = df.iloc[:, index]
+        texts = column.astype(str).str.strip()
+        return texts.where(column.notna(), "")
+    
+    @staticmethod
+    def _fuel_normalizer(fuel_type_mapping: Optional[Dict], fuels) -> Dict[str, str]:
+        """
+        Нормализованные виды топлива для уникальных значений колонки
+        
+        Маппинг шаблона сравнивается без учета регистра (при совпадении ключей
+        побеждает первый); без совпадения - стандартная нормализация
+        """
+        mapping = {}
+        for source_name, target_name in (fuel_type_mapping or {}).items():
+            mapping.setdefault(source_name.strip().lower(), target_name)
+        
+        normalized = {}
+        for fuel in fuels:
+            if not fuel:
+                normalized[fuel] = fuel
+                continue
+            target = mapping.get(fuel.lower())
+            if target is None or target == fuel:
+                target = app_services.normalize_fuel(fuel)
+            normalized[fuel] = target
+        return normalized
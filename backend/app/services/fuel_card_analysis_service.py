@@ -17,12 +17,11 @@ from app.models import (
 from app.repositories import (
     VehicleRefuelRepository,
     VehicleLocationRepository,
-    FuelCardAnalysisRepository
-)
-from app.utils.geolocation_utils import (
-    calculate_distance_haversine,
-    is_point_in_radius
+    FuelCardAnalysisRepository,
+    AnomalyStatsRepository
 )
+from app.repositories.anomaly_stats_repository import anomaly_key
+from app.utils.geolocation_utils import calculate_distance_haversine
 from app.logger import logger
 
 
@@ -41,6 +40,7 @@ class FuelCardAnalysisService:
         self.refuel_repo = VehicleRefuelRepository(db)
         self.location_repo = VehicleLocationRepository(db)
         self.analysis_repo = FuelCardAnalysisRepository(db)
+        self.stats_repo = AnomalyStatsRepository(db)
     
     def get_vehicle_location_at_time(
         self,
@@ -152,23 +152,15 @@ class FuelCardAnalysisService:
             logger.debug(f"Не найдено местоположение ТС {vehicle_id} в момент транзакции")
             return False, None, None
         
-        # Вычисляем расстояние и проверяем нахождение в радиусе
-        is_in_radius = is_point_in_radius(
-            float(azs.latitude),
-            float(azs.longitude),
-            float(location.latitude),
-            float(location.longitude),
-            radius_meters,
-            float(location.accuracy) if location.accuracy else None
-        )
-        
-        # Вычисляем расстояние для возврата
+        # Расстояние вычисляется один раз; радиус расширяется на точность координат ТС
         distance = calculate_distance_haversine(
             float(azs.latitude),
             float(azs.longitude),
             float(location.latitude),
             float(location.longitude)
         )
+        effective_radius = radius_meters + (float(location.accuracy) if location.accuracy else 0)
+        is_in_radius = distance <= effective_radius
         
         return is_in_radius, distance, location
     
@@ -203,9 +195,13 @@ class FuelCardAnalysisService:
         existing_result = self.analysis_repo.get_by_transaction_id(transaction_id)
         
         if existing_result:
-            # Обновляем существующий результат
+            # Обновляем существующий результат; флаги аномалии вычисляются заново
             result = existing_result
+            old_stats_key = anomaly_key(result, transaction.organization_id)
+            result.is_anomaly = False
+            result.anomaly_type = None
         else:
+            old_stats_key = None
             # Создаем новый результат
             result = FuelCardAnalysisResult(
                 transaction_id=transaction_id,
@@ -341,6 +337,9 @@ class FuelCardAnalysisService:
         
         result.analysis_details = json.dumps(analysis_details, ensure_ascii=False)
         
+        # Дневные счетчики аномалий обновляются в той же транзакции, что и результат
+        self.stats_repo.record_change(old_stats_key, anomaly_key(result, transaction.organization_id))
+        
         self.db.commit()
         self.db.refresh(result)
         
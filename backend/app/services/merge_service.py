@@ -0,0 +1,417 @@
+"""
+Пакетное слияние дублей транспортных средств и топливных карт
+
+План слияния (MergePlan) - целевая запись и список дублей, которые будут
+перенесены на нее и удалены (N-к-1, например по результатам поиска похожих ТС).
+Ссылки переносятся порциями по диапазонам id: каждая порция - отдельная короткая
+транзакция UPDATE ... WHERE <ссылка> IN (дубли) AND id > a AND id <= b, поэтому
+слияние ТС с сотнями тысяч транзакций не держит блокировки на всей таблице и
+не раздувает журнал одной огромной транзакцией. Записи-дубли удаляются только
+после переноса всех ссылок: при сбое посередине повторный запуск того же плана
+доделывает перенос.
+
+Длительные слияния выполняются в фоне (MergeJobManager): задачи выполняются по
+одной в отдельном потоке, прогресс доступен по ID задачи.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.logger import logger
+from app.models import FuelCard, FuelCardAnalysisResult, Transaction, Vehicle, VehicleLocation, VehicleRefuel
+from app.services.cache_service import (
+    CacheService, invalidate_dashboard_cache, invalidate_fuel_cards_cache, invalidate_vehicles_cache
+)
+
+MERGE_ENTITIES = ("vehicle", "fuel_card")
+
+# Таблицы со ссылкой на ТС
+VEHICLE_REFERENCES = (
+    (Transaction, Transaction.vehicle_id),
+    (FuelCard, FuelCard.vehicle_id),
+    (FuelCardAnalysisResult, FuelCardAnalysisResult.vehicle_id),
+    (VehicleRefuel, VehicleRefuel.vehicle_id),
+    (VehicleLocation, VehicleLocation.vehicle_id),
+)
+
+JOBS_CACHE_PREFIX = "merge_jobs"
+JOBS_CACHE_TTL = 86400
+MAX_KEPT_JOBS = 100
+
+
+@dataclass
+class MergePlan:
+    """
+    Слияние source_ids в target_id
+    """
+    target_id: int
+    source_ids: List[int] = field(default_factory=list)
+
+
+class MergeService:
+    """
+    Слияние ТС и топливных карт порциями по диапазонам id
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        chunk_size: Optional[int] = None,
+        progress: Optional[Callable[[int], None]] = None
+    ):
+        self.db = db
+        self.chunk_size = chunk_size or get_settings().merge_chunk_size
+        # Вызывается после каждой порции с числом перенесенных строк
+        self.progress = progress
+
+    def validate_plans(self, entity: str, plans: Sequence[MergePlan]) -> None:
+        """
+        Проверка планов: записи существуют, цель не входит в дубли,
+        каждая запись участвует не более чем в одном плане
+
+        Raises:
+            ValueError: если план некорректен
+        """
+        if entity not in MERGE_ENTITIES:
+            raise ValueError(f"Неизвестный тип записей: {entity}")
+        if not plans:
+            raise ValueError("Не указаны планы слияния")
+
+        seen = set()
+        for plan in plans:
+            if not plan.source_ids:
+                raise ValueError(f"Для записи {plan.target_id} не указаны дубли")
+            if plan.target_id in plan.source_ids:
+                raise ValueError(f"Запись {plan.target_id} указана и целью, и дублем")
+            for record_id in (plan.target_id, *plan.source_ids):
+                if record_id in seen:
+                    raise ValueError(f"Запись {record_id} участвует в нескольких планах")
+                seen.add(record_id)
+
+        model = Vehicle if entity == "vehicle" else FuelCard
+        existing = set()
+        ids = list(seen)
+        for start in range(0, len(ids), 1000):
+            existing.update(
+                row_id for (row_id,) in self.db.query(model.id).filter(model.id.in_(ids[start:start + 1000]))
+            )
+        missing = sorted(seen - existing)
+        if missing:
+            raise ValueError(f"Записи не найдены: {', '.join(map(str, missing[:20]))}")
+
+    def count_rows(self, entity: str, plans: Sequence[MergePlan]) -> int:
+        """
+        Число строк со ссылками на дубли (для расчета прогресса)
+        """
+        total = 0
+        for plan in plans:
+            if entity == "vehicle":
+                for model, column in VEHICLE_REFERENCES:
+                    total += self.db.query(func.count(model.id)).filter(column.in_(plan.source_ids)).scalar() or 0
+            else:
+                card_numbers = self._card_numbers(plan.source_ids)
+                if card_numbers:
+                    total += self.db.query(func.count(Transaction.id)).filter(
+                        Transaction.card_number.in_(card_numbers)
+                    ).scalar() or 0
+                total += self.db.query(func.count(FuelCardAnalysisResult.id)).filter(
+                    FuelCardAnalysisResult.fuel_card_id.in_(plan.source_ids)
+                ).scalar() or 0
+        return total
+
+    def merge(
+        self,
+        entity: str,
+        plans: Sequence[MergePlan],
+        on_plan_done: Optional[Callable[[], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Выполнение планов слияния
+
+        Returns:
+            Словарь: plans, rows_updated, deleted
+        """
+        merge_plan = self.merge_vehicle_plan if entity == "vehicle" else self.merge_fuel_card_plan
+        result = {"plans": 0, "rows_updated": 0, "deleted": 0}
+        for plan in plans:
+            plan_result = merge_plan(plan)
+            result["plans"] += 1
+            result["rows_updated"] += sum(plan_result["updated"].values())
+            result["deleted"] += plan_result["deleted"]
+            if on_plan_done:
+                on_plan_done()
+        return result
+
+    def merge_vehicle_plan(self, plan: MergePlan) -> Dict[str, Any]:
+        """
+        Перенос ссылок дублей ТС на целевое ТС и удаление дублей
+
+        Returns:
+            Словарь: updated (строк по таблицам), deleted
+        """
+        source_ids = list(plan.source_ids)
+        updated = {
+            model.__tablename__: self._update_in_chunks(model, column, source_ids, plan.target_id)
+            for model, column in VEHICLE_REFERENCES
+        }
+
+        target = self.db.query(Vehicle).filter(Vehicle.id == plan.target_id).first()
+        sources = self.db.query(Vehicle).filter(Vehicle.id.in_(source_ids)).order_by(Vehicle.id).all()
+        for source in sources:
+            # Дополняем целевое ТС данными дубля, если у цели их нет
+            if not target.garage_number and source.garage_number:
+                target.garage_number = source.garage_number
+            if not target.license_plate and source.license_plate:
+                target.license_plate = source.license_plate
+            self.db.delete(source)
+        self.db.commit()
+
+        logger.info("ТС объединены", extra={
+            "target_vehicle_id": plan.target_id,
+            "source_vehicle_ids": source_ids,
+            "rows_updated": updated
+        })
+        return {"updated": updated, "deleted": len(sources)}
+
+    def merge_fuel_card_plan(self, plan: MergePlan) -> Dict[str, Any]:
+        """
+        Перенос транзакций и результатов анализа дублей карты на целевую карту
+        и удаление дублей
+
+        Returns:
+            Словарь: updated (строк по таблицам), deleted
+        """
+        source_ids = list(plan.source_ids)
+        target = self.db.query(FuelCard).filter(FuelCard.id == plan.target_id).first()
+        card_numbers = [number for number in self._card_numbers(source_ids) if number != target.card_number]
+
+        updated = {
+            Transaction.__tablename__: self._update_in_chunks(
+                Transaction, Transaction.card_number, card_numbers, target.card_number
+            ) if card_numbers else 0,
+            FuelCardAnalysisResult.__tablename__: self._update_in_chunks(
+                FuelCardAnalysisResult, FuelCardAnalysisResult.fuel_card_id, source_ids, plan.target_id
+            ),
+        }
+
+        target = self.db.query(FuelCard).filter(FuelCard.id == plan.target_id).first()
+        sources = self.db.query(FuelCard).filter(FuelCard.id.in_(source_ids)).order_by(FuelCard.id).all()
+        for source in sources:
+            # Дополняем связи целевой карты, если они пустые
+            if not target.provider_id and source.provider_id:
+                target.provider_id = source.provider_id
+            if not target.vehicle_id and source.vehicle_id:
+                target.vehicle_id = source.vehicle_id
+            self.db.delete(source)
+        self.db.commit()
+
+        logger.info("Топливные карты объединены", extra={
+            "target_card_id": plan.target_id,
+            "source_card_ids": source_ids,
+            "rows_updated": updated
+        })
+        return {"updated": updated, "deleted": len(sources)}
+
+    def _card_numbers(self, card_ids: Iterable[int]) -> List[str]:
+        return [
+            number for (number,) in self.db.query(FuelCard.card_number).filter(FuelCard.id.in_(list(card_ids)))
+            if number
+        ]
+
+    def _update_in_chunks(self, model, column, old_values: List[Any], new_value: Any) -> int:
+        """
+        UPDATE model SET column = new_value WHERE column IN old_values порциями
+        по chunk_size строк; каждая порция фиксируется отдельно
+        """
+        if not old_values:
+            return 0
+        total = 0
+        last_id = None
+        while True:
+            query = select(model.id).where(column.in_(old_values))
+            if last_id is not None:
+                query = query.where(model.id > last_id)
+            ids = self.db.execute(query.order_by(model.id).limit(self.chunk_size)).scalars().all()
+            if not ids:
+                break
+
+            conditions = [column.in_(old_values), model.id <= ids[-1]]
+            if last_id is not None:
+                conditions.append(model.id > last_id)
+            result = self.db.execute(
+                update(model).where(*conditions).values({column.key: new_value})
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+
+            total += result.rowcount
+            last_id = ids[-1]
+            if self.progress:
+                self.progress(result.rowcount)
+            if len(ids) < self.chunk_size:
+                break
+        return total
+
+
+@dataclass
+class MergeJob:
+    """
+    Фоновая задача слияния
+    """
+    id: str
+    entity: str
+    plans: List[MergePlan]
+    status: str = "pending"  # pending, running, completed, failed
+    total_rows: int = 0
+    processed_rows: int = 0
+    plans_done: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = 100.0 if self.status == "completed" else (
+            round(self.processed_rows * 100 / self.total_rows, 1) if self.total_rows else 0.0
+        )
+        return {
+            "id": self.id,
+            "entity": self.entity,
+            "status": self.status,
+            "plans_total": len(self.plans),
+            "plans_done": self.plans_done,
+            "total_rows": self.total_rows,
+            "processed_rows": self.processed_rows,
+            "deleted": self.deleted,
+            "progress": min(progress, 100.0),
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class MergeJobManager:
+    """
+    Фоновое выполнение слияний (singleton на процесс)
+
+    Задачи выполняются по одной: параллельные слияния пересекающихся записей
+    блокировали бы друг друга. Состояние задач хранится в памяти процесса и
+    дублируется в Redis (если доступен), чтобы прогресс был виден из других
+    воркеров API.
+    """
+
+    _instance: Optional['MergeJobManager'] = None
+
+    def __init__(self):
+        if MergeJobManager._instance is not None:
+            raise RuntimeError("MergeJobManager is a singleton. Use get_instance() instead.")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="merge-job")
+        self._jobs: Dict[str, MergeJob] = {}
+        self._lock = threading.Lock()
+        MergeJobManager._instance = self
+
+    @classmethod
+    def get_instance(cls) -> 'MergeJobManager':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def submit(
+        self,
+        entity: str,
+        plans: List[MergePlan],
+        session_factory: Callable[[], Session] = SessionLocal
+    ) -> MergeJob:
+        """
+        Постановка слияния в очередь (планы должны быть проверены validate_plans)
+        """
+        job = MergeJob(id=uuid.uuid4().hex, entity=entity, plans=plans)
+        with self._lock:
+            self._jobs[job.id] = job
+            if len(self._jobs) > MAX_KEPT_JOBS:
+                finished = [
+                    job_id for job_id, item in self._jobs.items() if item.status in ("completed", "failed")
+                ]
+                for job_id in finished[:len(self._jobs) - MAX_KEPT_JOBS]:
+                    self._jobs.pop(job_id, None)
+        self._publish(job)
+        self._executor.submit(self._run, job, session_factory)
+        logger.info("Задача слияния поставлена в очередь", extra={
+            "job_id": job.id,
+            "entity": entity,
+            "plans": len(plans)
+        })
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Состояние задачи (из памяти процесса или из Redis)
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return CacheService.get_instance().get(job_id, prefix=JOBS_CACHE_PREFIX)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """
+        Задачи процесса, новые первыми
+        """
+        jobs = sorted(self._jobs.values(), key=lambda item: item.created_at, reverse=True)
+        return [job.to_dict() for job in jobs]
+
+    def _publish(self, job: MergeJob) -> None:
+        cache = CacheService.get_instance()
+        if cache.is_available:
+            cache.set(job.id, job.to_dict(), ttl=JOBS_CACHE_TTL, prefix=JOBS_CACHE_PREFIX)
+
+    def _run(self, job: MergeJob, session_factory: Callable[[], Session]) -> None:
+        job.status = "running"
+        job.started_at = datetime.now()
+        self._publish(job)
+        last_published = time.monotonic()
+
+        def on_chunk(rows: int) -> None:
+            nonlocal last_published
+            job.processed_rows += rows
+            if time.monotonic() - last_published >= 1.0:
+                self._publish(job)
+                last_published = time.monotonic()
+
+        def on_plan_done() -> None:
+            job.plans_done += 1
+
+        db = session_factory()
+        try:
+            service = MergeService(db, progress=on_chunk)
+            job.total_rows = service.count_rows(job.entity, job.plans)
+            result = service.merge(job.entity, job.plans, on_plan_done=on_plan_done)
+            job.deleted = result["deleted"]
+            job.status = "completed"
+            logger.info("Задача слияния завершена", extra={"job_id": job.id, **result})
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            logger.error("Ошибка задачи слияния", extra={"job_id": job.id, "error": str(e)}, exc_info=True)
+        finally:
+            db.close()
+            job.finished_at = datetime.now()
+            # Агрегаты дашборда и списки справочников пересчитываются после
+            # слияния (в том числе частичного)
+            if job.entity == "vehicle":
+                invalidate_vehicles_cache()
+            else:
+                invalidate_fuel_cards_cache()
+            invalidate_dashboard_cache()
+            self._publish(job)
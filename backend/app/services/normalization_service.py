@@ -4,9 +4,57 @@
 """
 import re
 import json
-from typing import Optional, Dict, Any
+import threading
+import time
+from functools import lru_cache
+import pandas as pd
+from typing import Optional, Dict, Any, Tuple
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from app.models import NormalizationSettings
+from app.config import get_settings
+from app.logger import logger
+from app.models import FuelCard, NormalizationSettings
+
+# Регулярные выражения нормализации компилируются один раз
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s]')
+_EXTRA_SPACES_RE = re.compile(r'\s+')
+_NON_WORD_RE = re.compile(r'[^\w]')
+_NON_DIGIT_RE = re.compile(r'[^\d]')
+# Обычный формат госномера: буква(ы), 3 цифры, 2-3 буквы, 2-3 цифры
+_LICENSE_PLATE_STANDARD_RE = re.compile(
+    r'([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{1,2})\s*(\d{3})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2,3})\s*(\d{2,3})',
+    re.IGNORECASE
+)
+# Формат трактора: 4 цифры, 2 буквы, 2 цифры
+_LICENSE_PLATE_TRACTOR_RE = re.compile(
+    r'(\d{4})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2})\s*(\d{2})',
+    re.IGNORECASE
+)
+
+# Госномер в названии ТС: буква(ы), 3-4 цифры, 2-3 буквы, 2-3 цифры
+_VEHICLE_LICENSE_PLATE_RE = re.compile(
+    r'([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{1,2})\s*(\d{3,4})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2,3})\s*(\d{2,3})',
+    re.IGNORECASE
+)
+_CARD_SEPARATORS_RE = re.compile(r'[\s\-_]+')
+_DIGITS_RE = re.compile(r'\d+')
+
+# Вид топлива: пробелы и дефисы не учитываются, правила проверяются по порядку
+_FUEL_SEPARATORS_TABLE = str.maketrans('', '', ' -')
+_FUEL_RULES = (
+    (('аи95', 'ai95'), "АИ-95"),
+    (('аи92', 'ai92'), "АИ-92"),
+    (('аи98', 'ai98'), "АИ-98"),
+    (('дт', 'диз', 'diesel'), "Дизельное топливо"),
+    (('газ', 'cng', 'lng', 'метан', 'пропан'), "Газ"),
+)
+
+# Одни и те же карты, виды топлива и АЗС повторяются в файле тысячи раз:
+# результаты нормализации строк запоминаются (LRU на процесс)
+NORMALIZATION_CACHE_SIZE = 16384
+
+# Типы справочников, для которых доступен поиск госномера и гаражного номера
+TYPES_WITH_LICENSE_PLATE_SEARCH = ('fuel_card_owner', 'vehicle')
 
 
 def normalize_fuel(fuel: Optional[str]) -> str:
@@ -27,25 +75,18 @@ def normalize_fuel(fuel: Optional[str]) -> str:
     """
     if not fuel:
         return ""
+    return _normalize_fuel_text(str(fuel))
 
-    fuel_str = str(fuel).strip()
-    fuel_lower = fuel_str.lower().replace(' ', '').replace('-', '')
 
-    # Бензин
-    if 'аи95' in fuel_lower or 'ai95' in fuel_lower:
-        return "АИ-95"
-    if 'аи92' in fuel_lower or 'ai92' in fuel_lower:
-        return "АИ-92"
-    if 'аи98' in fuel_lower or 'ai98' in fuel_lower:
-        return "АИ-98"
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_fuel_text(fuel: str) -> str:
+    fuel_str = fuel.strip()
+    fuel_lower = fuel_str.lower().translate(_FUEL_SEPARATORS_TABLE)
 
-    # Дизель
-    if 'дт' in fuel_lower or 'диз' in fuel_lower or 'diesel' in fuel_lower:
-        return "Дизельное топливо"
-
-    # Газ
-    if 'газ' in fuel_lower or 'cng' in fuel_lower or 'lng' in fuel_lower or 'метан' in fuel_lower or 'пропан' in fuel_lower:
-        return "Газ"
+    for markers, target in _FUEL_RULES:
+        for marker in markers:
+            if marker in fuel_lower:
+                return target
 
     return fuel_str
 
@@ -71,28 +112,20 @@ def normalize_vehicle_name(vehicle_name: Optional[str]) -> str:
     """
     if not vehicle_name:
         return ""
+    return _normalize_vehicle_text(str(vehicle_name))
 
-    # Приводим к строке и удаляем лишние пробелы
-    normalized = str(vehicle_name).strip()
-
-    # Удаляем множественные пробелы
-    normalized = re.sub(r'\s+', ' ', normalized)
 
-    # Нормализуем госномер: удаляем пробелы и дефисы из номеров
-    # Паттерн для госномера: буквы, цифры, буквы, цифры
-    # Пример: "А 123 ВС 77" -> "А123ВС77"
-    license_pattern = r'([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{1,2})\s*(\d{3,4})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2,3})\s*(\d{2,3})'
+def _join_license_plate(match: re.Match) -> str:
+    letters1, digits1, letters2, digits2 = match.groups()
+    return f"{letters1.upper()}{digits1}{letters2.upper()}{digits2}"
 
-    def normalize_license(match: re.Match) -> str:
-        letters1 = match.group(1).upper()
-        digits1 = match.group(2)
-        letters2 = match.group(3).upper()
-        digits2 = match.group(4)
-        return f"{letters1}{digits1}{letters2}{digits2}"
 
-    normalized = re.sub(license_pattern, normalize_license, normalized, flags=re.IGNORECASE)
-
-    return normalized
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_vehicle_text(vehicle_name: str) -> str:
+    # Удаляем лишние и множественные пробелы
+    normalized = _EXTRA_SPACES_RE.sub(' ', vehicle_name.strip())
+    # Нормализуем госномер: "А 123 ВС 77" -> "А123ВС77"
+    return _VEHICLE_LICENSE_PLATE_RE.sub(_join_license_plate, normalized)
 
 
 def normalize_card_number(card_number: Optional[str]) -> str:
@@ -115,14 +148,16 @@ def normalize_card_number(card_number: Optional[str]) -> str:
     """
     if not card_number:
         return ""
+    return _normalize_card_text(str(card_number))
 
-    # Преобразуем в строку, если передан как число
-    card_number_str = str(card_number).strip() if card_number else ""
-
-    # Удаляем все пробелы, дефисы и другие разделители
-    normalized = re.sub(r'[\s\-_]+', '', card_number_str)
 
-    return normalized
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _normalize_card_text(card_number: str) -> str:
+    card_number_str = card_number.strip()
+    # Номер из одних цифр (основной случай) разделителей не содержит
+    if card_number_str.isdecimal():
+        return card_number_str
+    return _CARD_SEPARATORS_RE.sub('', card_number_str)
 
 
 def extract_azs_number(kazs: Optional[str]) -> str:
@@ -143,10 +178,60 @@ def extract_azs_number(kazs: Optional[str]) -> str:
     """
     if not kazs:
         return ""
+    return _extract_azs_text(str(kazs))
 
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def _extract_azs_text(kazs: str) -> str:
     # Извлекаем числовую часть из строки
-    match = re.search(r'\d+', str(kazs))
-    return match.group(0) if match else str(kazs).strip()
+    match = _DIGITS_RE.search(kazs)
+    return match.group(0) if match else kazs.strip()
+
+
+def clear_normalization_caches() -> None:
+    """
+    Очистка кэшей нормализации значений (для замеров и тестов)
+    """
+    for function in (_normalize_fuel_text, _normalize_vehicle_text, _normalize_card_text, _extract_azs_text):
+        function.cache_clear()
+
+
+def _map_unique(values: pd.Series, normalize) -> pd.Series:
+    """
+    Нормализация колонки: функция вызывается один раз на уникальное значение,
+    пустые ячейки (NaN/None) - ""
+    """
+    present = values.notna()
+    mapping = {value: normalize(value) for value in values[present].unique()}
+    return values.map(mapping).where(present, "").astype(object)
+
+
+def normalize_fuels(values: pd.Series) -> pd.Series:
+    """
+    Векторный вариант normalize_fuel для колонки (пустые - "")
+    """
+    return _map_unique(values, normalize_fuel)
+
+
+def normalize_vehicle_names(values: pd.Series) -> pd.Series:
+    """
+    Векторный вариант normalize_vehicle_name для колонки (пустые - "")
+    """
+    return _map_unique(values, normalize_vehicle_name)
+
+
+def normalize_card_numbers(values: pd.Series) -> pd.Series:
+    """
+    Векторный вариант normalize_card_number для колонки (пустые - "")
+    """
+    return _map_unique(values, normalize_card_number)
+
+
+def extract_azs_numbers(values: pd.Series) -> pd.Series:
+    """
+    Векторный вариант extract_azs_number для колонки строк (пустые - "")
+    """
+    return _map_unique(values.fillna("").astype(str), extract_azs_number)
 
 
 def get_default_normalization_options() -> Dict[str, Any]:
@@ -181,22 +266,60 @@ def get_normalization_settings(db: Optional[Session], dictionary_type: str = "fu
         Словарь с настройками нормализации
     """
     if db:
-        settings = db.query(NormalizationSettings).filter(
-            NormalizationSettings.dictionary_type == dictionary_type
-        ).first()
+        ttl = get_settings().normalization_settings_cache_ttl
+        # В ключ входит БД сессии: настройки разных баз не смешиваются
+        key = (str(db.get_bind().url), dictionary_type)
+        if ttl > 0:
+            cached = _settings_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return dict(cached[1])
         
-        if settings and settings.options:
-            try:
-                if isinstance(settings.options, str):
-                    return json.loads(settings.options)
-                return settings.options
-            except (json.JSONDecodeError, TypeError):
-                pass
+        options = _load_normalization_settings(db, dictionary_type)
+        if ttl > 0:
+            with _settings_cache_lock:
+                _settings_cache[key] = (time.monotonic() + ttl, options)
+        return dict(options)
     
     # Настройки по умолчанию
     return get_default_normalization_options()
 
 
+# (URL БД, тип справочника) -> (момент устаревания, настройки)
+_settings_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_settings_cache_lock = threading.Lock()
+
+
+def _load_normalization_settings(db: Session, dictionary_type: str) -> Dict[str, Any]:
+    settings = db.query(NormalizationSettings).filter(
+        NormalizationSettings.dictionary_type == dictionary_type
+    ).first()
+    
+    if settings and settings.options:
+        try:
+            if isinstance(settings.options, str):
+                return json.loads(settings.options)
+            return settings.options
+        except (json.JSONDecodeError, TypeError):
+            pass
+    
+    return get_default_normalization_options()
+
+
+def invalidate_normalization_settings(dictionary_type: Optional[str] = None) -> None:
+    """
+    Очистка кэша настроек нормализации
+    
+    Args:
+        dictionary_type: Тип справочника (если не указан - очищаются все типы)
+    """
+    with _settings_cache_lock:
+        if dictionary_type is None:
+            _settings_cache.clear()
+        else:
+            for key in [key for key in _settings_cache if key[1] == dictionary_type]:
+                del _settings_cache[key]
+
+
 def apply_normalization_options(text: str, options: Dict[str, Any]) -> str:
     """
     Применение опций нормализации к тексту
@@ -220,11 +343,11 @@ def apply_normalization_options(text: str, options: Dict[str, Any]) -> str:
     
     # Удаление спецсимволов (кроме букв, цифр и пробелов)
     if options.get("remove_special_chars", False):
-        result = re.sub(r'[^\w\s]', '', result)
+        result = _SPECIAL_CHARS_RE.sub('', result)
     
     # Удаление лишних пробелов
     if options.get("remove_extra_spaces", True):
-        result = re.sub(r'\s+', ' ', result)
+        result = _EXTRA_SPACES_RE.sub(' ', result)
     
     # Обрезка пробелов в начале/конце
     if options.get("trim", True):
@@ -292,8 +415,6 @@ def normalize_owner_name(
     if options is None:
         options = get_normalization_settings(db, dictionary_type)
     
-    # Типы справочников, для которых доступен поиск госномера и гаражного номера
-    TYPES_WITH_LICENSE_PLATE_SEARCH = ['fuel_card_owner', 'vehicle']
     can_search_license_plate = dictionary_type in TYPES_WITH_LICENSE_PLATE_SEARCH
     
     # Применяем базовую нормализацию (удаление символов, регистр и т.д.)
@@ -315,15 +436,10 @@ def normalize_owner_name(
     }
     
     # 1. ПРИОРИТЕТ: Ищем госномер (если включен приоритет)
-    # Обычный формат: буква(ы), 3 цифры, 2-3 буквы, 2-3 цифры
-    license_pattern_standard = r'([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{1,2})\s*(\d{3})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2,3})\s*(\d{2,3})'
-    # Формат трактора: 4 цифры, 2 буквы, 2 цифры
-    license_pattern_tractor = r'(\d{4})\s*([АВЕКМНОРСТУХABEKMHOPCTYXавекмнорстухabekmhopctx]{2})\s*(\d{2})'
-    
     # Ищем госномер в строке (если включен приоритет и тип справочника поддерживает поиск)
     if can_search_license_plate and options.get("priority_license_plate", True):
-        match_standard = re.search(license_pattern_standard, owner_str, re.IGNORECASE)
-        match_tractor = re.search(license_pattern_tractor, owner_str, re.IGNORECASE)
+        match_standard = _LICENSE_PLATE_STANDARD_RE.search(owner_str)
+        match_tractor = _LICENSE_PLATE_TRACTOR_RE.search(owner_str)
         
         if match_standard:
             # Обычный формат госномера
@@ -336,7 +452,7 @@ def normalize_owner_name(
             result["normalized"] = license_plate
             
             # Удаляем госномер из строки для дальнейшего анализа
-            owner_str = re.sub(license_pattern_standard, '', owner_str, flags=re.IGNORECASE).strip()
+            owner_str = _LICENSE_PLATE_STANDARD_RE.sub('', owner_str).strip()
         elif match_tractor:
             # Формат трактора
             digits1 = match_tractor.group(1)
@@ -347,7 +463,7 @@ def normalize_owner_name(
             result["normalized"] = license_plate
             
             # Удаляем госномер из строки для дальнейшего анализа
-            owner_str = re.sub(license_pattern_tractor, '', owner_str, flags=re.IGNORECASE).strip()
+            owner_str = _LICENSE_PLATE_TRACTOR_RE.sub('', owner_str).strip()
     
     # 2. Если осталась строка, проверяем на гаражный номер (только цифры) - если включен приоритет и тип поддерживает поиск
     if owner_str and can_search_license_plate:
@@ -357,8 +473,8 @@ def normalize_owner_name(
         
         for part in parts:
             # Убираем спецсимволы для проверки
-            part_clean = re.sub(r'[^\w]', '', part)
-            digits_only = re.sub(r'[^\d]', '', part_clean)
+            part_clean = _NON_WORD_RE.sub('', part)
+            digits_only = _NON_DIGIT_RE.sub('', part_clean)
             
             # Если часть состоит только из цифр - это гаражный номер
             min_length = options.get("min_garage_number_length", 2)
@@ -396,3 +512,69 @@ def normalize_owner_name(
         result["company_name"] = apply_normalization_options(result["company_name"], options)
     
     return result
+
+
+def renormalize_fuel_card_owners(
+    db: Session,
+    dictionary_type: str = "fuel_card_owner",
+    batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Повторная нормализация владельцев всех топливных карт по текущим настройкам
+    
+    Карты читаются пакетами по id, изменившиеся normalized_owner обновляются
+    одним UPDATE на пакет с фиксацией после каждого пакета. Одинаковые исходные
+    наименования нормализуются один раз.
+    
+    Args:
+        db: Сессия базы данных
+        dictionary_type: Тип справочника, настройки которого применяются
+        batch_size: Размер пакета карт
+        
+    Returns:
+        Словарь с полями processed (обработано карт) и updated (изменено карт)
+    """
+    started = time.monotonic()
+    options = get_normalization_settings(db, dictionary_type)
+    normalized_by_name: Dict[str, Optional[str]] = {}
+    processed = 0
+    updated = 0
+    last_id = 0
+    
+    while True:
+        rows = (
+            db.query(FuelCard.id, FuelCard.original_owner_name, FuelCard.normalized_owner)
+            .filter(FuelCard.id > last_id, FuelCard.original_owner_name.isnot(None))
+            .order_by(FuelCard.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        
+        changes = []
+        for card_id, owner_name, current in rows:
+            if owner_name not in normalized_by_name:
+                normalized_by_name[owner_name] = normalize_owner_name(
+                    owner_name, options=options, dictionary_type=dictionary_type
+                )["normalized"]
+            normalized = normalized_by_name[owner_name]
+            # Как и при загрузке информации по карте: пустой результат не затирает значение
+            if normalized and normalized != current:
+                changes.append({"id": card_id, "normalized_owner": normalized})
+        
+        if changes:
+            db.execute(update(FuelCard), changes)
+            db.commit()
+        processed += len(rows)
+        updated += len(changes)
+    
+    logger.info("Владельцы топливных карт нормализованы повторно", extra={
+        "dictionary_type": dictionary_type,
+        "processed": processed,
+        "updated": updated,
+        "distinct_names": len(normalized_by_name),
+        "duration_ms": int((time.monotonic() - started) * 1000)
+    })
+    return {"processed": processed, "updated": updated}
@@ -0,0 +1,426 @@
+"""
+Доставка уведомлений из очереди по внешним каналам
+
+send_notification сохраняет задачи доставки (notification_deliveries), а
+воркеры - по одному потоку на канал - забирают их пакетами:
+- email: все письма пакета отправляются через одно SMTP-соединение,
+  соединение сохраняется между пакетами;
+- telegram: уведомления одного чата объединяются в одно сообщение,
+  отправка ограничена общим лимитом Bot API и интервалом на чат,
+  ответ 429 (retry_after) переносит задачи на указанное время;
+- push: отправка через PushChannel.
+
+Неуспешные задачи повторяются с экспоненциальной задержкой, после
+notification_max_attempts попыток переходят в статус dead.
+"""
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.logger import logger
+from app.middleware.prometheus_metrics import record_notification_delivery, update_notification_backlog
+from app.models import Notification, NotificationDelivery, NotificationSettings, User
+from app.repositories.notification_delivery_repository import NotificationDeliveryRepository, utcnow
+from app.services.notification_service import (
+    QUEUED_CHANNELS,
+    EmailChannel,
+    PushChannel,
+    TelegramChannel,
+)
+
+# Статусы каналов, после которых задача не повторяется
+FINAL_STATUSES = ("disabled", "not_implemented")
+
+# Разделитель уведомлений в объединенном сообщении Telegram
+TELEGRAM_SEPARATOR = "\n\n———\n\n"
+
+
+class TelegramRateLimiter:
+    """
+    Ограничение частоты отправки: общий лимит сообщений в секунду
+    и минимальный интервал между сообщениями в один чат
+    """
+
+    def __init__(self, per_second: float, chat_interval: float, sleep: Callable[[float], None] = time.sleep):
+        self.min_interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.chat_interval = chat_interval
+        self._sleep = sleep
+        self._last_send = float("-inf")
+        self._last_by_chat: Dict[str, float] = {}
+
+    def wait(self, chat_id: str) -> None:
+        now = time.monotonic()
+        ready_at = max(
+            self._last_send + self.min_interval,
+            self._last_by_chat.get(chat_id, float("-inf")) + self.chat_interval
+        )
+        if ready_at > now:
+            self._sleep(ready_at - now)
+            now = ready_at
+        self._last_send = now
+        self._last_by_chat[chat_id] = now
+        if len(self._last_by_chat) > 1000:
+            cutoff = now - self.chat_interval
+            self._last_by_chat = {chat: sent for chat, sent in self._last_by_chat.items() if sent > cutoff}
+
+
+def build_telegram_batches(texts: List[str], max_length: int = TelegramChannel.MAX_MESSAGE_LENGTH) -> List[List[int]]:
+    """
+    Разбиение сообщений одного чата на группы, каждая из которых помещается в одно сообщение
+
+    Returns:
+        Списки индексов texts по группам
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    length = 0
+    for index, text in enumerate(texts):
+        added = len(text) + (len(TELEGRAM_SEPARATOR) if current else 0)
+        if current and length + added > max_length:
+            batches.append(current)
+            current, length = [], 0
+            added = len(text)
+        current.append(index)
+        length += added
+    if current:
+        batches.append(current)
+    return batches
+
+
+class NotificationDeliveryService:
+    """
+    Воркеры очереди доставки уведомлений (singleton на процесс)
+    """
+
+    _instance: Optional['NotificationDeliveryService'] = None
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        if NotificationDeliveryService._instance is not None:
+            raise RuntimeError("NotificationDeliveryService is a singleton. Use get_instance() instead.")
+        self._session_factory = session_factory
+        self._events = {channel: threading.Event() for channel in QUEUED_CHANNELS}
+        self._stop = threading.Event()
+        self._threads: Dict[str, threading.Thread] = {}
+        NotificationDeliveryService._instance = self
+
+    @classmethod
+    def get_instance(cls) -> 'NotificationDeliveryService':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads.values())
+
+    def start(self) -> None:
+        """
+        Запуск воркеров каналов
+        """
+        if not get_settings().notification_queue_enabled or self.running:
+            return
+        self._stop.clear()
+
+        db = self._session_factory()
+        try:
+            released = NotificationDeliveryRepository(db).release_stale()
+            db.commit()
+            if released:
+                logger.info(f"Возвращено в очередь незавершенных задач доставки: {released}")
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Не удалось вернуть в очередь незавершенные задачи доставки: {e}")
+        finally:
+            db.close()
+
+        for channel in QUEUED_CHANNELS:
+            thread = threading.Thread(
+                target=self._run_worker, args=(channel,), name=f"notification-{channel}", daemon=True
+            )
+            self._threads[channel] = thread
+            thread.start()
+        logger.info("Воркеры доставки уведомлений запущены", extra={"channels": list(QUEUED_CHANNELS)})
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """
+        Остановка воркеров (текущий пакет дорабатывается)
+        """
+        self._stop.set()
+        for event in self._events.values():
+            event.set()
+        for thread in self._threads.values():
+            thread.join(timeout=timeout)
+        self._threads = {}
+
+    def wake(self, channels: Iterable[str]) -> None:
+        """
+        Пробуждение воркеров каналов после постановки задач в очередь
+        """
+        for channel in channels:
+            event = self._events.get(channel)
+            if event is not None:
+                event.set()
+
+    def _run_worker(self, channel: str) -> None:
+        settings = get_settings()
+        event = self._events[channel]
+        deliverer = ChannelDeliverer.create(channel)
+        try:
+            while not self._stop.is_set():
+                try:
+                    processed = self.process_batch(channel, deliverer)
+                except Exception as e:
+                    processed = 0
+                    logger.error(f"Ошибка воркера доставки уведомлений ({channel}): {e}", exc_info=True)
+                # Полный пакет - в очереди, вероятно, есть еще задачи
+                if processed >= settings.notification_worker_batch_size:
+                    continue
+                event.wait(settings.notification_worker_poll_interval)
+                event.clear()
+        finally:
+            deliverer.close()
+
+    def process_batch(self, channel: str, deliverer: Optional['ChannelDeliverer'] = None) -> int:
+        """
+        Обработка одного пакета задач канала
+
+        Returns:
+            Количество обработанных задач
+        """
+        settings = get_settings()
+        own_deliverer = deliverer is None
+        deliverer = deliverer or ChannelDeliverer.create(channel)
+        db = self._session_factory()
+        try:
+            repo = NotificationDeliveryRepository(db)
+            deliveries = repo.claim_batch(channel, settings.notification_worker_batch_size)
+            if deliveries:
+                deliverer.deliver(db, repo, deliveries)
+                db.flush()
+                self._update_notification_statuses(db, repo, deliveries)
+                db.commit()
+            update_notification_backlog(channel, repo.count_backlog(channel))
+            return len(deliveries)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+            if own_deliverer:
+                deliverer.close()
+
+    @staticmethod
+    def _update_notification_statuses(
+        db: Session,
+        repo: NotificationDeliveryRepository,
+        deliveries: List[NotificationDelivery]
+    ) -> None:
+        """
+        Обновление delivery_status in-app уведомлений по статусам задач доставки
+        """
+        notification_ids = {delivery.notification_id for delivery in deliveries if delivery.notification_id}
+        for notification_id in notification_ids:
+            notification = db.get(Notification, notification_id)
+            if notification is None:
+                continue
+            try:
+                delivery_status = json.loads(notification.delivery_status) if notification.delivery_status else {}
+            except (TypeError, ValueError):
+                delivery_status = {}
+            delivery_status.update(repo.get_channel_statuses(notification_id))
+            notification.delivery_status = json.dumps(delivery_status)
+
+
+class ChannelDeliverer:
+    """
+    Отправка пакета задач одного канала
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.settings = get_settings()
+
+    @staticmethod
+    def create(channel: str) -> 'ChannelDeliverer':
+        if channel == "email":
+            return EmailDeliverer(channel)
+        if channel == "telegram":
+            return TelegramDeliverer(channel)
+        if channel == "push":
+            return PushDeliverer(channel)
+        raise ValueError(f"Неизвестный канал доставки: {channel}")
+
+    def deliver(self, db: Session, repo: NotificationDeliveryRepository, deliveries: List[NotificationDelivery]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def retry_delay(self, delivery: NotificationDelivery) -> float:
+        return self.settings.notification_retry_base_delay * 2 ** max(delivery.attempts - 1, 0)
+
+    def apply_result(
+        self,
+        repo: NotificationDeliveryRepository,
+        delivery: NotificationDelivery,
+        result: Dict,
+        retry_delay: Optional[float] = None
+    ) -> None:
+        """
+        Перевод задачи в статус по результату канала и запись метрик
+        """
+        status = result.get("status", "unknown")
+        if status == "sent":
+            repo.mark_sent(delivery)
+            latency = (delivery.sent_at - delivery.created_at).total_seconds() if delivery.created_at else None
+            record_notification_delivery(self.channel, "sent", latency)
+            return
+
+        if status in FINAL_STATUSES:
+            repo.mark_final(delivery, status, result.get("error"))
+            record_notification_delivery(self.channel, status)
+            return
+
+        repo.mark_failed(
+            delivery,
+            result.get("error") or status,
+            max_attempts=self.settings.notification_max_attempts,
+            retry_delay=retry_delay if retry_delay is not None else self.retry_delay(delivery)
+        )
+        record_notification_delivery(self.channel, "dead" if delivery.status == "dead" else "retry")
+        if delivery.status == "dead":
+            logger.error(f"Уведомление не доставлено ({self.channel}), задача перемещена в dead", extra={
+                "delivery_id": delivery.id,
+                "user_id": delivery.user_id,
+                "attempts": delivery.attempts,
+                "error": delivery.last_error
+            })
+
+    @staticmethod
+    def load_users(db: Session, deliveries: List[NotificationDelivery]) -> Dict[int, User]:
+        user_ids = {delivery.user_id for delivery in deliveries}
+        return {user.id: user for user in db.query(User).filter(User.id.in_(user_ids)).all()}
+
+
+class PerMessageDeliverer(ChannelDeliverer):
+    """
+    Отправка задач по одной через канал уведомлений
+    """
+
+    channel_impl = None
+
+    def deliver(self, db: Session, repo: NotificationDeliveryRepository, deliveries: List[NotificationDelivery]) -> None:
+        users = self.load_users(db, deliveries)
+        for delivery in deliveries:
+            user = users.get(delivery.user_id)
+            if user is None:
+                repo.mark_final(delivery, "failed", "User not found")
+                record_notification_delivery(self.channel, "failed")
+                continue
+            try:
+                result = self.channel_impl.send(
+                    user=user,
+                    title=delivery.title,
+                    message=delivery.message,
+                    notification_type=delivery.notification_type or "info",
+                    db=db
+                )
+            except Exception as e:
+                result = {"status": "failed", "error": str(e)}
+            self.apply_result(repo, delivery, result)
+
+
+class EmailDeliverer(PerMessageDeliverer):
+    """
+    Email: одно SMTP-соединение на воркер
+    """
+
+    def __init__(self, channel: str):
+        super().__init__(channel)
+        self.channel_impl = EmailChannel(keep_alive=True)
+
+    def close(self) -> None:
+        self.channel_impl.close()
+
+
+class PushDeliverer(PerMessageDeliverer):
+
+    def __init__(self, channel: str):
+        super().__init__(channel)
+        self.channel_impl = PushChannel()
+
+
+class TelegramDeliverer(ChannelDeliverer):
+    """
+    Telegram: уведомления одного чата объединяются, отправка с ограничением частоты
+    """
+
+    def __init__(self, channel: str, rate_limiter: Optional[TelegramRateLimiter] = None):
+        super().__init__(channel)
+        self.client = httpx.Client(timeout=10.0)
+        self.channel_impl = TelegramChannel(client=self.client)
+        self.rate_limiter = rate_limiter or TelegramRateLimiter(
+            self.settings.telegram_rate_limit_per_second,
+            self.settings.telegram_chat_min_interval
+        )
+
+    def close(self) -> None:
+        self.client.close()
+
+    def deliver(self, db: Session, repo: NotificationDeliveryRepository, deliveries: List[NotificationDelivery]) -> None:
+        if not self.channel_impl.enabled or not self.channel_impl.api_url:
+            result = (
+                {"status": "disabled", "error": "Telegram notifications are disabled"}
+                if not self.channel_impl.enabled
+                else {"status": "failed", "error": "Telegram bot token is not configured"}
+            )
+            for delivery in deliveries:
+                self.apply_result(repo, delivery, result)
+            return
+
+        user_ids = {delivery.user_id for delivery in deliveries}
+        user_settings = {
+            item.user_id: item
+            for item in db.query(NotificationSettings).filter(NotificationSettings.user_id.in_(user_ids)).all()
+        }
+
+        by_chat: Dict[str, List[NotificationDelivery]] = {}
+        for delivery in deliveries:
+            settings_item = user_settings.get(delivery.user_id)
+            if not settings_item or not settings_item.telegram_enabled:
+                self.apply_result(repo, delivery, {"status": "disabled", "error": "Telegram notifications disabled for user"})
+            elif not settings_item.telegram_chat_id:
+                repo.mark_final(delivery, "failed", "Telegram chat_id is not set for user")
+                record_notification_delivery(self.channel, "failed")
+            else:
+                by_chat.setdefault(str(settings_item.telegram_chat_id), []).append(delivery)
+
+        for chat_id, chat_deliveries in by_chat.items():
+            texts = [TelegramChannel.format_message(item.title, item.message) for item in chat_deliveries]
+            for batch in build_telegram_batches(texts):
+                self.rate_limiter.wait(chat_id)
+                try:
+                    result = self.channel_impl.send_text(chat_id, TELEGRAM_SEPARATOR.join(texts[index] for index in batch))
+                except Exception as e:
+                    result = {"status": "failed", "error": f"Failed to send Telegram notification: {e}"}
+                for index in batch:
+                    self.apply_result(repo, chat_deliveries[index], result, retry_delay=result.get("retry_after"))
+
+
+def get_queue_stats(db: Session) -> Dict:
+    """
+    Состояние очереди доставки: количество задач по каналам и статусам
+    """
+    repo = NotificationDeliveryRepository(db)
+    return {
+        "enabled": get_settings().notification_queue_enabled,
+        "workers_running": NotificationDeliveryService.get_instance().running,
+        "channels": repo.get_status_counts(),
+        "checked_at": utcnow().isoformat()
+    }
@@ -5,6 +5,9 @@
 - Telegram
 - Push-уведомления
 - In-app уведомления (в системе)
+
+In-app уведомление сохраняется сразу, а email, telegram и push ставятся
+в очередь доставки и отправляются воркерами (notification_delivery_service).
 """
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
@@ -15,12 +18,16 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import httpx
 from app.repositories.notification_repository import NotificationRepository
+from app.repositories.notification_delivery_repository import NotificationDeliveryRepository
 from app.models import Notification, NotificationSettings, User
 from app.logger import logger
 from app.config import get_settings
 
 settings = get_settings()
 
+# Каналы, которые доставляются через очередь (in_app сохраняется сразу)
+QUEUED_CHANNELS = ("email", "telegram", "push")
+
 
 class NotificationChannel:
     """
@@ -42,7 +49,7 @@ class EmailChannel(NotificationChannel):
     Канал уведомлений через Email
     """
     
-    def __init__(self):
+    def __init__(self, keep_alive: bool = False):
         self.enabled = settings.email_enabled
         self.smtp_host = settings.email_smtp_host
         self.smtp_port = settings.email_smtp_port
@@ -51,6 +58,48 @@ class EmailChannel(NotificationChannel):
         self.from_address = settings.email_from_address
         self.from_name = settings.email_from_name
         self.use_tls = settings.email_use_tls
+        # Воркер очереди отправляет все письма через одно SMTP-соединение
+        self.keep_alive = keep_alive
+        self._server: Optional[smtplib.SMTP] = None
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.smtp_user and self.smtp_password:
+                server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _send_message(self, msg: MIMEMultipart) -> None:
+        if not self.keep_alive:
+            with self._connect() as server:
+                server.send_message(msg)
+            return
+        
+        if self._server is None:
+            self._server = self._connect()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Сервер закрыл простаивающее соединение - подключаемся заново
+            self._server = self._connect()
+            self._server.send_message(msg)
+    
+    def close(self) -> None:
+        """
+        Закрытие постоянного SMTP-соединения (keep_alive)
+        """
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
     
     def send(self, user: User, title: str, message: str, notification_type: str = "info", **kwargs) -> Dict[str, Any]:
         """
@@ -89,12 +138,7 @@ class EmailChannel(NotificationChannel):
             msg.attach(html_part)
             
             # Отправка
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls()
-                if self.smtp_user and self.smtp_password:
-                    server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+            self._send_message(msg)
             
             logger.info(f"Email notification sent to {user.email}", extra={
                 "user_id": user.id,
@@ -104,6 +148,8 @@ class EmailChannel(NotificationChannel):
             return {"status": "sent"}
         
         except Exception as e:
+            # После ошибки состояние постоянного соединения неизвестно
+            self.close()
             error_msg = f"Failed to send email: {str(e)}"
             logger.error(error_msg, extra={
                 "user_id": user.id,
@@ -117,10 +163,50 @@ class TelegramChannel(NotificationChannel):
     Канал уведомлений через Telegram Bot API
     """
     
-    def __init__(self):
+    # Максимальная длина сообщения Bot API
+    MAX_MESSAGE_LENGTH = 4096
+    
+    def __init__(self, client: Optional[httpx.Client] = None):
         self.enabled = settings.telegram_enabled
         self.bot_token = settings.telegram_bot_token
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}" if self.bot_token else None
+        # Общий клиент воркера очереди (без него - клиент на каждое сообщение)
+        self.client = client
+    
+    @staticmethod
+    def format_message(title: str, message: str) -> str:
+        return f"*{title}*\n\n{message}"
+    
+    def send_text(self, chat_id: str, text: str) -> Dict[str, Any]:
+        """
+        Отправка текста в чат
+        
+        Returns:
+            dict: {"status": "sent"} или {"status": "failed", "error": "...", "retry_after": секунд (при 429)}
+        """
+        payload = {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        }
+        send_url = f"{self.api_url}/sendMessage"
+        
+        if self.client is not None:
+            response = self.client.post(send_url, json=payload)
+        else:
+            with httpx.Client(timeout=10.0) as client:
+                response = client.post(send_url, json=payload)
+        
+        if response.status_code == 429:
+            # Превышен лимит Bot API: Telegram сообщает, через сколько секунд повторить
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                retry_after = None
+            return {"status": "failed", "error": "Telegram rate limit exceeded", "retry_after": retry_after}
+        
+        response.raise_for_status()
+        return {"status": "sent"}
     
     def send(self, user: User, title: str, message: str, notification_type: str = "info", **kwargs) -> Dict[str, Any]:
         """
@@ -146,20 +232,10 @@ class TelegramChannel(NotificationChannel):
             return {"status": "failed", "error": "Telegram chat_id is not set for user"}
         
         try:
-            # Форматируем сообщение для Telegram
-            telegram_message = f"*{title}*\n\n{message}"
-            
             # Отправка через Telegram Bot API
-            send_url = f"{self.api_url}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": telegram_message,
-                "parse_mode": "Markdown"
-            }
-            
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(send_url, json=payload)
-                response.raise_for_status()
+            result = self.send_text(chat_id, self.format_message(title, message))
+            if result["status"] != "sent":
+                return result
             
             logger.info(f"Telegram notification sent to user {user.id}", extra={
                 "user_id": user.id,
@@ -406,8 +482,20 @@ class NotificationService:
         # Результаты отправки по каналам
         delivery_status = {}
         
+        # Внешние каналы при включенной очереди не отправляются в запросе:
+        # задачи доставки сохраняются и отправляются воркерами каналов
+        queued_channels = []
+        if settings.notification_queue_enabled:
+            queued_channels = [channel for channel in channels if channel in QUEUED_CHANNELS]
+            for channel_name in queued_channels:
+                delivery_status[channel_name] = "queued"
+        in_app_notification_id = None
+        
         # Отправка через каждый канал
         for channel_name in channels:
+            if channel_name in queued_channels:
+                continue
+            
             logger.debug(f"Обработка канала {channel_name} для user_id={user_id}", extra={
                 "user_id": user_id,
                 "channel": channel_name
@@ -449,6 +537,7 @@ class NotificationService:
                 )
                 
                 delivery_status[channel_name] = result.get("status", "unknown")
+                in_app_notification_id = result.get("notification_id") or in_app_notification_id
                 
                 logger.info(f"Результат отправки через канал {channel_name}", extra={
                     "user_id": user_id,
@@ -493,6 +582,7 @@ class NotificationService:
                     )
                     new_status = result.get("status", "unknown")
                     delivery_status["in_app"] = new_status
+                    in_app_notification_id = result.get("notification_id") or in_app_notification_id
                     if new_status == "sent":
                         logger.info(f"In-app уведомление успешно создано принудительно (force=True)", extra={
                             "user_id": user_id,
@@ -534,12 +624,24 @@ class NotificationService:
                         delivery_status=delivery_status
                     )
                     delivery_status["in_app"] = result.get("status", "unknown")
+                    in_app_notification_id = result.get("notification_id") or in_app_notification_id
                 except Exception as e:
                     logger.error(f"Ошибка при создании in-app уведомления (fallback)", extra={
                         "user_id": user_id,
                         "error": str(e)
                     }, exc_info=True)
         
+        if queued_channels:
+            self._enqueue_deliveries(
+                user_id=user_id,
+                channels=queued_channels,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                notification_id=in_app_notification_id,
+                delivery_status=delivery_status
+            )
+        
         logger.info(f"Завершение send_notification для user_id={user_id}", extra={
             "user_id": user_id,
             "delivery_status": delivery_status,
@@ -552,6 +654,44 @@ class NotificationService:
             "channels_used": channels
         }
     
+    def _enqueue_deliveries(
+        self,
+        user_id: int,
+        channels: List[str],
+        title: str,
+        message: str,
+        notification_type: str,
+        notification_id: Optional[int],
+        delivery_status: Dict[str, str]
+    ) -> None:
+        """
+        Сохранение задач доставки по внешним каналам и пробуждение воркеров
+        """
+        from app.services.notification_delivery_service import NotificationDeliveryService
+        
+        try:
+            NotificationDeliveryRepository(self.db).enqueue(
+                user_id=user_id,
+                channels=channels,
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                notification_id=notification_id
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error("Ошибка при постановке уведомления в очередь доставки", extra={
+                "user_id": user_id,
+                "channels": channels,
+                "error": str(e)
+            }, exc_info=True)
+            for channel_name in channels:
+                delivery_status[channel_name] = "error"
+            return
+        
+        NotificationDeliveryService.get_instance().wake(channels)
+    
     def get_notifications(
         self,
         user_id: int,
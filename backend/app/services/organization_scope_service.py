@@ -0,0 +1,98 @@
+"""
+Кэш областей видимости пользователей по организациям
+
+Список доступных организаций нужен почти каждому запросу со списками данных.
+Он кэшируется в памяти процесса на organization_scope_cache_ttl секунд вместе
+с версиями области видимости из Redis (общая версия и версия пользователя).
+Изменение организаций, назначений пользователей и самих пользователей
+увеличивает версию, и все процессы перечитывают область при следующем запросе.
+Без Redis сбросить кэш в других процессах нельзя, поэтому он не используется.
+"""
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import Organization, User, user_organizations
+from app.services.cache_service import CacheService
+from app.utils.organization_scope import normalize_organization_ids
+
+# Движок БД -> {(ID пользователя, суперпользователь): (момент устаревания, версии, ID организаций)}
+_scope_cache: "weakref.WeakKeyDictionary[Any, Dict[Tuple[int, bool], Tuple[float, tuple, tuple]]]" = weakref.WeakKeyDictionary()
+_scope_cache_lock = threading.Lock()
+
+# Счетчики версий в Redis: общий (организации) и на пользователя (назначения)
+_SCOPE_VERSION_KEY = "organization_scope:version"
+_USER_SCOPE_VERSION_KEY = "organization_scope:user:{user_id}:version"
+
+
+def _scope_versions(user_id: int) -> Optional[tuple]:
+    """
+    Текущие версии области видимости пользователя (None - Redis недоступен)
+    """
+    counters = CacheService.get_instance().get_counters([
+        _SCOPE_VERSION_KEY, _USER_SCOPE_VERSION_KEY.format(user_id=user_id)
+    ])
+    return tuple(counters) if counters is not None else None
+
+
+def get_user_organization_scope(db: Session, user: User) -> List[int]:
+    """
+    ID активных организаций, к которым у пользователя есть доступ
+    (суперпользователю доступны все активные организации)
+    """
+    ttl = get_settings().organization_scope_cache_ttl
+    if ttl <= 0 or user.id is None:
+        return list(_load_scope(db, user))
+
+    # Версии читаются до загрузки области: сброс во время загрузки не потеряется
+    versions = _scope_versions(user.id)
+    if versions is None:
+        return list(_load_scope(db, user))
+
+    engine = db.get_bind()
+    key = (user.id, bool(user.is_superuser))
+    cached = _scope_cache.get(engine, {}).get(key)
+    if cached is not None and cached[0] > time.monotonic() and cached[1] == versions:
+        return list(cached[2])
+
+    organization_ids = _load_scope(db, user)
+    with _scope_cache_lock:
+        _scope_cache.setdefault(engine, {})[key] = (time.monotonic() + ttl, versions, organization_ids)
+    return list(organization_ids)
+
+
+def _load_scope(db: Session, user: User) -> tuple:
+    query = select(Organization.id).where(Organization.is_active == True)
+    if not user.is_superuser:
+        query = query.join(
+            user_organizations, user_organizations.c.organization_id == Organization.id
+        ).where(user_organizations.c.user_id == user.id)
+    return normalize_organization_ids(db.execute(query).scalars())
+
+
+def invalidate_organization_scopes(user_id: Optional[int] = None) -> None:
+    """
+    Сброс кэша областей видимости во всех процессах (через версию в Redis)
+
+    Args:
+        user_id: Пользователь (если не указан - сбрасываются области всех
+            пользователей, например при изменении организации)
+    """
+    cache = CacheService.get_instance()
+    if user_id is None:
+        cache.incr(_SCOPE_VERSION_KEY)
+    else:
+        cache.incr(_USER_SCOPE_VERSION_KEY.format(user_id=user_id))
+
+    with _scope_cache_lock:
+        for scopes in _scope_cache.values():
+            if user_id is None:
+                scopes.clear()
+            else:
+                for key in [key for key in scopes if key[0] == user_id]:
+                    del scopes[key]
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, List, Tuple
 from app.repositories.organization_repository import OrganizationRepository
 from app.models import Organization, User
+from app.services.organization_scope_service import invalidate_organization_scopes
 from app.logger import logger
 
 
@@ -72,7 +73,7 @@ class OrganizationService:
         if existing:
             raise ValueError(f"Организация с кодом '{code}' уже существует")
         
-        return self.organization_repo.create(
+        organization = self.organization_repo.create(
             name=name,
             code=code,
             description=description,
@@ -92,6 +93,8 @@ class OrganizationService:
             bank_correspondent_account=bank_correspondent_account,
             is_active=is_active
         )
+        invalidate_organization_scopes()
+        return organization
     
     def update_organization(
         self,
@@ -124,7 +127,7 @@ class OrganizationService:
             if existing and existing.id != organization_id:
                 raise ValueError(f"Организация с кодом '{code}' уже существует")
         
-        return self.organization_repo.update(
+        organization = self.organization_repo.update(
             organization_id=organization_id,
             name=name,
             code=code,
@@ -145,18 +148,24 @@ class OrganizationService:
             bank_correspondent_account=bank_correspondent_account,
             is_active=is_active
         )
+        invalidate_organization_scopes()
+        return organization
     
     def delete_organization(self, organization_id: int) -> bool:
         """
         Удаление организации
         """
-        return self.organization_repo.delete(organization_id)
+        deleted = self.organization_repo.delete(organization_id)
+        invalidate_organization_scopes()
+        return deleted
     
     def assign_organizations_to_user(self, user_id: int, organization_ids: List[int]) -> bool:
         """
         Назначение организаций пользователю
         """
-        return self.organization_repo.assign_to_user(user_id, organization_ids)
+        assigned = self.organization_repo.assign_to_user(user_id, organization_ids)
+        invalidate_organization_scopes(user_id)
+        return assigned
     
     def get_user_organizations(self, user_id: int) -> List[Organization]:
         """
@@ -0,0 +1,345 @@
+"""
+Сервис обслуживания секционированных по времени таблиц
+
+В PostgreSQL таблицы секционированы по месяцам (RANGE по колонке времени),
+секции называются <таблица>_pYYYYMM, плюс секция DEFAULT для выпадающих значений.
+Сервис заранее создает будущие секции и удаляет устаревшие целиком,
+что заменяет массовый DELETE и не вызывает разрастания таблиц.
+Для остальных СУБД (SQLite в тестах) срок хранения применяется обычным DELETE.
+"""
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.logger import logger
+
+# Секционированные таблицы: колонка секционирования, настройка срока хранения
+# и ссылки из других таблиц, которые обнуляются перед удалением секции
+PARTITIONED_TABLES: Dict[str, Dict] = {
+    "vehicle_locations": {
+        "time_column": "timestamp",
+        "retention_setting": "vehicle_locations_retention_months",
+        "dependents": [],
+    },
+    "vehicle_refuels": {
+        "time_column": "refuel_date",
+        "retention_setting": "vehicle_refuels_retention_months",
+        "dependents": [("fuel_card_analysis_results", "refuel_id")],
+    },
+    "system_logs": {
+        "time_column": "created_at",
+        "retention_setting": "system_logs_retention_months",
+        "dependents": [],
+    },
+    "user_action_logs": {
+        "time_column": "created_at",
+        "retention_setting": "user_action_logs_retention_months",
+        "dependents": [],
+    },
+}
+
+_BOUND_PATTERN = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def add_months(value: date, months: int) -> date:
+    """
+    Первое число месяца, отстоящего от value на months месяцев
+    """
+    month_index = value.year * 12 + (value.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month_start: date) -> str:
+    """
+    Имя месячной секции таблицы
+    """
+    return f"{table}_p{month_start:%Y%m}"
+
+
+class PartitionService:
+    """
+    Создание, просмотр и удаление месячных секций
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _spec(self, table: str) -> Dict:
+        if table not in PARTITIONED_TABLES:
+            raise ValueError(f"Таблица {table} не поддерживает секционирование")
+        return PARTITIONED_TABLES[table]
+
+    def is_supported(self) -> bool:
+        """
+        Поддерживается ли секционирование текущей СУБД
+        """
+        return self.db.get_bind().dialect.name == "postgresql"
+
+    def is_partitioned(self, table: str) -> bool:
+        """
+        Проверка, что таблица в БД действительно секционирована
+        """
+        if not self.is_supported():
+            return False
+        row = self.db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = :table AND c.relnamespace = 'public'::regnamespace"
+        ), {"table": table}).first()
+        return row is not None
+
+    def list_partitions(self, table: str) -> List[Dict]:
+        """
+        Список секций таблицы с границами и оценкой количества строк
+
+        Returns:
+            Список словарей: name, range_from, range_to, is_default, estimated_rows
+        """
+        self._spec(table)
+        if not self.is_partitioned(table):
+            return []
+
+        rows = self.db.execute(text(
+            "SELECT child.relname AS name, "
+            "       pg_get_expr(child.relpartbound, child.oid) AS bound, "
+            "       child.reltuples::bigint AS estimated_rows "
+            "FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = :table AND parent.relnamespace = 'public'::regnamespace "
+            "ORDER BY child.relname"
+        ), {"table": table}).all()
+
+        partitions = []
+        for row in rows:
+            match = _BOUND_PATTERN.search(row.bound or "")
+            partitions.append({
+                "name": row.name,
+                "range_from": datetime.fromisoformat(match.group(1)).date() if match else None,
+                "range_to": datetime.fromisoformat(match.group(2)).date() if match else None,
+                "is_default": (row.bound or "").strip().upper() == "DEFAULT",
+                "estimated_rows": max(int(row.estimated_rows or 0), 0),
+            })
+        return partitions
+
+    def estimate_rows(self, table: str) -> int:
+        """
+        Количество строк таблицы без полного сканирования
+
+        В PostgreSQL - оценка по pg_class.reltuples (сумма по секциям для
+        секционированной таблицы), для остальных СУБД - точный COUNT(*)
+        """
+        self._spec(table)
+        if not self.is_supported():
+            return self.db.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar() or 0
+        if self.is_partitioned(table):
+            return sum(partition["estimated_rows"] for partition in self.list_partitions(table))
+        estimated = self.db.execute(text(
+            "SELECT reltuples::bigint FROM pg_class "
+            "WHERE relname = :table AND relnamespace = 'public'::regnamespace"
+        ), {"table": table}).scalar()
+        return max(int(estimated or 0), 0)
+
+    def ensure_partitions(
+        self,
+        table: str,
+        months_ahead: Optional[int] = None,
+        start: Optional[date] = None
+    ) -> List[str]:
+        """
+        Создание месячных секций от start (по умолчанию текущий месяц) на months_ahead месяцев вперед
+
+        Returns:
+            Имена созданных секций
+        """
+        self._spec(table)
+        if not self.is_partitioned(table):
+            return []
+
+        if months_ahead is None:
+            months_ahead = get_settings().partition_months_ahead
+        first_month = add_months(start or date.today(), 0)
+        partitions = self.list_partitions(table)
+        existing = {p["name"] for p in partitions}
+        default_partition = next((p["name"] for p in partitions if p["is_default"]), None)
+
+        created = []
+        for offset in range(months_ahead + 1):
+            month_start = add_months(first_month, offset)
+            name = partition_name(table, month_start)
+            if name in existing:
+                continue
+            # Каждый месяц в своей транзакции: ошибка одного месяца не мешает остальным
+            try:
+                self._create_month_partition(table, name, month_start, default_partition)
+                self.db.commit()
+                created.append(name)
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Ошибка создания секции {name}: {e}", extra={
+                    "table": table,
+                    "partition": name,
+                    "error": str(e)
+                }, exc_info=True)
+
+        if created:
+            logger.info("Созданы секции таблицы", extra={"table": table, "partitions": created})
+        return created
+
+    def _create_month_partition(
+        self,
+        table: str,
+        name: str,
+        month_start: date,
+        default_partition: Optional[str]
+    ) -> None:
+        """
+        Создание месячной секции
+
+        Если в секции DEFAULT уже есть строки этого месяца (загруженная задним
+        числом история, метки времени дальше months_ahead), PostgreSQL не даст
+        создать секцию: DEFAULT отсоединяется, секция создается, строки
+        переносятся в нее, DEFAULT присоединяется обратно
+        """
+        time_column = self._spec(table)["time_column"]
+        month_end = add_months(month_start, 1)
+        bounds = f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+        params = {
+            "range_from": datetime.combine(month_start, datetime.min.time()),
+            "range_to": datetime.combine(month_end, datetime.min.time()),
+        }
+        in_range = f'"{time_column}" >= :range_from AND "{time_column}" < :range_to'
+
+        has_default_rows = default_partition is not None and self.db.execute(text(
+            f'SELECT 1 FROM "{default_partition}" WHERE {in_range} LIMIT 1'
+        ), params).first() is not None
+        if not has_default_rows:
+            self.db.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" {bounds}'))
+            return
+
+        self.db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default_partition}"'))
+        self.db.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{table}" {bounds}'))
+        moved = self.db.execute(text(
+            f'WITH moved AS (DELETE FROM "{default_partition}" WHERE {in_range} RETURNING *) '
+            f'INSERT INTO "{table}" SELECT * FROM moved'
+        ), params).rowcount
+        self.db.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default_partition}" DEFAULT'))
+        logger.info("Строки перенесены из секции DEFAULT в новую секцию", extra={
+            "table": table,
+            "partition": name,
+            "rows_moved": moved
+        })
+
+    def drop_partitions_before(self, table: str, cutoff: date, dry_run: bool = False) -> List[str]:
+        """
+        Удаление секций, целиком лежащих раньше cutoff
+
+        Перед удалением секции обнуляются ссылки на ее строки из зависимых таблиц.
+        Для СУБД без секционирования строки удаляются обычным DELETE.
+
+        Returns:
+            Имена удаленных (при dry_run - подлежащих удалению) секций
+        """
+        spec = self._spec(table)
+
+        if not self.is_partitioned(table):
+            if not dry_run:
+                self._delete_rows_before(table, spec, cutoff)
+            return []
+
+        partitions = self.list_partitions(table)
+        expired = [
+            p["name"] for p in partitions
+            if not p["is_default"] and p["range_to"] is not None and p["range_to"] <= cutoff
+        ]
+        if dry_run:
+            return expired
+
+        # Строки, попавшие в секцию DEFAULT, целиком не удалить - удаляются DELETE
+        for default_partition in (p["name"] for p in partitions if p["is_default"]):
+            deleted = self._delete_rows_before(default_partition, spec, cutoff)
+            if deleted:
+                logger.info("Удалены устаревшие строки секции DEFAULT", extra={
+                    "table": table,
+                    "partition": default_partition,
+                    "rows_deleted": deleted,
+                    "cutoff": cutoff.isoformat()
+                })
+
+        for name in expired:
+            for dependent_table, dependent_column in spec["dependents"]:
+                self.db.execute(text(
+                    f'UPDATE "{dependent_table}" SET "{dependent_column}" = NULL '
+                    f'WHERE "{dependent_column}" IN (SELECT id FROM "{name}")'
+                ))
+            self.db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            self.db.execute(text(f'DROP TABLE "{name}"'))
+            self.db.commit()
+            logger.info("Удалена устаревшая секция", extra={"table": table, "partition": name, "cutoff": cutoff.isoformat()})
+        return expired
+
+    def _delete_rows_before(self, table: str, spec: Dict, cutoff: date) -> int:
+        """
+        Удаление устаревших строк для несекционированной таблицы или секции DEFAULT
+        """
+        time_column = spec["time_column"]
+        cutoff_value = datetime.combine(cutoff, datetime.min.time())
+        for dependent_table, dependent_column in spec["dependents"]:
+            self.db.execute(text(
+                f'UPDATE "{dependent_table}" SET "{dependent_column}" = NULL '
+                f'WHERE "{dependent_column}" IN (SELECT id FROM "{table}" WHERE "{time_column}" < :cutoff)'
+            ), {"cutoff": cutoff_value})
+        result = self.db.execute(
+            text(f'DELETE FROM "{table}" WHERE "{time_column}" < :cutoff'),
+            {"cutoff": cutoff_value}
+        )
+        self.db.commit()
+        return result.rowcount or 0
+
+    def truncate(self, table: str) -> None:
+        """
+        Полная очистка таблицы (в PostgreSQL - TRUNCATE, без разрастания таблицы)
+        """
+        self._spec(table)
+        if self.is_supported():
+            self.db.execute(text(f'TRUNCATE TABLE "{table}"'))
+        else:
+            self.db.execute(text(f'DELETE FROM "{table}"'))
+        self.db.commit()
+
+    def apply_retention(self, table: str, retention_months: Optional[int] = None) -> List[str]:
+        """
+        Применение срока хранения: удаляются секции старше retention_months полных месяцев
+        """
+        spec = self._spec(table)
+        if retention_months is None:
+            retention_months = getattr(get_settings(), spec["retention_setting"])
+        if not retention_months or retention_months <= 0:
+            return []
+        cutoff = add_months(date.today(), -retention_months)
+        return self.drop_partitions_before(table, cutoff)
+
+    def run_maintenance(self) -> Dict[str, Dict]:
+        """
+        Плановое обслуживание всех секционированных таблиц:
+        создание будущих секций и применение срока хранения
+        """
+        report = {}
+        for table in PARTITIONED_TABLES:
+            try:
+                report[table] = {
+                    "created": self.ensure_partitions(table),
+                    "dropped": self.apply_retention(table),
+                }
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Ошибка обслуживания секций таблицы {table}: {e}", extra={
+                    "table": table,
+                    "error": str(e)
+                }, exc_info=True)
+                report[table] = {"created": [], "dropped": [], "error": str(e)}
+        return report
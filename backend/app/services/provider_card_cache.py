@@ -0,0 +1,153 @@
+"""
+Кэш ответов API провайдеров: списки карт и информация по картам
+
+Списки карт и реквизиты карт меняются редко, а запрашиваются при каждой
+загрузке транзакций, проверке карты и выполнении регламента. Ответы хранятся
+по шаблону провайдера в Redis (CacheService), при недоступном Redis - в памяти
+процесса. В ключ входит отпечаток настроек подключения шаблона, поэтому после
+смены настроек старые ответы не используются; кроме того, при изменении или
+удалении шаблона кэш очищается явно (invalidate_template).
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.logger import logger
+from app.models import ProviderTemplate
+from app.services.cache_service import CacheService
+
+CACHE_PREFIX = "provider_cards"
+
+
+class MemoryTTLCache:
+    """
+    Ограниченный по размеру кэш в памяти со сроком жизни записей
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        # Копия, как и при чтении из Redis: изменение результата не меняет кэш
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_memory_cache = MemoryTTLCache()
+
+
+def settings_fingerprint(template: ProviderTemplate) -> str:
+    """
+    Отпечаток типа и настроек подключения шаблона
+    """
+    settings = template.connection_settings
+    if not isinstance(settings, str):
+        settings = json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+    raw = f"{template.connection_type}\x1f{settings or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderCardCache:
+    """
+    Кэш списка карт и информации по картам одного шаблона провайдера
+    """
+
+    def __init__(self, template: ProviderTemplate):
+        settings = get_settings()
+        self.template_id = template.id
+        self.card_list_ttl = settings.provider_card_list_cache_ttl
+        self.card_info_ttl = settings.provider_card_info_cache_ttl
+        self._base_key = f"{template.id}:{settings_fingerprint(template)}"
+
+    @staticmethod
+    def _redis() -> Optional[CacheService]:
+        cache = CacheService.get_instance()
+        return cache if cache.is_available else None
+
+    def _get(self, key: str) -> Optional[Any]:
+        redis_cache = self._redis()
+        if redis_cache is not None:
+            return redis_cache.get(key, prefix=CACHE_PREFIX)
+        return _memory_cache.get(f"{CACHE_PREFIX}:{key}")
+
+    def _set(self, key: str, value: Any, ttl: int) -> None:
+        if ttl <= 0:
+            return
+        redis_cache = self._redis()
+        if redis_cache is not None:
+            redis_cache.set(key, value, ttl=ttl, prefix=CACHE_PREFIX)
+        else:
+            _memory_cache.set(f"{CACHE_PREFIX}:{key}", value, ttl)
+
+    def _card_info_key(self, card_number: str, flags: int) -> str:
+        return f"{self._base_key}:card:{str(card_number).strip()}:{flags}"
+
+    def get_card_list(self) -> Optional[List[Any]]:
+        if self.card_list_ttl <= 0:
+            return None
+        return self._get(f"{self._base_key}:list")
+
+    def set_card_list(self, cards: List[Any]) -> None:
+        # Пустой список не кэшируется: обычно это ошибка авторизации или API
+        if cards:
+            self._set(f"{self._base_key}:list", cards, self.card_list_ttl)
+
+    def get_card_info(self, card_number: str, flags: int) -> Optional[Dict[str, Any]]:
+        if self.card_info_ttl <= 0:
+            return None
+        return self._get(self._card_info_key(card_number, flags))
+
+    def set_card_info(self, card_number: str, flags: int, card_info: Dict[str, Any]) -> None:
+        if card_info:
+            self._set(self._card_info_key(card_number, flags), card_info, self.card_info_ttl)
+
+    @staticmethod
+    def invalidate_template(template_id: int) -> int:
+        """
+        Удаление всех закэшированных ответов шаблона
+
+        Returns:
+            Количество удаленных записей
+        """
+        deleted = _memory_cache.delete_prefix(f"{CACHE_PREFIX}:{template_id}:")
+        redis_cache = ProviderCardCache._redis()
+        if redis_cache is not None:
+            deleted += redis_cache.delete_pattern(f"{template_id}:*", prefix=CACHE_PREFIX)
+        logger.debug("Кэш карт шаблона провайдера очищен", extra={
+            "template_id": template_id,
+            "deleted": deleted
+        })
+        return deleted
@@ -133,6 +133,9 @@ class SchedulerService:
             # Добавляем задачу автоматического бэкапа БД
             self._add_backup_schedule()
             
+            # Добавляем задачу обслуживания секций таблиц телематики
+            self._add_partition_maintenance_schedule()
+            
         except Exception as e:
             logger.error("Ошибка при загрузке расписаний", extra={"error": str(e)}, exc_info=True)
         finally:
@@ -712,6 +715,64 @@ class SchedulerService:
             "event_category": "startup"
         })
     
+    def _add_partition_maintenance_schedule(self):
+        """
+        Добавить задачу обслуживания секционированных таблиц
+        (создание будущих месячных секций и удаление устаревших)
+        """
+        from app.config import get_settings
+        
+        settings = get_settings()
+        if not settings.partition_maintenance_enabled:
+            logger.info("Обслуживание секций отключено (PARTITION_MAINTENANCE_ENABLED=false)")
+            return
+        
+        job_id = "partition_maintenance"
+        
+        def run_maintenance_sync():
+            """Синхронная функция обслуживания секций"""
+            from app.services.partition_service import PartitionService
+            
+            db = SessionLocal()
+            try:
+                report = PartitionService(db).run_maintenance()
+                logger.info("Обслуживание секций выполнено", extra={
+                    "report": report,
+                    "event_type": "partitions",
+                    "event_category": "scheduled"
+                })
+            except Exception as e:
+                logger.error(f"Ошибка при обслуживании секций: {e}", extra={
+                    "event_type": "partitions",
+                    "event_category": "scheduled"
+                }, exc_info=True)
+            finally:
+                db.close()
+        
+        import asyncio
+        async def run_maintenance_async():
+            try:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, run_maintenance_sync)
+            except Exception as e:
+                logger.error(f"Ошибка в асинхронной обертке обслуживания секций: {e}", exc_info=True)
+        
+        self._scheduler.add_job(
+            func=run_maintenance_async,
+            trigger=CronTrigger(hour=settings.partition_maintenance_hour, minute=30),
+            id=job_id,
+            replace_existing=True,
+            max_instances=1,
+            misfire_grace_time=3600
+        )
+        
+        logger.info("Добавлена задача обслуживания секций", extra={
+            "job_id": job_id,
+            "schedule": f"{settings.partition_maintenance_hour:02d}:30 ежедневно",
+            "event_type": "scheduler",
+            "event_category": "startup"
+        })
+    
     def get_scheduled_jobs(self) -> Dict:
         """
         Получить список запланированных задач
@@ -0,0 +1,300 @@
+"""
+Сервис пространственного поиска АЗС и точек трека ТС
+
+Кандидаты отбираются по геохешу (ячейки сетки, покрывающие радиус поиска,
+диапазонный поиск по B-tree индексу), точные расстояния считаются
+векторно (NumPy) по формуле гаверсинуса.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+from app.models import GasStation, VehicleLocation
+from app.utils.geohash_utils import (
+    geohash_cells_for_radius,
+    geohash_encode_many,
+    precision_for_radius
+)
+from app.utils.geolocation_utils import haversine_distances, haversine_pairwise
+
+# Максимум префиксов геохеша в одном запросе (условия OR)
+CELLS_PER_QUERY = 200
+
+# Максимальный размер матрицы расстояний (точки × АЗС), обрабатываемой за раз
+PAIRWISE_CHUNK_ELEMENTS = 2_000_000
+
+# Таблицы с колонкой геохеша
+GEOHASH_MODELS = {
+    "gas_stations": GasStation,
+    "vehicle_locations": VehicleLocation,
+}
+
+
+def _chunks(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SpatialIndexService:
+    """
+    Поиск ближайших АЗС, АЗС вдоль маршрута и дубликатов АЗС по координатам
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _stations_in_cells(self, cells: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        АЗС с координатами в указанных ячейках геохеша (без загрузки ORM-объектов)
+        """
+        rows = []
+        for chunk in _chunks(sorted(set(cells)), CELLS_PER_QUERY):
+            rows.extend(self.db.query(
+                GasStation.id,
+                GasStation.latitude,
+                GasStation.longitude
+            ).filter(
+                or_(*[GasStation.geohash.like(f"{cell}%") for cell in chunk])
+            ).all())
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        lats = np.fromiter((float(row[1]) for row in rows), dtype=float, count=len(rows))
+        lons = np.fromiter((float(row[2]) for row in rows), dtype=float, count=len(rows))
+        if len(ids):
+            ids, unique_index = np.unique(ids, return_index=True)
+            lats, lons = lats[unique_index], lons[unique_index]
+        return {"id": ids, "latitude": lats, "longitude": lons}
+
+    def _describe_stations(self, station_ids: Sequence[int]) -> Dict[int, Dict]:
+        """
+        Наименования и номера АЗС для ответа
+        """
+        if not station_ids:
+            return {}
+        rows = self.db.query(
+            GasStation.id,
+            GasStation.name,
+            GasStation.azs_number,
+            GasStation.latitude,
+            GasStation.longitude
+        ).filter(GasStation.id.in_([int(station_id) for station_id in station_ids])).all()
+        return {
+            row.id: {
+                "id": row.id,
+                "name": row.name,
+                "azs_number": row.azs_number,
+                "latitude": float(row.latitude),
+                "longitude": float(row.longitude),
+            }
+            for row in rows
+        }
+
+    def nearest_stations(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float = 1000,
+        limit: int = 10
+    ) -> List[Dict]:
+        """
+        Ближайшие к точке АЗС в радиусе radius_meters, по возрастанию расстояния
+        """
+        stations = self._stations_in_cells(geohash_cells_for_radius(latitude, longitude, radius_meters))
+        if not len(stations["id"]):
+            return []
+
+        distances = haversine_distances(latitude, longitude, stations["latitude"], stations["longitude"])
+        inside = np.flatnonzero(distances <= radius_meters)
+        order = inside[np.argsort(distances[inside], kind="stable")][:limit]
+
+        described = self._describe_stations(stations["id"][order].tolist())
+        return [
+            {**described[int(stations["id"][i])], "distance_meters": round(float(distances[i]), 1)}
+            for i in order
+            if int(stations["id"][i]) in described
+        ]
+
+    def stations_near_path(
+        self,
+        latitudes: Sequence[float],
+        longitudes: Sequence[float],
+        radius_meters: float = 500
+    ) -> List[Dict]:
+        """
+        АЗС, к которым маршрут (последовательность точек) приближался на radius_meters
+
+        Returns:
+            Список словарей: id АЗС, минимальное расстояние, индекс ближайшей точки маршрута
+        """
+        lats = np.asarray(latitudes, dtype=float)
+        lons = np.asarray(longitudes, dtype=float)
+        if not len(lats):
+            return []
+
+        precision = precision_for_radius(radius_meters, float(np.nanmax(np.abs(lats))))
+        # Соседние ячейки вычисляются по одной точке на каждую ячейку маршрута
+        first_point_in_cell: Dict[str, int] = {}
+        for index, cell in enumerate(geohash_encode_many(lats, lons, precision)):
+            if cell is not None and cell not in first_point_in_cell:
+                first_point_in_cell[cell] = index
+        cells = set()
+        for index in first_point_in_cell.values():
+            cells.update(geohash_cells_for_radius(float(lats[index]), float(lons[index]), radius_meters, precision))
+        stations = self._stations_in_cells(sorted(cells))
+        if not len(stations["id"]):
+            return []
+
+        best_distance = np.full(len(stations["id"]), np.inf)
+        best_point = np.zeros(len(stations["id"]), dtype=np.int64)
+        points_per_chunk = max(PAIRWISE_CHUNK_ELEMENTS // len(stations["id"]), 1)
+        for start in range(0, len(lats), points_per_chunk):
+            matrix = haversine_pairwise(
+                lats[start:start + points_per_chunk], lons[start:start + points_per_chunk],
+                stations["latitude"], stations["longitude"]
+            )
+            chunk_best = matrix.argmin(axis=0)
+            chunk_distance = matrix[chunk_best, np.arange(matrix.shape[1])]
+            improved = chunk_distance < best_distance
+            best_distance[improved] = chunk_distance[improved]
+            best_point[improved] = chunk_best[improved] + start
+
+        inside = np.flatnonzero(best_distance <= radius_meters)
+        inside = inside[np.argsort(best_distance[inside], kind="stable")]
+        return [
+            {
+                "station_id": int(stations["id"][i]),
+                "distance_meters": round(float(best_distance[i]), 1),
+                "point_index": int(best_point[i]),
+            }
+            for i in inside
+        ]
+
+    def stations_near_vehicle_route(
+        self,
+        vehicle_id: int,
+        date_from: datetime,
+        date_to: datetime,
+        radius_meters: float = 500
+    ) -> List[Dict]:
+        """
+        АЗС, мимо которых проезжало ТС за период, с временем наибольшего сближения
+        """
+        track = self.db.query(
+            VehicleLocation.timestamp,
+            VehicleLocation.latitude,
+            VehicleLocation.longitude
+        ).filter(
+            VehicleLocation.vehicle_id == vehicle_id,
+            VehicleLocation.timestamp >= date_from,
+            VehicleLocation.timestamp <= date_to
+        ).order_by(VehicleLocation.timestamp).all()
+        if not track:
+            return []
+
+        matches = self.stations_near_path(
+            [float(point.latitude) for point in track],
+            [float(point.longitude) for point in track],
+            radius_meters
+        )
+        described = self._describe_stations([match["station_id"] for match in matches])
+        return [
+            {
+                **described[match["station_id"]],
+                "distance_meters": match["distance_meters"],
+                "closest_at": track[match["point_index"]].timestamp,
+            }
+            for match in matches
+            if match["station_id"] in described
+        ]
+
+    def find_duplicate_stations(self, radius_meters: float = 50) -> List[Dict]:
+        """
+        Пары АЗС, координаты которых совпадают с точностью до radius_meters
+        (кандидаты на объединение)
+        """
+        rows = self.db.query(
+            GasStation.id,
+            GasStation.latitude,
+            GasStation.longitude
+        ).filter(
+            GasStation.latitude.isnot(None),
+            GasStation.longitude.isnot(None)
+        ).order_by(GasStation.id).all()
+        if len(rows) < 2:
+            return []
+
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        lats = np.array([float(row[1]) for row in rows])
+        lons = np.array([float(row[2]) for row in rows])
+
+        # Группировка по ячейкам, размер которых не меньше радиуса
+        precision = precision_for_radius(radius_meters, float(np.max(np.abs(lats))))
+        station_cells = geohash_encode_many(lats, lons, precision)
+        by_cell: Dict[str, List[int]] = {}
+        for index, cell in enumerate(station_cells):
+            by_cell.setdefault(cell, []).append(index)
+
+        pairs = []
+        for members in by_cell.values():
+            first = members[0]
+            neighbours = set()
+            for neighbour_cell in geohash_cells_for_radius(
+                float(lats[first]), float(lons[first]), radius_meters, precision
+            ):
+                neighbours.update(by_cell.get(neighbour_cell, []))
+            candidates = np.array(sorted(neighbours), dtype=np.int64)
+            for index in members:
+                others = candidates[candidates > index]
+                if not len(others):
+                    continue
+                distances = haversine_distances(lats[index], lons[index], lats[others], lons[others])
+                for other, distance in zip(others[distances <= radius_meters], distances[distances <= radius_meters]):
+                    pairs.append({
+                        "station_id": int(ids[index]),
+                        "duplicate_id": int(ids[other]),
+                        "distance_meters": round(float(distance), 1),
+                    })
+
+        pairs.sort(key=lambda pair: (pair["distance_meters"], pair["station_id"], pair["duplicate_id"]))
+        return pairs
+
+    def backfill_geohash(self, table: str, batch_size: int = 10000, limit: Optional[int] = None) -> int:
+        """
+        Заполнение геохеша для записей с координатами, у которых он не вычислен
+
+        Returns:
+            Количество обновленных записей
+        """
+        if table not in GEOHASH_MODELS:
+            raise ValueError(f"Таблица {table} не содержит геохеша")
+        model = GEOHASH_MODELS[table]
+
+        updated = 0
+        last_id = 0
+        while limit is None or updated < limit:
+            rows = self.db.query(model.id, model.latitude, model.longitude).filter(
+                model.id > last_id,
+                model.geohash.is_(None),
+                model.latitude.isnot(None),
+                model.longitude.isnot(None)
+            ).order_by(model.id).limit(batch_size if limit is None else min(batch_size, limit - updated)).all()
+            if not rows:
+                break
+
+            hashes = geohash_encode_many([float(row[1]) for row in rows], [float(row[2]) for row in rows])
+            table_obj = model.__table__
+            self.db.execute(
+                update(table_obj)
+                .where(table_obj.c.id == bindparam("row_id"))
+                .values(geohash=bindparam("new_geohash")),
+                [{"row_id": row[0], "new_geohash": value} for row, value in zip(rows, hashes)]
+            )
+            self.db.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+            logger.debug("Геохеш заполнен для пакета записей", extra={"table": table, "updated": updated})
+        return updated
@@ -0,0 +1,340 @@
+"""
+Сервис потоковой загрузки данных телематики (местоположения и заправки ТС)
+
+Тело запроса в формате NDJSON или CSV читается построчно, строки собираются
+в пакеты, каждый пакет валидируется векторно средствами pandas и записывается
+в БД одной операцией COPY с пропуском уже загруженных записей
+"""
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import DateTime, Integer, Numeric, String, select
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+from app.models import Vehicle, VehicleLocation, VehicleRefuel
+from app.repositories import VehicleLocationRepository, VehicleRefuelRepository
+
+INGEST_FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+
+# Типы содержимого, по которым определяется формат, если он не указан явно
+_CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+    "text/csv": "csv",
+    "application/csv": "csv",
+}
+
+# Смещение часового пояса в конце ISO-строки. Колонки времени хранятся без пояса,
+# поэтому, как и при загрузке через JSON, сохраняется локальное время источника
+_TZ_SUFFIX_PATTERN = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+INGEST_TARGETS = {
+    "locations": {
+        "model": VehicleLocation,
+        "repository": VehicleLocationRepository,
+        "time_column": "timestamp",
+        "columns": (
+            "vehicle_id", "timestamp", "latitude", "longitude",
+            "speed", "heading", "accuracy", "source",
+        ),
+        "defaults": {"source": "GLONASS"},
+        "ranges": {"latitude": (-90, 90), "longitude": (-180, 180)},
+    },
+    "refuels": {
+        "model": VehicleRefuel,
+        "repository": VehicleRefuelRepository,
+        "time_column": "refuel_date",
+        "columns": (
+            "vehicle_id", "refuel_date", "fuel_type", "quantity",
+            "fuel_level_before", "fuel_level_after", "odometer_reading",
+            "source_system", "source_id", "latitude", "longitude", "location_accuracy",
+        ),
+        "defaults": {},
+        "ranges": {"latitude": (-90, 90), "longitude": (-180, 180), "quantity": (0, None)},
+    },
+}
+
+
+def resolve_ingest_format(content_type: Optional[str], explicit_format: Optional[str] = None) -> str:
+    """
+    Определение формата тела запроса по явному параметру или заголовку Content-Type
+
+    Raises:
+        ValueError: если формат не поддерживается
+    """
+    if explicit_format:
+        fmt = explicit_format.strip().lower()
+        if fmt not in INGEST_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат '{explicit_format}'. Допустимые значения: {', '.join(INGEST_FORMATS)}")
+        return fmt
+
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if not media_type:
+        return "ndjson"
+    if media_type not in _CONTENT_TYPE_FORMATS:
+        raise ValueError(f"Неподдерживаемый Content-Type '{content_type}'. Используйте application/x-ndjson или text/csv")
+    return _CONTENT_TYPE_FORMATS[media_type]
+
+
+class TelematicsIngestService:
+    """
+    Высокопроизводительная загрузка местоположений и заправок ТС
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._known_vehicle_ids: Set[int] = set()
+        self._unknown_vehicle_ids: Set[int] = set()
+
+    async def ingest(
+        self,
+        target: str,
+        chunks: AsyncIterator[bytes],
+        fmt: str = "ndjson",
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> Dict:
+        """
+        Потоковая загрузка данных из тела запроса
+
+        Args:
+            target: Тип данных ("locations" или "refuels")
+            chunks: Асинхронный итератор байтов тела запроса
+            fmt: Формат данных ("ndjson" или "csv")
+            batch_size: Количество строк в пакете валидации и записи
+
+        Returns:
+            Словарь со счетчиками: received, inserted, duplicates, invalid и errors
+        """
+        if target not in INGEST_TARGETS:
+            raise ValueError(f"Неизвестный тип данных телематики: {target}")
+        if fmt not in INGEST_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат: {fmt}")
+
+        spec = INGEST_TARGETS[target]
+        stats = {"received": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "errors": []}
+        header: Optional[List[str]] = None
+        batch: List[Tuple[int, str]] = []
+        line_number = 0
+        pending = b""
+
+        async for piece in chunks:
+            if not piece:
+                continue
+            pending += piece
+            *complete, pending = pending.split(b"\n")
+            for raw_line in complete:
+                line_number += 1
+                line = self._decode_line(raw_line, line_number)
+                if not line:
+                    continue
+                if fmt == "csv" and header is None:
+                    header = self._parse_csv_header(line)
+                    continue
+                batch.append((line_number, line))
+                if len(batch) >= batch_size:
+                    self._process_batch(spec, batch, fmt, header, stats)
+                    batch = []
+
+        if pending:
+            line_number += 1
+            line = self._decode_line(pending, line_number)
+            if line:
+                if fmt == "csv" and header is None:
+                    header = self._parse_csv_header(line)
+                else:
+                    batch.append((line_number, line))
+        if batch:
+            self._process_batch(spec, batch, fmt, header, stats)
+
+        logger.info("Потоковая загрузка телематики завершена", extra={
+            "target": target,
+            "format": fmt,
+            "received": stats["received"],
+            "inserted": stats["inserted"],
+            "duplicates": stats["duplicates"],
+            "invalid": stats["invalid"]
+        })
+        return stats
+
+    @staticmethod
+    def _decode_line(raw_line: bytes, line_number: int) -> str:
+        """
+        Декодирование строки тела запроса с удалением BOM и перевода строки
+        """
+        line = raw_line.decode("utf-8", errors="replace")
+        if line_number == 1:
+            line = line.lstrip("\ufeff")
+        return line.strip()
+
+    @staticmethod
+    def _parse_csv_header(line: str) -> List[str]:
+        """
+        Разбор строки заголовка CSV
+        """
+        return [name.strip().lower() for name in next(csv.reader([line]))]
+
+    def _process_batch(
+        self,
+        spec: Dict,
+        batch: List[Tuple[int, str]],
+        fmt: str,
+        header: Optional[List[str]],
+        stats: Dict
+    ) -> None:
+        """
+        Разбор, валидация и запись одного пакета строк
+        """
+        stats["received"] += len(batch)
+        errors: List[Dict] = []
+
+        if fmt == "csv":
+            frame = self._csv_batch_to_frame(batch, header or [], errors)
+        else:
+            frame = self._ndjson_batch_to_frame(batch, errors)
+
+        frame = self._validate_frame(spec, frame, errors)
+
+        before_dedup = len(frame)
+        frame = frame.drop_duplicates(subset=["vehicle_id", spec["time_column"]], keep="first")
+        in_batch_duplicates = before_dedup - len(frame)
+
+        inserted = spec["repository"](self.db).bulk_insert(frame) if not frame.empty else 0
+
+        stats["inserted"] += inserted
+        stats["duplicates"] += in_batch_duplicates + (len(frame) - inserted)
+        stats["invalid"] += len(errors)
+        free_slots = MAX_REPORTED_ERRORS - len(stats["errors"])
+        if free_slots > 0:
+            stats["errors"].extend(errors[:free_slots])
+
+    @staticmethod
+    def _ndjson_batch_to_frame(batch: List[Tuple[int, str]], errors: List[Dict]) -> pd.DataFrame:
+        """
+        Разбор пакета NDJSON-строк в DataFrame (индекс - номер строки)
+        """
+        records = []
+        row_numbers = []
+        for line_number, line in batch:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                errors.append({"row": line_number, "error": f"Некорректный JSON: {e.msg}"})
+                continue
+            if not isinstance(record, dict):
+                errors.append({"row": line_number, "error": "Ожидается JSON-объект"})
+                continue
+            records.append({str(key).lower(): value for key, value in record.items()})
+            row_numbers.append(line_number)
+        return pd.DataFrame.from_records(records, index=pd.Index(row_numbers, dtype="int64"))
+
+    @staticmethod
+    def _csv_batch_to_frame(
+        batch: List[Tuple[int, str]],
+        header: List[str],
+        errors: List[Dict]
+    ) -> pd.DataFrame:
+        """
+        Разбор пакета CSV-строк в DataFrame (индекс - номер строки)
+        """
+        rows = []
+        row_numbers = []
+        parsed = csv.reader(line for _, line in batch)
+        for (line_number, _), values in zip(batch, parsed):
+            if len(values) != len(header):
+                errors.append({
+                    "row": line_number,
+                    "error": f"Ожидается {len(header)} колонок, получено {len(values)}"
+                })
+                continue
+            rows.append(values)
+            row_numbers.append(line_number)
+        return pd.DataFrame(rows, columns=header, index=pd.Index(row_numbers, dtype="int64"))
+
+    def _validate_frame(self, spec: Dict, frame: pd.DataFrame, errors: List[Dict]) -> pd.DataFrame:
+        """
+        Векторная валидация и приведение типов пакета
+
+        Ограничения (обязательность, длина строк, точность чисел) берутся
+        из описания колонок модели, поэтому COPY не падает на отдельных строках.
+        Невалидные строки попадают в errors и исключаются из результата
+        """
+        table = spec["model"].__table__
+        result = pd.DataFrame(index=frame.index)
+        reasons = pd.Series("", index=frame.index, dtype=object)
+
+        def reject(mask: pd.Series, message: str) -> None:
+            mask = mask & (reasons == "")
+            reasons[mask] = message
+
+        for name in spec["columns"]:
+            column = table.c[name]
+            if name in frame.columns:
+                raw = frame[name]
+            else:
+                raw = pd.Series(np.nan, index=frame.index, dtype=object)
+            as_text = raw.astype(str).str.strip()
+            present = raw.notna() & (as_text != "") & (as_text.str.lower() != "null")
+
+            if name in spec["defaults"]:
+                raw = raw.where(present, spec["defaults"][name])
+                as_text = as_text.where(present, str(spec["defaults"][name]))
+                present = pd.Series(True, index=frame.index)
+
+            if not column.nullable:
+                reject(~present, f"Не заполнено обязательное поле {name}")
+
+            if isinstance(column.type, DateTime):
+                cleaned = as_text.where(present).str.replace(_TZ_SUFFIX_PATTERN, "", regex=True)
+                values = pd.to_datetime(cleaned, errors="coerce", format="ISO8601")
+                reject(present & values.isna(), f"Некорректная дата в поле {name}")
+            elif isinstance(column.type, (Integer, Numeric)):
+                values = pd.to_numeric(raw.where(present), errors="coerce")
+                reject(present & values.isna(), f"Некорректное число в поле {name}")
+                if isinstance(column.type, Integer):
+                    reject(present & values.notna() & (values % 1 != 0), f"Ожидается целое число в поле {name}")
+                else:
+                    precision, scale = column.type.precision, column.type.scale
+                    if precision is not None and scale is not None:
+                        reject(values.abs() >= 10 ** (precision - scale), f"Значение поля {name} вне допустимого диапазона")
+                low, high = spec["ranges"].get(name, (None, None))
+                if low is not None:
+                    reject(values < low, f"Значение поля {name} меньше {low}")
+                if high is not None:
+                    reject(values > high, f"Значение поля {name} больше {high}")
+            else:
+                values = as_text.where(present, None)
+                if isinstance(column.type, String) and column.type.length:
+                    reject(values.str.len() > column.type.length, f"Длина поля {name} превышает {column.type.length} символов")
+
+            result[name] = values
+
+        self._reject_unknown_vehicles(result["vehicle_id"], reject)
+
+        invalid = reasons != ""
+        for row_number, message in reasons[invalid].items():
+            errors.append({"row": int(row_number), "error": message})
+
+        valid = result[~invalid].copy()
+        valid["vehicle_id"] = valid["vehicle_id"].astype("int64")
+        return valid
+
+    def _reject_unknown_vehicles(self, vehicle_ids: pd.Series, reject) -> None:
+        """
+        Проверка существования ТС одним запросом на пакет (с кэшем между пакетами)
+        """
+        candidates = {int(value) for value in vehicle_ids.dropna().unique() if float(value).is_integer()}
+        unchecked = candidates - self._known_vehicle_ids - self._unknown_vehicle_ids
+        if unchecked:
+            found = set(self.db.execute(select(Vehicle.id).where(Vehicle.id.in_(unchecked))).scalars())
+            self._known_vehicle_ids.update(found)
+            self._unknown_vehicle_ids.update(unchecked - found)
+        if self._unknown_vehicle_ids:
+            reject(vehicle_ids.isin(list(self._unknown_vehicle_ids)), "Транспортное средство не найдено")
@@ -0,0 +1,459 @@
+"""
+Индекс сигнатур заголовков шаблонов для автоопределения провайдера и шаблона
+
+detect_provider_and_template сравнивает колонки загружаемого файла с маппингом
+каждого активного шаблона. Чтобы не разбирать JSON маппингов и не оценивать
+все шаблоны при каждой загрузке, для шаблонов строится индекс:
+
+- сигнатура шаблона - нормализованный набор колонок маппинга и его хэш;
+- обратный индекс "колонка -> шаблоны" для расчета коэффициента Жаккара;
+- запомненные результаты определения по хэшу заголовка файла.
+
+Порядок поиска: запомненный результат для такого же заголовка, затем шаблоны
+с совпадающей сигнатурой и top-k по Жаккару. Остальные шаблоны оцениваются,
+только если их верхняя граница оценки (точные совпадения по множеству колонок,
+для прочих полей - частичное совпадение) не ниже лучшего кандидата; если среди
+кандидатов нет уверенного совпадения - полная оценка всех шаблонов. Результат
+совпадает с полным перебором. Индекс строится один раз
+на процесс и движок БД, перестраивается при изменении шаблонов и провайдеров
+(invalidate_template_index) или их количества и не живет дольше
+template_index_ttl.
+
+Здесь же - кэш результатов анализа структуры файла по хэшу содержимого:
+проверка соответствия (/transactions/check-match) и последующая загрузка того
+же файла анализируют его один раз.
+"""
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.logger import logger
+from app.models import Provider, ProviderTemplate
+from app.services.cache_service import CacheService
+
+# Минимальная оценка уверенного совпадения (как в detect_provider_and_template)
+CONFIDENT_MATCH_SCORE = 30
+JACCARD_TOP_K = 5
+MAX_REMEMBERED_DETECTIONS = 1024
+
+FILE_ANALYSIS_PREFIX = "file_analysis"
+MAX_LOCAL_FILE_ANALYSES = 64
+
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_header(value: Any) -> str:
+    """
+    Нормализованное название колонки: нижний регистр, без пробелов по краям
+    и повторяющихся пробелов
+    """
+    return _SPACES_RE.sub(' ', str(value).lower().strip())
+
+
+def columns_signature(columns: Iterable[str]) -> str:
+    """
+    Хэш набора колонок (не зависит от порядка и повторов)
+    """
+    return hashlib.sha1("\x1f".join(sorted(set(columns))).encode("utf-8")).hexdigest()
+
+
+def header_key(file_columns: List[str], header_row: int) -> str:
+    """
+    Ключ заголовка файла: колонки в исходном порядке и строка заголовка
+    """
+    payload = json.dumps([header_row, file_columns], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class TemplateSignature:
+    """
+    Сигнатура активного шаблона
+    """
+    template_id: int
+    template_name: str
+    provider_id: int
+    provider_name: str
+    header_row: Optional[int]
+    mapping: Tuple[Tuple[str, str], ...]  # (поле, колонка в нижнем регистре)
+    template_columns: Tuple[Any, ...]  # Колонки маппинга как в шаблоне
+    columns: FrozenSet[str]
+    signature: str
+    order: int  # Порядок полного перебора (провайдеры, затем шаблоны)
+
+
+@dataclass(frozen=True)
+class ProviderWithoutTemplates:
+    """
+    Активный провайдер без шаблонов (определяется по упоминанию в заголовке)
+    """
+    provider_id: int
+    provider_name: str
+    provider_code: str
+    order: int
+
+
+def score_template(
+    template: TemplateSignature,
+    file_columns: List[str],
+    file_header_row: int
+) -> Tuple[int, List[str]]:
+    """
+    Оценка соответствия колонок файла шаблону
+
+    Точное совпадение колонки - 10 баллов, частичное (вхождение) - 5,
+    найденные дата/количество/топливо - еще по 5, совпадение строки
+    заголовка - 2.
+
+    Returns:
+        (оценка, найденные поля шаблона)
+    """
+    file_column_set = set(file_columns)
+    matched_fields = []
+    match_score = 0
+    for field_name, template_column in template.mapping:
+        if template_column in file_column_set:
+            matched_fields.append(field_name)
+            match_score += 10
+        else:
+            for file_col in file_columns:
+                if template_column in file_col or file_col in template_column:
+                    matched_fields.append(field_name)
+                    match_score += 5
+                    break
+
+        if field_name in ["date", "quantity", "fuel"]:
+            if field_name in matched_fields:
+                match_score += 5
+
+    if template.header_row == file_header_row:
+        match_score += 2
+    return match_score, matched_fields
+
+
+def score_upper_bound(template: TemplateSignature, file_column_set: FrozenSet[str], file_header_row: int) -> int:
+    """
+    Максимально возможная оценка score_template без поиска частичных совпадений:
+    поля без точного совпадения считаются совпавшими частично
+    """
+    bound = 0
+    for field_name, template_column in template.mapping:
+        bound += 10 if template_column in file_column_set else 5
+        if field_name in ["date", "quantity", "fuel"]:
+            bound += 5
+    if template.header_row == file_header_row:
+        bound += 2
+    return bound
+
+
+class TemplateSignatureIndex:
+    """
+    Сигнатуры активных шаблонов активных провайдеров
+    """
+
+    def __init__(self, templates: List[TemplateSignature], providers_without_templates: List[ProviderWithoutTemplates]):
+        self.templates = templates
+        self.providers_without_templates = providers_without_templates
+        self.by_signature: Dict[str, List[TemplateSignature]] = {}
+        self.by_column: Dict[str, List[TemplateSignature]] = {}
+        for template in templates:
+            self.by_signature.setdefault(template.signature, []).append(template)
+            for column in template.columns:
+                self.by_column.setdefault(column, []).append(template)
+        self.by_id: Dict[int, TemplateSignature] = {template.template_id: template for template in templates}
+        self._detections: "OrderedDict[str, Tuple[Optional[int], Optional[int], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, db: Session) -> 'TemplateSignatureIndex':
+        templates = []
+        providers_without_templates = []
+        providers = db.query(Provider).filter(Provider.is_active == True).all()
+        for provider in providers:
+            provider_templates = db.query(ProviderTemplate).filter(
+                ProviderTemplate.provider_id == provider.id,
+                ProviderTemplate.is_active == True
+            ).all()
+            if not provider_templates:
+                providers_without_templates.append(ProviderWithoutTemplates(
+                    provider_id=provider.id,
+                    provider_name=provider.name,
+                    provider_code=provider.code,
+                    order=len(templates) + len(providers_without_templates),
+                ))
+            for template in provider_templates:
+                try:
+                    mapping = json.loads(template.field_mapping) if isinstance(
+                        template.field_mapping, str
+                    ) else template.field_mapping
+                    items = tuple((field, str(column).lower().strip()) for field, column in mapping.items())
+                except Exception:
+                    continue
+                columns = frozenset(normalize_header(column) for _, column in items)
+                templates.append(TemplateSignature(
+                    template_id=template.id,
+                    template_name=template.name,
+                    provider_id=provider.id,
+                    provider_name=provider.name,
+                    header_row=template.header_row,
+                    mapping=items,
+                    template_columns=tuple(mapping.values()),
+                    columns=columns,
+                    signature=columns_signature(columns),
+                    order=len(templates) + len(providers_without_templates),
+                ))
+        return cls(templates, providers_without_templates)
+
+    def candidates(self, file_columns: List[str], file_field_mapping: Dict[str, str]) -> List[TemplateSignature]:
+        """
+        Шаблоны для первичной оценки: с сигнатурой, равной набору колонок,
+        найденных анализом файла, и top-k по коэффициенту Жаккара между
+        колонками файла и колонками шаблона
+        """
+        file_set = {normalize_header(column) for column in file_columns if column}
+        mapped = {normalize_header(column) for column in file_field_mapping.values()}
+        selected = {
+            template.template_id: template
+            for template in self.by_signature.get(columns_signature(mapped), [])
+        } if mapped else {}
+
+        intersections: Dict[int, int] = {}
+        templates: Dict[int, TemplateSignature] = {}
+        for column in file_set:
+            for template in self.by_column.get(column, ()):
+                intersections[template.template_id] = intersections.get(template.template_id, 0) + 1
+                templates[template.template_id] = template
+
+        ranked = sorted(
+            templates.values(),
+            key=lambda item: (
+                -intersections[item.template_id] / len(file_set | item.columns),
+                item.order
+            )
+        )
+        for template in ranked[:JACCARD_TOP_K]:
+            selected.setdefault(template.template_id, template)
+        return sorted(selected.values(), key=lambda item: item.order)
+
+    def best_match(
+        self,
+        file_columns: List[str],
+        file_header_row: int,
+        templates: Optional[List[TemplateSignature]] = None
+    ) -> Tuple[Optional[int], Optional[int], Dict[str, Any]]:
+        """
+        Лучший шаблон среди templates (по умолчанию - полный перебор всех
+        шаблонов и провайдеров без шаблонов в исходном порядке)
+
+        Returns:
+            (provider_id, template_id, match_info) с наибольшей оценкой;
+            при равенстве оценок побеждает первый по порядку
+        """
+        entries: List[Any] = list(templates) if templates is not None else sorted(
+            [*self.templates, *self.providers_without_templates], key=lambda item: item.order
+        )
+        best_score = 0
+        best: Tuple[Optional[int], Optional[int], Dict[str, Any]] = (None, None, {
+            "score": 0,
+            "matched_fields": [],
+            "provider_name": None,
+            "template_name": None
+        })
+        file_text = None
+        for entry in entries:
+            if isinstance(entry, ProviderWithoutTemplates):
+                # Провайдер без шаблонов засчитывается, если упомянут в колонках файла
+                if file_text is None:
+                    file_text = " ".join(file_columns).lower()
+                if entry.provider_name.lower() in file_text or entry.provider_code.lower() in file_text:
+                    if best_score < 5:
+                        best_score = 5
+                        best = (entry.provider_id, None, {
+                            "score": 5,
+                            "matched_fields": [],
+                            "provider_name": entry.provider_name,
+                            "template_name": None,
+                            "file_columns": file_columns,
+                            "template_columns": []
+                        })
+                continue
+
+            score, matched_fields = score_template(entry, file_columns, file_header_row)
+            if score > best_score:
+                best_score = score
+                best = (entry.provider_id, entry.template_id, {
+                    "score": score,
+                    "matched_fields": matched_fields,
+                    "provider_name": entry.provider_name,
+                    "template_name": entry.template_name,
+                    "file_columns": file_columns,
+                    "template_columns": list(entry.template_columns)
+                })
+        return best
+
+    def best_match_from_candidates(
+        self,
+        file_columns: List[str],
+        file_header_row: int,
+        candidates: List[TemplateSignature]
+    ) -> Tuple[Optional[int], Optional[int], Dict[str, Any]]:
+        """
+        Лучший шаблон с тем же результатом, что и полный перебор: сначала
+        оцениваются кандидаты, затем только те остальные шаблоны, которые по
+        верхней границе оценки могут обойти лучшего кандидата (или сравняться
+        с ним, стоя раньше по порядку)
+        """
+        best = self.best_match(file_columns, file_header_row, candidates)
+        best_score = best[2]["score"]
+        if best_score < CONFIDENT_MATCH_SCORE or best[1] is None:
+            # Провайдеры без шаблонов и слабые совпадения - полный перебор
+            return self.best_match(file_columns, file_header_row)
+
+        best_order = self.by_id[best[1]].order
+        candidate_ids = {template.template_id for template in candidates}
+        file_column_set = frozenset(file_columns)
+        contenders = []
+        for template in self.templates:
+            if template.template_id in candidate_ids:
+                continue
+            bound = score_upper_bound(template, file_column_set, file_header_row)
+            if bound > best_score or (bound == best_score and template.order < best_order):
+                contenders.append(template)
+        if not contenders:
+            return best
+        return self.best_match(
+            file_columns, file_header_row, sorted([*candidates, *contenders], key=lambda item: item.order)
+        )
+
+    def remembered(self, key: str) -> Optional[Tuple[Optional[int], Optional[int], Dict[str, Any]]]:
+        with self._lock:
+            result = self._detections.get(key)
+            if result is not None:
+                self._detections.move_to_end(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def remember(self, key: str, result: Tuple[Optional[int], Optional[int], Dict[str, Any]]) -> None:
+        with self._lock:
+            self._detections[key] = copy.deepcopy(result)
+            self._detections.move_to_end(key)
+            while len(self._detections) > MAX_REMEMBERED_DETECTIONS:
+                self._detections.popitem(last=False)
+
+
+# Индексы по движкам БД: (время построения, отметка версии, индекс)
+_indexes: "weakref.WeakKeyDictionary[Any, Tuple[float, Tuple, TemplateSignatureIndex]]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def _templates_version(db: Session) -> Tuple:
+    """
+    Отметка версии шаблонов и провайдеров: количество и максимальный id
+
+    Изменения через API сбрасывают индекс сразу, отметка позволяет заметить
+    добавление и удаление шаблонов другими процессами без полного чтения
+    """
+    return tuple(db.execute(select(
+        select(func.count(ProviderTemplate.id)).where(ProviderTemplate.is_active == True).scalar_subquery(),
+        select(func.max(ProviderTemplate.id)).scalar_subquery(),
+        select(func.count(Provider.id)).where(Provider.is_active == True).scalar_subquery(),
+        select(func.max(Provider.id)).scalar_subquery(),
+    )).one())
+
+
+def get_template_index(db: Session) -> TemplateSignatureIndex:
+    """
+    Индекс сигнатур шаблонов БД сессии (из кэша процесса, если не устарел)
+    """
+    engine = db.get_bind()
+    ttl = get_settings().template_index_ttl
+    version = _templates_version(db)
+    cached = _indexes.get(engine)
+    if cached is not None and cached[1] == version and time.monotonic() - cached[0] < ttl:
+        return cached[2]
+
+    index = TemplateSignatureIndex.build(db)
+    if ttl > 0:
+        with _indexes_lock:
+            _indexes[engine] = (time.monotonic(), version, index)
+    logger.debug("Индекс сигнатур шаблонов построен", extra={"templates_count": len(index.templates)})
+    return index
+
+
+def invalidate_template_index() -> None:
+    """
+    Сброс индекса сигнатур (после изменения шаблонов или провайдеров)
+    """
+    with _indexes_lock:
+        _indexes.clear()
+
+
+# Результаты анализа структуры файлов по хэшу содержимого
+_file_analyses: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_file_analyses_lock = threading.Lock()
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    SHA-256 содержимого файла
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_cached_file_analysis(content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    Результат анализа файла с таким содержимым (память процесса, затем Redis)
+    """
+    ttl = get_settings().file_analysis_cache_ttl
+    if ttl <= 0:
+        return None
+    with _file_analyses_lock:
+        cached = _file_analyses.get(content_hash)
+        if cached is not None and time.monotonic() - cached[0] >= ttl:
+            _file_analyses.pop(content_hash, None)
+            cached = None
+    if cached is not None:
+        return copy.deepcopy(cached[1])
+
+    analysis = CacheService.get_instance().get(content_hash, prefix=FILE_ANALYSIS_PREFIX)
+    if analysis is not None:
+        _store_local_analysis(content_hash, analysis)
+    return analysis
+
+
+def cache_file_analysis(content_hash: str, analysis: Dict[str, Any]) -> None:
+    """
+    Сохранение результата анализа файла на file_analysis_cache_ttl секунд
+    """
+    ttl = get_settings().file_analysis_cache_ttl
+    if ttl <= 0:
+        return
+    _store_local_analysis(content_hash, analysis)
+    CacheService.get_instance().set(content_hash, analysis, ttl=ttl, prefix=FILE_ANALYSIS_PREFIX)
+
+
+def _store_local_analysis(content_hash: str, analysis: Dict[str, Any]) -> None:
+    with _file_analyses_lock:
+        _file_analyses[content_hash] = (time.monotonic(), copy.deepcopy(analysis))
+        _file_analyses.move_to_end(content_hash)
+        while len(_file_analyses) > MAX_LOCAL_FILE_ANALYSES:
+            _file_analyses.popitem(last=False)
+
+
+def clear_file_analysis_cache() -> None:
+    with _file_analyses_lock:
+        _file_analyses.clear()
@@ -10,6 +10,7 @@ from datetime import datetime
 from app.models import Transaction, Vehicle, FuelCard
 from app.services.gas_station_service import GasStationService
 from app.services.fuel_type_service import FuelTypeService
+from app.services.upload_fingerprint_service import UploadFingerprintService
 # Импортируем функции из основного модуля services (не из папки services/)
 from app import services as app_services
 from app.logger import logger
@@ -46,6 +47,14 @@ class TransactionBatchProcessor:
         if not transactions:
             return 0, 0, []
         
+        # Строки, уже загруженные ранее (тот же row_hash у транзакций провайдера),
+        # не проверяются на дубликаты и сразу учитываются как пропущенные
+        total_count = len(transactions)
+        transactions, already_loaded = UploadFingerprintService(self.db).exclude_loaded_rows(transactions)
+        if not transactions:
+            logger.info(f"Все {total_count} транзакций загружены ранее")
+            return 0, already_loaded, []
+        
         # Нормализуем данные для всех транзакций заранее
         for trans_data in transactions:
             # Нормализуем номер карты
@@ -66,7 +75,7 @@ class TransactionBatchProcessor:
                 trans_data["product"] = product_normalized
         
         created_count = 0
-        skipped_count = 0
+        skipped_count = already_loaded
         warnings = []
         
         # Обрабатываем транзакции батчами
@@ -101,12 +110,12 @@ class TransactionBatchProcessor:
         # Итоговое логирование с уровнем WARNING, если есть пропущенные дубликаты
         if skipped_count > 0:
             # Используем print для гарантированного вывода в консоль
-            print(f"[FINAL STATS] Обработка завершена: создано={created_count}, пропущено={skipped_count} дубликатов из {len(transactions)} транзакций")
+            print(f"[FINAL STATS] Обработка завершена: создано={created_count}, пропущено={skipped_count} дубликатов из {total_count} транзакций")
             
             logger.warning(
-                f"Обработка завершена: создано {created_count}, пропущено {skipped_count} дубликатов из {len(transactions)} транзакций",
+                f"Обработка завершена: создано {created_count}, пропущено {skipped_count} дубликатов из {total_count} транзакций",
                 extra={
-                    "total_transactions": len(transactions),
+                    "total_transactions": total_count,
                     "created_count": created_count,
                     "skipped_count": skipped_count,
                     "warnings_count": len(warnings),
@@ -117,9 +126,9 @@ class TransactionBatchProcessor:
             )
         else:
             logger.info(
-                f"Обработка завершена: создано {created_count} транзакций из {len(transactions)}",
+                f"Обработка завершена: создано {created_count} транзакций из {total_count}",
                 extra={
-                    "total_transactions": len(transactions),
+                    "total_transactions": total_count,
                     "created_count": created_count,
                     "skipped_count": skipped_count,
                     "warnings_count": len(warnings)
@@ -348,7 +357,7 @@ class TransactionBatchProcessor:
                 "product", "operation_type", "quantity", "currency", "exchange_rate",
                 "price", "price_with_discount", "amount", "amount_with_discount",
                 "discount_percent", "discount_amount", "vat_rate", "vat_amount",
-                "source_file", "organization"
+                "source_file", "row_hash", "organization"
             }
             
             # Фильтруем только допустимые поля
@@ -2,9 +2,12 @@
 Сервис для работы с транзакциями
 Содержит бизнес-логику для работы с транзакциями
 """
+import time
 from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any
 from datetime import datetime, date
+from app.config import get_settings
+from app.services.cache_service import invalidate_dashboard_cache, invalidate_transactions_cache
 from app.repositories.transaction_repository import TransactionRepository
 from app.repositories.vehicle_repository import VehicleRepository
 from app.models import Transaction, Vehicle, Provider, UploadPeriodLock, GasStation
@@ -203,10 +206,40 @@ class TransactionService:
         Returns:
             int: количество удаленных транзакций
         """
-        count = self.transaction_repo.delete_all()
+        settings = get_settings()
+        count = self.transaction_repo.delete_all(
+            chunk_size=settings.bulk_delete_chunk_size,
+            max_rows_per_second=settings.bulk_delete_max_rows_per_second,
+            on_chunk=self._deletion_progress("Очистка всех транзакций", self.transaction_repo.count())
+        )
         logger.info("Все транзакции удалены", extra={"deleted_count": count})
         return count
     
+    def _deletion_progress(self, operation: str, total: int, **context) -> Callable[[int], None]:
+        """
+        Обработчик прогресса массового удаления: не чаще интервала из настроек
+        пишет прогресс в лог и сбрасывает кэш транзакций и дашборда, чтобы
+        во время длительного удаления не отдавались устаревшие агрегаты
+        """
+        interval = get_settings().bulk_delete_progress_interval
+        last_reported = time.monotonic()
+        
+        def report(deleted: int) -> None:
+            nonlocal last_reported
+            if deleted < total and time.monotonic() - last_reported < interval:
+                return
+            last_reported = time.monotonic()
+            logger.info(f"{operation}: удалено {deleted} из {total}", extra={
+                "deleted_count": deleted,
+                "total_count": total,
+                "progress": round(deleted * 100 / total, 1) if total else 100.0,
+                **context
+            })
+            invalidate_transactions_cache()
+            invalidate_dashboard_cache()
+        
+        return report
+    
     def get_stats_summary(self, provider_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Получение статистики по транзакциям
@@ -278,12 +311,23 @@ class TransactionService:
                         f"Укажите период удаления после {lock_date.strftime('%d.%m.%Y')}"
                     )
         
-        # Выполняем удаление
-        deleted_count = self.transaction_repo.delete_by_provider_and_period(
+        # Выполняем удаление порциями
+        settings = get_settings()
+        total_count = self.transaction_repo.count_by_provider_and_period(
             provider_id=provider_id,
             date_from=date_from,
             date_to=date_to
         )
+        deleted_count = self.transaction_repo.delete_by_provider_and_period(
+            provider_id=provider_id,
+            date_from=date_from,
+            date_to=date_to,
+            chunk_size=settings.bulk_delete_chunk_size,
+            max_rows_per_second=settings.bulk_delete_max_rows_per_second,
+            on_chunk=self._deletion_progress(
+                f"Очистка транзакций провайдера '{provider.name}'", total_count, provider_id=provider_id
+            )
+        )
         
         # Формируем сообщение
         if date_from is not None or date_to is not None:
@@ -33,9 +33,14 @@ class UploadEventService:
         transactions_failed: int = 0,
         duration_ms: Optional[int] = None,
         message: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        row_hashes: Optional[bytes] = None,
     ) -> UploadEvent:
         """
         Создает запись о событии загрузки и уведомление для пользователя
+
+        content_hash и row_hashes (см. upload_fingerprint_service) позволяют
+        распознать повторную загрузку того же файла
         """
         try:
             event = UploadEvent(
@@ -53,6 +58,8 @@ class UploadEventService:
                 transactions_failed=transactions_failed or 0,
                 duration_ms=duration_ms,
                 message=message,
+                content_hash=content_hash,
+                row_hashes=row_hashes,
             )
 
             self.db.add(event)
@@ -197,6 +204,7 @@ class UploadEventService:
                 transactions_failed=transactions_failed or 0,
                 duration_ms=duration_ms,
                 message=message,
+                content_hash=content_hash,
                 created_at=datetime.utcnow(),
                 updated_at=datetime.utcnow(),
             )
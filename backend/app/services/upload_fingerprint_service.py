@@ -0,0 +1,165 @@
+"""
+Сервис отпечатков загрузок: хэш содержимого файла и хэши строк
+
+Провайдеры часто повторно присылают тот же отчет или отчет за
+пересекающийся период. Чтобы не проверять на дубликаты строки, которые уже
+загружены:
+
+- каждой строке загрузки присваивается хэш исходных данных (row_hash),
+  который сохраняется в транзакции; строки с хэшем, уже имеющимся у
+  транзакций провайдера, отбрасываются до проверки дубликатов и вставки;
+- хэш содержимого файла и хэши всех его строк сохраняются в UploadEvent;
+  повторная загрузка того же файла завершается без разбора, если все его
+  строки по-прежнему есть в БД (после удаления транзакций файл загружается
+  заново обычным образом).
+"""
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+from app.models import Transaction, UploadEvent
+
+ROW_HASH_BYTES = 16
+# Поля, не влияющие на содержимое строки (имя файла меняется при повторной отправке)
+ROW_HASH_EXCLUDED_FIELDS = frozenset({"source_file", "row_hash"})
+
+
+def content_hash(content: bytes) -> str:
+    """
+    SHA-256 содержимого файла
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def _hash_value(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value.normalize()) if value.is_finite() else str(value)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if not isinstance(value, str) else value
+
+
+def compute_row_hash(trans_data: Dict) -> str:
+    """
+    Хэш исходных данных строки загрузки (32 шестнадцатеричных символа)
+    """
+    digest = hashlib.blake2b(digest_size=ROW_HASH_BYTES)
+    for key in sorted(trans_data):
+        if key in ROW_HASH_EXCLUDED_FIELDS:
+            continue
+        value = trans_data[key]
+        if value is None:
+            continue
+        digest.update(f"{key}\x1f{_hash_value(value)}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def pack_row_hashes(hashes: Iterable[str]) -> bytes:
+    """
+    Уникальные хэши строк в компактном двоичном виде для UploadEvent.row_hashes
+    """
+    return b"".join(bytes.fromhex(value) for value in sorted(set(hashes)))
+
+
+def unpack_row_hashes(data: Optional[bytes]) -> List[str]:
+    if not data:
+        return []
+    return [data[i:i + ROW_HASH_BYTES].hex() for i in range(0, len(data), ROW_HASH_BYTES)]
+
+
+class UploadFingerprintService:
+    """
+    Поиск уже загруженных файлов и строк по хэшам
+    """
+
+    # Хэшей в одном запросе IN (...)
+    LOOKUP_CHUNK_SIZE = 1000
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def existing_row_hashes(self, provider_id: Optional[int], hashes: Iterable[str]) -> Set[str]:
+        """
+        Хэши из hashes, которые уже есть у транзакций провайдера
+        """
+        hashes = list(set(hashes))
+        provider_filter = Transaction.provider_id == provider_id if provider_id is not None else Transaction.provider_id.is_(None)
+        existing = set()
+        for start in range(0, len(hashes), self.LOOKUP_CHUNK_SIZE):
+            chunk = hashes[start:start + self.LOOKUP_CHUNK_SIZE]
+            existing.update(
+                row_hash for (row_hash,) in self.db.query(Transaction.row_hash).filter(
+                    provider_filter,
+                    Transaction.row_hash.in_(chunk)
+                ).distinct()
+            )
+        return existing
+
+    def exclude_loaded_rows(self, transactions: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Присвоение строкам row_hash и исключение строк, уже загруженных ранее
+
+        Returns:
+            (новые строки в исходном порядке, количество исключенных строк)
+        """
+        hashes_by_provider: Dict[Optional[int], Set[str]] = {}
+        for trans_data in transactions:
+            row_hash = trans_data.get("row_hash")
+            if not row_hash:
+                row_hash = trans_data["row_hash"] = compute_row_hash(trans_data)
+            hashes_by_provider.setdefault(trans_data.get("provider_id"), set()).add(row_hash)
+
+        loaded = {
+            provider_id: self.existing_row_hashes(provider_id, hashes)
+            for provider_id, hashes in hashes_by_provider.items()
+        }
+        if not any(loaded.values()):
+            return transactions, 0
+
+        new_rows = [
+            trans_data for trans_data in transactions
+            if trans_data["row_hash"] not in loaded[trans_data.get("provider_id")]
+        ]
+        excluded = len(transactions) - len(new_rows)
+        logger.info("Исключены строки, загруженные ранее", extra={
+            "rows_total": len(transactions),
+            "rows_excluded": excluded
+        })
+        return new_rows, excluded
+
+    def find_loaded_upload(
+        self,
+        file_content_hash: str,
+        provider_id: Optional[int] = None,
+        template_id: Optional[int] = None
+    ) -> Optional[UploadEvent]:
+        """
+        Последняя загрузка файла с таким содержимым, все строки которой
+        по-прежнему есть в БД
+
+        Если provider_id или template_id указаны, учитываются только загрузки
+        с тем же провайдером и шаблоном (загрузка файла другим шаблоном - новый импорт)
+        """
+        query = self.db.query(UploadEvent).filter(
+            UploadEvent.content_hash == file_content_hash,
+            UploadEvent.row_hashes.isnot(None),
+            UploadEvent.status.in_(["success", "partial"])
+        )
+        if provider_id is not None:
+            query = query.filter(UploadEvent.provider_id == provider_id)
+        if template_id is not None:
+            query = query.filter(UploadEvent.template_id == template_id)
+        event = query.order_by(UploadEvent.id.desc()).first()
+        if event is None:
+            return None
+
+        hashes = unpack_row_hashes(event.row_hashes)
+        if not hashes or len(self.existing_row_hashes(event.provider_id, hashes)) != len(hashes):
+            return None
+        return event
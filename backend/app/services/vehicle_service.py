@@ -149,7 +149,7 @@ class VehicleService:
         Returns:
             Vehicle: обновленное целевое ТС или None если не найдено
         """
-        from app.models import Transaction, FuelCard
+        from app.services.merge_service import MergePlan, MergeService
         
         source_vehicle = self.vehicle_repo.get_by_id(source_vehicle_id)
         target_vehicle = self.vehicle_repo.get_by_id(target_vehicle_id)
@@ -160,39 +160,12 @@ class VehicleService:
         if source_vehicle_id == target_vehicle_id:
             return target_vehicle
         
-        # Обновляем все транзакции, связанные с source_vehicle
-        transactions_updated = self.db.query(Transaction).filter(
-            Transaction.vehicle_id == source_vehicle_id
-        ).update({"vehicle_id": target_vehicle_id})
-        
-        # Обновляем все карты, связанные с source_vehicle
-        cards_updated = self.db.query(FuelCard).filter(
-            FuelCard.vehicle_id == source_vehicle_id
-        ).update({"vehicle_id": target_vehicle_id})
-        
-        # Обновляем данные target_vehicle, если в source_vehicle есть более полная информация
-        updated = False
-        if not target_vehicle.garage_number and source_vehicle.garage_number:
-            target_vehicle.garage_number = source_vehicle.garage_number
-            updated = True
-        if not target_vehicle.license_plate and source_vehicle.license_plate:
-            target_vehicle.license_plate = source_vehicle.license_plate
-            updated = True
-        
-        # Удаляем source_vehicle
-        self.db.delete(source_vehicle)
-        self.db.commit()
-        self.db.refresh(target_vehicle)
-        
-        logger.info(
-            "ТС объединены",
-            extra={
-                "source_vehicle_id": source_vehicle_id,
-                "target_vehicle_id": target_vehicle_id,
-                "transactions_updated": transactions_updated,
-                "cards_updated": cards_updated
-            }
+        # Ссылки переносятся порциями (транзакции, карты, анализ, заправки, треки),
+        # данные дубля дополняют целевое ТС, дубль удаляется
+        MergeService(self.db).merge_vehicle_plan(
+            MergePlan(target_id=target_vehicle_id, source_ids=[source_vehicle_id])
         )
+        self.db.refresh(target_vehicle)
 
         return target_vehicle
 
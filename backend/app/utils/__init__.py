@@ -2,7 +2,13 @@
 Утилиты для работы с API
 """
 from .date_utils import parse_date_range
-from .file_utils import validate_excel_file, validate_file_size, create_temp_file, cleanup_temp_file
+from .file_utils import (
+    validate_excel_file,
+    validate_file_size,
+    spool_upload_to_temp_file,
+    create_temp_file,
+    cleanup_temp_file
+)
 from .json_utils import parse_template_json, serialize_template_json
 from .encryption import (
     encrypt_password,
@@ -13,17 +19,20 @@ from .encryption import (
 from .firebird_utils import check_firebird_available, require_firebird, get_firebird_service
 from .geolocation_utils import (
     calculate_distance_haversine,
+    haversine_distances,
+    haversine_pairwise,
     calculate_distance_with_accuracy,
     is_point_in_radius,
     validate_coordinates,
     format_distance
 )
-from .fuel_mapping import match_fuel_type, normalize_fuel_string
+from .fuel_mapping import compile_fuel_mapping, match_fuel_type, normalize_fuel_string
 
 __all__ = [
     "parse_date_range",
     "validate_excel_file",
     "validate_file_size",
+    "spool_upload_to_temp_file",
     "create_temp_file",
     "cleanup_temp_file",
     "parse_template_json",
@@ -32,10 +41,13 @@ __all__ = [
     "require_firebird",
     "get_firebird_service",
     "calculate_distance_haversine",
+    "haversine_distances",
+    "haversine_pairwise",
     "calculate_distance_with_accuracy",
     "is_point_in_radius",
     "validate_coordinates",
     "format_distance",
+    "compile_fuel_mapping",
     "match_fuel_type",
     "normalize_fuel_string"
 ]
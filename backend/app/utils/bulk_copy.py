@@ -0,0 +1,133 @@
+"""
+Утилиты для массовой вставки данных без создания ORM-объектов
+"""
+import io
+from typing import List, Sequence
+
+import pandas as pd
+from sqlalchemy import Table, and_, or_, select, text
+from sqlalchemy.orm import Session
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[dict]:
+    """
+    Преобразование DataFrame в список словарей с нативными типами Python
+
+    NaN/NaT заменяются на None, numpy-типы - на int/float/datetime,
+    чтобы значения можно было передать в любой DB-API драйвер
+    """
+    if frame.empty:
+        return []
+    prepared = frame.astype(object).where(frame.notna(), None)
+    return prepared.to_dict("records")
+
+
+def _copy_into_postgresql(
+    db: Session,
+    table: Table,
+    frame: pd.DataFrame,
+    conflict_columns: Sequence[str]
+) -> int:
+    """
+    Вставка через COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING
+    """
+    columns = list(frame.columns)
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    conflict_list = ", ".join(f'"{column}"' for column in conflict_columns)
+    staging_table = f"_staging_{table.name}"
+
+    db.execute(text(
+        f'CREATE TEMP TABLE IF NOT EXISTS "{staging_table}" ON COMMIT DROP AS '
+        f'SELECT {column_list} FROM "{table.name}" WITH NO DATA'
+    ))
+
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S.%f")
+    buffer.seek(0)
+
+    # COPY доступен только через DB-API соединение psycopg2
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY "{staging_table}" ({column_list}) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+    finally:
+        cursor.close()
+
+    result = db.execute(text(
+        f'INSERT INTO "{table.name}" ({column_list}) '
+        f'SELECT {column_list} FROM "{staging_table}" '
+        f'ON CONFLICT ({conflict_list}) DO NOTHING'
+    ))
+    inserted = result.rowcount or 0
+    db.execute(text(f'TRUNCATE "{staging_table}"'))
+    return inserted
+
+
+def _insert_missing_generic(
+    db: Session,
+    table: Table,
+    frame: pd.DataFrame,
+    conflict_columns: Sequence[str]
+) -> int:
+    """
+    Переносимая вставка для остальных СУБД (SQLite в тестах и локальной разработке):
+    существующие ключи выбираются одним запросом и отфильтровываются перед INSERT
+    """
+    records = frame_to_records(frame)
+    if not records:
+        return 0
+
+    key_columns = [table.c[column] for column in conflict_columns]
+    keys = {tuple(record[column] for column in conflict_columns) for record in records}
+    existing = set()
+    key_list = list(keys)
+    for start in range(0, len(key_list), 500):
+        batch = key_list[start:start + 500]
+        conditions = [
+            and_(*[column == value for column, value in zip(key_columns, key)])
+            for key in batch
+        ]
+        rows = db.execute(select(*key_columns).where(or_(*conditions))).all()
+        existing.update(tuple(row) for row in rows)
+
+    to_insert = [
+        record for record in records
+        if tuple(record[column] for column in conflict_columns) not in existing
+    ]
+    if to_insert:
+        db.execute(table.insert(), to_insert)
+    return len(to_insert)
+
+
+def copy_insert_ignore_conflicts(
+    db: Session,
+    table: Table,
+    frame: pd.DataFrame,
+    conflict_columns: Sequence[str]
+) -> int:
+    """
+    Массовая вставка строк DataFrame в таблицу с пропуском конфликтующих записей
+
+    Для PostgreSQL используется COPY во временную таблицу и
+    INSERT ... ON CONFLICT DO NOTHING по уникальному индексу conflict_columns,
+    для остальных СУБД - переносимый INSERT с предварительной фильтрацией ключей.
+    Дубликаты внутри frame должны быть удалены вызывающим кодом.
+    Транзакцию фиксирует вызывающий код.
+
+    Args:
+        db: Сессия БД
+        table: Целевая таблица
+        frame: Данные для вставки (имена колонок совпадают с колонками таблицы)
+        conflict_columns: Колонки уникального ключа
+
+    Returns:
+        Количество фактически вставленных строк
+    """
+    if frame.empty:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        return _copy_into_postgresql(db, table, frame, conflict_columns)
+    return _insert_missing_generic(db, table, frame, conflict_columns)
@@ -0,0 +1,110 @@
+"""
+Утилиты для массового удаления строк без длительных блокировок
+
+Одиночный DELETE по большой выборке держит блокировки строк до конца
+транзакции, создает объем WAL, пропорциональный всей выборке, и блокирует
+параллельные загрузки. Здесь строки удаляются порциями в порядке id, каждая
+порция фиксируется отдельной транзакцией, а скорость ограничивается целевым
+числом строк в секунду, чтобы удаление не вытесняло остальную нагрузку.
+"""
+import time
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.logger import logger
+
+
+def delete_in_chunks(
+    db: Session,
+    model,
+    conditions: Sequence = (),
+    chunk_size: int = 5000,
+    max_rows_per_second: Optional[float] = None,
+    before_delete: Optional[Callable[[List[int]], None]] = None,
+    on_chunk: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Удаление строк model, удовлетворяющих conditions, порциями по chunk_size
+
+    Args:
+        db: Сессия БД
+        model: ORM-модель с первичным ключом id
+        conditions: Условия отбора строк
+        chunk_size: Строк в одной транзакции
+        max_rows_per_second: Ограничение скорости (None или 0 - без ограничения)
+        before_delete: Вызывается с id порции перед ее удалением в той же
+            транзакции (удаление зависимых строк, обновление агрегатов)
+        on_chunk: Вызывается после фиксации каждой порции с общим числом
+            удаленных строк
+
+    Returns:
+        Количество удаленных строк
+    """
+    deleted = 0
+    last_id = None
+    started = time.monotonic()
+    while True:
+        query = select(model.id).where(*conditions)
+        if last_id is not None:
+            query = query.where(model.id > last_id)
+        ids = db.execute(query.order_by(model.id).limit(chunk_size)).scalars().all()
+        if not ids:
+            break
+
+        try:
+            if before_delete:
+                before_delete(ids)
+            # Условия повторяются: строка могла измениться после выборки id
+            result = db.execute(
+                delete(model).where(model.id.in_(ids), *conditions)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        deleted += result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(ids)
+        last_id = ids[-1]
+        if on_chunk:
+            on_chunk(deleted)
+        if len(ids) < chunk_size:
+            break
+
+        if max_rows_per_second:
+            delay = deleted / max_rows_per_second - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+    return deleted
+
+
+def truncate_tables(db: Session, table_names: Sequence[str], lock_timeout_ms: int = 5000) -> bool:
+    """
+    TRUNCATE таблиц (только PostgreSQL)
+
+    TRUNCATE требует эксклюзивной блокировки: чтобы не останавливать чтения,
+    ожидающие в очереди за ней, ожидание ограничено lock_timeout_ms. Таблицы,
+    ссылающиеся на очищаемые внешними ключами, должны быть в списке.
+
+    Returns:
+        True, если таблицы очищены; False, если TRUNCATE недоступен или
+        блокировку не удалось получить (вызывающий код удаляет порциями)
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    tables = ", ".join(f'"{name}"' for name in table_names)
+    try:
+        db.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+        db.execute(text(f"TRUNCATE TABLE {tables}"))
+        db.commit()
+        return True
+    except OperationalError as e:
+        db.rollback()
+        logger.warning("TRUNCATE не выполнен, удаление будет выполнено порциями", extra={
+            "tables": list(table_names),
+            "error": str(e)
+        })
+        return False
@@ -0,0 +1,206 @@
+"""
+Параметры и инструментирование пулов соединений SQLAlchemy
+
+- размеры пула, таймаут, recycle и pre-ping задаются в Settings (DB_POOL_*);
+- время получения соединения из пула (ожидание свободного или открытие нового)
+  пишется в гистограмму gsm_db_pool_checkout_wait_seconds;
+- PoolMonitor периодически публикует состояние пулов (выдано, свободно, overflow)
+  и сообщает о соединениях, не возвращенных в пул дольше порога (утечки сессий:
+  SessionLocal() без close() в фоновых задачах и т.п.).
+"""
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.config import get_settings
+from app.logger import logger
+from app.middleware.prometheus_metrics import record_db_pool_checkout, update_db_connections, update_db_pool_stats
+
+
+class TimedPoolMixin:
+    """
+    Замер времени получения соединения из пула
+
+    Имя пула хранится в атрибуте класса: при recreate() пул пересоздается
+    через self.__class__ и сохраняет имя
+    """
+    monitor_name = "default"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_db_pool_checkout(self.monitor_name, time.perf_counter() - started)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def timed_pool_class(name: str, is_async: bool = False) -> Type[Pool]:
+    """
+    Класс пула с замером ожидания соединения для пула с именем name
+    """
+    base = TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool
+    return type(f"{base.__name__}_{name}", (base,), {"monitor_name": name})
+
+
+def pool_options(database_url: str, name: str, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Аргументы create_engine/create_async_engine для пула из настроек
+
+    Для SQLite (тесты, локальные утилиты) используется пул по умолчанию
+    """
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    settings = get_settings()
+    return {
+        "poolclass": timed_pool_class(name, is_async),
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+@dataclass
+class CheckoutInfo:
+    """
+    Выданное из пула соединение
+    """
+    pool: str
+    checked_out_at: float
+    thread: str
+    stack: Optional[str] = None
+    reported: bool = False
+
+
+class PoolMonitor:
+    """
+    Состояние зарегистрированных пулов и поиск утечек соединений
+
+    Singleton: выдачу соединений отслеживают события пула (checkout/checkin),
+    фоновый поток раз в db_pool_monitor_interval секунд обновляет метрики.
+    """
+    _instance: Optional["PoolMonitor"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        leak_seconds: Optional[float] = None,
+        trace: Optional[bool] = None,
+        interval: Optional[float] = None
+    ):
+        settings = get_settings()
+        self.leak_seconds = leak_seconds if leak_seconds is not None else settings.db_connection_leak_seconds
+        self.trace = trace if trace is not None else settings.db_connection_leak_trace
+        self.interval = interval if interval is not None else settings.db_pool_monitor_interval
+        self._engines: Dict[str, Engine] = {}
+        self._checkouts: Dict[int, CheckoutInfo] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def get_instance(cls) -> "PoolMonitor":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def register(self, name: str, engine: Engine) -> None:
+        """
+        Подключение отслеживания к engine (для асинхронного - async_engine.sync_engine)
+        """
+        if name in self._engines:
+            return
+        self._engines[name] = engine
+
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            stack = "".join(traceback.format_stack(limit=25)[:-1]) if self.trace else None
+            with self._lock:
+                self._checkouts[id(connection_record)] = CheckoutInfo(
+                    pool=name,
+                    checked_out_at=time.monotonic(),
+                    thread=threading.current_thread().name,
+                    stack=stack
+                )
+
+        @event.listens_for(engine, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self._checkouts.pop(id(connection_record), None)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Обновление метрик пулов и поиск утечек
+
+        Returns:
+            Состояние пулов по именам: size, checked_out, idle, overflow, leaked
+        """
+        now = time.monotonic()
+        with self._lock:
+            checkouts = list(self._checkouts.values())
+
+        report = {}
+        total_checked_out = 0
+        for name, engine in self._engines.items():
+            pool = engine.pool
+            stats = {
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else None,
+                "leaked": 0,
+            }
+            for info in checkouts:
+                if info.pool != name or now - info.checked_out_at < self.leak_seconds:
+                    continue
+                stats["leaked"] += 1
+                if not info.reported:
+                    info.reported = True
+                    logger.warning(
+                        f"Соединение пула {name} не возвращено {now - info.checked_out_at:.0f} с "
+                        f"(поток {info.thread}) - возможна утечка сессии",
+                        extra={"pool": name, "thread": info.thread, "stack": info.stack}
+                    )
+            total_checked_out += stats["checked_out"] or 0
+            update_db_pool_stats(name, stats)
+            report[name] = stats
+
+        update_db_connections(total_checked_out)
+        return report
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-pool-monitor", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"Ошибка сбора метрик пулов соединений: {e}", exc_info=True)
@@ -0,0 +1,117 @@
+"""
+Потоковое чтение Excel файлов (openpyxl read_only)
+
+Файл читается за один проход: заголовки - только первые строки листа,
+данные - пакетами строк и только из нужных колонок. В отличие от
+pd.read_excel(skiprows=..., nrows=...) книга не разбирается заново для каждого пакета.
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Сколько первых строк читается для поиска строки заголовков
+HEADER_SCAN_ROWS = 30
+
+
+def _selected_columns(columns: Sequence[int]) -> List[int]:
+    """
+    Отсортированные неотрицательные индексы колонок без повторов
+    """
+    return sorted({column for column in columns if column is not None and column >= 0})
+
+
+@contextmanager
+def _first_sheet(file_path: str):
+    """
+    Первый лист книги в режиме только для чтения (как sheet_name=0 в pandas)
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        if not workbook.worksheets:
+            raise ValueError("В файле нет листов")
+        yield workbook.worksheets[0]
+    finally:
+        workbook.close()
+
+
+def _convert_cell(value):
+    """
+    Приведение значения ячейки к виду, который возвращает pd.read_excel:
+    целые числа с плавающей точкой становятся int, пустые ячейки - None
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value == "":
+        return None
+    return value
+
+
+def read_excel_head(file_path: str, max_rows: int = HEADER_SCAN_ROWS) -> pd.DataFrame:
+    """
+    Чтение первых max_rows строк первого листа без разбора остальной книги
+
+    Returns:
+        DataFrame без заголовков (header=None), колонки пронумерованы с 0
+    """
+    with _first_sheet(file_path) as sheet:
+        rows = [
+            [_convert_cell(value) for value in row]
+            for row in sheet.iter_rows(max_row=max_rows, values_only=True)
+        ]
+
+    width = max((len(row) for row in rows), default=0)
+    # Хвостовые пустые строки pandas не возвращает
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    return pd.DataFrame([row + [None] * (width - len(row)) for row in rows], columns=range(width))
+
+
+def iter_excel_batches(
+    file_path: str,
+    start_row: int,
+    columns: Sequence[int],
+    batch_size: int = 1000
+) -> Iterator[pd.DataFrame]:
+    """
+    Пакеты строк первого листа начиная с start_row (нумерация с 0), только колонки columns
+
+    Yields:
+        DataFrame с колонками, названными исходными индексами колонок,
+        и индексом строк, равным номеру строки в листе (с 0)
+    """
+    columns = _selected_columns(columns)
+    if not columns:
+        return
+    max_col = columns[-1] + 1
+
+    with _first_sheet(file_path) as sheet:
+        batch: List[List] = []
+        row_numbers: List[int] = []
+        # iter_rows с max_col не читает ячейки правее последней нужной колонки
+        for row_number, row in enumerate(
+            sheet.iter_rows(min_row=start_row + 1, max_col=max_col, values_only=True),
+            start=start_row
+        ):
+            values = [_convert_cell(row[column]) if column < len(row) else None for column in columns]
+            if all(value is None for value in values):
+                continue
+            batch.append(values)
+            row_numbers.append(row_number)
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=columns, index=row_numbers)
+                batch, row_numbers = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=row_numbers)
+
+
+def remap_column_indices(column_indices: Dict[str, int], columns: Sequence[int]) -> Dict[str, int]:
+    """
+    Перевод исходных индексов колонок в позиции внутри пакета iter_excel_batches
+    """
+    positions = {column: position for position, column in enumerate(_selected_columns(columns))}
+    return {
+        field: positions.get(index, -1) if index is not None and index >= 0 else -1
+        for field, index in column_indices.items()
+    }
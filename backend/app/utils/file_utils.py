@@ -2,11 +2,16 @@
 Утилиты для работы с файлами
 """
 from fastapi import UploadFile, HTTPException
+from dataclasses import dataclass
 from typing import Optional
+import hashlib
 import tempfile
 import os
 from app.logger import logger
 
+# Размер порции при копировании загружаемого файла на диск
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 
 def validate_excel_file(file: UploadFile) -> None:
     """
@@ -43,6 +48,19 @@ def validate_excel_file(file: UploadFile) -> None:
             )
 
 
+def _file_too_large(file_size: int, max_size: int, exact: bool = True) -> HTTPException:
+    logger.warning(
+        f"Файл превышает максимальный размер",
+        extra={"file_size_bytes": file_size, "max_size_bytes": max_size}
+    )
+    size_text = f"{file_size / 1024 / 1024:.2f}MB" if exact else f"более {max_size / 1024 / 1024:.0f}MB"
+    return HTTPException(
+        status_code=400,
+        detail=f"Размер файла превышает максимально допустимый ({max_size / 1024 / 1024:.0f}MB). "
+               f"Размер загружаемого файла: {size_text}"
+    )
+
+
 def validate_file_size(content: bytes, max_size: int) -> None:
     """
     Валидация размера файла
@@ -57,15 +75,69 @@ def validate_file_size(content: bytes, max_size: int) -> None:
     file_size = len(content)
     
     if file_size > max_size:
-        logger.warning(
-            f"Файл превышает максимальный размер",
-            extra={"file_size_bytes": file_size, "max_size_bytes": max_size}
-        )
-        raise HTTPException(
-            status_code=400,
-            detail=f"Размер файла превышает максимально допустимый ({max_size / 1024 / 1024:.0f}MB). "
-                   f"Размер загружаемого файла: {file_size / 1024 / 1024:.2f}MB"
-        )
+        raise _file_too_large(file_size, max_size)
+
+
+@dataclass
+class SpooledUpload:
+    """
+    Загруженный файл, сохраненный во временный файл
+    """
+    path: str
+    size: int
+    sha256: str
+
+
+async def spool_upload_to_temp_file(
+    file: UploadFile,
+    max_size: Optional[int] = None,
+    suffix: str = ".xlsx",
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> SpooledUpload:
+    """
+    Копирование загружаемого файла во временный файл порциями
+
+    Файл не читается в память целиком: размер проверяется по мере чтения
+    (загрузка прерывается, как только превышен max_size), SHA-256 содержимого
+    считается на лету. Временный файл удаляет вызывающий код
+    (cleanup_temp_file); при ошибке он удаляется здесь.
+
+    Args:
+        file: Загружаемый файл
+        max_size: Максимальный размер файла в байтах (None - без ограничения)
+        suffix: Суффикс временного файла
+        chunk_size: Размер порции чтения в байтах
+
+    Raises:
+        HTTPException: Если размер файла превышает максимальный
+    """
+    # Размер может быть известен заранее (multipart-парсер уже сохранил файл)
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise _file_too_large(file.size, max_size)
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with tmp_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise _file_too_large(size, max_size, exact=False)
+                digest.update(chunk)
+                tmp_file.write(chunk)
+    except BaseException:
+        cleanup_temp_file(tmp_file.name)
+        raise
+
+    logger.debug(
+        f"Размер загружаемого файла: {size / 1024 / 1024:.2f}MB",
+        extra={"file_size_bytes": size}
+    )
+    return SpooledUpload(path=tmp_file.name, size=size, sha256=digest.hexdigest())
 
 
 def create_temp_file(content: bytes, suffix: str = ".xlsx") -> str:
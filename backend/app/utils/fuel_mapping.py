@@ -148,3 +148,49 @@ def match_fuel_type(value: str, mapping: Dict[str, str], template_id: Optional[i
         })
     
     return None
+
+
+class CompiledFuelMapping:
+    """
+    Маппинг видов топлива с заранее нормализованными ключами и значениями
+    
+    Результат match() совпадает с match_fuel_type() для того же маппинга:
+    побеждает первая по порядку запись, у которой совпал ключ или значение,
+    но сопоставление выполняется одним поиском в словаре вместо
+    нормализации всего маппинга при каждом вызове.
+    """
+    
+    def __init__(self, mapping: Dict[str, str]):
+        self._lookup: Dict[str, str] = {}
+        for source_name, target_name in mapping.items():
+            if not source_name:
+                continue
+            self._lookup.setdefault(normalize_fuel_string(source_name), target_name)
+            if target_name:
+                self._lookup.setdefault(normalize_fuel_string(target_name), target_name)
+    
+    def __len__(self) -> int:
+        return len(self._lookup)
+    
+    def match(self, value: str) -> Optional[str]:
+        """
+        Нормализованное значение топлива или None, если совпадение не найдено
+        """
+        if not value:
+            return None
+        norm_value = normalize_fuel_string(value)
+        if not norm_value:
+            return None
+        return self._lookup.get(norm_value)
+
+
+def compile_fuel_mapping(mapping: Optional[Dict[str, str]]) -> Optional[CompiledFuelMapping]:
+    """
+    Подготовка маппинга видов топлива к многократному сопоставлению
+    
+    Returns:
+        CompiledFuelMapping или None, если маппинг пустой или не является словарем
+    """
+    if not mapping or not isinstance(mapping, dict):
+        return None
+    return CompiledFuelMapping(mapping)
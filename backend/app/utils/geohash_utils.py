@@ -0,0 +1,134 @@
+"""
+Утилиты геохеширования координат для пространственного поиска
+
+Геохеш - строка base32, префикс которой задает прямоугольную ячейку сетки:
+чем длиннее префикс, тем мельче ячейка. Точки в радиусе R от центра лежат
+в ячейке центра и восьми соседних ячейках точности, размер ячейки которой не меньше R,
+поэтому поиск сводится к нескольким диапазонным запросам по B-tree индексу.
+"""
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Точность хранимого геохеша (~4.8 x 4.8 м)
+GEOHASH_PRECISION = 9
+
+_ALPHABET_CODES = np.frombuffer(GEOHASH_ALPHABET.encode("ascii"), dtype=np.uint8)
+_METERS_PER_DEGREE_LAT = 110574.0
+_METERS_PER_DEGREE_LON = 111320.0
+
+
+def _bit_counts(precision: int) -> Tuple[int, int]:
+    """
+    Количество бит долготы и широты для точности precision
+    """
+    total_bits = precision * 5
+    return (total_bits + 1) // 2, total_bits // 2
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """
+    Размер ячейки геохеша в градусах: (широта, долгота)
+    """
+    lon_bits, lat_bits = _bit_counts(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_encode_many(
+    latitudes: Sequence[float],
+    longitudes: Sequence[float],
+    precision: int = GEOHASH_PRECISION
+) -> np.ndarray:
+    """
+    Векторное вычисление геохешей для массивов координат
+
+    Returns:
+        Массив строк (dtype object); для отсутствующих координат - None
+    """
+    lat = np.asarray(latitudes, dtype=float)
+    lon = np.asarray(longitudes, dtype=float)
+    valid = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+
+    lon_bits, lat_bits = _bit_counts(precision)
+    lat_cells = np.clip(
+        np.floor((np.where(valid, lat, 0) + 90.0) / 180.0 * (1 << lat_bits)), 0, (1 << lat_bits) - 1
+    ).astype(np.int64)
+    lon_cells = np.clip(
+        np.floor((np.where(valid, lon, 0) + 180.0) / 360.0 * (1 << lon_bits)), 0, (1 << lon_bits) - 1
+    ).astype(np.int64)
+
+    # Чередование бит: старший бит - долгота, затем широта
+    code = np.zeros(lat.shape, dtype=np.int64)
+    lon_shift, lat_shift = lon_bits, lat_bits
+    for bit in range(precision * 5):
+        code <<= 1
+        if bit % 2 == 0:
+            lon_shift -= 1
+            code |= (lon_cells >> lon_shift) & 1
+        else:
+            lat_shift -= 1
+            code |= (lat_cells >> lat_shift) & 1
+
+    chars = np.empty(lat.shape + (precision,), dtype=np.uint8)
+    for position in range(precision):
+        shift = (precision - 1 - position) * 5
+        chars[..., position] = _ALPHABET_CODES[(code >> shift) & 31]
+
+    result = chars.view(f"S{precision}").reshape(lat.shape).astype(str).astype(object)
+    result[~valid] = None
+    return result
+
+
+def geohash_encode(latitude, longitude, precision: int = GEOHASH_PRECISION) -> Optional[str]:
+    """
+    Геохеш одной точки (None для отсутствующих или некорректных координат)
+    """
+    if latitude is None or longitude is None:
+        return None
+    try:
+        return geohash_encode_many([float(latitude)], [float(longitude)], precision)[0]
+    except (TypeError, ValueError):
+        return None
+
+
+def precision_for_radius(radius_meters: float, latitude: float = 0.0) -> int:
+    """
+    Максимальная точность, при которой ячейка не меньше радиуса поиска
+    (с учетом сужения ячеек по долготе к полюсам)
+    """
+    # Берется самая высокая широта круга поиска - там ячейки самые узкие
+    extreme_latitude = min(abs(latitude) + radius_meters / _METERS_PER_DEGREE_LAT, 89.0)
+    lon_scale = max(math.cos(math.radians(extreme_latitude)), 1e-6)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_deg, lon_deg = cell_size_degrees(precision)
+        min_side = min(lat_deg * _METERS_PER_DEGREE_LAT, lon_deg * _METERS_PER_DEGREE_LON * lon_scale)
+        if min_side >= radius_meters:
+            return precision
+    return 1
+
+
+def geohash_cells_for_radius(
+    latitude: float,
+    longitude: float,
+    radius_meters: float,
+    precision: Optional[int] = None
+) -> List[str]:
+    """
+    Префиксы геохешей (ячейка точки и соседние), покрывающие круг радиуса radius_meters
+
+    Если precision не задана, выбирается по радиусу и широте точки
+    """
+    if precision is None:
+        precision = precision_for_radius(radius_meters, latitude)
+    lat_deg, lon_deg = cell_size_degrees(precision)
+    lats, lons = [], []
+    for dlat in (-1, 0, 1):
+        for dlon in (-1, 0, 1):
+            cell_lat = min(max(latitude + dlat * lat_deg, -90.0), 90.0)
+            cell_lon = (longitude + dlon * lon_deg + 180.0) % 360.0 - 180.0
+            lats.append(cell_lat)
+            lons.append(cell_lon)
+    return sorted(set(geohash_encode_many(lats, lons, precision)))
@@ -2,9 +2,13 @@
 Утилиты для работы с геолокацией
 """
 import math
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple
 from decimal import Decimal
 
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
+
 
 def calculate_distance_haversine(
     lat1: float,
@@ -34,7 +38,7 @@ def calculate_distance_haversine(
     except (ValueError, TypeError):
         return float('inf')
     
-    R = 6371000  # Радиус Земли в метрах
+    R = EARTH_RADIUS_METERS
     
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
@@ -49,6 +53,54 @@ def calculate_distance_haversine(
     return distance
 
 
+def haversine_distances(
+    lat: float,
+    lon: float,
+    lats: Sequence[float],
+    lons: Sequence[float]
+) -> np.ndarray:
+    """
+    Векторное вычисление расстояний (в метрах) от точки до массива точек
+    по формуле гаверсинуса
+    
+    Args:
+        lat, lon: координаты исходной точки
+        lats, lons: массивы координат (None/NaN дают inf)
+    
+    Returns:
+        Массив расстояний в метрах
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    phi1 = math.radians(float(lat))
+    phi2 = np.radians(lats)
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(lons) - math.radians(float(lon))
+    
+    a = np.sin(delta_phi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    distances = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return np.where(np.isfinite(distances), distances, np.inf)
+
+
+def haversine_pairwise(
+    lats1: Sequence[float],
+    lons1: Sequence[float],
+    lats2: Sequence[float],
+    lons2: Sequence[float]
+) -> np.ndarray:
+    """
+    Матрица расстояний (в метрах) между двумя наборами точек, форма (len1, len2)
+    """
+    phi1 = np.radians(np.asarray(lats1, dtype=float))[:, None]
+    phi2 = np.radians(np.asarray(lats2, dtype=float))[None, :]
+    lambda1 = np.radians(np.asarray(lons1, dtype=float))[:, None]
+    lambda2 = np.radians(np.asarray(lons2, dtype=float))[None, :]
+    
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    distances = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return np.where(np.isfinite(distances), distances, np.inf)
+
+
 def calculate_distance_with_accuracy(
     lat1: float,
     lon1: float,
@@ -0,0 +1,217 @@
+"""
+Пакетная запись системных логов (system_logs) фоновым потоком
+
+Запись лога не должна открывать сессию и выполнять commit в потоке запроса:
+строки копятся в ограниченной очереди и вставляются одним INSERT пачками
+по размеру (log_batch_size) или по времени (log_batch_flush_interval).
+При переполнении очереди новые записи отбрасываются, а не блокируют запрос.
+"""
+import atexit
+import json
+import queue
+import sys
+import threading
+import traceback
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+
+
+def build_system_log_row(
+    level: str,
+    message: str,
+    module: Optional[str] = None,
+    function: Optional[str] = None,
+    line_number: Optional[int] = None,
+    event_type: Optional[str] = None,
+    event_category: Optional[str] = None,
+    extra_data: Optional[Dict[str, Any]] = None,
+    exception: Optional[BaseException] = None,
+    exc_info: Optional[tuple] = None
+) -> Dict[str, Any]:
+    """
+    Словарь значений колонок SystemLog (формат совпадает с LoggingService.log_system_event)
+    """
+    extra_data_json = None
+    if extra_data:
+        try:
+            extra_data_json = json.dumps(extra_data, ensure_ascii=False, default=str)
+        except Exception:
+            extra_data_json = str(extra_data)
+
+    exception_type = None
+    exception_message = None
+    stack_trace = None
+    if exception is not None and not exc_info:
+        exc_info = (type(exception), exception, exception.__traceback__)
+    if exc_info and exc_info[0]:
+        exception_type = exc_info[0].__name__
+        exception_message = str(exc_info[1]) if exc_info[1] else None
+        stack_trace = "".join(traceback.format_exception(*exc_info))
+
+    return {
+        "level": level,
+        "message": message,
+        "module": module,
+        "function": function,
+        "line_number": line_number,
+        "event_type": event_type,
+        "event_category": event_category,
+        "extra_data": extra_data_json,
+        "exception_type": exception_type,
+        "exception_message": exception_message,
+        "stack_trace": stack_trace,
+        "created_at": datetime.utcnow()
+    }
+
+
+class SystemLogBatchWriter:
+    """
+    Буфер записей system_logs с фоновой пакетной вставкой
+
+    Ошибки записи не логируются через logger (это привело бы к рекурсии
+    через DatabaseLogHandler), а выводятся в stderr.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        auto_start: bool = True
+    ):
+        settings = get_settings()
+        self._session_factory = session_factory
+        self.batch_size = max(1, batch_size or settings.log_batch_size)
+        self.flush_interval = flush_interval if flush_interval is not None else settings.log_batch_flush_interval
+        self.auto_start = auto_start
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue or settings.log_batch_max_queue)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            # Импорт здесь: app.database импортирует logger, который использует этот модуль
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Постановка записи в очередь без ожидания; False - запись отброшена
+        """
+        if self.auto_start and self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> int:
+        """
+        Запись всех накопленных строк пачками, возвращает количество записанных
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = self._drain(self.batch_size)
+                if not rows:
+                    break
+                written += self._write(rows)
+        return written
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="system-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Остановка фонового потока с записью оставшихся строк
+        """
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        from app.models import SystemLog
+
+        db = None
+        try:
+            db = self.session_factory()
+            db.execute(insert(SystemLog), rows)
+            db.commit()
+            self.written += len(rows)
+            return len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            if db is not None:
+                db.rollback()
+            print(f"Ошибка пакетной записи system_logs ({len(rows)} строк): {e}", file=sys.stderr)
+            return 0
+        finally:
+            if db is not None:
+                db.close()
+
+
+_writer: Optional[SystemLogBatchWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_system_log_writer() -> SystemLogBatchWriter:
+    """
+    Общий для процесса писатель system_logs
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SystemLogBatchWriter()
+    return _writer
+
+
+def shutdown_system_log_writer() -> None:
+    if _writer is not None:
+        _writer.shutdown()
@@ -0,0 +1,41 @@
+"""
+Условие фильтрации по организациям пользователя
+
+Записи без организации (organization_id IS NULL) видны всем для обратной
+совместимости, поэтому условие имеет вид
+``organization_id IN (...) OR organization_id IS NULL``. PostgreSQL выполняет
+его как BitmapOr двух индексных сканирований: по составному индексу
+(organization_id, transaction_date) и по частичному индексу
+``... WHERE organization_id IS NULL``. Для этого ветка NULL должна оставаться
+отдельным условием ``IS NULL`` (частичный индекс применяется, только если
+условие запроса совпадает с его предикатом), а список организаций - списком
+констант, а не подзапросом.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import or_
+
+
+def normalize_organization_ids(organization_ids: Iterable[Optional[int]]) -> tuple:
+    """
+    Уникальные ID организаций по возрастанию (одинаковые области видимости
+    дают одинаковый текст запроса и ключ кэша)
+    """
+    return tuple(sorted({int(org_id) for org_id in organization_ids if org_id is not None}))
+
+
+def organization_scope_clause(column, organization_ids: Iterable[Optional[int]]):
+    """
+    Условие видимости строк для списка организаций
+
+    Args:
+        column: Колонка organization_id модели
+        organization_ids: Доступные организации (пустой список - только
+            записи без организации)
+    """
+    organization_ids = normalize_organization_ids(organization_ids)
+    if not organization_ids:
+        return column.is_(None)
+    if len(organization_ids) == 1:
+        return or_(column == organization_ids[0], column.is_(None))
+    return or_(column.in_(organization_ids), column.is_(None))
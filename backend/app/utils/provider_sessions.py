@@ -0,0 +1,199 @@
+"""
+Общие HTTP-клиенты и кэш авторизации для адаптеров API провайдеров
+
+Адаптеры создаются на каждую загрузку/проверку/задачу, но HTTP-клиенты и токены
+переиспользуются в пределах процесса:
+- клиенты (пул соединений, keep-alive, HTTP/2 при наличии пакета h2) - по базовому URL;
+- токены, cookies и данные сессии - по набору учетных данных, со сроком жизни,
+  принудительное обновление - только после ответа 401.
+
+httpx.AsyncClient привязан к event loop, в котором открыты его соединения:
+планировщик выполняет задачи в собственных loop'ах, поэтому клиенты хранятся
+отдельно для каждого loop, а кэш авторизации - общий для всех.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from app.config import get_settings
+from app.logger import logger
+
+# HTTP/2 в httpx требует пакет h2 (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class CachedAuth:
+    """
+    Результат авторизации у провайдера
+    """
+    token: Optional[str]
+    data: Dict[str, Any] = field(default_factory=dict)
+    cookies: Dict[str, str] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+    def is_valid(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+def session_key(*parts: Any) -> str:
+    """
+    Ключ сессии по учетным данным (секреты не хранятся в ключе в открытом виде)
+    """
+    raw = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ProviderSessionRegistry:
+    """
+    Реестр HTTP-клиентов и авторизаций адаптеров провайдеров
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple[int, str], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self._auth: Dict[str, CachedAuth] = {}
+        self._auth_locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+    def _purge_closed_loops(self) -> None:
+        """
+        Удаление клиентов и блокировок завершившихся event loop'ов
+        """
+        closed = {key for key, (loop, _) in self._clients.items() if loop.is_closed()}
+        for key in closed:
+            del self._clients[key]
+        if closed:
+            closed_loops = {loop_id for loop_id, _ in closed}
+            for key in [key for key in self._auth_locks if key[0] in closed_loops]:
+                del self._auth_locks[key]
+
+    def get_client(self, client_key: str, **options: Any) -> httpx.AsyncClient:
+        """
+        Общий клиент для client_key в текущем event loop
+
+        Args:
+            client_key: Ключ клиента (базовый URL; для адаптеров с cookies - URL и пользователь)
+            options: Параметры httpx.AsyncClient, применяются при создании клиента
+        """
+        loop = asyncio.get_running_loop()
+        key = (id(loop), client_key)
+        with self._lock:
+            self._purge_closed_loops()
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] is loop and not entry[1].is_closed:
+                return entry[1]
+
+            settings = get_settings()
+            options.setdefault("timeout", 30.0)
+            options.setdefault("http2", HTTP2_AVAILABLE)
+            options.setdefault("limits", httpx.Limits(
+                max_connections=settings.provider_http_max_connections,
+                max_keepalive_connections=settings.provider_http_max_connections,
+                keepalive_expiry=settings.provider_http_keepalive_expiry
+            ))
+            client = httpx.AsyncClient(**options)
+            self._clients[key] = (loop, client)
+            logger.debug("Создан HTTP-клиент провайдера", extra={
+                "client_key": client_key,
+                "http2": options["http2"],
+                "clients_total": len(self._clients)
+            })
+            return client
+
+    def _auth_lock(self, key: str) -> asyncio.Lock:
+        loop_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            lock = self._auth_locks.get(loop_key)
+            if lock is None:
+                lock = self._auth_locks[loop_key] = asyncio.Lock()
+            return lock
+
+    def get_auth(self, key: str) -> Optional[CachedAuth]:
+        """
+        Действующая авторизация из кэша
+        """
+        with self._lock:
+            auth = self._auth.get(key)
+            if auth is not None and not auth.is_valid():
+                del self._auth[key]
+                return None
+            return auth
+
+    def invalidate_auth(self, key: str) -> None:
+        with self._lock:
+            self._auth.pop(key, None)
+
+    async def authenticate(
+        self,
+        key: str,
+        login: Callable[[], Awaitable[Optional[CachedAuth]]],
+        stale_token: Optional[str] = None,
+        ttl: Optional[int] = None
+    ) -> Optional[CachedAuth]:
+        """
+        Авторизация из кэша или через login()
+
+        Одновременные запросы с одинаковым ключом выполняют вход один раз.
+
+        Args:
+            key: Ключ сессии (session_key по учетным данным)
+            login: Функция входа, возвращает CachedAuth или None при ошибке
+            stale_token: Токен, отклоненный провайдером (ответ 401): кэш с этим
+                токеном не используется, выполняется повторный вход
+            ttl: Срок жизни авторизации в секундах (по умолчанию из настроек)
+        """
+        async with self._auth_lock(key):
+            cached = self.get_auth(key)
+            if cached is not None and (stale_token is None or cached.token != stale_token):
+                return cached
+
+            self.invalidate_auth(key)
+            auth = await login()
+            if auth is None:
+                return None
+            auth.expires_at = time.monotonic() + (ttl if ttl is not None else get_settings().provider_auth_ttl_seconds)
+            with self._lock:
+                self._auth[key] = auth
+            return auth
+
+    async def aclose(self) -> None:
+        """
+        Закрытие клиентов текущего event loop (при остановке приложения)
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = [client for (_, (client_loop, client)) in self._clients.items() if client_loop is loop]
+            self._clients = {
+                key: entry for key, entry in self._clients.items() if entry[0] is not loop
+            }
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "cached_auth": sum(1 for auth in self._auth.values() if auth.is_valid()),
+            }
+
+
+_registry: Optional[ProviderSessionRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_provider_session_registry() -> ProviderSessionRegistry:
+    """
+    Получить реестр сессий провайдеров (один на процесс)
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderSessionRegistry()
+    return _registry
@@ -0,0 +1,247 @@
+"""
+Профилирование SQL запросов через события курсора SQLAlchemy
+
+- before_cursor_execute/after_cursor_execute замеряют каждый запрос;
+- внутри profile_queries() (HTTP запрос, фоновая задача) накапливаются количество
+  запросов, суммарное время и число повторов каждого запроса - повтор одного
+  SELECT много раз за запрос означает N+1 (обогащение по строкам, ленивые связи);
+- запросы дольше порога сохраняются в кольцевой буфер вместе с планом EXPLAIN.
+
+Включается настройкой QUERY_PROFILING_ENABLED, без нее события не регистрируются.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.logger import logger
+from app.middleware.prometheus_metrics import record_slow_query
+
+MAX_STATEMENT_LENGTH = 2000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Списки параметров IN (?, ?, ?) / (%(id_1)s, %(id_2)s) / ($1, $2) сворачиваются в (?)
+_PLACEHOLDER_LIST_RE = re.compile(
+    r"\(\s*(?:\?|%\(\w+\)s|%s|\$\d+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|\$\d+))*\s*\)"
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Нормализация SQL для группировки повторов: пробелы и списки параметров
+    """
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _PLACEHOLDER_LIST_RE.sub("(?)", statement)
+
+
+def _is_select(statement: str) -> bool:
+    head = statement.lstrip()[:6].upper()
+    return head.startswith("SELECT") or head.startswith("WITH")
+
+
+@dataclass
+class QueryProfile:
+    """
+    SQL запросы одной единицы работы (HTTP запроса, фоновой задачи)
+    """
+    endpoint: str = ""
+    query_count: int = 0
+    total_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.total_seconds += seconds
+        self.statements[normalize_statement(statement)] += 1
+
+    def repeated_selects(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        SELECT, выполненные не менее threshold раз (признак N+1)
+        """
+        if threshold <= 0:
+            return []
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold and _is_select(statement)
+        ]
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+@contextmanager
+def profile_queries(endpoint: str = "") -> Iterator[QueryProfile]:
+    """
+    Сбор SQL запросов, выполненных внутри блока (в том числе в threadpool и
+    дочерних задачах, унаследовавших контекст)
+    """
+    profile = QueryProfile(endpoint=endpoint)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current_profile.get()
+
+
+class QueryProfiler:
+    """
+    Обработчики событий курсора и журнал медленных запросов
+    """
+
+    def __init__(
+        self,
+        slow_ms: Optional[float] = None,
+        explain: Optional[bool] = None,
+        history_size: int = 50
+    ):
+        settings = get_settings()
+        self.slow_ms = slow_ms if slow_ms is not None else settings.query_profiling_slow_ms
+        self.explain = explain if explain is not None else settings.query_profiling_explain
+        self._slow_queries: deque = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._engines: List[Engine] = []
+
+    def install(self, engine: Engine) -> None:
+        """
+        Регистрация обработчиков на engine (для асинхронного - async_engine.sync_engine)
+        """
+        if any(installed is engine for installed in self._engines):
+            return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        self._engines.append(engine)
+
+    def uninstall(self) -> None:
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+            event.remove(engine, "handle_error", self._handle_error)
+        self._engines = []
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """
+        Последние медленные запросы, новые первыми
+        """
+        with self._lock:
+            return list(reversed(self._slow_queries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slow_queries.clear()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_profiler_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_profiler_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, seconds)
+
+        if seconds * 1000 >= self.slow_ms:
+            self._capture_slow(conn, statement, parameters, executemany, seconds, profile)
+
+    def _handle_error(self, exception_context):
+        # after_cursor_execute не вызывается для упавшего запроса
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_profiler_start"):
+            conn.info["query_profiler_start"].pop()
+
+    def _capture_slow(self, conn, statement, parameters, executemany, seconds, profile) -> None:
+        endpoint = profile.endpoint if profile is not None and profile.endpoint else "background"
+        plan = None
+        if self.explain and not executemany and _is_select(statement):
+            plan = self._explain(conn, statement, parameters)
+
+        entry = {
+            "captured_at": datetime.now().isoformat(),
+            "endpoint": endpoint,
+            "duration_ms": round(seconds * 1000, 2),
+            "statement": normalize_statement(statement)[:MAX_STATEMENT_LENGTH],
+            "plan": plan,
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+        record_slow_query(endpoint)
+        logger.warning(
+            f"Медленный SQL запрос ({entry['duration_ms']} мс) в {endpoint}",
+            extra={
+                "event_type": "database",
+                "event_category": "slow_query",
+                "duration_ms": entry["duration_ms"],
+                "statement": entry["statement"],
+                "plan": plan,
+            }
+        )
+
+    def _explain(self, conn, statement, parameters) -> Optional[str]:
+        """
+        План запроса на том же соединении (DBAPI курсор, события не вызываются)
+
+        В PostgreSQL EXPLAIN выполняется внутри SAVEPOINT, чтобы ошибка не
+        прервала транзакцию вызывающего кода
+        """
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            prefix = "EXPLAIN "
+        elif dialect == "sqlite":
+            prefix = "EXPLAIN QUERY PLAN "
+        else:
+            return None
+
+        cursor = conn.connection.cursor()
+        savepoint = dialect == "postgresql"
+        try:
+            if savepoint:
+                cursor.execute("SAVEPOINT query_profiler_explain")
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception as e:
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT query_profiler_explain")
+                logger.debug(f"Не удалось получить план запроса: {e}")
+                return None
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT query_profiler_explain")
+            return "\n".join(str(row[-1]) for row in rows)
+        except Exception as e:
+            logger.debug(f"Не удалось получить план запроса: {e}")
+            return None
+        finally:
+            cursor.close()
+
+
+_profiler: Optional[QueryProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_query_profiler() -> QueryProfiler:
+    """
+    Общий профилировщик приложения (создается при первом обращении)
+    """
+    global _profiler
+    if _profiler is None:
+        with _profiler_lock:
+            if _profiler is None:
+                _profiler = QueryProfiler()
+    return _profiler
@@ -0,0 +1,234 @@
+"""
+Генератор синтетических данных для бенчмарков
+
+Данные детерминированы (random.Random(seed)): один и тот же размер и seed дают
+одинаковые транзакции, поэтому результаты разных прогонов сравнимы.
+Справочники масштабируются от числа транзакций: ТС - 1%, карты - 2%, АЗС - 0.2%.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List
+
+from openpyxl import Workbook
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import FuelCard, GasStation, Provider, Transaction, Vehicle
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+BENCH_PROVIDER_CODE = "BENCH"
+SEED_SOURCE_FILE = "bench_seed"
+START_DATE = datetime(2025, 1, 1)
+PERIOD_DAYS = 365
+
+PRODUCTS = ["АИ-92", "АИ-95", "АИ-98", "ДТ", "ДТ-З", "Газ"]
+ORGANIZATIONS = ["ООО Ромашка", "АО Вектор", "ООО ТрансЛайн", "ИП Сидоров"]
+EXCEL_HEADER = ["Организация", "Закреплена за", "Номер карты", "КАЗС", "Дата", "Кол-во", "Вид топлива"]
+
+INSERT_CHUNK = 10_000
+
+
+def parse_size(value: str) -> int:
+    """
+    Размер набора: 10k, 100k, 1m или число строк
+    """
+    key = value.strip().lower()
+    if key in SIZES:
+        return SIZES[key]
+    multiplier = 1
+    if key.endswith("k"):
+        key, multiplier = key[:-1], 1_000
+    elif key.endswith("m"):
+        key, multiplier = key[:-1], 1_000_000
+    count = int(float(key) * multiplier)
+    if count <= 0:
+        raise ValueError(f"Некорректный размер набора: {value}")
+    return count
+
+
+@dataclass
+class Dataset:
+    """
+    Справочники бенчмарка в БД
+    """
+    provider_id: int
+    vehicles: Dict[str, int] = field(default_factory=dict)  # наименование -> id
+    cards: List[str] = field(default_factory=list)
+    card_vehicles: Dict[str, str] = field(default_factory=dict)  # номер карты -> наименование ТС
+    stations: Dict[str, int] = field(default_factory=dict)  # номер АЗС -> id
+
+
+def _plate(index: int) -> str:
+    letters = "АВЕКМНОРСТУХ"
+    return f"{letters[index % 12]}{index % 1000:03d}{letters[(index // 12) % 12]}{letters[(index // 144) % 12]}"
+
+
+def seed_reference_data(db: Session, transactions: int, seed: int = 42) -> Dataset:
+    """
+    Провайдер, ТС, карты и АЗС для набора из transactions транзакций
+
+    Повторный вызов использует уже созданные справочники
+    """
+    code = f"{BENCH_PROVIDER_CODE}_{transactions}"
+    other = db.query(Provider.code).filter(
+        Provider.code.like(f"{BENCH_PROVIDER_CODE}_%"), Provider.code != code
+    ).first()
+    if other is not None:
+        raise ValueError(f"БД содержит набор другого размера ({other.code}), пересоздайте ее (--reset)")
+
+    provider = db.query(Provider).filter(Provider.code == code).first()
+    if provider is None:
+        provider = Provider(name=f"Бенчмарк {transactions}", code=code, is_active=True)
+        db.add(provider)
+        db.commit()
+        db.refresh(provider)
+
+        rng = random.Random(seed)
+        vehicle_count = max(10, transactions // 100)
+        station_count = max(10, transactions // 500)
+        db.execute(insert(Vehicle), [
+            {
+                "original_name": f"Газель {_plate(i)} ({i})",
+                "license_plate": _plate(i),
+                "garage_number": str(1000 + i),
+                "is_validated": "valid",
+            }
+            for i in range(vehicle_count)
+        ])
+        db.execute(insert(GasStation), [
+            {
+                "provider_id": provider.id,
+                "original_name": f"АЗС №{i}",
+                "name": f"АЗС №{i}",
+                "azs_number": str(i),
+                "region": rng.choice(["Москва", "Тверская обл.", "Калужская обл."]),
+                "is_validated": "valid",
+            }
+            for i in range(1, station_count + 1)
+        ])
+        db.commit()
+
+        vehicle_ids = [vehicle_id for (vehicle_id,) in db.query(Vehicle.id).order_by(Vehicle.id)]
+        db.execute(insert(FuelCard), [
+            {
+                "card_number": f"70058300{i:08d}",
+                "provider_id": provider.id,
+                "vehicle_id": vehicle_ids[i % len(vehicle_ids)],
+                "is_active_assignment": True,
+            }
+            for i in range(vehicle_count * 2)
+        ])
+        db.commit()
+
+    dataset = Dataset(provider_id=provider.id)
+    dataset.vehicles = {name: vehicle_id for vehicle_id, name in db.query(Vehicle.id, Vehicle.original_name)}
+    vehicle_names = {vehicle_id: name for name, vehicle_id in dataset.vehicles.items()}
+    for card_number, vehicle_id in (
+        db.query(FuelCard.card_number, FuelCard.vehicle_id)
+        .filter(FuelCard.provider_id == provider.id)
+        .order_by(FuelCard.id)
+    ):
+        dataset.cards.append(card_number)
+        dataset.card_vehicles[card_number] = vehicle_names.get(vehicle_id)
+    dataset.stations = {
+        azs_number: station_id
+        for station_id, azs_number in db.query(GasStation.id, GasStation.azs_number)
+        .filter(GasStation.provider_id == provider.id)
+    }
+    return dataset
+
+
+def generate_transactions(
+    dataset: Dataset,
+    count: int,
+    seed: int = 0,
+    start: datetime = START_DATE,
+    source_file: str = "bench.xlsx"
+) -> Iterator[Dict]:
+    """
+    Транзакции в формате ExcelProcessor/ApiProviderService (вход create_transactions)
+    """
+    rng = random.Random(seed)
+    stations = list(dataset.stations)
+    period_seconds = PERIOD_DAYS * 86400
+    for _ in range(count):
+        card = rng.choice(dataset.cards)
+        azs_number = rng.choice(stations)
+        yield {
+            "transaction_date": start + timedelta(seconds=rng.randrange(period_seconds)),
+            "card_number": card,
+            "vehicle": dataset.card_vehicles.get(card),
+            "azs_number": azs_number,
+            "azs_original_name": f"АЗС №{azs_number}",
+            "product": rng.choice(PRODUCTS),
+            "operation_type": "Покупка",
+            "quantity": Decimal(rng.randrange(500, 8000)) / 100,
+            "currency": "RUB",
+            "exchange_rate": Decimal("1"),
+            "source_file": source_file,
+            "organization": rng.choice(ORGANIZATIONS),
+            "provider_id": dataset.provider_id,
+        }
+
+
+def seed_transactions(db: Session, dataset: Dataset, count: int, seed: int = 1) -> int:
+    """
+    Массовая вставка count транзакций (минуя дедупликацию) для сценариев чтения
+    """
+    inserted = 0
+    rows = []
+    for index, data in enumerate(generate_transactions(dataset, count, seed=seed, source_file=SEED_SOURCE_FILE)):
+        price = Decimal(50 + index % 15) + Decimal(index % 100) / 100
+        rows.append({
+            "transaction_date": data["transaction_date"],
+            "card_number": data["card_number"],
+            "vehicle": data["vehicle"],
+            "vehicle_id": dataset.vehicles.get(data["vehicle"]),
+            "azs_number": data["azs_number"],
+            "gas_station_id": dataset.stations[data["azs_number"]],
+            "provider_id": dataset.provider_id,
+            "product": data["product"],
+            "operation_type": "Покупка",
+            "quantity": data["quantity"],
+            "price": price,
+            "amount": (data["quantity"] * price).quantize(Decimal("0.01")),
+            "currency": "RUB",
+            "source_file": SEED_SOURCE_FILE,
+            "organization": data["organization"],
+        })
+        if len(rows) >= INSERT_CHUNK:
+            db.execute(insert(Transaction), rows)
+            db.commit()
+            inserted += len(rows)
+            rows = []
+    if rows:
+        db.execute(insert(Transaction), rows)
+        db.commit()
+        inserted += len(rows)
+    return inserted
+
+
+def write_excel(path: str, dataset: Dataset, count: int, seed: int = 2) -> str:
+    """
+    Файл отчета провайдера: строка заголовка отчета, шапка и count строк
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Отчет по транзакциям (бенчмарк)"])
+    sheet.append([])
+    sheet.append(EXCEL_HEADER)
+    for data in generate_transactions(dataset, count, seed=seed):
+        sheet.append([
+            data["organization"],
+            data["vehicle"],
+            data["card_number"],
+            data["azs_original_name"],
+            data["transaction_date"],
+            float(data["quantity"]),
+            data["product"],
+        ])
+    workbook.save(path)
+    return path
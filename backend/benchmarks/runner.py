@@ -0,0 +1,173 @@
+"""
+Запуск сценариев, формат результатов и сравнение с эталоном
+
+Формат результатов (JSON):
+    {
+      "version": 1,
+      "created_at": "...", "git_commit": "...", "python": "3.11.7",
+      "database": "postgresql", "size": 100000, "repeat": 3,
+      "results": {
+        "<сценарий>": {"rows": 100000, "runs": [...], "min_s": ..., "median_s": ...,
+                       "mean_s": ..., "max_s": ..., "rows_per_s": ...}
+      }
+    }
+
+Регрессия - отношение median_s текущего прогона к эталонному больше порога
+сценария из thresholds.json (сравниваются только прогоны одного размера).
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.datagen import SEED_SOURCE_FILE, seed_reference_data, seed_transactions
+from benchmarks.scenarios import BenchContext, SCENARIOS, Scenario
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+
+def prepare_context(session_factory: sessionmaker, size: int, workdir: str) -> BenchContext:
+    """
+    Справочники и size транзакций для сценариев чтения (создаются один раз)
+    """
+    from app.models import Transaction
+
+    db = session_factory()
+    try:
+        dataset = seed_reference_data(db, size)
+        seeded = db.query(Transaction).filter(Transaction.source_file == SEED_SOURCE_FILE).count()
+        if seeded != size:
+            db.query(Transaction).filter(Transaction.source_file == SEED_SOURCE_FILE).delete(
+                synchronize_session=False
+            )
+            db.commit()
+            seed_transactions(db, dataset, size)
+    finally:
+        db.close()
+    return BenchContext(session_factory=session_factory, dataset=dataset, size=size, workdir=workdir)
+
+
+def run_scenario(ctx: BenchContext, scenario: Scenario, repeat: int = 3, warmup: int = 1) -> Dict[str, Any]:
+    """
+    warmup прогонов без учета, затем repeat замеров
+    """
+    runs = []
+    rows = 0
+    for iteration in range(warmup + repeat):
+        state = scenario.prepare(ctx, iteration) if scenario.prepare else None
+        try:
+            started = time.perf_counter()
+            rows = scenario.run(ctx, state)
+            elapsed = time.perf_counter() - started
+        finally:
+            if scenario.cleanup:
+                scenario.cleanup(ctx, state)
+        if iteration >= warmup:
+            runs.append(elapsed)
+
+    median = statistics.median(runs)
+    return {
+        "description": scenario.description,
+        "rows": rows,
+        "runs": [round(value, 6) for value in runs],
+        "min_s": round(min(runs), 6),
+        "median_s": round(median, 6),
+        "mean_s": round(statistics.mean(runs), 6),
+        "max_s": round(max(runs), 6),
+        "rows_per_s": round(rows / median, 1) if median > 0 else None,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(
+    session_factory: sessionmaker,
+    size: int,
+    workdir: str,
+    names: Optional[Iterable[str]] = None,
+    repeat: int = 3,
+    warmup: int = 1,
+    progress=None
+) -> Dict[str, Any]:
+    """
+    Прогон сценариев names (все по умолчанию) на наборе из size транзакций
+    """
+    names = list(names or SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+    ctx = prepare_context(session_factory, size, workdir)
+    results = {}
+    for name in names:
+        results[name] = run_scenario(ctx, SCENARIOS[name], repeat=repeat, warmup=warmup)
+        if progress:
+            progress(name, results[name])
+
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "database": session_factory.kw["bind"].dialect.name,
+        "size": size,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def load_thresholds(path: str = DEFAULT_THRESHOLDS_PATH) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    thresholds: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """
+    Сравнение с эталоном
+
+    Returns:
+        Строки сравнения по общим сценариям: name, baseline_s, current_s, ratio,
+        threshold, regression
+    """
+    if current.get("size") != baseline.get("size"):
+        raise ValueError(
+            f"Размеры наборов различаются: {current.get('size')} и {baseline.get('size')}"
+        )
+    default = thresholds.get("default", 1.25)
+    per_scenario = thresholds.get("scenarios", {})
+
+    comparison = []
+    for name, result in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not reference.get("median_s"):
+            continue
+        ratio = result["median_s"] / reference["median_s"]
+        threshold = per_scenario.get(name, default)
+        comparison.append({
+            "name": name,
+            "baseline_s": reference["median_s"],
+            "current_s": result["median_s"],
+            "ratio": round(ratio, 3),
+            "threshold": threshold,
+            "regression": ratio > threshold,
+        })
+    return comparison
@@ -0,0 +1,303 @@
+"""
+Сценарии бенчмарков горячих путей
+
+Каждый сценарий: prepare (не замеряется) -> run (замеряется, возвращает число
+обработанных строк) -> cleanup (не замеряется, возвращает БД в исходное состояние).
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Transaction
+from app.services.excel_processor import ExcelProcessor
+from app.services.firebird_service import FirebirdService
+from app.services.normalization_service import (
+    clear_normalization_caches, extract_azs_number, extract_azs_numbers, normalize_card_number,
+    normalize_card_numbers, normalize_fuel, normalize_fuels, normalize_vehicle_name, normalize_vehicle_names
+)
+from app.services.transaction_batch_processor import TransactionBatchProcessor
+from app.services.transaction_service import TransactionService
+from benchmarks.datagen import Dataset, SEED_SOURCE_FILE, generate_transactions, write_excel
+
+FIREBIRD_COLUMNS = [
+    "ID", "CARD_NUM", "OWNER_NAME", "AZS_NAME", "AZS_CODE", "OPER_DATE", "FUEL_NAME",
+    "VOLUME", "PRICE", "SUMMA", "ORG_NAME", "REGION", "ADDRESS", "OPER_TYPE",
+]
+FIREBIRD_MAPPING = {
+    "card_number": "card_num",
+    "vehicle": "owner_name",
+    "azs_number": "azs_code",
+    "transaction_date": "oper_date",
+    "product": "fuel_name",
+    "quantity": "volume",
+    "amount": "summa",
+    "organization": "org_name",
+}
+
+
+@dataclass
+class BenchContext:
+    """
+    Общее состояние прогона: БД, справочники, размер набора, каталог файлов
+    """
+    session_factory: sessionmaker
+    dataset: Dataset
+    size: int
+    workdir: str
+
+    def session(self) -> Session:
+        return self.session_factory()
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    run: Callable[[BenchContext, Any], int]
+    prepare: Optional[Callable[[BenchContext, int], Any]] = None
+    cleanup: Optional[Callable[[BenchContext, Any], None]] = None
+
+
+def _max_transaction_id(ctx: BenchContext) -> int:
+    db = ctx.session()
+    try:
+        return db.query(func.max(Transaction.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def _delete_transactions_after(ctx: BenchContext, state: Dict) -> None:
+    db = ctx.session()
+    try:
+        db.query(Transaction).filter(Transaction.id > state["max_id"]).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _create_transactions(ctx: BenchContext, state: Dict) -> int:
+    db = ctx.session()
+    try:
+        created, skipped, _ = TransactionBatchProcessor(db).create_transactions(state["rows"])
+        return created + skipped
+    finally:
+        db.close()
+
+
+# Загрузка новых транзакций: дедупликация по БД + вставка
+def prepare_ingest_new(ctx: BenchContext, repeat: int) -> Dict:
+    return {
+        "max_id": _max_transaction_id(ctx),
+        "rows": list(generate_transactions(
+            ctx.dataset, ctx.size, seed=1000 + repeat, start=datetime(2027 + repeat, 1, 1),
+            source_file="bench_ingest.xlsx"
+        )),
+    }
+
+
+# Повторная загрузка уже загруженного набора: все строки - дубликаты
+def prepare_ingest_duplicates(ctx: BenchContext, repeat: int) -> Dict:
+    return {
+        "max_id": _max_transaction_id(ctx),
+        "rows": list(generate_transactions(ctx.dataset, ctx.size, seed=1, source_file=SEED_SOURCE_FILE)),
+    }
+
+
+def prepare_excel(ctx: BenchContext, repeat: int) -> str:
+    path = os.path.join(ctx.workdir, f"bench_{ctx.size}.xlsx")
+    if not os.path.exists(path):
+        write_excel(path, ctx.dataset, ctx.size)
+    return path
+
+
+def run_excel(ctx: BenchContext, path: str) -> int:
+    db = ctx.session()
+    try:
+        return len(ExcelProcessor(db).process_file(path, os.path.basename(path), ctx.dataset.provider_id))
+    finally:
+        db.close()
+
+
+class _InMemoryCursor:
+    def __init__(self, rows: List[tuple]):
+        self._rows = rows
+        self.description = [(name,) for name in FIREBIRD_COLUMNS]
+
+    def execute(self, query):
+        pass
+
+    def fetchall(self):
+        return self._rows
+
+
+class _InMemoryConnection:
+    def __init__(self, rows: List[tuple]):
+        self._rows = rows
+
+    def cursor(self):
+        return _InMemoryCursor(self._rows)
+
+    def close(self):
+        pass
+
+
+class InMemoryFirebirdService(FirebirdService):
+    """
+    FirebirdService с результатом запроса из памяти: замеряется преобразование
+    строк и маппинг полей read_data без сетевого обмена с Firebird
+    """
+
+    def __init__(self, db: Session, rows: List[tuple]):
+        super().__init__(db)
+        self._rows = rows
+
+    def connect(self, connection_settings):
+        return _InMemoryConnection(self._rows)
+
+
+def prepare_firebird(ctx: BenchContext, repeat: int) -> List[tuple]:
+    rows = []
+    for index, data in enumerate(generate_transactions(ctx.dataset, ctx.size, seed=3)):
+        rows.append((
+            index, data["card_number"], data["vehicle"], data["azs_original_name"], data["azs_number"],
+            data["transaction_date"], data["product"], data["quantity"], 55, data["quantity"] * 55,
+            data["organization"], "Москва", "ул. Ленина, 1", "Покупка",
+        ))
+    return rows
+
+
+def run_firebird(ctx: BenchContext, rows: List[tuple]) -> int:
+    db = ctx.session()
+    try:
+        service = InMemoryFirebirdService(db, rows)
+        return len(service.read_data({}, source_table="TRANSACTIONS", field_mapping=FIREBIRD_MAPPING))
+    finally:
+        db.close()
+
+
+# Нормализация значений загружаемых строк (вид топлива, ТС, карта, АЗС);
+# кэши очищаются перед каждым прогоном, чтобы замер включал первые вызовы
+def prepare_normalization(ctx: BenchContext, repeat: int) -> Dict[str, List]:
+    clear_normalization_caches()
+    columns = {"fuel": [], "vehicle": [], "card": [], "azs": []}
+    for index, data in enumerate(generate_transactions(ctx.dataset, ctx.size, seed=4)):
+        columns["fuel"].append(data["product"].lower() if index % 2 else data["product"])
+        columns["vehicle"].append(f"  {data['vehicle']} ")
+        card = data["card_number"]
+        columns["card"].append(f"{card[:4]} {card[4:8]} {card[8:12]} {card[12:]}" if index % 3 == 0 else card)
+        columns["azs"].append(data["azs_original_name"])
+    return columns
+
+
+def run_normalization(ctx: BenchContext, columns: Dict[str, List]) -> int:
+    for fuel, vehicle, card, azs in zip(columns["fuel"], columns["vehicle"], columns["card"], columns["azs"]):
+        normalize_fuel(fuel)
+        normalize_vehicle_name(vehicle)
+        normalize_card_number(card)
+        extract_azs_number(azs)
+    return len(columns["fuel"])
+
+
+def prepare_normalization_series(ctx: BenchContext, repeat: int) -> Dict[str, pd.Series]:
+    return {name: pd.Series(values, dtype=object) for name, values in prepare_normalization(ctx, repeat).items()}
+
+
+def run_normalization_series(ctx: BenchContext, columns: Dict[str, pd.Series]) -> int:
+    normalize_fuels(columns["fuel"])
+    normalize_vehicle_names(columns["vehicle"])
+    normalize_card_numbers(columns["card"])
+    extract_azs_numbers(columns["azs"])
+    return len(columns["fuel"])
+
+
+def _list_transactions(ctx: BenchContext, **filters) -> int:
+    db = ctx.session()
+    try:
+        items, _ = TransactionService(db).get_transactions(**filters)
+        return len(items)
+    finally:
+        db.close()
+
+
+def run_dashboard(ctx: BenchContext, state: Any) -> int:
+    from app.routers.dashboard import _collect_dashboard_stats
+
+    db = ctx.session()
+    try:
+        _collect_dashboard_stats(db, "year")
+        return ctx.size
+    finally:
+        db.close()
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario(
+            "ingest_new",
+            "TransactionBatchProcessor.create_transactions: новые транзакции",
+            run=_create_transactions,
+            prepare=prepare_ingest_new,
+            cleanup=_delete_transactions_after,
+        ),
+        Scenario(
+            "ingest_duplicates",
+            "TransactionBatchProcessor.create_transactions: повторная загрузка (дедупликация)",
+            run=_create_transactions,
+            prepare=prepare_ingest_duplicates,
+            cleanup=_delete_transactions_after,
+        ),
+        Scenario(
+            "excel_process_file",
+            "ExcelProcessor.process_file: разбор отчета провайдера",
+            run=run_excel,
+            prepare=prepare_excel,
+        ),
+        Scenario(
+            "firebird_mapping",
+            "FirebirdService.read_data: преобразование строк и маппинг полей",
+            run=run_firebird,
+            prepare=prepare_firebird,
+        ),
+        Scenario(
+            "normalization",
+            "normalize_fuel / normalize_vehicle_name / normalize_card_number / extract_azs_number по строкам",
+            run=run_normalization,
+            prepare=prepare_normalization,
+        ),
+        Scenario(
+            "normalization_series",
+            "Векторная нормализация колонок (normalize_fuels и др.)",
+            run=run_normalization_series,
+            prepare=prepare_normalization_series,
+        ),
+        Scenario(
+            "list_transactions_first_page",
+            "TransactionService.get_transactions: первая страница",
+            run=lambda ctx, state: _list_transactions(ctx, skip=0, limit=100),
+        ),
+        Scenario(
+            "list_transactions_deep_page",
+            "TransactionService.get_transactions: страница в середине списка",
+            run=lambda ctx, state: _list_transactions(ctx, skip=ctx.size // 2, limit=100),
+        ),
+        Scenario(
+            "list_transactions_by_card",
+            "TransactionService.get_transactions: фильтр по карте и периоду",
+            run=lambda ctx, state: _list_transactions(
+                ctx, card_number=ctx.dataset.cards[0], date_from=datetime(2025, 3, 1),
+                date_to=datetime(2025, 9, 30), limit=100
+            ),
+        ),
+        Scenario(
+            "dashboard_stats",
+            "Статистика дашборда (_collect_dashboard_stats, без кэша)",
+            run=run_dashboard,
+        ),
+    ]
+}
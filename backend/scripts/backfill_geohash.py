@@ -0,0 +1,37 @@
+"""
+Заполнение геохеша координат для существующих записей
+
+Примеры:
+    python scripts/backfill_geohash.py vehicle_locations
+    python scripts/backfill_geohash.py gas_stations --batch-size 1000
+"""
+import argparse
+import sys
+import os
+import time
+
+# Добавляем путь к backend в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.spatial_index_service import SpatialIndexService, GEOHASH_MODELS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение геохеша для записей с координатами")
+    parser.add_argument("table", choices=list(GEOHASH_MODELS))
+    parser.add_argument("--batch-size", type=int, default=10000, help="Записей в одном пакете")
+    parser.add_argument("--limit", type=int, default=None, help="Максимум обновляемых записей")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        updated = SpatialIndexService(db).backfill_geohash(args.table, args.batch_size, args.limit)
+        print(f"{args.table}: обновлено {updated} записей за {time.perf_counter() - started:.1f} с")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
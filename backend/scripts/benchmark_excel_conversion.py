@@ -0,0 +1,185 @@
+"""
+Бенчмарк преобразования пакетов Excel в транзакции (ExcelProcessor._process_dataframe_chunk)
+
+Генерирует книгу отчета провайдера, читает пакеты строк (iter_excel_batches,
+не замеряется) и сравнивает:
+- rows: прежнее построчное преобразование (df.iterrows, поэлементный разбор);
+- columnar: текущее преобразование по колонкам.
+Результаты обоих вариантов сверяются. С --end-to-end дополнительно замеряется
+ExcelProcessor.process_file целиком (чтение книги + преобразование).
+
+Примеры:
+    python scripts/benchmark_excel_conversion.py
+    python scripts/benchmark_excel_conversion.py --rows 50000 --repeat 5 --end-to-end
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Добавляем путь к backend в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from openpyxl import Workbook
+
+from app import services as app_services
+from app.services.excel_processor import ExcelProcessor
+from app.utils.excel_stream import iter_excel_batches, remap_column_indices
+
+HEADER = ["Организация", "Закреплена за", "Номер карты", "КАЗС", "Дата", "Кол-во", "Вид топлива"]
+FUELS = ["АИ-92", "аи 95", "ДТ", "Дизель зимний", "Газ метан", "Премиум-95"]
+FUEL_TYPE_MAPPING = {"Премиум-95": "АИ-95", "дизель зимний": "Дизельное топливо"}
+
+
+def write_workbook(path: str, rows: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Отчет по транзакциям"])
+    sheet.append([])
+    sheet.append(HEADER)
+    start = datetime(2025, 1, 1)
+    for i in range(rows):
+        moment = start + timedelta(minutes=rng.randrange(525600))
+        # Часть дат - строками, как в выгрузках некоторых провайдеров
+        date_value = moment.strftime("%d.%m.%Y %H:%M:%S") if i % 3 == 0 else moment
+        quantity = f"{rng.randrange(500, 8000) / 100}".replace(".", ",") if i % 5 == 0 else rng.randrange(500, 8000) / 100
+        sheet.append([
+            rng.choice(["ООО Ромашка", "АО Вектор"]),
+            f"Газель А{i % 997:03d}ВС",
+            str(7005830000000000 + i % 5000),
+            f"АЗС №{rng.randrange(1, 400)}",
+            date_value,
+            quantity,
+            rng.choice(FUELS),
+        ])
+    workbook.save(path)
+
+
+def legacy_process_chunk(df, file_name, column_indices, provider_id, fuel_type_mapping=None):
+    """
+    Прежнее построчное преобразование (для сравнения)
+    """
+    transactions = []
+    date_idx = column_indices.get("date", -1)
+    qty_idx = column_indices.get("quantity", -1)
+    fuel_idx = column_indices.get("fuel", -1)
+    for i, row in df.iterrows():
+        if pd.isna(row.iloc[date_idx]):
+            continue
+        date_value = app_services.parse_excel_date(row.iloc[date_idx])
+        if not date_value:
+            continue
+        qty_value = app_services.convert_to_decimal(row.iloc[qty_idx])
+        if not qty_value:
+            continue
+        user_idx = column_indices.get("user", -1)
+        card_idx = column_indices.get("card", -1)
+        kazs_idx = column_indices.get("kazs", -1)
+        org_idx = column_indices.get("org", -1)
+        user = str(row.iloc[user_idx]).strip() if user_idx >= 0 and not pd.isna(row.iloc[user_idx]) else ""
+        card = str(row.iloc[card_idx]).strip() if card_idx >= 0 and not pd.isna(row.iloc[card_idx]) else ""
+        kazs = str(row.iloc[kazs_idx]).strip() if kazs_idx >= 0 and not pd.isna(row.iloc[kazs_idx]) else ""
+        fuel = str(row.iloc[fuel_idx]).strip() if fuel_idx >= 0 and not pd.isna(row.iloc[fuel_idx]) else ""
+        org = str(row.iloc[org_idx]).strip() if org_idx >= 0 and not pd.isna(row.iloc[org_idx]) else ""
+        normalized_fuel = fuel
+        if fuel and fuel_type_mapping:
+            fuel_lower = fuel.strip().lower()
+            for source_name, target_name in fuel_type_mapping.items():
+                if source_name.strip().lower() == fuel_lower:
+                    normalized_fuel = target_name
+                    break
+            if normalized_fuel == fuel:
+                normalized_fuel = app_services.normalize_fuel(fuel)
+        elif fuel:
+            normalized_fuel = app_services.normalize_fuel(fuel)
+        transactions.append({
+            "transaction_date": date_value,
+            "card_number": card,
+            "vehicle": user,
+            "azs_number": app_services.extract_azs_number(kazs),
+            "azs_original_name": kazs,
+            "product": normalized_fuel,
+            "operation_type": "Покупка",
+            "quantity": qty_value,
+            "currency": "RUB",
+            "exchange_rate": Decimal("1"),
+            "source_file": file_name,
+            "organization": org,
+            "provider_id": provider_id
+        })
+    return transactions
+
+
+def time_variant(convert, batches, indices, repeat):
+    timings = []
+    result = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = []
+        for batch in batches:
+            result.extend(convert(batch, "bench.xlsx", indices, 1, FUEL_TYPE_MAPPING))
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк преобразования пакетов Excel в транзакции")
+    parser.add_argument("--rows", type=int, default=200000, help="Строк в книге")
+    parser.add_argument("--batch-size", type=int, default=ExcelProcessor.BATCH_SIZE, help="Строк в пакете")
+    parser.add_argument("--repeat", type=int, default=3, help="Замеров на вариант")
+    parser.add_argument("--file", default=None, help="Готовая книга (иначе генерируется)")
+    parser.add_argument("--end-to-end", action="store_true", help="Замерить ExcelProcessor.process_file целиком")
+    args = parser.parse_args()
+
+    path = args.file
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "bench_report.xlsx")
+        started = time.perf_counter()
+        write_workbook(path, args.rows)
+        print(f"Книга {path}: {args.rows} строк, {time.perf_counter() - started:.1f} с")
+
+    processor = ExcelProcessor(db=None)
+    header = pd.DataFrame([HEADER])
+    column_indices = processor._get_column_indices(header.iloc[0], {})
+    selected = [index for index in column_indices.values() if index >= 0]
+    indices = remap_column_indices(column_indices, selected)
+    started = time.perf_counter()
+    batches = list(iter_excel_batches(path, 3, selected, args.batch_size))
+    print(f"Чтение пакетов: {len(batches)} шт., {time.perf_counter() - started:.1f} с (не входит в замер)")
+
+    print(f"{'вариант':<10} {'median с':>10} {'min с':>10} {'строк/с':>12}")
+    results = {}
+    medians = {}
+    for name, convert in (("rows", legacy_process_chunk), ("columnar", processor._process_dataframe_chunk)):
+        timings, results[name] = time_variant(convert, batches, indices, args.repeat)
+        median = medians[name] = statistics.median(timings)
+        print(f"{name:<10} {median:>10.3f} {min(timings):>10.3f} {len(results[name]) / median:>12.0f}")
+
+    if results["rows"] != results["columnar"]:
+        mismatch = next(
+            (i for i, (a, b) in enumerate(zip(results["rows"], results["columnar"])) if a != b),
+            min(len(results["rows"]), len(results["columnar"]))
+        )
+        print(f"РАСХОЖДЕНИЕ результатов в строке {mismatch}")
+        sys.exit(1)
+    print(
+        f"Результаты совпадают ({len(results['columnar'])} транзакций), "
+        f"ускорение x{medians['rows'] / medians['columnar']:.1f}"
+    )
+
+    if args.end_to_end:
+        started = time.perf_counter()
+        transactions = processor.process_file(path, "bench_report.xlsx", provider_id=1, chunk_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        print(f"process_file: {elapsed:.2f} с, {len(transactions) / elapsed:.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Бенчмарк поиска ближайшей точки трека ТС на большом объеме GPS-данных
+
+Генерирует в отдельной схеме (по умолчанию bench_locations) синтетический трек:
+- flat: обычная таблица с B-tree индексом (vehicle_id, timestamp), как до секционирования;
+- partitioned: месячные секции, уникальный индекс (vehicle_id, timestamp) и BRIN по timestamp.
+Затем сравнивает прежний запрос (ORDER BY abs(extract(epoch ...))) и поиск
+двумя индексными запросами LIMIT 1 (до и после целевого времени).
+
+Примеры:
+    python scripts/benchmark_vehicle_locations.py                      # 100 млн точек
+    python scripts/benchmark_vehicle_locations.py --points 1000000 --queries 200
+    python scripts/benchmark_vehicle_locations.py --reuse --queries 5000
+"""
+import argparse
+import random
+import statistics
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Добавляем путь к backend в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine
+
+START = datetime(2025, 1, 1)
+
+OLD_QUERY = """
+    SELECT id, "timestamp" FROM {table}
+    WHERE vehicle_id = %(vehicle_id)s
+      AND "timestamp" BETWEEN %(time_from)s AND %(time_to)s
+    ORDER BY abs(extract(epoch FROM "timestamp" - %(target)s))
+    LIMIT 1
+"""
+
+PROBE_BEFORE = """
+    SELECT id, "timestamp" FROM {table}
+    WHERE vehicle_id = %(vehicle_id)s
+      AND "timestamp" <= %(target)s AND "timestamp" >= %(time_from)s
+    ORDER BY "timestamp" DESC
+    LIMIT 1
+"""
+
+PROBE_AFTER = """
+    SELECT id, "timestamp" FROM {table}
+    WHERE vehicle_id = %(vehicle_id)s
+      AND "timestamp" > %(target)s AND "timestamp" <= %(time_to)s
+    ORDER BY "timestamp" ASC
+    LIMIT 1
+"""
+
+
+def create_schema(cursor, schema: str, months: int, with_flat: bool):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {schema}")
+    columns = """
+        id bigserial,
+        vehicle_id integer NOT NULL,
+        "timestamp" timestamp NOT NULL,
+        latitude numeric(10, 8) NOT NULL,
+        longitude numeric(11, 8) NOT NULL,
+        speed numeric(6, 2),
+        source varchar(100) NOT NULL DEFAULT 'GLONASS'
+    """
+    if with_flat:
+        cursor.execute(f"CREATE TABLE {schema}.flat ({columns}, PRIMARY KEY (id))")
+    cursor.execute(
+        f'CREATE TABLE {schema}.partitioned ({columns}, PRIMARY KEY (id, "timestamp")) '
+        f'PARTITION BY RANGE ("timestamp")'
+    )
+    for month in range(months + 1):
+        month_start = datetime(START.year + (START.month - 1 + month) // 12, (START.month - 1 + month) % 12 + 1, 1)
+        month_end = datetime(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+        cursor.execute(
+            f"CREATE TABLE {schema}.partitioned_p{month_start:%Y%m} PARTITION OF {schema}.partitioned "
+            f"FOR VALUES FROM ('{month_start:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+        )
+
+
+def generate_points(cursor, schema: str, points: int, vehicles: int, months: int, with_flat: bool, batch_vehicles: int):
+    points_per_vehicle = max(points // vehicles, 1)
+    step_seconds = max(int(months * 30 * 86400 / points_per_vehicle), 1)
+    targets = ["partitioned"] + (["flat"] if with_flat else [])
+
+    for table in targets:
+        started = time.perf_counter()
+        for first in range(1, vehicles + 1, batch_vehicles):
+            last = min(first + batch_vehicles - 1, vehicles)
+            cursor.execute(f"""
+                INSERT INTO {schema}.{table} (vehicle_id, "timestamp", latitude, longitude, speed)
+                SELECT v,
+                       %(start)s::timestamp + make_interval(secs => i * %(step)s + (v %% %(step)s)),
+                       55 + random(),
+                       37 + random(),
+                       round((random() * 90)::numeric, 2)
+                FROM generate_series(%(first)s, %(last)s) AS v,
+                     generate_series(0, %(per_vehicle)s - 1) AS i
+            """, {"start": START, "step": step_seconds, "first": first, "last": last, "per_vehicle": points_per_vehicle})
+            print(f"  {table}: ТС {first}-{last} из {vehicles} ({time.perf_counter() - started:.0f} с)", flush=True)
+
+        if table == "flat":
+            cursor.execute(f'CREATE INDEX ON {schema}.flat (vehicle_id, "timestamp")')
+            cursor.execute(f'CREATE INDEX ON {schema}.flat ("timestamp")')
+        else:
+            cursor.execute(f'CREATE UNIQUE INDEX ON {schema}.partitioned (vehicle_id, "timestamp")')
+            cursor.execute(f'CREATE INDEX ON {schema}.partitioned USING brin ("timestamp")')
+        cursor.execute(f"ANALYZE {schema}.{table}")
+        print(f"  {table}: загружено и проиндексировано за {time.perf_counter() - started:.0f} с", flush=True)
+
+    return step_seconds
+
+
+def make_queries(count: int, vehicles: int, months: int, window_seconds: int):
+    span_seconds = months * 30 * 86400
+    queries = []
+    for _ in range(count):
+        target = START + timedelta(seconds=random.randint(0, span_seconds))
+        queries.append({
+            "vehicle_id": random.randint(1, vehicles),
+            "target": target,
+            "time_from": target - timedelta(seconds=window_seconds),
+            "time_to": target + timedelta(seconds=window_seconds),
+        })
+    return queries
+
+
+def run_old(cursor, table, params):
+    cursor.execute(OLD_QUERY.format(table=table), params)
+    return cursor.fetchone()
+
+
+def run_two_probes(cursor, table, params):
+    cursor.execute(PROBE_BEFORE.format(table=table), params)
+    before = cursor.fetchone()
+    cursor.execute(PROBE_AFTER.format(table=table), params)
+    after = cursor.fetchone()
+    if before is None or after is None:
+        return before or after
+    return after if after[1] - params["target"] < params["target"] - before[1] else before
+
+
+def measure(name, func, cursor, table, queries):
+    timings = []
+    for params in queries:
+        started = time.perf_counter()
+        func(cursor, table, params)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p = lambda q: timings[min(int(len(timings) * q), len(timings) - 1)]
+    print(
+        f"{name:<40} mean={statistics.mean(timings):8.3f} мс  p50={p(0.50):8.3f}  "
+        f"p95={p(0.95):8.3f}  p99={p(0.99):8.3f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска ближайшей точки трека ТС")
+    parser.add_argument("--points", type=int, default=100_000_000, help="Количество генерируемых точек")
+    parser.add_argument("--vehicles", type=int, default=5000, help="Количество ТС")
+    parser.add_argument("--months", type=int, default=12, help="Глубина истории в месяцах")
+    parser.add_argument("--queries", type=int, default=1000, help="Количество измеряемых запросов")
+    parser.add_argument("--window", type=int, default=3600, help="Окно поиска в секундах")
+    parser.add_argument("--batch-vehicles", type=int, default=100, help="ТС на один INSERT при генерации")
+    parser.add_argument("--schema", default="bench_locations")
+    parser.add_argument("--skip-flat", action="store_true", help="Не создавать несекционированную таблицу")
+    parser.add_argument("--reuse", action="store_true", help="Использовать ранее сгенерированные данные")
+    parser.add_argument("--keep", action="store_true", help="Не удалять схему после замеров")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Бенчмарк требует PostgreSQL")
+        sys.exit(1)
+
+    random.seed(42)
+    connection = engine.raw_connection()
+    connection.autocommit = True
+    cursor = connection.cursor()
+    with_flat = not args.skip_flat
+
+    try:
+        if not args.reuse:
+            print(f"Генерация {args.points:,} точек для {args.vehicles} ТС за {args.months} мес.", flush=True)
+            create_schema(cursor, args.schema, args.months, with_flat)
+            generate_points(cursor, args.schema, args.points, args.vehicles, args.months, with_flat, args.batch_vehicles)
+
+        queries = make_queries(args.queries, args.vehicles, args.months, args.window)
+        print(f"\nЗамер {args.queries} запросов (окно ±{args.window} с)")
+        tables = [f"{args.schema}.partitioned"] + ([f"{args.schema}.flat"] if with_flat else [])
+        for table in tables:
+            # Прогрев кэша на части запросов
+            for params in queries[:50]:
+                run_two_probes(cursor, table, params)
+            measure(f"{table}: ORDER BY abs(epoch)", run_old, cursor, table, queries)
+            measure(f"{table}: два запроса LIMIT 1", run_two_probes, cursor, table, queries)
+
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + PROBE_BEFORE.format(table=tables[0]), queries[0])
+        print("\nПлан запроса (до целевого времени):")
+        for (line,) in cursor.fetchall():
+            print("  " + line)
+    finally:
+        if not args.keep and not args.reuse:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        cursor.close()
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Нагрузочный тест read-heavy эндпоинтов API
+
+Несколько конкурентных клиентов (asyncio + httpx) в течение заданного времени
+запрашивают эндпоинты по кругу; в конце выводятся p50/p95/p99 задержки, RPS
+и количество ошибок по каждому эндпоинту. Результат можно сохранить в JSON
+и сравнить два прогона (например, до и после перевода роутеров на async engine).
+
+Ответы дашборда и списка транзакций кэшируются в Redis на 1-2 минуты: чтобы
+измерять работу с БД, запускайте сервер без доступного Redis (кэш отключается).
+
+Примеры:
+    python scripts/load_test_api.py --base-url http://localhost:8000 --username admin --password admin123
+    python scripts/load_test_api.py --concurrency 100 --duration 60 --output after.json
+    python scripts/load_test_api.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import os
+import time
+from typing import Dict, List, Optional
+
+# Добавляем путь к backend в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+DEFAULT_ENDPOINTS = [
+    "/api/v1/transactions?limit=100",
+    "/api/v1/transactions/stats/summary",
+    "/api/v1/dashboard/stats?period=month",
+    "/api/v1/dashboard/vehicles",
+    "/api/v1/dashboard/errors-warnings",
+    "/api/v1/logs/system?limit=100",
+    "/api/v1/logs/user-actions?limit=100",
+]
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Перцентиль (метод ближайшего ранга) для отсортированного списка
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+    }
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/api/v1/auth/login-json", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    endpoints: List[str],
+    offset: int,
+    deadline: float,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, int]
+):
+    index = offset
+    while time.perf_counter() < deadline:
+        endpoint = endpoints[index % len(endpoints)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(endpoint)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies[endpoint].append(time.perf_counter() - started)
+        else:
+            errors[endpoint] += 1
+
+
+async def run(args) -> Dict:
+    endpoints = args.endpoint or DEFAULT_ENDPOINTS
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        token: Optional[str] = args.token
+        if not token and args.username:
+            token = await login(client, args.username, args.password or "")
+        if token:
+            client.headers["Authorization"] = f"Bearer {token}"
+
+        # Прогрев: соединения с сервером и пул соединений с БД
+        for endpoint in endpoints:
+            await client.get(endpoint)
+
+        latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in endpoints}
+        errors: Dict[str, int] = {endpoint: 0 for endpoint in endpoints}
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*[
+            worker(client, endpoints, offset, deadline, latencies, errors)
+            for offset in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    return {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 1),
+        "total": summarize([value for values in latencies.values() for value in values], sum(errors.values()), elapsed),
+        "endpoints": {
+            endpoint: summarize(latencies[endpoint], errors[endpoint], elapsed)
+            for endpoint in endpoints
+        },
+    }
+
+
+def print_report(report: Dict):
+    print(f"{report['base_url']}: {report['concurrency']} клиентов, {report['duration_s']} с")
+    print(f"{'эндпоинт':<45} {'запросов':>9} {'ошибок':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for endpoint, stats in list(report["endpoints"].items()) + [("ВСЕГО", report["total"])]:
+        print(
+            f"{endpoint:<45} {stats['requests']:>9} {stats['errors']:>7} "
+            f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+        )
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(after_path, encoding="utf-8") as file:
+        after = json.load(file)
+    print(f"{'эндпоинт':<45} {'p99 до, мс':>11} {'p99 после, мс':>14} {'RPS до':>8} {'RPS после':>10}")
+    rows = [("ВСЕГО", before["total"], after["total"])] + [
+        (endpoint, stats, after["endpoints"][endpoint])
+        for endpoint, stats in before["endpoints"].items()
+        if endpoint in after["endpoints"]
+    ]
+    for endpoint, old, new in rows:
+        print(f"{endpoint:<45} {old['p99_ms']:>11} {new['p99_ms']:>14} {old['rps']:>8} {new['rps']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест read-heavy эндпоинтов (p50/p95/p99)")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50, help="Количество конкурентных клиентов")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность теста, секунд")
+    parser.add_argument("--timeout", type=float, default=60, help="Таймаут запроса, секунд")
+    parser.add_argument("--endpoint", action="append", help="Эндпоинт (можно указать несколько раз)")
+    parser.add_argument("--token", help="JWT токен")
+    parser.add_argument("--username", help="Пользователь для получения токена")
+    parser.add_argument("--password", help="Пароль пользователя")
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Сравнить два JSON результата")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
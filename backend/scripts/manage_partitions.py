@@ -0,0 +1,75 @@
+"""
+Скрипт обслуживания секционированных таблиц (телематика и журналы)
+
+Примеры:
+    python scripts/manage_partitions.py list vehicle_locations
+    python scripts/manage_partitions.py ensure vehicle_locations --months-ahead 6
+    python scripts/manage_partitions.py drop vehicle_locations --before 2024-01-01 --dry-run
+    python scripts/manage_partitions.py list system_logs
+    python scripts/manage_partitions.py retention
+"""
+import argparse
+import sys
+import os
+from datetime import date
+
+# Добавляем путь к backend в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.partition_service import PartitionService, PARTITIONED_TABLES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание месячных секций таблиц")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="Список секций таблицы")
+    list_parser.add_argument("table", choices=list(PARTITIONED_TABLES))
+
+    ensure_parser = subparsers.add_parser("ensure", help="Создать будущие секции")
+    ensure_parser.add_argument("table", choices=list(PARTITIONED_TABLES))
+    ensure_parser.add_argument("--months-ahead", type=int, default=None)
+
+    drop_parser = subparsers.add_parser("drop", help="Удалить секции, целиком лежащие раньше даты")
+    drop_parser.add_argument("table", choices=list(PARTITIONED_TABLES))
+    drop_parser.add_argument("--before", type=date.fromisoformat, required=True, help="Дата в формате YYYY-MM-DD")
+    drop_parser.add_argument("--dry-run", action="store_true", help="Только показать секции к удалению")
+
+    subparsers.add_parser("retention", help="Создать будущие секции и применить сроки хранения из настроек")
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = PartitionService(db)
+        if args.command == "list":
+            partitions = service.list_partitions(args.table)
+            if not partitions:
+                print(f"Таблица {args.table} не секционирована")
+            for p in partitions:
+                bounds = "DEFAULT" if p["is_default"] else f"{p['range_from']} .. {p['range_to']}"
+                print(f"{p['name']:<40} {bounds:<28} ~{p['estimated_rows']} строк")
+        elif args.command == "ensure":
+            created = service.ensure_partitions(args.table, months_ahead=args.months_ahead)
+            print(f"Создано секций: {len(created)}")
+            for name in created:
+                print(f"  + {name}")
+        elif args.command == "drop":
+            dropped = service.drop_partitions_before(args.table, args.before, dry_run=args.dry_run)
+            action = "К удалению" if args.dry_run else "Удалено"
+            print(f"{action} секций: {len(dropped)}")
+            for name in dropped:
+                print(f"  - {name}")
+        elif args.command == "retention":
+            report = service.run_maintenance()
+            for table, result in report.items():
+                print(f"{table}: создано {len(result['created'])}, удалено {len(result['dropped'])}")
+                if result.get("error"):
+                    print(f"  ошибка: {result['error']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,18 @@ Pytest fixtures для тестов GSM Converter Backend
 """
 import pytest
 import os
+import uuid
 from typing import Generator
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from fastapi.testclient import TestClient
 
 # Отключаем rate limiting для тестов (ДО импорта приложения)
 os.environ["ENABLE_RATE_LIMIT"] = "false"
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db, get_read_db, get_async_read_db
 from app.models import User
 from app.auth import get_password_hash
 
@@ -36,15 +38,22 @@ _rate_limit_patcher = patch('app.middleware.rate_limit.limiter.limit', side_effe
 _rate_limit_patcher.start()
 
 
-# Тестовая база данных в памяти
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
+# Тестовая база данных в памяти с общим кэшем: к ней подключаются и синхронный
+# engine, и асинхронный (aiosqlite) для эндпоинтов на get_async_db
+SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///file:{name}?mode=memory&cache=shared&uri=true"
 
 
 @pytest.fixture(scope="function")
-def test_engine():
+def test_database_url() -> str:
+    """URL отдельной базы в памяти для каждого теста"""
+    return SQLALCHEMY_TEST_DATABASE_URL.format(name=f"test_{uuid.uuid4().hex}")
+
+
+@pytest.fixture(scope="function")
+def test_engine(test_database_url):
     """Создание тестового engine для SQLite в памяти"""
     engine = create_engine(
-        SQLALCHEMY_TEST_DATABASE_URL,
+        test_database_url,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
@@ -65,7 +74,7 @@ def test_db(test_engine) -> Generator[Session, None, None]:
 
 
 @pytest.fixture(scope="function")
-def client(test_db: Session) -> Generator[TestClient, None, None]:
+def client(test_db: Session, test_database_url: str) -> Generator[TestClient, None, None]:
     """Создание тестового клиента FastAPI"""
     
     def override_get_db():
@@ -74,7 +83,22 @@ def client(test_db: Session) -> Generator[TestClient, None, None]:
         finally:
             pass
     
+    # NullPool: соединение aiosqlite закрывается вместе с сессией,
+    # база в памяти живет, пока открыто соединение test_engine
+    async_engine = create_async_engine(
+        test_database_url.replace("sqlite://", "sqlite+aiosqlite://", 1),
+        poolclass=NullPool,
+    )
+    
+    async def override_get_async_db():
+        async with AsyncSession(async_engine, autoflush=False, expire_on_commit=False) as session:
+            yield session
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # Реплики в тестах нет: чтение идет из той же базы
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
     
     # TestClient принимает app как позиционный аргумент
     client = TestClient(app, raise_server_exceptions=False)
@@ -0,0 +1,156 @@
+"""
+Тесты плана преобразования транзакций API и нормализованного маппинга топлива
+"""
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.models import ProviderTemplate
+from app.services.api_conversion_plan import _plans, get_conversion_plan, invalidate_conversion_plan
+from app.services.api_provider_service import ApiProviderService
+from app.utils.fuel_mapping import compile_fuel_mapping, match_fuel_type
+
+
+@pytest.fixture(autouse=True)
+def clear_plans():
+    invalidate_conversion_plan()
+    yield
+    invalidate_conversion_plan()
+
+
+def make_template(template_id: int = 1, fuel_type_mapping=None, **settings) -> ProviderTemplate:
+    settings.setdefault("provider_type", "gpn")
+    return ProviderTemplate(
+        id=template_id,
+        provider_id=5,
+        name="API шаблон",
+        connection_type="api",
+        connection_settings=json.dumps(settings),
+        field_mapping="{}",
+        fuel_type_mapping=json.dumps(fuel_type_mapping, ensure_ascii=False) if fuel_type_mapping else None
+    )
+
+
+class TestCompiledFuelMapping:
+    """Нормализованный маппинг дает тот же результат, что и match_fuel_type"""
+
+    def test_matches_like_match_fuel_type(self):
+        mapping = {
+            "ДТ": "Дизельное топливо",
+            "Аи-95": "Бензин АИ-95",
+            "AI 92": "Бензин АИ-92",
+            "бензин аи-95": "Бензин АИ-95 (дубль)",
+            "": "Пусто",
+            "Газ": "",
+        }
+        compiled = compile_fuel_mapping(mapping)
+        values = [
+            "ДТ", "дт", " Д-Т ", "АИ 95", "бензин АИ-95", "Бензин АИ-92", "ai-92",
+            "Газ", "Пусто", "АИ-98", "", " ",
+        ]
+        for value in values:
+            assert compiled.match(value) == match_fuel_type(value, mapping), value
+
+    def test_empty_mapping(self):
+        assert compile_fuel_mapping({}) is None
+        assert compile_fuel_mapping(None) is None
+        assert compile_fuel_mapping(["ДТ"]) is None
+
+
+class TestConversionPlan:
+    """План строится один раз и перестраивается при изменении шаблона"""
+
+    def test_plan_cached_until_template_changes(self):
+        template = make_template(currency="KZT", fuel_type_mapping={"ДТ": "Дизельное топливо"})
+        plan = get_conversion_plan(template)
+        assert plan.is_gpn
+        assert plan.currency == "KZT"
+        assert plan.fuel_mapping.match("дт") == "Дизельное топливо"
+        assert get_conversion_plan(template) is plan
+
+        template.connection_settings = json.dumps({"provider_type": "rncard"})
+        rebuilt = get_conversion_plan(template)
+        assert rebuilt is not plan
+        assert not rebuilt.is_gpn
+        assert rebuilt.currency == "RUB"
+
+        invalidate_conversion_plan(template.id)
+        assert template.id not in _plans
+
+    def test_accessors_learned_from_first_payload(self):
+        plan = get_conversion_plan(make_template())
+        fields = plan.accessors({"timestamp": "2025-03-01T10:00:00", "qty": 10, "sum": 500})
+        assert fields["date"] == ("timestamp",)
+        assert fields["volume"] == ("qty",)
+        assert fields["product"] == ()
+        assert plan.accessors({"qty": 1}) is fields
+
+        # Транзакция с новыми ключами расширяет изученный набор
+        extended = plan.accessors({"timestamp": "2025-03-01T10:00:00", "product_name": "ДТ"})
+        assert extended["product"] == ("product_name",)
+        assert extended["volume"] == ("qty",)
+
+    def test_conversion_with_different_payload_shapes(self):
+        service = ApiProviderService(None)
+        template = make_template(currency="KZT")
+        plan = get_conversion_plan(template)
+
+        gpn = service._convert_to_system_format(
+            {"timestamp": "2025-03-01T10:00:00", "qty": -10, "sum": -500, "poi_id": 17, "product_name": " ДТ "},
+            template, "7001", plan
+        )
+        assert gpn["quantity"] == Decimal("10")
+        assert gpn["amount"] == Decimal("500")
+        assert gpn["operation_type"] == "Возврат"
+        assert gpn["azs_number"] == "17"
+        assert gpn["product"] == "ДТ"
+        assert gpn["currency"] == "KZT"
+
+        # Ключи, которых не было в первой транзакции, тоже учитываются
+        rncard = service._convert_to_system_format(
+            {"Date": "2025-03-02T11:00:00", "Value": 20, "Sum": 1000, "AZS": "42", "GName": "АИ-95",
+             "Region": "Иркутская обл.", "PosCode": "P1", "currency": "RUB"},
+            template, "7002", plan
+        )
+        assert rncard["quantity"] == Decimal("20")
+        assert rncard["amount"] == Decimal("1000")
+        assert rncard["operation_type"] == "Покупка"
+        assert rncard["azs_number"] == "42"
+        assert rncard["product"] == "АИ-95"
+        assert rncard["region"] == "Иркутская обл."
+        assert rncard["location_code"] == "P1"
+        assert rncard["currency"] == "RUB"
+
+
+def test_template_update_invalidates_conversion_plan(client, test_db):
+    """Изменение шаблона удаляет закэшированный план преобразования"""
+    from app.auth import require_auth_if_enabled
+    from app.main import app
+    from app.models import Provider
+
+    provider = Provider(name="GPN", code="GPN_PLAN", is_active=True)
+    test_db.add(provider)
+    test_db.commit()
+    template = ProviderTemplate(
+        provider_id=provider.id,
+        name="API",
+        connection_type="api",
+        connection_settings=json.dumps({"provider_type": "gpn"}),
+        field_mapping="{}"
+    )
+    test_db.add(template)
+    test_db.commit()
+
+    get_conversion_plan(template)
+    assert template.id in _plans
+    app.dependency_overrides[require_auth_if_enabled] = lambda: None
+    try:
+        response = client.put(
+            f"/api/v1/templates/{template.id}",
+            json={"fuel_type_mapping": {"ДТ": "Дизельное топливо"}}
+        )
+    finally:
+        app.dependency_overrides.pop(require_auth_if_enabled, None)
+    assert response.status_code == 200
+    assert template.id not in _plans
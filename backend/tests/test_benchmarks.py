@@ -0,0 +1,94 @@
+"""
+Тесты пакета бенчмарков (генератор, запуск сценариев, сравнение с эталоном)
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Provider, Transaction
+from benchmarks.__main__ import prepare_database
+from benchmarks.datagen import parse_size
+from benchmarks.runner import compare_results, load_thresholds, run_suite
+from benchmarks.scenarios import SCENARIOS
+
+
+@pytest.fixture
+def bench_session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def test_parse_size():
+    assert parse_size("10k") == 10_000
+    assert parse_size("1M") == 1_000_000
+    assert parse_size("2.5k") == 2_500
+    assert parse_size("300") == 300
+    with pytest.raises(ValueError):
+        parse_size("0")
+
+
+def test_run_suite_small_dataset(bench_session_factory, tmp_path):
+    results = run_suite(bench_session_factory, 200, str(tmp_path), repeat=1, warmup=0)
+
+    assert results["size"] == 200
+    assert results["database"] == "sqlite"
+    assert set(results["results"]) == set(SCENARIOS)
+    for name in (
+        "ingest_new", "ingest_duplicates", "excel_process_file", "firebird_mapping",
+        "normalization", "normalization_series",
+    ):
+        assert results["results"][name]["rows"] == 200
+        assert results["results"][name]["median_s"] > 0
+    assert results["results"]["list_transactions_first_page"]["rows"] == 100
+
+    # Сценарии загрузки не оставляют строк, набор для чтения создается один раз
+    db = bench_session_factory()
+    try:
+        assert db.query(Transaction).count() == 200
+    finally:
+        db.close()
+
+
+def test_compare_results_flags_regressions():
+    baseline = {"size": 1000, "results": {
+        "ingest_new": {"median_s": 1.0},
+        "dashboard_stats": {"median_s": 0.1},
+    }}
+    current = {"size": 1000, "results": {
+        "ingest_new": {"median_s": 1.1},
+        "dashboard_stats": {"median_s": 0.2},
+        "firebird_mapping": {"median_s": 0.5},
+    }}
+
+    comparison = {row["name"]: row for row in compare_results(current, baseline, load_thresholds())}
+    assert set(comparison) == {"ingest_new", "dashboard_stats"}
+    assert not comparison["ingest_new"]["regression"]
+    assert comparison["dashboard_stats"]["regression"]
+    assert comparison["dashboard_stats"]["ratio"] == 2.0
+
+    with pytest.raises(ValueError):
+        compare_results({**current, "size": 10}, baseline, load_thresholds())
+
+
+def test_prepare_database_refuses_foreign_data_before_reset(tmp_path):
+    url = f"sqlite:///{tmp_path / 'prod.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Provider(name="Рабочий провайдер", code="WORK"))
+    db.commit()
+    db.close()
+
+    with pytest.raises(SystemExit):
+        prepare_database(url, reset=True)
+
+    # --reset не должен удалить таблицы рабочей БД
+    db = sessionmaker(bind=engine)()
+    try:
+        assert db.query(Provider).filter(Provider.code == "WORK").count() == 1
+    finally:
+        db.close()
+    engine.dispose()
@@ -0,0 +1,140 @@
+"""
+Тесты порционного удаления транзакций
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import AnomalyStatsDaily, FuelCardAnalysisResult, Provider, Transaction
+from app.repositories.anomaly_stats_repository import AnomalyStatsRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.utils import chunked_delete
+from app.utils.chunked_delete import delete_in_chunks, truncate_tables
+
+
+@pytest.fixture
+def providers(test_db: Session):
+    first = Provider(name="Провайдер 1", code="DEL_1", is_active=True)
+    second = Provider(name="Провайдер 2", code="DEL_2", is_active=True)
+    test_db.add_all([first, second])
+    test_db.commit()
+    return first, second
+
+
+def add_transactions(db: Session, provider_id: int, count: int, month: int = 1):
+    transactions = [
+        Transaction(
+            transaction_date=datetime(2025, month, 1 + i % 28, 10, 0),
+            provider_id=provider_id,
+            organization_id=7,
+            quantity=10,
+            product="ДТ"
+        )
+        for i in range(count)
+    ]
+    db.add_all(transactions)
+    db.commit()
+    return transactions
+
+
+class TestDeleteInChunks:
+    """Удаление порциями с фиксацией каждой порции и ограничением скорости"""
+
+    def test_deletes_matching_rows_in_chunks(self, test_db: Session, providers):
+        first, second = providers
+        add_transactions(test_db, first.id, 10)
+        add_transactions(test_db, second.id, 4)
+
+        progress = []
+        deleted = delete_in_chunks(
+            test_db, Transaction, [Transaction.provider_id == first.id], chunk_size=3, on_chunk=progress.append
+        )
+
+        assert deleted == 10
+        assert progress == [3, 6, 9, 10]
+        assert test_db.query(Transaction).filter(Transaction.provider_id == first.id).count() == 0
+        assert test_db.query(Transaction).filter(Transaction.provider_id == second.id).count() == 4
+
+    def test_throttled_to_target_rate(self, test_db: Session, providers, monkeypatch):
+        add_transactions(test_db, providers[0].id, 9)
+        delays = []
+        monkeypatch.setattr(chunked_delete.time, "sleep", delays.append)
+
+        assert delete_in_chunks(test_db, Transaction, chunk_size=3, max_rows_per_second=10) == 9
+        # После каждой полной порции - пауза до момента, когда скорость не превышает 10 строк/с
+        # (sleep подменен, поэтому паузы накапливаются: ~0.3, ~0.6, ~0.9 с)
+        assert len(delays) == 3
+        assert all(0 < delay <= 0.3 * (index + 1) for index, delay in enumerate(delays))
+
+    def test_truncate_unavailable_on_sqlite(self, test_db: Session):
+        assert truncate_tables(test_db, [Transaction.__tablename__]) is False
+
+
+class TestTransactionDeletion:
+    """Удаление транзакций провайдера вместе с производными данными"""
+
+    def test_delete_by_provider_and_period_keeps_anomaly_stats_in_sync(self, test_db: Session, providers):
+        first, second = providers
+        january = add_transactions(test_db, first.id, 5, month=1)
+        february = add_transactions(test_db, first.id, 3, month=2)
+        other = add_transactions(test_db, second.id, 2, month=1)
+        for transaction in january + february + other:
+            test_db.add(FuelCardAnalysisResult(
+                transaction_id=transaction.id,
+                analysis_date=datetime(2025, 3, 1, 12, 0),
+                match_status="no_refuel",
+                is_anomaly=True,
+                anomaly_type="fuel_theft"
+            ))
+        test_db.commit()
+        stats_repo = AnomalyStatsRepository(test_db)
+        stats_repo.rebuild()
+        assert test_db.query(func.sum(AnomalyStatsDaily.anomaly_count)).scalar() == 10
+
+        deleted = TransactionRepository(test_db).delete_by_provider_and_period(
+            first.id, date_from=datetime(2025, 1, 1), date_to=datetime(2025, 1, 31, 23, 59, 59), chunk_size=2
+        )
+
+        assert deleted == 5
+        assert test_db.query(Transaction).count() == 5
+        assert test_db.query(FuelCardAnalysisResult).count() == 5
+        counters = test_db.query(AnomalyStatsDaily).all()
+        assert [(row.day, row.anomaly_count) for row in counters] == [(date(2025, 3, 1), 5)]
+
+        # Счетчики совпадают с полным пересчетом
+        stats_repo.rebuild()
+        assert test_db.query(func.sum(AnomalyStatsDaily.anomaly_count)).scalar() == 5
+
+    def test_delete_all_falls_back_to_chunks(self, test_db: Session, providers):
+        add_transactions(test_db, providers[0].id, 7)
+        add_transactions(test_db, providers[1].id, 3)
+
+        progress = []
+        assert TransactionRepository(test_db).delete_all(chunk_size=4, on_chunk=progress.append) == 10
+        assert progress == [4, 8, 10]
+        assert test_db.query(Transaction).count() == 0
+
+
+def test_clear_by_provider_endpoint(client, test_db: Session, providers):
+    from app.auth import require_admin
+    from app.main import app
+
+    first, second = providers
+    add_transactions(test_db, first.id, 6)
+    add_transactions(test_db, second.id, 2)
+
+    app.dependency_overrides[require_admin] = lambda: None
+    try:
+        response = client.delete(
+            "/api/v1/transactions/clear-by-provider",
+            params={"provider_id": first.id, "confirm": "true"}
+        )
+    finally:
+        app.dependency_overrides.pop(require_admin, None)
+
+    assert response.status_code == 200
+    assert response.json()["deleted_count"] == 6
+    test_db.expire_all()
+    assert test_db.query(Transaction).count() == 2
@@ -0,0 +1,92 @@
+"""
+Тесты асинхронного подключения к БД и чтения с реплики
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.database import ReplicaLagMonitor, make_async_url
+from app.models import Transaction
+
+
+class TestAsyncDatabase:
+    """Тесты асинхронного engine и эндпоинтов на get_async_db"""
+
+    def test_make_async_url(self):
+        """URL синхронного драйвера заменяется на асинхронный"""
+        assert make_async_url("postgresql://user:secret@db:5432/gsm_db") == "postgresql+asyncpg://user:secret@db:5432/gsm_db"
+        assert make_async_url("postgresql+psycopg2://user@db/gsm_db") == "postgresql+asyncpg://user@db/gsm_db"
+        assert make_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+    def test_make_async_url_unsupported(self):
+        """Для БД без асинхронного драйвера - ошибка"""
+        with pytest.raises(ValueError):
+            make_async_url("mssql+pyodbc://user@host/db")
+
+    def test_async_endpoint_reads_committed_data(self, client, test_db):
+        """Эндпоинт на асинхронной сессии видит данные, записанные синхронной сессией"""
+        transaction = Transaction(
+            transaction_date=datetime(2026, 1, 15, 10, 30),
+            card_number="1234567890",
+            quantity=Decimal("40.5"),
+            product="АИ-95"
+        )
+        test_db.add(transaction)
+        test_db.commit()
+
+        response = client.get(f"/api/v1/transactions/{transaction.id}")
+        assert response.status_code == 200
+        assert response.json()["card_number"] == "1234567890"
+
+        assert client.get("/api/v1/transactions/999999").status_code == 404
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReplicaLagMonitor:
+    """Выбор реплики по отставанию"""
+
+    def test_lag_threshold_and_caching(self):
+        clock = FakeClock()
+        lags = [1.0, 45.0]
+        monitor = ReplicaLagMonitor(probe=lambda: lags.pop(0), max_lag_seconds=30, check_interval=10, clock=clock)
+
+        assert monitor.is_usable() is True
+        assert monitor.last_lag == 1.0
+        # В пределах интервала проверки реплика не опрашивается повторно
+        clock.now = 5
+        assert monitor.is_usable() is True
+        assert lags == [45.0]
+
+        clock.now = 10
+        assert monitor.is_usable() is False
+        assert monitor.last_lag == 45.0
+
+    def test_probe_error_falls_back_to_primary(self):
+        clock = FakeClock()
+
+        def probe():
+            raise ConnectionError("replica is down")
+
+        monitor = ReplicaLagMonitor(probe=probe, max_lag_seconds=30, check_interval=10, clock=clock)
+        assert monitor.is_usable() is False
+        assert monitor.last_lag is None
+        assert not monitor.needs_check()
+
+    def test_read_dependency_without_replica_uses_primary(self):
+        from app import database
+
+        assert database.read_engine is None
+        assert database.replica_available() is False
+        session = next(database.get_read_db())
+        try:
+            assert session.get_bind() is database.engine
+        finally:
+            session.close()
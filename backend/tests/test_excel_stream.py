@@ -0,0 +1,126 @@
+"""
+Тесты потокового чтения Excel файлов
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from sqlalchemy.orm import Session
+
+from app.utils.excel_stream import iter_excel_batches, read_excel_head, remap_column_indices
+
+HEADER = ["Организация", "Закреплена за", "Номер карты", "КАЗС", "Дата", "Кол-во", "Вид топлива", "Комментарий"]
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    """Файл с двумя строками заголовка отчета, шапкой и 25 строками данных"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Отчет по транзакциям"])
+    sheet.append([])
+    sheet.append(HEADER)
+    for i in range(25):
+        sheet.append([
+            "ООО Ромашка", f"Газель А{i:03d}ВС", 7005830000000000.0 + i, f"АЗС №{i}",
+            datetime(2025, 3, 1, 8, i), 40.5 + i, "АИ-92", "x" * 10
+        ])
+    sheet.append([None] * len(HEADER))
+    path = tmp_path / "report.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+def test_read_head_matches_pandas(workbook_path):
+    head = read_excel_head(workbook_path, 10)
+    expected = pd.read_excel(workbook_path, header=None, nrows=10, engine="openpyxl")
+    assert head.shape == expected.shape
+    assert list(head.iloc[2]) == HEADER
+    assert head.iloc[3, 2] == expected.iloc[3, 2] == 7005830000000000
+
+
+def test_batches_are_column_pruned(workbook_path):
+    batches = list(iter_excel_batches(workbook_path, 3, [4, 5, -1, 2], batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert list(batches[0].columns) == [2, 4, 5]
+    assert batches[0].index[0] == 3
+    assert batches[-1].iloc[-1][5] == pytest.approx(64.5)
+    assert remap_column_indices({"card": 2, "date": 4, "org": -1}, [4, 5, -1, 2]) == {
+        "card": 0, "date": 1, "org": -1
+    }
+
+
+def test_analyze_template_structure_reads_header(workbook_path):
+    from app.services import analyze_template_structure
+    
+    analysis = analyze_template_structure(workbook_path)
+    assert analysis["header_row"] == 2
+    assert analysis["data_start_row"] == 3
+    assert analysis["field_mapping"]["date"] == "Дата"
+
+
+def test_excel_processor_streams_batches(test_db: Session, workbook_path):
+    from app.services.excel_processor import ExcelProcessor
+    
+    processor = ExcelProcessor(test_db)
+    batches = list(processor.iter_transaction_batches(workbook_path, "report.xlsx", batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    
+    transactions = processor.process_file(workbook_path, "report.xlsx")
+    assert len(transactions) == 25
+    first = transactions[0]
+    assert first["card_number"] == "7005830000000000"
+    assert first["transaction_date"] == datetime(2025, 3, 1, 8, 0)
+    assert first["organization"] == "ООО Ромашка"
+    assert float(first["quantity"]) == pytest.approx(40.5)
+
+
+def test_columnar_chunk_conversion_matches_row_helpers(test_db: Session):
+    """Колоночное преобразование пакета дает те же значения, что и построчные функции"""
+    from decimal import Decimal
+    from app.services import convert_to_decimal, extract_azs_number, normalize_fuel, parse_excel_date
+    from app.services.excel_processor import ExcelProcessor
+
+    raw_dates = [
+        datetime(2025, 3, 1, 8, 0), "02.03.2025 10:15:30", " 03.03.2025  11:20", 45000,
+        45000.5, "2025-03-04T09:00:00", None, "не дата", 0,
+    ]
+    df = pd.DataFrame({
+        0: ["ООО Ромашка", None, "  АО Вектор ", "ООО Ромашка", "x", "x", "x", "x", "x"],
+        1: [7005830000000000, 7005830000000001, 42, "7005 8300", None, "A", "B", "C", "D"],
+        2: ["АЗС №12", "Газпром АЗС-456", "Без номера", None, "АЗС 7", "АЗС 7", "АЗС 7", "АЗС 7", "АЗС 7"],
+        3: raw_dates,
+        4: [40.5, "12,75", 10, 0, 3.25, None, 5, 5, 5],
+        5: ["аи 95", "ДТ", "Премиум", "премиум ", None, "АИ-92", "АИ-92", "АИ-92", "АИ-92"],
+    }, index=range(10, 19))
+    indices = {"org": 0, "card": 1, "kazs": 2, "date": 3, "quantity": 4, "fuel": 5, "user": -1}
+    mapping = {" ПРЕМИУМ": "АИ-100", "премиум": "АИ-98"}
+
+    transactions = ExcelProcessor(test_db)._process_dataframe_chunk(df, "f.xlsx", indices, 3, mapping)
+
+    expected_dates = [parse_excel_date(value) for value in raw_dates]
+    assert [t["transaction_date"] for t in transactions] == [
+        expected_dates[i] for i in (0, 1, 2, 4)
+    ]
+    assert expected_dates[5] is not None  # строка ISO разбирается, но количество пустое
+    assert [t["quantity"] for t in transactions] == [
+        convert_to_decimal(40.5), Decimal("12.75"), Decimal("10"), Decimal("3.25")
+    ]
+    assert [t["card_number"] for t in transactions] == ["7005830000000000", "7005830000000001", "42", ""]
+    assert [t["organization"] for t in transactions] == ["ООО Ромашка", "", "АО Вектор", "x"]
+    assert [t["azs_number"] for t in transactions] == [
+        extract_azs_number("АЗС №12"), "456", "Без номера", "7"
+    ]
+    assert [t["azs_original_name"] for t in transactions] == ["АЗС №12", "Газпром АЗС-456", "Без номера", "АЗС 7"]
+    assert [t["product"] for t in transactions] == [normalize_fuel("аи 95"), normalize_fuel("ДТ"), "АИ-100", ""]
+    assert all(t["vehicle"] == "" and t["provider_id"] == 3 for t in transactions)
+
+
+def test_columnar_date_parsing_typed_columns():
+    from app.services.data_parsing_service import parse_excel_dates
+
+    typed = pd.Series(pd.to_datetime(["2025-03-01 08:00", None]))
+    assert parse_excel_dates(typed) == [datetime(2025, 3, 1, 8, 0), None]
+    serials = pd.Series([45000.0, 0.0, float("nan")])
+    assert parse_excel_dates(serials) == [datetime(2023, 3, 15), None, None]
@@ -250,3 +250,229 @@ class TestFuelCardAnalysisUpload:
         )
         assert response.status_code in [401, 403]
 
+
+
+async def _stream(*pieces: bytes):
+    """Имитация потокового тела запроса"""
+    for piece in pieces:
+        yield piece
+
+
+class TestTelematicsIngest:
+    """Тесты для потоковой загрузки телематики (NDJSON/CSV)"""
+    
+    @pytest.fixture
+    def vehicle(self, test_db: Session) -> Vehicle:
+        vehicle = Vehicle(original_name="Камаз А123БВ")
+        test_db.add(vehicle)
+        test_db.commit()
+        test_db.refresh(vehicle)
+        return vehicle
+    
+    @pytest.mark.asyncio
+    async def test_ingest_locations_ndjson(self, test_db: Session, vehicle: Vehicle):
+        """Загрузка NDJSON с разбиением строк между кусками потока"""
+        from app.models import VehicleLocation
+        from app.services.telematics_ingest_service import TelematicsIngestService
+        
+        body = (
+            f'{{"vehicle_id": {vehicle.id}, "timestamp": "2025-01-01T10:00:00", "latitude": 55.75, "longitude": 37.61}}\n'
+            f'{{"vehicle_id": {vehicle.id}, "timestamp": "2025-01-01T10:01:00+03:00", "latitude": "55.76", "longitude": "37.62", "speed": 40}}\n'
+        ).encode()
+        
+        stats = await TelematicsIngestService(test_db).ingest(
+            "locations", _stream(body[:50], body[50:]), "ndjson"
+        )
+        
+        assert stats["received"] == 2
+        assert stats["inserted"] == 2
+        assert stats["invalid"] == 0
+        locations = test_db.query(VehicleLocation).order_by(VehicleLocation.timestamp).all()
+        assert [loc.source for loc in locations] == ["GLONASS", "GLONASS"]
+        assert locations[1].timestamp == datetime(2025, 1, 1, 10, 1)
+    
+    @pytest.mark.asyncio
+    async def test_ingest_is_idempotent(self, test_db: Session, vehicle: Vehicle):
+        """Повторная загрузка тех же точек не создает дубликатов"""
+        from app.models import VehicleLocation
+        from app.services.telematics_ingest_service import TelematicsIngestService
+        
+        body = (
+            "vehicle_id,timestamp,latitude,longitude\n"
+            f"{vehicle.id},2025-01-01 10:00:00,55.75,37.61\n"
+            f"{vehicle.id},2025-01-01 10:00:00,55.75,37.61\n"
+            f"{vehicle.id},2025-01-01 10:05:00,55.77,37.63\n"
+        ).encode()
+        
+        first = await TelematicsIngestService(test_db).ingest("locations", _stream(body), "csv")
+        second = await TelematicsIngestService(test_db).ingest("locations", _stream(body), "csv")
+        
+        assert first["inserted"] == 2
+        assert first["duplicates"] == 1
+        assert second["inserted"] == 0
+        assert second["duplicates"] == 3
+        assert test_db.query(VehicleLocation).count() == 2
+    
+    @pytest.mark.asyncio
+    async def test_ingest_rejects_invalid_rows(self, test_db: Session, vehicle: Vehicle):
+        """Невалидные строки отклоняются с номером строки, остальные загружаются"""
+        from app.models import VehicleRefuel
+        from app.services.telematics_ingest_service import TelematicsIngestService
+        
+        body = (
+            "vehicle_id,refuel_date,quantity,source_system\n"
+            f"{vehicle.id},2025-01-01 10:00:00,50.5,GLONASS\n"
+            f"{vehicle.id},not-a-date,50,GLONASS\n"
+            f"{vehicle.id},2025-01-01 11:00:00,-1,GLONASS\n"
+            "999999,2025-01-01 12:00:00,10,GLONASS\n"
+            f"{vehicle.id},2025-01-01 13:00:00,10\n"
+            f"{vehicle.id},2025-01-01 14:00:00,20,\n"
+        ).encode()
+        
+        stats = await TelematicsIngestService(test_db).ingest("refuels", _stream(body), "csv")
+        
+        assert stats["received"] == 6
+        assert stats["inserted"] == 1
+        assert stats["invalid"] == 5
+        assert sorted(error["row"] for error in stats["errors"]) == [3, 4, 5, 6, 7]
+        assert test_db.query(VehicleRefuel).count() == 1
+    
+    def test_resolve_ingest_format(self):
+        """Определение формата по параметру и Content-Type"""
+        from app.services.telematics_ingest_service import resolve_ingest_format
+        
+        assert resolve_ingest_format("text/csv; charset=utf-8") == "csv"
+        assert resolve_ingest_format("application/x-ndjson") == "ndjson"
+        assert resolve_ingest_format("text/csv", "ndjson") == "ndjson"
+        with pytest.raises(ValueError):
+            resolve_ingest_format("application/xml")
+    
+    def test_ingest_locations_requires_auth(self, client: TestClient):
+        """Проверка что потоковая загрузка требует аутентификации"""
+        response = client.post(
+            "/api/v1/fuel-card-analysis/locations/ingest",
+            content=b"",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        assert response.status_code in [401, 403]
+
+
+class TestNearestLocation:
+    """Тесты поиска ближайшей точки трека двумя запросами LIMIT 1"""
+    
+    @pytest.fixture
+    def track(self, test_db: Session) -> Vehicle:
+        from app.models import VehicleLocation
+        
+        vehicle = Vehicle(original_name="Газель В456ГД")
+        test_db.add(vehicle)
+        test_db.commit()
+        base = datetime(2025, 3, 1, 12, 0, 0)
+        for offset in (-240, -60, 90, 600):
+            test_db.add(VehicleLocation(
+                vehicle_id=vehicle.id,
+                timestamp=base + timedelta(seconds=offset),
+                latitude=55.75,
+                longitude=37.61,
+                source="GPS"
+            ))
+        test_db.commit()
+        return vehicle
+    
+    def test_nearest_picks_closest_side(self, test_db: Session, track: Vehicle):
+        """Выбирается ближайшая точка из двух кандидатов (до и после)"""
+        from app.repositories import VehicleLocationRepository
+        
+        repo = VehicleLocationRepository(test_db)
+        base = datetime(2025, 3, 1, 12, 0, 0)
+        
+        assert repo.get_nearest_to_time(track.id, base).timestamp == base - timedelta(seconds=60)
+        assert repo.get_nearest_to_time(track.id, base + timedelta(seconds=30)).timestamp == base + timedelta(seconds=90)
+        assert repo.get_nearest_to_time(track.id, base + timedelta(seconds=90)).timestamp == base + timedelta(seconds=90)
+    
+    def test_nearest_respects_window(self, test_db: Session, track: Vehicle):
+        """Точки за пределами окна не возвращаются"""
+        from app.repositories import VehicleLocationRepository
+        
+        repo = VehicleLocationRepository(test_db)
+        base = datetime(2025, 3, 1, 12, 0, 0)
+        
+        assert repo.get_nearest_to_time(track.id, base + timedelta(seconds=400), 100) is None
+        assert repo.get_nearest_to_time(track.id, base + timedelta(seconds=400), 200).timestamp == base + timedelta(seconds=600)
+
+
+class TestAnomalyStatsRollup:
+    """Тесты дневных счетчиков аномалий"""
+    
+    @pytest.fixture
+    def organization_transactions(self, test_db: Session):
+        from app.models import Organization
+        
+        organization = Organization(name="ООО Рога", code="ROGA")
+        test_db.add(organization)
+        test_db.commit()
+        transactions = [
+            Transaction(transaction_date=datetime(2025, 3, 1, 10, 0), quantity=40, organization_id=organization.id),
+            Transaction(transaction_date=datetime(2025, 3, 1, 11, 0), quantity=50, organization_id=organization.id),
+            Transaction(transaction_date=datetime(2025, 3, 1, 12, 0), quantity=60),
+        ]
+        test_db.add_all(transactions)
+        test_db.commit()
+        return organization, transactions
+    
+    def test_analysis_maintains_rollups(self, test_db: Session, organization_transactions):
+        """Анализ транзакций обновляет счетчики, повторный анализ не удваивает их"""
+        from app.models import AnomalyStatsDaily
+        from app.services.fuel_card_analysis_service import FuelCardAnalysisService
+        
+        organization, transactions = organization_transactions
+        service = FuelCardAnalysisService(test_db)
+        for transaction in transactions:
+            service.analyze_transaction(transaction.id)
+        service.analyze_transaction(transactions[0].id)
+        
+        total = sum(row.anomaly_count for row in test_db.query(AnomalyStatsDaily).all())
+        assert total == 3
+        
+        from app.repositories import FuelCardAnalysisRepository
+        repo = FuelCardAnalysisRepository(test_db)
+        stats = repo.get_anomaly_stats(organization_id=organization.id)
+        assert stats == {
+            "total_anomalies": 2,
+            "by_type": {"card_misuse": 2},
+            "by_status": {"no_refuel": 2}
+        }
+        assert repo.get_anomaly_stats()["total_anomalies"] == 3
+    
+    def test_partial_days_use_raw_aggregation(self, test_db: Session, organization_transactions):
+        """Неполные крайние дни периода считаются по результатам анализа"""
+        from app.models import FuelCardAnalysisResult
+        from app.repositories import AnomalyStatsRepository
+        
+        organization, transactions = organization_transactions
+        for transaction, analysis_date in zip(transactions, (
+            datetime(2025, 3, 1, 9, 0), datetime(2025, 3, 2, 15, 0), datetime(2025, 3, 3, 18, 0)
+        )):
+            test_db.add(FuelCardAnalysisResult(
+                transaction_id=transaction.id,
+                analysis_date=analysis_date,
+                match_status="no_refuel",
+                is_anomaly=True,
+                anomaly_type="fuel_theft"
+            ))
+        test_db.commit()
+        
+        repo = AnomalyStatsRepository(test_db)
+        assert repo.rebuild() == 3
+        
+        assert repo.get_stats()["total_anomalies"] == 3
+        assert repo.get_stats(date_from=datetime(2025, 3, 1, 12, 0))["total_anomalies"] == 2
+        assert repo.get_stats(date_to=datetime(2025, 3, 3, 12, 0))["total_anomalies"] == 2
+        assert repo.get_stats(
+            date_from=datetime(2025, 3, 2, 14, 0), date_to=datetime(2025, 3, 2, 16, 0)
+        )["total_anomalies"] == 1
+        assert repo.get_stats(
+            date_from=datetime(2025, 3, 1), date_to=datetime(2025, 3, 2, 23, 59, 59, 999999),
+            organization_id=organization.id
+        )["total_anomalies"] == 2
+        assert repo.get_stats(anomaly_type="card_misuse")["total_anomalies"] == 0
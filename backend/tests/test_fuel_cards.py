@@ -295,3 +295,44 @@ class TestFuelCardClear:
         data = response.json()
         assert data["total"] == 0, f"API вернул {data['total']} карт вместо 0"
 
+
+
+class TestRenormalizeOwners:
+    """Тесты повторной нормализации владельцев карт"""
+
+    def test_renormalize_owners_in_batches(self, client: TestClient, test_db: Session, test_provider: Provider):
+        """Настройки применяются ко всем картам, неизменившиеся не обновляются"""
+        from app.auth import require_admin
+        from app.main import app
+        from app.models import NormalizationSettings
+
+        names = ["ооо  ромашка", "А 123 ВС 77", "1234", None]
+        for index in range(250):
+            test_db.add(FuelCard(
+                card_number=f"7000{index:04d}",
+                provider_id=test_provider.id,
+                original_owner_name=names[index % len(names)],
+                normalized_owner="А123ВС77" if index % len(names) == 1 else None
+            ))
+        test_db.add(NormalizationSettings(
+            dictionary_type="fuel_card_owner",
+            options='{"case": "upper", "remove_extra_spaces": true, "trim": true}'
+        ))
+        test_db.commit()
+
+        app.dependency_overrides[require_admin] = lambda: None
+        try:
+            response = client.post("/api/v1/fuel-cards/renormalize-owners?batch_size=100")
+        finally:
+            app.dependency_overrides.pop(require_admin, None)
+        assert response.status_code == 200
+        data = response.json()
+        # Карты без исходного наименования не обрабатываются, у госномеров значение не изменилось
+        assert data["processed"] == 188
+        assert data["updated"] == 125
+
+        owners = {
+            card.original_owner_name: card.normalized_owner
+            for card in test_db.query(FuelCard).filter(FuelCard.original_owner_name.isnot(None))
+        }
+        assert owners == {"ооо  ромашка": "ООО РОМАШКА", "А 123 ВС 77": "А123ВС77", "1234": "1234"}
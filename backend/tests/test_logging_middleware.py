@@ -0,0 +1,136 @@
+"""
+Тесты журнала HTTP запросов и пакетной записи system_logs
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.middleware.logging import LoggingMiddleware, RequestLogPolicy, parse_route_sample_rates
+from app.models import SystemLog
+from app.utils.log_batch_writer import SystemLogBatchWriter, build_system_log_row
+
+
+@pytest.fixture
+def writer(test_engine):
+    return SystemLogBatchWriter(
+        session_factory=sessionmaker(autoflush=False, bind=test_engine),
+        batch_size=2,
+        max_queue=100,
+        auto_start=False
+    )
+
+
+def make_app(policy: RequestLogPolicy, writer: SystemLogBatchWriter) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(LoggingMiddleware, policy=policy, writer=writer)
+
+    @app.get("/api/v1/ok")
+    def ok():
+        return {"ok": True}
+
+    @app.get("/api/v1/fail")
+    def fail():
+        return JSONResponse(status_code=503, content={"detail": "unavailable"})
+
+    @app.get("/api/v1/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+class TestRequestLogPolicy:
+    """Правила сохранения запросов в system_logs"""
+
+    def test_access_mode_persists_only_failed_and_slow(self):
+        policy = RequestLogPolicy(slow_ms=500)
+        assert policy.persist_level("/api/v1/ok", 200, 10) is None
+        assert policy.persist_level("/api/v1/ok", 404, 10) is None
+        assert policy.persist_level("/api/v1/ok", 500, 10) == "ERROR"
+        assert policy.persist_level("/api/v1/ok", 200, 750) == "WARNING"
+
+    def test_full_mode_persists_all(self):
+        assert RequestLogPolicy(mode="full").persist_level("/api/v1/ok", 200, 10) == "INFO"
+        with pytest.raises(ValueError):
+            RequestLogPolicy(mode="verbose")
+
+    def test_route_sample_rates_longest_prefix_wins(self):
+        rates = parse_route_sample_rates("/api=0.5, /api/public-api/v2=0, broken, /api/v1/auth=2")
+        policy = RequestLogPolicy(route_sample_rates=rates, random_func=lambda: 0.3)
+        assert policy.sample_rate_for("/api/v1/auth/login") == 1.0
+        assert policy.persist_level("/api/v1/auth/login", 200, 1) == "INFO"
+        assert policy.persist_level("/api/v1/transactions", 200, 1) == "INFO"
+        assert policy.persist_level("/api/public-api/v2/cards", 200, 1) is None
+        assert policy.persist_level("/other", 200, 1) is None
+
+
+class TestSystemLogBatchWriter:
+    """Пакетная запись system_logs"""
+
+    def test_flush_writes_in_batches(self, writer, test_db):
+        for index in range(5):
+            assert writer.submit(build_system_log_row("INFO", f"Событие {index}", event_type="request"))
+
+        assert test_db.query(SystemLog).count() == 0
+        assert writer.flush() == 5
+        assert writer.pending() == 0
+        assert [log.message for log in test_db.query(SystemLog).order_by(SystemLog.id)] == [
+            f"Событие {index}" for index in range(5)
+        ]
+
+    def test_overflow_drops_rows(self, test_engine):
+        writer = SystemLogBatchWriter(
+            session_factory=sessionmaker(bind=test_engine), max_queue=2, auto_start=False
+        )
+        results = [writer.submit(build_system_log_row("INFO", "Событие")) for _ in range(3)]
+        assert results == [True, True, False]
+        assert writer.dropped == 1
+
+    def test_background_thread_flushes_on_shutdown(self, writer, test_db):
+        writer.start()
+        writer.submit(build_system_log_row("ERROR", "Ошибка", exception=ValueError("плохое значение")))
+        writer.shutdown()
+
+        log = test_db.query(SystemLog).one()
+        assert log.exception_type == "ValueError"
+        assert log.exception_message == "плохое значение"
+
+
+class TestLoggingMiddleware:
+    """Сохранение запросов middleware"""
+
+    def test_only_failed_requests_persisted(self, writer, test_db):
+        client = TestClient(make_app(RequestLogPolicy(slow_ms=60000), writer), raise_server_exceptions=False)
+
+        response = client.get("/api/v1/ok")
+        assert response.status_code == 200
+        assert "X-Process-Time" in response.headers
+        assert client.get("/health").status_code == 200
+        assert client.get("/api/v1/fail").status_code == 503
+        assert client.get("/api/v1/boom").status_code == 500
+        writer.flush()
+
+        logs = test_db.query(SystemLog).order_by(SystemLog.id).all()
+        assert [(log.level, log.message) for log in logs] == [
+            ("ERROR", "HTTP GET /api/v1/fail - 503"),
+            ("ERROR", "Ошибка при обработке запроса: GET /api/v1/boom"),
+        ]
+        assert logs[1].exception_type == "RuntimeError"
+
+    def test_slow_requests_persisted(self, writer, test_db):
+        client = TestClient(make_app(RequestLogPolicy(slow_ms=0), writer))
+
+        client.get("/api/v1/ok")
+        client.get("/health")
+        writer.flush()
+
+        log = test_db.query(SystemLog).one()
+        assert log.level == "WARNING"
+        assert log.event_type == "request"
+        assert '"status_code": 200' in log.extra_data
@@ -401,3 +401,83 @@ class TestLogsTestEndpoint:
         assert "items" in data
         assert isinstance(data["items"], list)
 
+
+
+@pytest.fixture
+def admin_override():
+    """Доступ администратора без входа (эндпоинт входа ограничен по частоте)"""
+    from app.auth import require_admin
+    from app.main import app
+
+    app.dependency_overrides[require_admin] = lambda: None
+    yield
+    app.dependency_overrides.pop(require_admin, None)
+
+
+class TestLogCursorPagination:
+    """Постраничный просмотр по курсору и поиск"""
+
+    def test_cursor_pages_cover_all_logs(self, client: TestClient, test_db: Session, admin_override):
+        base = datetime(2026, 1, 1, 12, 0, 0)
+        # Две записи с одинаковым временем: порядок определяется id
+        for i in range(5):
+            test_db.add(SystemLog(level="INFO", message=f"Cursor {i}", created_at=base + timedelta(minutes=min(i, 3))))
+        test_db.commit()
+
+        response = client.get("/api/v1/logs/system", params={"limit": 2})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 5
+        seen = [item["message"] for item in data["items"]]
+
+        while data["next_cursor"]:
+            response = client.get("/api/v1/logs/system", params={"limit": 2, "cursor": data["next_cursor"]})
+            assert response.status_code == 200
+            data = response.json()
+            assert data["total"] is None
+            seen.extend(item["message"] for item in data["items"])
+
+        assert seen == ["Cursor 4", "Cursor 3", "Cursor 2", "Cursor 1", "Cursor 0"]
+
+    def test_invalid_cursor(self, client: TestClient, admin_override):
+        response = client.get("/api/v1/logs/system", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_search_escapes_wildcards(self, client: TestClient, test_db: Session, admin_override):
+        test_db.add_all([
+            SystemLog(level="INFO", message="Загружено 100% строк"),
+            SystemLog(level="INFO", message="Загружено 100 строк"),
+        ])
+        test_db.commit()
+
+        response = client.get("/api/v1/logs/system", params={"search": "100%"})
+        assert response.status_code == 200
+        assert [item["message"] for item in response.json()["items"]] == ["Загружено 100% строк"]
+
+
+def test_delete_old_user_action_logs(client: TestClient, test_db: Session, admin_override):
+    """Удаление устаревших записей журнала (без секционирования - DELETE)"""
+    now = datetime.utcnow()
+    test_db.add_all([
+        UserActionLog(action_type="login", action_description="Старое", created_at=now - timedelta(days=40)),
+        UserActionLog(action_type="login", action_description="Новое", created_at=now),
+    ])
+    test_db.commit()
+
+    response = client.delete("/api/v1/logs/user-actions", params={"days": 30})
+
+    assert response.status_code == 204
+    assert [log.action_description for log in test_db.query(UserActionLog)] == ["Новое"]
+
+
+def test_list_slow_queries(client: TestClient, admin_override):
+    """Журнал медленных SQL запросов профилировщика"""
+    from app.utils.query_profiler import get_query_profiler
+
+    profiler = get_query_profiler()
+    profiler.clear()
+    response = client.get("/api/v1/logs/slow-queries")
+
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+    assert response.json()["slow_ms"] == profiler.slow_ms
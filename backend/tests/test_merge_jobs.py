@@ -0,0 +1,154 @@
+"""
+Тесты пакетного слияния дублей ТС и топливных карт
+"""
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import FuelCard, FuelCardAnalysisResult, Transaction, Vehicle, VehicleRefuel
+from app.services.merge_service import MergePlan, MergeService
+
+
+def add_transactions(db: Session, count: int, **values) -> None:
+    db.add_all([
+        Transaction(transaction_date=datetime(2025, 1, 1, 10, i % 60), quantity=10, product="ДТ", **values)
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def make_vehicles(db: Session, *names: str, **values):
+    vehicles = [Vehicle(original_name=name, is_validated="valid", **values) for name in names]
+    db.add_all(vehicles)
+    db.commit()
+    return vehicles
+
+
+class TestMergeService:
+    """Слияние порциями дает тот же результат, что и слияние одной транзакцией"""
+
+    def test_merge_vehicles_in_chunks(self, test_db: Session):
+        target, first, second = make_vehicles(test_db, "КАМАЗ 1", "КАМАЗ-1", "камаз 1")
+        first.license_plate = "А001АА77"
+        second.garage_number = "15"
+        card = FuelCard(card_number="7001", vehicle_id=first.id)
+        test_db.add(card)
+        test_db.add(VehicleRefuel(
+            vehicle_id=second.id, refuel_date=datetime(2025, 1, 1), quantity=30, source_system="manual"
+        ))
+        test_db.commit()
+        add_transactions(test_db, 7, vehicle_id=first.id)
+        add_transactions(test_db, 5, vehicle_id=second.id)
+        add_transactions(test_db, 3, vehicle_id=target.id)
+        target_id, source_ids = target.id, [first.id, second.id]
+
+        chunks = []
+        service = MergeService(test_db, chunk_size=2, progress=chunks.append)
+        plans = [MergePlan(target_id=target_id, source_ids=source_ids)]
+        service.validate_plans("vehicle", plans)
+        assert service.count_rows("vehicle", plans) == 14
+
+        result = service.merge("vehicle", plans)
+
+        assert result == {"plans": 1, "rows_updated": 14, "deleted": 2}
+        assert sum(chunks) == 14
+        assert max(chunks) <= 2
+        assert test_db.query(Transaction).filter(Transaction.vehicle_id == target_id).count() == 15
+        assert test_db.query(FuelCard).filter(FuelCard.vehicle_id == target_id).count() == 1
+        assert test_db.query(VehicleRefuel).filter(VehicleRefuel.vehicle_id == target_id).count() == 1
+        assert test_db.query(Vehicle).filter(Vehicle.id.in_(source_ids)).count() == 0
+        merged = test_db.query(Vehicle).filter(Vehicle.id == target_id).one()
+        assert merged.license_plate == "А001АА77"
+        assert merged.garage_number == "15"
+
+    def test_merge_fuel_cards(self, test_db: Session):
+        target = FuelCard(card_number="7001")
+        source = FuelCard(card_number="7001-old", provider_id=None, vehicle_id=None)
+        test_db.add_all([target, source])
+        test_db.commit()
+        add_transactions(test_db, 5, card_number="7001-old")
+        transaction = test_db.query(Transaction).first()
+        test_db.add(FuelCardAnalysisResult(
+            transaction_id=transaction.id, fuel_card_id=source.id, match_status="no_refuel"
+        ))
+        test_db.commit()
+        target_id, source_id = target.id, source.id
+
+        result = MergeService(test_db, chunk_size=2).merge_fuel_card_plan(
+            MergePlan(target_id=target_id, source_ids=[source_id])
+        )
+
+        assert result["updated"] == {"transactions": 5, "fuel_card_analysis_results": 1}
+        assert result["deleted"] == 1
+        assert test_db.query(Transaction).filter(Transaction.card_number == "7001").count() == 5
+        assert test_db.query(FuelCardAnalysisResult).filter(
+            FuelCardAnalysisResult.fuel_card_id == target_id
+        ).count() == 1
+        assert test_db.query(FuelCard).filter(FuelCard.id == source_id).first() is None
+
+    @pytest.mark.parametrize("plans, message", [
+        ([], "Не указаны"),
+        ([MergePlan(target_id=1, source_ids=[1, 2])], "и целью, и дублем"),
+        ([MergePlan(target_id=1, source_ids=[2]), MergePlan(target_id=3, source_ids=[2])], "нескольких планах"),
+        ([MergePlan(target_id=1, source_ids=[999])], "не найдены"),
+    ])
+    def test_validate_plans(self, test_db: Session, plans, message):
+        make_vehicles(test_db, "ТС 1", "ТС 2", "ТС 3")
+        with pytest.raises(ValueError, match=message):
+            MergeService(test_db).validate_plans("vehicle", plans)
+
+
+class TestMergeJobsApi:
+    """Фоновое слияние через API"""
+
+    @pytest.fixture(autouse=True)
+    def admin_override(self):
+        from app.auth import require_admin
+        from app.main import app
+
+        app.dependency_overrides[require_admin] = lambda: None
+        yield
+        app.dependency_overrides.pop(require_admin, None)
+
+    def test_background_merge_job(self, client, test_db: Session):
+        target, first, second, other = make_vehicles(test_db, "МАЗ 1", "МАЗ-1", "ГАЗ 2", "ГАЗ-2")
+        add_transactions(test_db, 4, vehicle_id=first.id)
+        add_transactions(test_db, 2, vehicle_id=other.id)
+        ids = [target.id, first.id, second.id, other.id]
+
+        response = client.post("/api/v1/merge-jobs", json={
+            "entity": "vehicle",
+            "plans": [
+                {"target_id": ids[0], "source_ids": [ids[1]]},
+                {"target_id": ids[2], "source_ids": [ids[3]]},
+            ]
+        })
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        deadline = time.monotonic() + 10
+        while True:
+            job = client.get(f"/api/v1/merge-jobs/{job_id}").json()
+            if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+
+        assert job["status"] == "completed", job
+        assert job["plans_done"] == 2
+        assert job["processed_rows"] == job["total_rows"] == 6
+        assert job["progress"] == 100.0
+        test_db.expire_all()
+        assert test_db.query(Vehicle).count() == 2
+        assert test_db.query(Transaction).filter(Transaction.vehicle_id == ids[0]).count() == 4
+        assert test_db.query(Transaction).filter(Transaction.vehicle_id == ids[2]).count() == 2
+
+    def test_invalid_plan_rejected(self, client, test_db: Session):
+        target, = make_vehicles(test_db, "МАЗ 1")
+        response = client.post("/api/v1/merge-jobs", json={
+            "entity": "vehicle",
+            "plans": [{"target_id": target.id, "source_ids": [target.id + 100]}]
+        })
+        assert response.status_code == 400
+        assert client.get("/api/v1/merge-jobs/unknown").status_code == 404
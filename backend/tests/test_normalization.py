@@ -0,0 +1,154 @@
+"""
+Корпус значений для нормализации видов топлива, названий ТС, номеров карт и АЗС
+
+Ожидаемые значения получены реализацией до оптимизации (паттерны в каждом
+вызове, последовательные replace) и фиксируют ее поведение.
+"""
+import pandas as pd
+import pytest
+
+from app.services.normalization_service import (
+    clear_normalization_caches,
+    extract_azs_number,
+    extract_azs_numbers,
+    normalize_card_number,
+    normalize_card_numbers,
+    normalize_fuel,
+    normalize_fuels,
+    normalize_vehicle_name,
+    normalize_vehicle_names,
+)
+
+FUEL_CORPUS = [
+    ("аи 95", "АИ-95"),
+    ("АИ-95", "АИ-95"),
+    ("Аи-95-К5", "АИ-95"),
+    ("ai95", "АИ-95"),
+    ("AI 92", "АИ-92"),
+    ("аи-92", "АИ-92"),
+    ("АИ98", "АИ-98"),
+    ("Премиум-98", "Премиум-98"),
+    ("ДТ", "Дизельное топливо"),
+    ("дт-з", "Дизельное топливо"),
+    ("ДТ-Е-К5", "Дизельное топливо"),
+    ("Дизель", "Дизельное топливо"),
+    ("Diesel", "Дизельное топливо"),
+    ("ДИЗЕЛЬНОЕ ТОПЛИВО", "Дизельное топливо"),
+    ("Газ", "Газ"),
+    ("СУГ (пропан)", "Газ"),
+    ("Метан", "Газ"),
+    ("CNG", "Газ"),
+    ("LNG", "Газ"),
+    ("Газ-пропан", "Газ"),
+    ("Бензин", "Бензин"),
+    ("  Масло моторное ", "Масло моторное"),
+    ("Аи-80", "Аи-80"),
+    ("АИ - 95", "АИ-95"),
+    ("", ""),
+    (" ", ""),
+    (None, ""),
+    (95, "95"),
+    ("Аи-100", "Аи-100"),
+    ("аи-9 5", "АИ-95"),
+    ("ПРОПАН-БУТАН", "Газ"),
+]
+
+VEHICLE_CORPUS = [
+    ("А 123 ВС 77", "А123ВС77"),
+    ("  КАМАЗ  5490  ", "КАМАЗ 5490"),
+    ("КАМАЗ 5490 а123вс777", "КАМАЗ 5490 А123ВС777"),
+    ("Газель в 456 ок 50", "Газель В456ОК50"),
+    ("ГАЗ-3302 А123ВС77", "ГАЗ-3302 А123ВС77"),
+    ("Трактор МТЗ 1234 АВ 77", "Трактор МТЗ 1234 АВ 77"),
+    ("x 0001 ab 199", "X0001AB199"),
+    ("a 1234 bc 77", "A1234BC77"),
+    ("МАЗ\tО 777 ОО\n99", "МАЗ О777ОО99"),
+    ("", ""),
+    (" ", ""),
+    (None, ""),
+    (12345, "12345"),
+    ("Лада Веста", "Лада Веста"),
+    ("Hyundai Solaris М 001 ММ 777", "Hyundai Solaris М001ММ777"),
+    ("КамАЗ  С 065 МК 78 (прицеп)", "КамАЗ С065МК78 (прицеп)"),
+    ("АВ 123 ВС 77", "АВ123ВС77"),
+    ("A123BC77", "A123BC77"),
+    ("а 123 вс 7", "а 123 вс 7"),
+]
+
+CARD_CORPUS = [
+    ("1234-5678-9012", "123456789012"),
+    ("1234 5678 9012", "123456789012"),
+    ("7005 8300 0000 1234", "7005830000001234"),
+    ("7005_8300_0000_1234", "7005830000001234"),
+    ("  70058300000012345  ", "70058300000012345"),
+    ("7005\t8300", "70058300"),
+    ("7005–8300", "7005–8300"),
+    ("", ""),
+    (" ", ""),
+    (None, ""),
+    (1234567890123, "1234567890123"),
+    ("ABC-123", "ABC123"),
+    ("0012 3", "00123"),
+]
+
+AZS_CORPUS = [
+    ("АЗС №123", "123"),
+    ("Газпром АЗС-456", "456"),
+    ("АЗС", "АЗС"),
+    ("  АЗС без номера  ", "АЗС без номера"),
+    ("КАЗС 12/3", "12"),
+    ("АЗС 007", "007"),
+    ("", ""),
+    (" ", ""),
+    (None, ""),
+    (123, "123"),
+    ("Лукойл 1234 Москва", "1234"),
+    ("№ 42 ", "42"),
+    (45.0, "45"),
+]
+
+CASES = [
+    (normalize_fuel, normalize_fuels, FUEL_CORPUS),
+    (normalize_vehicle_name, normalize_vehicle_names, VEHICLE_CORPUS),
+    (normalize_card_number, normalize_card_numbers, CARD_CORPUS),
+    (extract_azs_number, extract_azs_numbers, AZS_CORPUS),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    clear_normalization_caches()
+    yield
+    clear_normalization_caches()
+
+
+@pytest.mark.parametrize("normalize, corpus", [(case[0], case[2]) for case in CASES],
+                         ids=lambda value: getattr(value, "__name__", ""))
+def test_corpus(normalize, corpus):
+    # Второй проход читается из кэша и должен совпадать с первым
+    for _ in range(2):
+        for value, expected in corpus:
+            assert normalize(value) == expected, value
+
+
+@pytest.mark.parametrize("normalize, normalize_series, corpus", CASES,
+                         ids=lambda value: getattr(value, "__name__", ""))
+def test_series_variant_matches_scalar(normalize, normalize_series, corpus):
+    values = [value for value, _ in corpus if value is not None] * 3
+    series = pd.Series(values + [None, float("nan")], index=list(range(len(values), 0, -1)) + [0, 0])
+
+    result = normalize_series(series)
+
+    assert list(result.index) == list(series.index)
+    assert result.iloc[:len(values)].tolist() == [normalize(value) for value in values]
+    assert result.iloc[len(values):].tolist() == ["", ""]
+
+
+def test_repeated_values_are_memoized():
+    from app.services.normalization_service import _normalize_fuel_text
+
+    for _ in range(1000):
+        normalize_fuel("Аи-95-К5")
+    info = _normalize_fuel_text.cache_info()
+    assert info.misses == 1
+    assert info.hits == 999
@@ -281,3 +281,35 @@ class TestNormalizationSettingsDelete:
         )
         assert response.status_code in [401, 403]
 
+
+
+class TestNormalizationSettingsCache:
+    """Тесты кэша настроек нормализации"""
+    
+    def test_settings_cached_and_invalidated_on_update(self, client: TestClient, test_db: Session):
+        """Настройки читаются из кэша, изменение через API очищает кэш"""
+        from app.auth import require_admin
+        from app.main import app
+        from app.services.normalization_service import get_normalization_settings, normalize_owner_name
+        
+        setting = NormalizationSettings(dictionary_type="fuel_card_owner", options='{"case": "upper"}')
+        test_db.add(setting)
+        test_db.commit()
+        
+        assert get_normalization_settings(test_db, "fuel_card_owner") == {"case": "upper"}
+        setting.options = '{"case": "lower"}'
+        test_db.commit()
+        # Изменение в обход API видно только после истечения TTL
+        assert normalize_owner_name("ооо ромашка", db=test_db)["normalized"] == "ООО РОМАШКА"
+        
+        app.dependency_overrides[require_admin] = lambda: None
+        try:
+            response = client.put(
+                "/api/v1/normalization-settings/fuel_card_owner",
+                json={"options": {"case": "title"}}
+            )
+        finally:
+            app.dependency_overrides.pop(require_admin, None)
+        assert response.status_code == 200
+        assert get_normalization_settings(test_db, "fuel_card_owner")["case"] == "title"
+        assert normalize_owner_name("ооо ромашка", db=test_db)["normalized"] == "Ооо Ромашка"
@@ -0,0 +1,253 @@
+"""
+Тесты очереди доставки уведомлений
+"""
+import json
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.models import Notification, NotificationDelivery, NotificationSettings
+from app.repositories.notification_delivery_repository import NotificationDeliveryRepository, utcnow
+from app.services import notification_delivery_service
+from app.services.notification_delivery_service import (
+    NotificationDeliveryService,
+    TelegramDeliverer,
+    TelegramRateLimiter,
+    build_telegram_batches,
+)
+from app.services.notification_service import NotificationService
+
+
+class FakeSMTP:
+    """SMTP без сети: считает подключения и отправленные письма"""
+
+    connections = 0
+    sent = []
+    fail = False
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        if FakeSMTP.fail:
+            raise OSError("SMTP недоступен")
+        FakeSMTP.sent.append(msg["To"])
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def email_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "email_enabled", True)
+    monkeypatch.setattr(settings, "email_smtp_host", "smtp.example.com")
+    monkeypatch.setattr(settings, "email_smtp_user", "robot")
+    monkeypatch.setattr(settings, "email_from_address", "robot@example.com")
+    monkeypatch.setattr("app.services.notification_service.smtplib.SMTP", FakeSMTP)
+    FakeSMTP.connections, FakeSMTP.sent, FakeSMTP.fail = 0, [], False
+    return settings
+
+
+@pytest.fixture
+def delivery_service(test_engine, monkeypatch):
+    monkeypatch.setattr(NotificationDeliveryService, "_instance", None)
+    service = NotificationDeliveryService(session_factory=sessionmaker(autoflush=False, bind=test_engine))
+    yield service
+    service.shutdown()
+
+
+def enable_channels(db, user, **flags):
+    db.add(NotificationSettings(user_id=user.id, **flags))
+    db.commit()
+
+
+class TestSendNotificationQueue:
+    """send_notification сохраняет задачи доставки вместо отправки"""
+
+    def test_external_channels_are_queued(self, test_db, test_user, email_settings, delivery_service):
+        enable_channels(test_db, test_user, email_enabled=True, in_app_enabled=True)
+
+        result = NotificationService(test_db).send_notification(
+            user_id=test_user.id, title="Загрузка", message="Файл обработан"
+        )
+
+        assert result["delivery_status"] == {"email": "queued", "in_app": "sent"}
+        assert FakeSMTP.connections == 0
+        delivery = test_db.query(NotificationDelivery).one()
+        assert delivery.channel == "email"
+        assert delivery.status == "pending"
+        notification = test_db.query(Notification).one()
+        assert delivery.notification_id == notification.id
+        assert json.loads(notification.delivery_status)["email"] == "queued"
+
+    def test_queue_disabled_sends_inline(self, test_db, test_user, email_settings, monkeypatch):
+        monkeypatch.setattr(email_settings, "notification_queue_enabled", False)
+        enable_channels(test_db, test_user, email_enabled=True, in_app_enabled=False)
+
+        result = NotificationService(test_db).send_notification(
+            user_id=test_user.id, title="Загрузка", message="Файл обработан", channels=["email"]
+        )
+
+        assert result["delivery_status"] == {"email": "sent"}
+        assert test_db.query(NotificationDelivery).count() == 0
+
+
+class TestDeliveryWorkers:
+    """Обработка очереди воркерами каналов"""
+
+    def test_email_batch_reuses_connection(self, test_db, test_user, admin_user, email_settings, delivery_service):
+        enable_channels(test_db, test_user, email_enabled=True, in_app_enabled=True)
+        service = NotificationService(test_db)
+        service.send_notification(user_id=test_user.id, title="Первое", message="Текст")
+        service.send_notification(user_id=test_user.id, title="Второе", message="Текст")
+        NotificationDeliveryRepository(test_db).enqueue(admin_user.id, ["email"], "Третье", "Текст")
+        test_db.commit()
+
+        assert delivery_service.process_batch("email") == 3
+
+        assert FakeSMTP.connections == 1
+        assert FakeSMTP.sent == ["test@example.com", "test@example.com", "admin@example.com"]
+        test_db.expire_all()
+        assert {delivery.status for delivery in test_db.query(NotificationDelivery)} == {"sent"}
+        for notification in test_db.query(Notification):
+            assert json.loads(notification.delivery_status)["email"] == "sent"
+
+    def test_failed_delivery_retried_then_dead(self, test_db, test_user, email_settings, delivery_service, monkeypatch):
+        monkeypatch.setattr(email_settings, "notification_max_attempts", 2)
+        FakeSMTP.fail = True
+        NotificationDeliveryRepository(test_db).enqueue(test_user.id, ["email"], "Тест", "Текст")
+        test_db.commit()
+
+        assert delivery_service.process_batch("email") == 1
+        test_db.expire_all()
+        delivery = test_db.query(NotificationDelivery).one()
+        assert delivery.status == "pending"
+        assert delivery.next_attempt_at > utcnow()
+        # До наступления времени повтора задача не берется
+        assert delivery_service.process_batch("email") == 0
+
+        delivery.next_attempt_at = utcnow() - timedelta(seconds=1)
+        test_db.commit()
+        assert delivery_service.process_batch("email") == 1
+        test_db.expire_all()
+        delivery = test_db.query(NotificationDelivery).one()
+        assert delivery.status == "dead"
+        assert "SMTP недоступен" in delivery.last_error
+
+        repo = NotificationDeliveryRepository(test_db)
+        assert repo.requeue_dead("email") == 1
+        test_db.commit()
+        FakeSMTP.fail = False
+        assert delivery_service.process_batch("email") == 1
+        assert FakeSMTP.sent == ["test@example.com"]
+
+    def test_telegram_messages_batched_per_chat(self, test_db, test_user, admin_user, delivery_service, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "telegram_enabled", True)
+        monkeypatch.setattr(settings, "telegram_bot_token", "token")
+        enable_channels(test_db, test_user, telegram_enabled=True, telegram_chat_id="100")
+        enable_channels(test_db, admin_user, telegram_enabled=False)
+        repo = NotificationDeliveryRepository(test_db)
+        repo.enqueue(test_user.id, ["telegram"], "Первое", "Текст")
+        repo.enqueue(test_user.id, ["telegram"], "Второе", "Текст")
+        repo.enqueue(admin_user.id, ["telegram"], "Админу", "Текст")
+        test_db.commit()
+
+        sent = []
+        deliverer = TelegramDeliverer("telegram", rate_limiter=TelegramRateLimiter(1000, 0, sleep=lambda _: None))
+        monkeypatch.setattr(deliverer.channel_impl, "send_text", lambda chat_id, text: sent.append((chat_id, text)) or {"status": "sent"})
+
+        assert delivery_service.process_batch("telegram", deliverer) == 3
+        deliverer.close()
+
+        assert len(sent) == 1
+        assert sent[0][0] == "100"
+        assert "*Первое*" in sent[0][1] and "*Второе*" in sent[0][1]
+        test_db.expire_all()
+        statuses = sorted(delivery.status for delivery in test_db.query(NotificationDelivery))
+        assert statuses == ["disabled", "sent", "sent"]
+
+    def test_telegram_rate_limit_uses_retry_after(self, test_db, test_user, delivery_service, monkeypatch):
+        settings = get_settings()
+        monkeypatch.setattr(settings, "telegram_enabled", True)
+        monkeypatch.setattr(settings, "telegram_bot_token", "token")
+        enable_channels(test_db, test_user, telegram_enabled=True, telegram_chat_id="100")
+        NotificationDeliveryRepository(test_db).enqueue(test_user.id, ["telegram"], "Тест", "Текст")
+        test_db.commit()
+
+        deliverer = TelegramDeliverer("telegram", rate_limiter=TelegramRateLimiter(1000, 0, sleep=lambda _: None))
+        monkeypatch.setattr(
+            deliverer.channel_impl, "send_text",
+            lambda chat_id, text: {"status": "failed", "error": "Telegram rate limit exceeded", "retry_after": 3600}
+        )
+        delivery_service.process_batch("telegram", deliverer)
+        deliverer.close()
+
+        test_db.expire_all()
+        delivery = test_db.query(NotificationDelivery).one()
+        assert delivery.status == "pending"
+        assert delivery.next_attempt_at > utcnow() + timedelta(minutes=59)
+
+
+class TestTelegramHelpers:
+    """Разбиение и ограничение частоты сообщений Telegram"""
+
+    def test_build_batches_respects_max_length(self):
+        texts = ["a" * 30, "b" * 30, "c" * 30]
+        separator = len(notification_delivery_service.TELEGRAM_SEPARATOR)
+        assert build_telegram_batches(texts, max_length=4096) == [[0, 1, 2]]
+        assert build_telegram_batches(texts, max_length=60 + separator) == [[0, 1], [2]]
+        assert build_telegram_batches(texts, max_length=60 + separator - 1) == [[0], [1], [2]]
+
+    def test_rate_limiter_waits_per_chat(self):
+        sleeps = []
+        limiter = TelegramRateLimiter(per_second=1000, chat_interval=1.0, sleep=sleeps.append)
+        limiter.wait("1")
+        limiter.wait("2")
+        assert sleeps == [] or max(sleeps) < 0.01
+        limiter.wait("1")
+        assert sleeps and sleeps[-1] > 0.9
+
+
+def test_queue_endpoint_requeues_dead(client, test_db, test_user, delivery_service):
+    """Состояние очереди и повторная постановка задач из dead"""
+    from app.auth import require_admin
+    from app.main import app
+
+    repo = NotificationDeliveryRepository(test_db)
+    delivery = repo.enqueue(test_user.id, ["email"], "Тест", "Текст")[0]
+    delivery.status = "dead"
+    test_db.commit()
+
+    app.dependency_overrides[require_admin] = lambda: None
+    try:
+        response = client.get("/api/v1/notifications/queue")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["channels"]["email"] == {"dead": 1}
+        assert data["dead"][0]["id"] == delivery.id
+
+        response = client.post("/api/v1/notifications/queue/requeue-dead?channel=email")
+        assert response.status_code == 200
+        assert response.json() == {"requeued": 1}
+        assert client.post("/api/v1/notifications/queue/requeue-dead?channel=sms").status_code == 400
+    finally:
+        app.dependency_overrides.pop(require_admin, None)
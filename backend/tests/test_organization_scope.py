@@ -0,0 +1,173 @@
+"""
+Тесты кэша областей видимости по организациям и условия фильтрации
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.auth import filter_by_user_organizations, get_user_organization_ids
+from app.models import Organization, Transaction, user_organizations
+from app.repositories.transaction_repository import TransactionRepository
+from app.services.cache_service import CacheService
+from app.services.organization_scope_service import invalidate_organization_scopes
+from app.services.organization_service import OrganizationService
+from app.utils.organization_scope import organization_scope_clause
+
+
+class CounterRedis:
+    """Счетчики Redis в памяти (ping нет - остальные функции кэша считаются недоступными)"""
+
+    def __init__(self):
+        self.values = {}
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def mget(self, keys):
+        return [str(self.values[key]).encode() if key in self.values else None for key in keys]
+
+
+@pytest.fixture(autouse=True)
+def redis_counters(monkeypatch):
+    client = CounterRedis()
+    monkeypatch.setattr(CacheService.get_instance(), "_client", client)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def clear_scopes(redis_counters):
+    invalidate_organization_scopes()
+    yield
+    invalidate_organization_scopes()
+
+
+@pytest.fixture
+def organizations(test_db: Session):
+    items = [
+        Organization(name="Север", code="NORTH", is_active=True),
+        Organization(name="Юг", code="SOUTH", is_active=True),
+        Organization(name="Архив", code="ARCHIVE", is_active=False),
+    ]
+    test_db.add_all(items)
+    test_db.commit()
+    return items
+
+
+@pytest.fixture
+def count_queries(test_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(test_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def test_scope_is_cached_until_assignment_changes(test_db: Session, test_user, organizations, count_queries):
+    north, south, archive = organizations
+    service = OrganizationService(test_db)
+    service.assign_organizations_to_user(test_user.id, [south.id, archive.id])
+
+    assert get_user_organization_ids(test_db, test_user) == [south.id]
+    count_queries.clear()
+    assert get_user_organization_ids(test_db, test_user) == [south.id]
+    assert count_queries == []
+
+    service.assign_organizations_to_user(test_user.id, [north.id, south.id])
+    assert get_user_organization_ids(test_db, test_user) == [north.id, south.id]
+
+
+def test_superuser_scope_follows_organization_changes(test_db: Session, admin_user, organizations):
+    north, south, _ = organizations
+    assert get_user_organization_ids(test_db, admin_user) == [north.id, south.id]
+
+    OrganizationService(test_db).update_organization(north.id, is_active=False)
+    assert get_user_organization_ids(test_db, admin_user) == [south.id]
+
+
+def test_scope_reloaded_after_invalidation_in_other_process(
+    test_db: Session, test_user, organizations, redis_counters, count_queries
+):
+    north_id, south_id = organizations[0].id, organizations[1].id
+    OrganizationService(test_db).assign_organizations_to_user(test_user.id, [north_id, south_id])
+    assert get_user_organization_ids(test_db, test_user) == [north_id, south_id]
+
+    # Другой процесс снял назначение: локальный кэш не сброшен, версия в Redis увеличена
+    test_db.execute(user_organizations.delete().where(
+        user_organizations.c.user_id == test_user.id,
+        user_organizations.c.organization_id == north_id
+    ))
+    test_db.commit()
+    test_db.refresh(test_user)
+    count_queries.clear()
+    assert get_user_organization_ids(test_db, test_user) == [north_id, south_id]
+    assert count_queries == []
+
+    redis_counters.incr(f"gsm:organization_scope:user:{test_user.id}:version")
+    assert get_user_organization_ids(test_db, test_user) == [south_id]
+
+
+def test_cache_not_used_without_redis(test_db: Session, test_user, organizations, count_queries, monkeypatch):
+    monkeypatch.setattr(CacheService.get_instance(), "_client", None)
+    OrganizationService(test_db).assign_organizations_to_user(test_user.id, [organizations[0].id])
+    get_user_organization_ids(test_db, test_user)
+    count_queries.clear()
+    get_user_organization_ids(test_db, test_user)
+    assert len(count_queries) == 1
+
+
+def test_cache_disabled_with_zero_ttl(test_db: Session, test_user, organizations, count_queries, monkeypatch):
+    from app.config import get_settings
+
+    monkeypatch.setattr(get_settings(), "organization_scope_cache_ttl", 0)
+    OrganizationService(test_db).assign_organizations_to_user(test_user.id, [organizations[0].id])
+    get_user_organization_ids(test_db, test_user)
+    count_queries.clear()
+    get_user_organization_ids(test_db, test_user)
+    assert len(count_queries) == 1
+
+
+class TestScopeFilter:
+    """Записи без организации видны в любой области видимости"""
+
+    @pytest.fixture
+    def transactions(self, test_db: Session, organizations):
+        north, south, _ = organizations
+        for i, organization_id in enumerate([north.id, south.id, None, north.id]):
+            test_db.add(Transaction(
+                transaction_date=datetime(2025, 4, 1 + i), card_number=f"7005{i}",
+                quantity=Decimal("10"), organization_id=organization_id
+            ))
+        test_db.commit()
+
+    def visible(self, test_db: Session, organization_ids):
+        return sorted(
+            (row.organization_id or 0) for row in
+            test_db.query(Transaction).filter(organization_scope_clause(Transaction.organization_id, organization_ids))
+        )
+
+    def test_clause(self, test_db: Session, organizations, transactions):
+        north, south, _ = organizations
+        assert self.visible(test_db, []) == [0]
+        assert self.visible(test_db, [north.id]) == [0, north.id, north.id]
+        assert self.visible(test_db, [south.id, north.id, south.id, None]) == sorted([0, north.id, north.id, south.id])
+
+    def test_repository_and_auth_filter(self, test_db: Session, test_user, organizations, transactions):
+        north, south, _ = organizations
+        repository = TransactionRepository(test_db)
+        items, total = repository.get_all(organization_ids=[south.id])
+        assert total == 2
+        assert {item.organization_id for item in items} == {south.id, None}
+        assert repository.get_all(organization_id=north.id)[1] == 3
+
+        query = test_db.query(Transaction)
+        assert filter_by_user_organizations(query, test_db, test_user, Transaction.organization_id).count() == 0
+
+        OrganizationService(test_db).assign_organizations_to_user(test_user.id, [south.id])
+        assert filter_by_user_organizations(query, test_db, test_user, Transaction.organization_id).count() == 2
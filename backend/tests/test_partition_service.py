@@ -0,0 +1,115 @@
+"""
+Тесты для сервиса обслуживания секционированных таблиц
+"""
+import pytest
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+
+from app.models import Vehicle, VehicleLocation, VehicleRefuel, FuelCardAnalysisResult, Transaction
+from app.services.partition_service import PartitionService, add_months, partition_name
+
+
+class TestPartitionHelpers:
+    """Тесты вспомогательных функций"""
+    
+    def test_add_months(self):
+        assert add_months(date(2025, 1, 31), 1) == date(2025, 2, 1)
+        assert add_months(date(2025, 11, 15), 3) == date(2026, 2, 1)
+        assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    
+    def test_partition_name(self):
+        assert partition_name("vehicle_locations", date(2025, 3, 1)) == "vehicle_locations_p202503"
+
+
+class TestPartitionServiceFallback:
+    """Тесты поведения без секционирования (SQLite)"""
+    
+    def test_not_partitioned_on_sqlite(self, test_db: Session):
+        service = PartitionService(test_db)
+        assert service.is_supported() is False
+        assert service.list_partitions("vehicle_locations") == []
+        assert service.ensure_partitions("vehicle_locations") == []
+    
+    def test_unknown_table(self, test_db: Session):
+        with pytest.raises(ValueError):
+            PartitionService(test_db).list_partitions("transactions")
+    
+    def test_retention_deletes_old_rows(self, test_db: Session):
+        """Срок хранения применяется DELETE, ссылки из результатов анализа обнуляются"""
+        vehicle = Vehicle(original_name="Камаз")
+        test_db.add(vehicle)
+        test_db.commit()
+        
+        old_refuel = VehicleRefuel(
+            vehicle_id=vehicle.id, refuel_date=datetime(2020, 1, 10), quantity=10, source_system="GLONASS"
+        )
+        new_refuel = VehicleRefuel(
+            vehicle_id=vehicle.id, refuel_date=datetime.now(), quantity=20, source_system="GLONASS"
+        )
+        test_db.add_all([old_refuel, new_refuel])
+        test_db.add(VehicleLocation(
+            vehicle_id=vehicle.id, timestamp=datetime(2020, 1, 10), latitude=55, longitude=37
+        ))
+        transaction = Transaction(transaction_date=datetime(2020, 1, 10), quantity=10)
+        test_db.add(transaction)
+        test_db.commit()
+        result = FuelCardAnalysisResult(
+            transaction_id=transaction.id, refuel_id=old_refuel.id, match_status="matched"
+        )
+        test_db.add(result)
+        test_db.commit()
+        
+        service = PartitionService(test_db)
+        service.apply_retention("vehicle_refuels", retention_months=12)
+        service.apply_retention("vehicle_locations", retention_months=12)
+        test_db.expire_all()
+        
+        assert test_db.query(VehicleRefuel).count() == 1
+        assert test_db.query(VehicleLocation).count() == 0
+        assert test_db.get(FuelCardAnalysisResult, result.id).refuel_id is None
+    
+    def test_retention_disabled(self, test_db: Session):
+        assert PartitionService(test_db).apply_retention("vehicle_locations", retention_months=0) == []
+
+
+class TestPartitionMaintenanceErrors:
+    """Сбой одного месяца и строки секции DEFAULT (секционирование эмулируется)"""
+    
+    def test_failed_month_does_not_stop_following_months(self, test_db: Session, monkeypatch):
+        monkeypatch.setattr(PartitionService, "is_partitioned", lambda self, table: True)
+        monkeypatch.setattr(PartitionService, "list_partitions", lambda self, table: [])
+        attempted = []
+        
+        def create(self, table, name, month_start, default_partition):
+            attempted.append(name)
+            if month_start == date(2025, 2, 1):
+                raise RuntimeError("строки секции DEFAULT")
+        
+        monkeypatch.setattr(PartitionService, "_create_month_partition", create)
+        created = PartitionService(test_db).ensure_partitions(
+            "vehicle_locations", months_ahead=2, start=date(2025, 1, 1)
+        )
+        
+        assert attempted == ["vehicle_locations_p202501", "vehicle_locations_p202502", "vehicle_locations_p202503"]
+        assert created == ["vehicle_locations_p202501", "vehicle_locations_p202503"]
+    
+    def test_retention_deletes_default_partition_rows(self, test_db: Session, monkeypatch):
+        vehicle = Vehicle(original_name="Камаз")
+        test_db.add(vehicle)
+        test_db.commit()
+        test_db.add_all([
+            VehicleLocation(vehicle_id=vehicle.id, timestamp=datetime(2020, 1, 10), latitude=55, longitude=37),
+            VehicleLocation(vehicle_id=vehicle.id, timestamp=datetime.now(), latitude=55, longitude=37),
+        ])
+        test_db.commit()
+        
+        # Таблица SQLite выступает секцией DEFAULT
+        monkeypatch.setattr(PartitionService, "is_partitioned", lambda self, table: True)
+        monkeypatch.setattr(PartitionService, "list_partitions", lambda self, table: [{
+            "name": "vehicle_locations", "range_from": None, "range_to": None,
+            "is_default": True, "estimated_rows": 2,
+        }])
+        
+        assert PartitionService(test_db).apply_retention("vehicle_locations", retention_months=12) == []
+        test_db.expire_all()
+        assert test_db.query(VehicleLocation).count() == 1
@@ -0,0 +1,156 @@
+"""
+Тесты кэша списков карт и информации по картам провайдеров
+"""
+import json
+
+import pytest
+
+from app.models import ProviderTemplate
+from app.services.api_provider_service import ApiProviderService, RnCardAdapter
+from app.services.provider_card_cache import MemoryTTLCache, ProviderCardCache, _memory_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_memory_cache():
+    _memory_cache.clear()
+    yield
+    _memory_cache.clear()
+
+
+def make_template(template_id: int = 1, **settings) -> ProviderTemplate:
+    settings.setdefault("provider_type", "rncard")
+    settings.setdefault("login", "user")
+    return ProviderTemplate(
+        id=template_id,
+        name="API шаблон",
+        connection_type="api",
+        connection_settings=json.dumps(settings)
+    )
+
+
+class CountingRnCardAdapter(RnCardAdapter):
+    """Адаптер РН-Карт без сети: считает запросы списка карт"""
+
+    def __init__(self):
+        super().__init__("https://api.example.com", "user", "password", "contract")
+        self.list_calls = 0
+
+    async def list_cards(self):
+        self.list_calls += 1
+        return [
+            {"Num": "7001", "SCode": "00", "SName": "В работе", "Rem": "Иванов Иван Иванович"},
+            {"Num": "7002", "SCode": "01", "SName": "Заблокирована", "Rem": ""},
+        ]
+
+
+class TestMemoryTTLCache:
+    """Тесты кэша в памяти"""
+
+    def test_expired_entries_are_dropped(self):
+        cache = MemoryTTLCache()
+        cache.set("key", {"value": 1}, ttl=0)
+        assert cache.get("key") is None
+
+    def test_bounded_size_and_copies(self):
+        cache = MemoryTTLCache(max_entries=2)
+        cache.set("a", [1], ttl=60)
+        cache.set("b", [2], ttl=60)
+        cache.set("c", [3], ttl=60)
+        assert cache.get("a") is None
+        cached = cache.get("b")
+        cached.append(99)
+        assert cache.get("b") == [2]
+
+
+class TestProviderCardCache:
+    """Тесты кэша ответов провайдера по шаблону"""
+
+    def test_settings_change_changes_key(self):
+        ProviderCardCache(make_template(login="old")).set_card_list(["7001"])
+        assert ProviderCardCache(make_template(login="old")).get_card_list() == ["7001"]
+        assert ProviderCardCache(make_template(login="new")).get_card_list() is None
+
+    def test_invalidate_template(self):
+        ProviderCardCache(make_template(1)).set_card_info("7001", 23, {"card_number": "7001"})
+        ProviderCardCache(make_template(2)).set_card_info("7001", 23, {"card_number": "7001"})
+        assert ProviderCardCache.invalidate_template(1) == 1
+        assert ProviderCardCache(make_template(1)).get_card_info("7001", 23) is None
+        assert ProviderCardCache(make_template(2)).get_card_info("7001", 23) is not None
+
+    def test_empty_responses_not_cached(self):
+        card_cache = ProviderCardCache(make_template())
+        card_cache.set_card_list([])
+        card_cache.set_card_info("7001", 23, {})
+        assert card_cache.get_card_list() is None
+        assert card_cache.get_card_info("7001", 23) is None
+
+
+class TestApiProviderServiceCardCache:
+    """Кэширование в ApiProviderService"""
+
+    @pytest.mark.asyncio
+    async def test_card_info_cached_and_bypassed(self):
+        service = ApiProviderService(db=None)
+        template = make_template()
+        adapter = CountingRnCardAdapter()
+
+        first = await service.get_card_info(template, "7001", adapter=adapter)
+        assert first["state"] == 0
+        # Повторный запрос и другая карта: список карт договора не запрашивается заново
+        assert await service.get_card_info(template, "7001", adapter=adapter) == first
+        await service.get_card_info(template, "7002", adapter=adapter)
+        assert adapter.list_calls == 1
+
+        # Новый адаптер берет список карт из кэша шаблона
+        second_adapter = CountingRnCardAdapter()
+        await service.get_card_info(template, "7002", adapter=second_adapter)
+        assert second_adapter.list_calls == 0
+
+        # Без кэша список запрашивается у провайдера
+        refreshed_adapter = CountingRnCardAdapter()
+        await service.get_card_info(template, "7001", adapter=refreshed_adapter, use_cache=False)
+        assert refreshed_adapter.list_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_list_cards_cached(self):
+        service = ApiProviderService(db=None)
+        template = make_template()
+        adapter = CountingRnCardAdapter()
+
+        cards = await service.list_cards(adapter, template)
+        assert await service.list_cards(adapter, template) == cards
+        assert adapter.list_calls == 1
+        await service.list_cards(adapter, template, use_cache=False)
+        assert adapter.list_calls == 2
+
+
+def test_template_update_invalidates_card_cache(client, test_db):
+    """Изменение настроек подключения шаблона очищает кэш карт"""
+    from app.auth import require_auth_if_enabled
+    from app.main import app
+    from app.models import Provider
+
+    provider = Provider(name="РН-Карт", code="RNCARD_CACHE", is_active=True)
+    test_db.add(provider)
+    test_db.commit()
+    template = ProviderTemplate(
+        provider_id=provider.id,
+        name="API",
+        connection_type="api",
+        connection_settings=json.dumps({"provider_type": "rncard"}),
+        field_mapping="{}"
+    )
+    test_db.add(template)
+    test_db.commit()
+
+    ProviderCardCache(template).set_card_list(["7001"])
+    app.dependency_overrides[require_auth_if_enabled] = lambda: None
+    try:
+        response = client.put(
+            f"/api/v1/templates/{template.id}",
+            json={"connection_settings": {"provider_type": "rncard", "login": "new"}}
+        )
+    finally:
+        app.dependency_overrides.pop(require_auth_if_enabled, None)
+    assert response.status_code == 200
+    assert not [key for key in _memory_cache._data if key.startswith(f"provider_cards:{template.id}:")]
@@ -0,0 +1,135 @@
+"""
+Тесты общего реестра HTTP-клиентов и авторизаций адаптеров провайдеров
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.api_provider_service import GPNAdapter
+from app.utils.provider_sessions import CachedAuth, ProviderSessionRegistry, session_key
+
+
+class TestProviderSessionRegistry:
+    """Тесты ProviderSessionRegistry"""
+
+    @pytest.mark.asyncio
+    async def test_client_shared_per_key(self):
+        """Клиент переиспользуется для одного ключа в пределах event loop"""
+        registry = ProviderSessionRegistry()
+        first = registry.get_client("https://api.example.com")
+        assert registry.get_client("https://api.example.com") is first
+        assert registry.get_client("https://other.example.com") is not first
+        await registry.aclose()
+        assert first.is_closed
+        assert registry.stats()["clients"] == 0
+
+    def test_clients_are_per_event_loop(self):
+        """В другом event loop создается отдельный клиент, клиенты закрытого loop удаляются"""
+        registry = ProviderSessionRegistry()
+
+        async def get_client():
+            return registry.get_client("https://api.example.com")
+
+        first = asyncio.run(get_client())
+        second = asyncio.run(get_client())
+        assert first is not second
+        assert registry.stats()["clients"] == 1
+
+    @pytest.mark.asyncio
+    async def test_authenticate_uses_cache_until_stale(self):
+        """Повторный вход выполняется только для отклоненного токена"""
+        registry = ProviderSessionRegistry()
+        logins = []
+
+        async def login():
+            logins.append(1)
+            return CachedAuth(token=f"token-{len(logins)}")
+
+        key = session_key("test", "user", "password")
+        assert (await registry.authenticate(key, login)).token == "token-1"
+        assert (await registry.authenticate(key, login)).token == "token-1"
+        assert len(logins) == 1
+
+        # Устаревший токен, который уже заменен, не приводит к новому входу
+        assert (await registry.authenticate(key, login, stale_token="token-0")).token == "token-1"
+        assert (await registry.authenticate(key, login, stale_token="token-1")).token == "token-2"
+        assert len(logins) == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_authenticate_logs_in_once(self):
+        """Одновременные запросы с одним ключом выполняют вход один раз"""
+        registry = ProviderSessionRegistry()
+        logins = []
+
+        async def login():
+            logins.append(1)
+            await asyncio.sleep(0.01)
+            return CachedAuth(token="token")
+
+        results = await asyncio.gather(*[registry.authenticate("key", login) for _ in range(5)])
+        assert {auth.token for auth in results} == {"token"}
+        assert len(logins) == 1
+
+    @pytest.mark.asyncio
+    async def test_expired_auth_is_refreshed(self):
+        """Авторизация с истекшим сроком не используется"""
+        registry = ProviderSessionRegistry()
+        logins = []
+
+        async def login():
+            logins.append(1)
+            return CachedAuth(token=f"token-{len(logins)}")
+
+        await registry.authenticate("key", login, ttl=0)
+        assert registry.get_auth("key") is None
+        assert (await registry.authenticate("key", login)).token == "token-2"
+
+    @pytest.mark.asyncio
+    async def test_failed_login_is_not_cached(self):
+        """Неуспешный вход не кэшируется"""
+        registry = ProviderSessionRegistry()
+
+        async def login():
+            return None
+
+        assert await registry.authenticate("key", login) is None
+        assert registry.get_auth("key") is None
+
+
+class TestGPNAdapterSession:
+    """Сессия GPN переиспользуется между адаптерами и обновляется при 401"""
+
+    @pytest.mark.asyncio
+    async def test_session_shared_and_refreshed_on_401(self, monkeypatch):
+        registry = ProviderSessionRegistry()
+        monkeypatch.setattr(
+            "app.services.api_provider_service.get_provider_session_registry", lambda: registry
+        )
+        calls = {"auth": 0}
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/authUser"):
+                calls["auth"] += 1
+                return httpx.Response(200, json={
+                    "status": {"code": 200},
+                    "data": {"session_id": f"session-{calls['auth']}", "contracts": [{"id": "C1"}]}
+                })
+            if request.headers.get("session_id") != f"session-{calls['auth']}" or calls["auth"] < 2:
+                return httpx.Response(401, json={"status": {"code": 401}})
+            return httpx.Response(200, json={"status": {"code": 200}, "data": {"result": [{"number": "7001"}]}})
+
+        base_url = "https://gpn.example.com"
+        registry.get_client(base_url, transport=httpx.MockTransport(handler))
+
+        async with GPNAdapter(base_url, "key", "login", "password") as adapter:
+            assert adapter.session_id == "session-1"
+        async with GPNAdapter(base_url, "key", "login", "password") as adapter:
+            # Второй адаптер использует сессию из кэша
+            assert calls["auth"] == 1
+            cards = await adapter.list_cards()
+
+        assert cards == [{"number": "7001"}]
+        assert calls["auth"] == 2
+        assert registry.get_auth(adapter._auth_key).token == "session-2"
+        await registry.aclose()
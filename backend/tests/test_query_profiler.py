@@ -0,0 +1,91 @@
+"""
+Тесты профилирования SQL запросов
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.middleware.query_profiling import QueryProfilingMiddleware
+from app.utils.query_profiler import QueryProfiler, normalize_statement, profile_queries
+
+
+@pytest.fixture
+def profiled_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (id, name) VALUES (1, 'a'), (2, 'b')"))
+    profiler = QueryProfiler(slow_ms=60000, explain=True)
+    profiler.install(engine)
+    yield engine, profiler
+    profiler.uninstall()
+    engine.dispose()
+
+
+def test_normalize_statement_collapses_whitespace_and_in_lists():
+    assert normalize_statement("SELECT *\n  FROM items WHERE id IN (?, ?, ?)") == \
+        "SELECT * FROM items WHERE id IN (?)"
+    assert normalize_statement("SELECT * FROM items WHERE id IN (%(id_1)s, %(id_2)s)") == \
+        "SELECT * FROM items WHERE id IN (?)"
+
+
+def test_profile_counts_queries_and_detects_repeats(profiled_engine):
+    engine, _ = profiled_engine
+    with profile_queries("GET /items") as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT count(*) FROM items"))
+            for item_id in range(12):
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": item_id})
+
+    assert profile.query_count == 13
+    assert profile.total_seconds > 0
+    repeated = profile.repeated_selects(10)
+    assert repeated == [("SELECT name FROM items WHERE id = ?", 12)]
+    assert profile.repeated_selects(20) == []
+
+    # Вне profile_queries запросы не накапливаются
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert profile.query_count == 13
+
+
+def test_slow_queries_captured_with_plan(profiled_engine):
+    engine, profiler = profiled_engine
+    profiler.slow_ms = 0
+    with profile_queries("GET /items"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT name FROM items WHERE name = :name"), {"name": "a"})
+
+    entry = profiler.slow_queries()[0]
+    assert entry["endpoint"] == "GET /items"
+    assert entry["statement"] == "SELECT name FROM items WHERE name = ?"
+    assert "SCAN" in entry["plan"]
+
+
+def test_failed_statement_does_not_break_timing(profiled_engine):
+    engine, _ = profiled_engine
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_profiler_start"] == []
+
+
+def test_middleware_sets_db_headers(profiled_engine):
+    engine, _ = profiled_engine
+    app = FastAPI()
+    app.add_middleware(QueryProfilingMiddleware, n_plus_one_threshold=3)
+
+    @app.get("/api/v1/items/{item_id}")
+    def get_item(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": item_id})
+        return {"id": item_id}
+
+    response = TestClient(app).get("/api/v1/items/1")
+    assert response.status_code == 200
+    assert response.headers["X-DB-Query-Count"] == "3"
+    assert float(response.headers["X-DB-Time"]) >= 0
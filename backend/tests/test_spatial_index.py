@@ -0,0 +1,141 @@
+"""
+Тесты пространственного поиска АЗС (геохеш + векторный гаверсинус)
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from app.models import GasStation, Vehicle, VehicleLocation
+from app.services.spatial_index_service import SpatialIndexService
+from app.utils.geohash_utils import geohash_cells_for_radius, geohash_encode, geohash_encode_many
+from app.utils.geolocation_utils import calculate_distance_haversine, haversine_distances, haversine_pairwise
+
+# Красная площадь
+CENTER = (55.753930, 37.620795)
+
+
+def _offset(latitude: float, longitude: float, north_m: float, east_m: float):
+    """Смещение точки на заданное число метров к северу и востоку"""
+    return (
+        latitude + north_m / 111195.0,
+        longitude + east_m / (111195.0 * math.cos(math.radians(latitude)))
+    )
+
+
+class TestGeoUtils:
+    """Тесты геохеша и векторного гаверсинуса"""
+    
+    def test_geohash_known_value(self):
+        assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+        assert geohash_encode(None, 10) is None
+        hashes = geohash_encode_many([57.64911, float("nan")], [10.40744, 1.0], 5)
+        assert list(hashes) == ["u4pru", None]
+    
+    def test_cells_cover_radius(self):
+        """Любая точка в радиусе попадает в одну из ячеек поиска"""
+        cells = geohash_cells_for_radius(*CENTER, 800)
+        for angle in range(0, 360, 15):
+            point = _offset(*CENTER, 790 * math.cos(math.radians(angle)), 790 * math.sin(math.radians(angle)))
+            assert any(geohash_encode(*point).startswith(cell) for cell in cells)
+    
+    def test_vectorized_haversine_matches_scalar(self):
+        lats = [55.7, 59.93, None]
+        lons = [37.6, 30.31, 10.0]
+        distances = haversine_distances(*CENTER, lats, lons)
+        assert distances[0] == pytest.approx(calculate_distance_haversine(*CENTER, 55.7, 37.6), rel=1e-9)
+        assert distances[1] == pytest.approx(calculate_distance_haversine(*CENTER, 59.93, 30.31), rel=1e-9)
+        assert np.isinf(distances[2])
+        matrix = haversine_pairwise([CENTER[0]], [CENTER[1]], lats[:2], lons[:2])
+        assert matrix.shape == (1, 2)
+        assert np.allclose(matrix[0], distances[:2])
+
+
+class TestSpatialIndexService:
+    """Тесты поиска АЗС"""
+    
+    @pytest.fixture
+    def stations(self, test_db: Session):
+        layout = {
+            "АЗС 100м": (100, 0),
+            "АЗС 400м": (0, -400),
+            "АЗС 2км": (2000, 0),
+            "АЗС 100м дубль": (110, 5),
+        }
+        created = {}
+        for name, (north, east) in layout.items():
+            latitude, longitude = _offset(*CENTER, north, east)
+            station = GasStation(original_name=name, name=name, latitude=latitude, longitude=longitude)
+            test_db.add(station)
+            created[name] = station
+        test_db.add(GasStation(original_name="Без координат", name="Без координат"))
+        test_db.commit()
+        return created
+    
+    def test_geohash_assigned_on_save(self, test_db: Session, stations):
+        station = stations["АЗС 100м"]
+        assert station.geohash == geohash_encode(station.latitude, station.longitude)
+        station.latitude, station.longitude = 59.93, 30.31
+        test_db.commit()
+        assert station.geohash == geohash_encode(59.93, 30.31)
+    
+    def test_nearest_stations(self, test_db: Session, stations):
+        result = SpatialIndexService(test_db).nearest_stations(*CENTER, radius_meters=500)
+        assert [item["name"] for item in result] == ["АЗС 100м", "АЗС 100м дубль", "АЗС 400м"]
+        assert result[0]["distance_meters"] == pytest.approx(100, abs=1)
+        assert SpatialIndexService(test_db).nearest_stations(*CENTER, radius_meters=500, limit=1)[0]["name"] == "АЗС 100м"
+    
+    def test_find_duplicates(self, test_db: Session, stations):
+        pairs = SpatialIndexService(test_db).find_duplicate_stations(radius_meters=50)
+        assert len(pairs) == 1
+        assert {pairs[0]["station_id"], pairs[0]["duplicate_id"]} == {
+            stations["АЗС 100м"].id, stations["АЗС 100м дубль"].id
+        }
+    
+    def test_stations_near_vehicle_route(self, test_db: Session, stations):
+        vehicle = Vehicle(original_name="Маршрутный")
+        test_db.add(vehicle)
+        test_db.commit()
+        start = datetime(2025, 3, 1, 8, 0)
+        # Движение на север вдоль меридиана центра: 3 км с шагом 250 м, далеко на востоке
+        for step in range(13):
+            latitude, longitude = _offset(*CENTER, step * 250, 1500)
+            test_db.add(VehicleLocation(
+                vehicle_id=vehicle.id, timestamp=start + timedelta(minutes=step),
+                latitude=latitude, longitude=longitude
+            ))
+        test_db.commit()
+        
+        service = SpatialIndexService(test_db)
+        assert service.stations_near_vehicle_route(vehicle.id, start, start + timedelta(hours=1), 300) == []
+        
+        result = service.stations_near_vehicle_route(vehicle.id, start, start + timedelta(hours=1), 1600)
+        by_name = {item["name"]: item for item in result}
+        assert by_name["АЗС 2км"]["closest_at"] == start + timedelta(minutes=8)
+        assert by_name["АЗС 2км"]["distance_meters"] == pytest.approx(1500, abs=5)
+        assert "АЗС 400м" not in by_name
+    
+    def test_backfill_and_bulk_insert(self, test_db: Session):
+        from app.repositories import VehicleLocationRepository
+        
+        vehicle = Vehicle(original_name="Пакетный")
+        test_db.add(vehicle)
+        test_db.commit()
+        inserted = VehicleLocationRepository(test_db).bulk_insert([
+            {"vehicle_id": vehicle.id, "timestamp": datetime(2025, 3, 1, 8, 0), "latitude": CENTER[0],
+             "longitude": CENTER[1], "source": "GPS"}
+        ])
+        assert inserted == 1
+        location = test_db.query(VehicleLocation).filter(VehicleLocation.vehicle_id == vehicle.id).one()
+        assert location.geohash == geohash_encode(*CENTER)
+        
+        test_db.query(VehicleLocation).update({"geohash": None})
+        test_db.commit()
+        assert SpatialIndexService(test_db).backfill_geohash("vehicle_locations", batch_size=10) == 1
+        test_db.refresh(location)
+        assert location.geohash == geohash_encode(*CENTER)
+        
+        with pytest.raises(ValueError):
+            SpatialIndexService(test_db).backfill_geohash("transactions")
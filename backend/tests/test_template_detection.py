@@ -0,0 +1,204 @@
+"""
+Тесты автоопределения провайдера и шаблона по индексу сигнатур
+"""
+import json
+import shutil
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy.orm import Session
+
+from app.models import Provider, ProviderTemplate
+from app.services import analyze_template_structure_cached, app_services_module, detect_provider_and_template
+from app.services import template_signature_index
+from app.services.template_signature_index import (
+    clear_file_analysis_cache,
+    get_template_index,
+    invalidate_template_index,
+)
+
+HEADER = ["Организация", "Закреплена за", "Номер карты", "КАЗС", "Дата", "Кол-во", "Вид топлива"]
+MAPPING = {
+    "organization": "Организация",
+    "user": "Закреплена за",
+    "card": "Номер карты",
+    "kazs": "КАЗС",
+    "date": "Дата",
+    "quantity": "Кол-во",
+    "fuel": "Вид топлива",
+}
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    invalidate_template_index()
+    clear_file_analysis_cache()
+    yield
+    invalidate_template_index()
+    clear_file_analysis_cache()
+
+
+def make_file(tmp_path, header, name="report.xlsx"):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Отчет по транзакциям"])
+    sheet.append(header)
+    for i in range(5):
+        sheet.append([f"Значение {i}"] * len(header))
+    path = tmp_path / name
+    workbook.save(path)
+    return str(path)
+
+
+def add_template(db: Session, provider: Provider, name: str, mapping: dict, header_row: int = 1):
+    template = ProviderTemplate(
+        provider_id=provider.id, name=name, field_mapping=json.dumps(mapping, ensure_ascii=False),
+        header_row=header_row, data_start_row=header_row + 1, is_active=True
+    )
+    db.add(template)
+    db.commit()
+    return template
+
+
+@pytest.fixture
+def templates(test_db: Session):
+    """Нужный шаблон и несколько шаблонов с другими колонками"""
+    target_provider = Provider(name="Петрол", code="PETROL", is_active=True)
+    other_provider = Provider(name="Другой", code="OTHER", is_active=True)
+    test_db.add_all([target_provider, other_provider])
+    test_db.commit()
+    for i in range(8):
+        add_template(test_db, other_provider, f"Чужой {i}", {
+            "date": f"Дата операции {i}", "quantity": f"Литры {i}", "fuel": "Товар", "card": f"Карта {i}"
+        }, header_row=0)
+    target = add_template(test_db, target_provider, "Отчет Петрол", MAPPING)
+    return target_provider, target
+
+
+class TestDetection:
+    """Результат определения по индексу совпадает с полным перебором"""
+
+    def test_detects_template_and_matches_full_scan(self, test_db: Session, tmp_path, templates):
+        provider, target = templates
+        path = make_file(tmp_path, HEADER)
+
+        provider_id, template_id, info = detect_provider_and_template(path, test_db)
+
+        assert (provider_id, template_id) == (provider.id, target.id)
+        assert info["template_name"] == "Отчет Петрол"
+        # 7 точных совпадений, бонусы за дату/количество/топливо и строку заголовка
+        assert info["score"] == 7 * 10 + 3 * 5 + 2
+        assert info["template_columns"] == list(MAPPING.values())
+
+        file_columns = [column.lower() for column in HEADER]
+        assert get_template_index(test_db).best_match(file_columns, 1) == (provider_id, template_id, info)
+
+    def test_candidates_include_matching_signature(self, test_db: Session, templates):
+        _, target = templates
+        index = get_template_index(test_db)
+        candidates = index.candidates([column.lower() for column in HEADER], MAPPING)
+        assert target.id in [candidate.template_id for candidate in candidates]
+        assert len(candidates) <= template_signature_index.JACCARD_TOP_K + 1
+
+    def test_repeated_header_is_not_rescored(self, test_db: Session, tmp_path, templates, monkeypatch):
+        first = detect_provider_and_template(make_file(tmp_path, HEADER, "first.xlsx"), test_db)
+
+        scored = []
+        original = template_signature_index.score_template
+        monkeypatch.setattr(
+            template_signature_index, "score_template",
+            lambda *args: scored.append(args[0].template_id) or original(*args)
+        )
+        second = detect_provider_and_template(make_file(tmp_path, HEADER + ["Комментарий"], "second.xlsx"), test_db)
+        repeated = detect_provider_and_template(make_file(tmp_path, HEADER, "third.xlsx"), test_db)
+
+        assert second[1] == first[1]
+        # Для нового заголовка оцениваются только кандидаты, а не все 9 шаблонов
+        assert 0 < len(scored) < 9
+        scored.clear()
+        assert repeated == first
+        assert scored == []
+
+    def test_index_follows_template_changes(self, test_db: Session, tmp_path, templates):
+        provider, target = templates
+        path = make_file(tmp_path, HEADER)
+        assert detect_provider_and_template(path, test_db)[1] == target.id
+
+        # Шаблон, добавленный в обход API, учитывается по отметке версии
+        target.is_active = False
+        test_db.commit()
+        replacement = add_template(test_db, provider, "Новый отчет", MAPPING)
+        assert detect_provider_and_template(path, test_db)[1] == replacement.id
+
+    def test_update_through_api_resets_index(self, client, test_db: Session, tmp_path, templates):
+        from app.auth import require_auth_if_enabled
+        from app.main import app
+
+        _, target = templates
+        path = make_file(tmp_path, HEADER)
+        assert detect_provider_and_template(path, test_db)[1] == target.id
+
+        app.dependency_overrides[require_auth_if_enabled] = lambda: None
+        try:
+            response = client.put(f"/api/v1/templates/{target.id}", json={
+                "field_mapping": {"date": "Дата продажи", "quantity": "Объем"}
+            })
+        finally:
+            app.dependency_overrides.pop(require_auth_if_enabled, None)
+        assert response.status_code == 200
+
+        provider_id, template_id, info = detect_provider_and_template(path, test_db)
+        assert template_id != target.id
+        assert info["score"] < template_signature_index.CONFIDENT_MATCH_SCORE
+
+
+def test_partial_match_outside_candidates_matches_full_scan(test_db: Session, tmp_path):
+    """Шаблон без точных совпадений колонок, но с большей оценкой по частичным"""
+    exact_provider = Provider(name="Точный", code="EXACT", is_active=True)
+    partial_provider = Provider(name="Частичный", code="PARTIAL", is_active=True)
+    test_db.add_all([exact_provider, partial_provider])
+    test_db.commit()
+    exact = add_template(test_db, exact_provider, "Три колонки", {"date": "Дата", "quantity": "Кол-во", "card": "Карта"})
+    partial = add_template(test_db, partial_provider, "Длинные колонки", {
+        "user": "Закреплена за", "card": "Номер карты", "kazs": "АЗС", "date": "Дата операции",
+        "quantity": "Кол-во литров", "fuel": "Вид топлива", "organization": "Организация",
+    })
+    header = [
+        "Дата", "Кол-во", "Карта", "Номер карты клиента", "Вид топлива продукта",
+        "АЗС станция", "Закреплена за водителем", "Организация получатель",
+    ]
+    path = make_file(tmp_path, header)
+
+    index = get_template_index(test_db)
+    file_columns = [column.lower() for column in header]
+    analysis = analyze_template_structure_cached(path)
+    candidate_ids = [item.template_id for item in index.candidates(file_columns, analysis["field_mapping"])]
+    assert exact.id in candidate_ids and partial.id not in candidate_ids
+    assert index.best_match(file_columns, 1, [index.by_id[exact.id]])[2]["score"] == 3 * 10 + 2 * 5 + 2
+
+    provider_id, template_id, info = detect_provider_and_template(path, test_db)
+
+    assert (provider_id, template_id) == (partial_provider.id, partial.id)
+    assert info["score"] == 7 * 5 + 3 * 5 + 2
+    assert index.best_match(file_columns, 1) == (provider_id, template_id, info)
+
+
+def test_file_analysis_reused_for_same_content(tmp_path, monkeypatch):
+    reads = []
+    original = app_services_module.read_excel_head
+    monkeypatch.setattr(
+        app_services_module, "read_excel_head", lambda *args: reads.append(args[0]) or original(*args)
+    )
+    path = make_file(tmp_path, HEADER, "check.xlsx")
+    first = analyze_template_structure_cached(path)
+    # Тот же файл, сохраненный под другим именем при загрузке
+    copy_path = str(tmp_path / "upload.xlsx")
+    shutil.copyfile(path, copy_path)
+    second = analyze_template_structure_cached(copy_path)
+    other = analyze_template_structure_cached(make_file(tmp_path, HEADER[:-1], "other.xlsx"))
+
+    assert second == first
+    assert first["header_row"] == 1
+    assert first["field_mapping"]["fuel"] == "Вид топлива"
+    assert "fuel" not in other["field_mapping"] or other["field_mapping"]["fuel"] != "Вид топлива"
+    assert len(reads) == 2
@@ -0,0 +1,251 @@
+"""
+Тесты идемпотентной загрузки по хэшам файла и строк
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy.orm import Session
+
+from app.models import Provider, ProviderTemplate, Transaction, UploadEvent
+from app.services.template_signature_index import clear_file_analysis_cache, invalidate_template_index
+from app.services.transaction_batch_processor import TransactionBatchProcessor
+from app.services.upload_fingerprint_service import (
+    UploadFingerprintService,
+    compute_row_hash,
+    pack_row_hashes,
+    unpack_row_hashes,
+)
+
+HEADER = ["Закреплена за", "Номер карты", "КАЗС", "Дата", "Кол-во", "Вид топлива"]
+MAPPING = {
+    "user": "Закреплена за",
+    "card": "Номер карты",
+    "kazs": "КАЗС",
+    "date": "Дата",
+    "quantity": "Кол-во",
+    "fuel": "Вид топлива",
+}
+
+
+@pytest.fixture
+def provider(test_db: Session):
+    provider = Provider(name="Петрол", code="PETROL", is_active=True)
+    test_db.add(provider)
+    test_db.commit()
+    return provider
+
+
+def make_rows(provider_id: int, start: int, count: int):
+    return [
+        {
+            "transaction_date": datetime(2025, 3, 1 + i % 28, 8, i % 60),
+            "card_number": f"70058300{i:04d}",
+            "azs_number": f"АЗС {i % 5}",
+            "product": "АИ-92",
+            "quantity": Decimal("40.5") + i,
+            "provider_id": provider_id,
+            "source_file": "report.xlsx",
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def test_row_hash_ignores_file_name_and_key_order():
+    row = make_rows(1, 0, 1)[0]
+    renamed = dict(reversed(list(row.items())), source_file="resend.xlsx")
+    assert compute_row_hash(renamed) == compute_row_hash(row)
+    assert compute_row_hash(dict(row, quantity=Decimal("41.5"))) != compute_row_hash(row)
+
+    hashes = [compute_row_hash(item) for item in make_rows(1, 0, 3)]
+    assert sorted(unpack_row_hashes(pack_row_hashes(hashes + hashes[:1]))) == sorted(hashes)
+
+
+class TestRowDiff:
+    """Строки, загруженные ранее, не доходят до проверки дубликатов"""
+
+    def test_overlapping_rows_skip_dedup(self, test_db: Session, provider, monkeypatch):
+        processor = TransactionBatchProcessor(test_db)
+        assert processor.create_transactions(make_rows(provider.id, 0, 6))[:2] == (6, 0)
+
+        batches = []
+        original = TransactionBatchProcessor._process_batch
+        monkeypatch.setattr(
+            TransactionBatchProcessor, "_process_batch",
+            lambda self, batch: batches.append(len(batch)) or original(self, batch)
+        )
+        created, skipped, _ = processor.create_transactions(make_rows(provider.id, 3, 6))
+
+        assert (created, skipped) == (3, 3)
+        assert batches == [3]
+        assert test_db.query(Transaction).count() == 9
+        assert test_db.query(Transaction).filter(Transaction.row_hash.is_(None)).count() == 0
+
+    def test_deleted_rows_are_loaded_again(self, test_db: Session, provider):
+        processor = TransactionBatchProcessor(test_db)
+        processor.create_transactions(make_rows(provider.id, 0, 4))
+        test_db.query(Transaction).filter(Transaction.card_number == "700583000001").delete()
+        test_db.commit()
+
+        created, skipped, _ = processor.create_transactions(make_rows(provider.id, 0, 4))
+        assert (created, skipped) == (1, 3)
+
+
+class TestIdempotentUpload:
+    """Повторная загрузка того же файла завершается без разбора"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, test_db: Session, provider):
+        from app.auth import require_auth_if_enabled
+        from app.main import app
+
+        test_db.add(ProviderTemplate(
+            provider_id=provider.id, name="Отчет Петрол", field_mapping=json.dumps(MAPPING, ensure_ascii=False),
+            header_row=0, data_start_row=1, is_active=True
+        ))
+        test_db.commit()
+        invalidate_template_index()
+        clear_file_analysis_cache()
+        app.dependency_overrides[require_auth_if_enabled] = lambda: None
+        yield
+        app.dependency_overrides.pop(require_auth_if_enabled, None)
+        invalidate_template_index()
+        clear_file_analysis_cache()
+
+    @pytest.fixture
+    def report(self, tmp_path):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER)
+        for i in range(5):
+            sheet.append([f"Газель {i}", f"70058300{i:04d}", f"АЗС {i}", datetime(2025, 3, 1, 8, i), 40 + i, "АИ-92"])
+        path = tmp_path / "report.xlsx"
+        workbook.save(path)
+        return path.read_bytes()
+
+    def upload(self, client, content: bytes, name: str = "report.xlsx", **params):
+        response = client.post("/api/v1/transactions/upload", params=params, files={
+            "file": (name, content, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def test_identical_file_short_circuits(self, client, test_db: Session, report, monkeypatch):
+        first = self.upload(client, report)
+        assert first["transactions_created"] == 5
+        event = test_db.query(UploadEvent).one()
+        assert event.content_hash and len(unpack_row_hashes(event.row_hashes)) == 5
+
+        from app.services.excel_processor import ExcelProcessor
+
+        def fail(*args, **kwargs):
+            raise AssertionError("файл не должен разбираться повторно")
+
+        monkeypatch.setattr(ExcelProcessor, "iter_transaction_batches", fail)
+        second = self.upload(client, report, "report (1).xlsx")
+
+        assert (second["transactions_created"], second["transactions_skipped"]) == (0, 5)
+        assert second["detected_provider_id"] == event.provider_id
+        assert test_db.query(Transaction).count() == 5
+        assert test_db.query(UploadEvent).count() == 2
+
+    def test_same_file_with_other_template_is_imported(
+        self, client, test_db: Session, provider, report, monkeypatch
+    ):
+        first = self.upload(client, report)
+        template = test_db.query(ProviderTemplate).one()
+        assert first["detected_template_id"] == template.id
+
+        other = ProviderTemplate(
+            provider_id=provider.id, name="Отчет Петрол (новый)",
+            field_mapping=json.dumps(MAPPING, ensure_ascii=False), header_row=0, data_start_row=1, is_active=True
+        )
+        test_db.add(other)
+        test_db.commit()
+
+        from app.services.excel_processor import ExcelProcessor
+
+        parsed = []
+        original = ExcelProcessor.iter_transaction_batches
+        monkeypatch.setattr(
+            ExcelProcessor, "iter_transaction_batches",
+            lambda self, *args, **kwargs: parsed.append(kwargs.get("template_id")) or original(self, *args, **kwargs)
+        )
+
+        # Тот же шаблон, указанный явно, - повторная загрузка пропускается
+        self.upload(client, report, provider_id=provider.id, template_id=template.id)
+        assert parsed == []
+
+        # Другой шаблон - файл разбирается заново
+        again = self.upload(client, report, provider_id=provider.id, template_id=other.id)
+        assert parsed == [other.id]
+        assert again["detected_template_id"] == other.id
+        assert test_db.query(UploadEvent).order_by(UploadEvent.id.desc()).first().template_id == other.id
+
+    def test_file_reprocessed_after_rows_deleted(self, client, test_db: Session, report):
+        self.upload(client, report)
+        test_db.query(Transaction).filter(Transaction.card_number == "700583000002").delete()
+        test_db.commit()
+        assert UploadFingerprintService(test_db).find_loaded_upload(
+            test_db.query(UploadEvent).one().content_hash
+        ) is None
+
+        again = self.upload(client, report)
+        assert (again["transactions_created"], again["transactions_skipped"]) == (1, 4)
+        assert test_db.query(Transaction).count() == 5
+
+    def test_upload_processed_batch_by_batch(self, client, test_db: Session, report, monkeypatch):
+        from app.services.excel_processor import ExcelProcessor
+
+        def fail(*args, **kwargs):
+            raise AssertionError("файл не должен собираться в один список")
+
+        batches = []
+        original = TransactionBatchProcessor.create_transactions
+        monkeypatch.setattr(ExcelProcessor, "BATCH_SIZE", 2)
+        monkeypatch.setattr(ExcelProcessor, "process_file", fail)
+        monkeypatch.setattr(
+            TransactionBatchProcessor, "create_transactions",
+            lambda self, transactions: batches.append(len(transactions)) or original(self, transactions)
+        )
+
+        result = self.upload(client, report)
+
+        assert batches == [2, 2, 1]
+        assert (result["transactions_created"], result["transactions_skipped"]) == (5, 0)
+        event = test_db.query(UploadEvent).one()
+        assert event.transactions_total == 5
+        assert len(unpack_row_hashes(event.row_hashes)) == 5
+
+    def test_period_lock_rejects_whole_file_before_writing(self, client, test_db: Session, tmp_path, monkeypatch):
+        from datetime import date
+
+        from app.models import UploadPeriodLock
+        from app.services.excel_processor import ExcelProcessor
+
+        # Закрытая дата только в последнем пакете файла
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER)
+        for i in range(5):
+            day = datetime(2025, 3, 1, 8, i) if i == 4 else datetime(2025, 5, 1, 8, i)
+            sheet.append([f"Газель {i}", f"70058300{i:04d}", f"АЗС {i}", day, 40 + i, "АИ-92"])
+        path = tmp_path / "locked.xlsx"
+        workbook.save(path)
+
+        monkeypatch.setattr(ExcelProcessor, "BATCH_SIZE", 2)
+        test_db.add(UploadPeriodLock(lock_date=date(2025, 4, 1)))
+        test_db.commit()
+
+        response = client.post("/api/v1/transactions/upload", files={
+            "file": ("locked.xlsx", path.read_bytes(), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        })
+
+        assert response.status_code == 400
+        assert "01.04.2025" in response.json()["detail"]
+        assert "01.03.2025" in response.json()["detail"]
+        assert test_db.query(Transaction).count() == 0
+        event = test_db.query(UploadEvent).one()
+        assert (event.status, event.transactions_total, event.transactions_created) == ("failed", 5, 0)
@@ -0,0 +1,89 @@
+"""
+Тесты потокового сохранения загружаемых файлов
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.utils import cleanup_temp_file, spool_upload_to_temp_file
+
+CONTENT = os.urandom(10 * 1024 + 17)
+
+
+class CountingStream(io.BytesIO):
+    """Поток, запоминающий объем прочитанных данных"""
+
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def test_spools_in_chunks_and_hashes(temp_dir):
+    upload = UploadFile(file=io.BytesIO(CONTENT), filename="report.xlsx")
+    spooled = asyncio.run(spool_upload_to_temp_file(upload, max_size=len(CONTENT), chunk_size=1024))
+    try:
+        assert spooled.size == len(CONTENT)
+        assert spooled.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert spooled.path.endswith(".xlsx")
+        with open(spooled.path, "rb") as f:
+            assert f.read() == CONTENT
+    finally:
+        cleanup_temp_file(spooled.path)
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_oversized_upload_stops_early_and_cleans_up(temp_dir):
+    stream = CountingStream(CONTENT)
+    upload = UploadFile(file=stream, filename="report.xlsx")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(spool_upload_to_temp_file(upload, max_size=4096, chunk_size=1024))
+
+    assert exc_info.value.status_code == 400
+    assert "превышает максимально допустимый" in exc_info.value.detail
+    # Чтение прекращено на первой порции сверх лимита
+    assert stream.bytes_read == 5 * 1024
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_known_size_rejected_before_reading(temp_dir):
+    stream = CountingStream(CONTENT)
+    upload = UploadFile(file=stream, filename="report.xlsx", size=len(CONTENT))
+
+    with pytest.raises(HTTPException):
+        asyncio.run(spool_upload_to_temp_file(upload, max_size=1024))
+    assert stream.bytes_read == 0
+
+
+def test_upload_endpoint_enforces_limit(client, monkeypatch):
+    from app.auth import require_auth_if_enabled
+    from app.main import app
+    from app.routers import transactions
+
+    monkeypatch.setattr(transactions.settings, "max_upload_size", 4096)
+    app.dependency_overrides[require_auth_if_enabled] = lambda: None
+    try:
+        response = client.post("/api/v1/transactions/upload", files={
+            "file": ("report.xlsx", CONTENT, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        })
+    finally:
+        app.dependency_overrides.pop(require_auth_if_enabled, None)
+
+    assert response.status_code == 400
+    assert "превышает максимально допустимый" in response.json()["detail"]
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from 'react'
+import React, { useEffect, useState, useMemo, useRef } from 'react'
 import { Card, Input, Button, Badge, Modal, Skeleton } from './ui'
 import Pagination from './Pagination'
 import EmptyState from './EmptyState'
@@ -27,6 +27,9 @@ const SystemLogsList = () => {
   // Пагинация
   const [currentPage, setCurrentPage] = useState(1)
   const [limit] = useState(50)
+  // Курсоры страниц (номер страницы -> next_cursor предыдущей) для текущих фильтров:
+  // следующие страницы запрашиваются по курсору без OFFSET и пересчета total
+  const cursorsRef = useRef({ key: null, pages: {} })
 
   const isAdmin = useMemo(
     () => currentUser && (currentUser.role === 'admin' || currentUser.is_superuser),
@@ -38,7 +41,16 @@ const SystemLogsList = () => {
     setLoading(true)
     try {
       const params = new URLSearchParams()
-      params.append('skip', ((currentPage - 1) * limit).toString())
+      const filtersKey = JSON.stringify([search, levelFilter, eventTypeFilter, eventCategoryFilter])
+      if (cursorsRef.current.key !== filtersKey) {
+        cursorsRef.current = { key: filtersKey, pages: {} }
+      }
+      const cursor = currentPage > 1 ? cursorsRef.current.pages[currentPage] : null
+      if (cursor) {
+        params.append('cursor', cursor)
+      } else {
+        params.append('skip', ((currentPage - 1) * limit).toString())
+      }
       params.append('limit', limit.toString())
       if (search.trim()) {
         params.append('search', search.trim())
@@ -69,7 +81,13 @@ const SystemLogsList = () => {
       if (data && typeof data === 'object') {
         if (Array.isArray(data.items)) {
           setLogs([...data.items])
-          setTotal(data.total || data.items.length)
+          if (data.next_cursor) {
+            cursorsRef.current.pages[currentPage + 1] = data.next_cursor
+          }
+          // Для страниц по курсору total не вычисляется - оставляем прежнее значение
+          if (data.total !== null && data.total !== undefined) {
+            setTotal(data.total || data.items.length)
+          }
         } else if (Array.isArray(data)) {
           // Если вернулся массив напрямую
           logger.warn('Ответ - массив, а не объект с items')
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from 'react'
+import React, { useEffect, useState, useMemo, useRef } from 'react'
 import { Card, Input, Button, Badge, Modal, Skeleton } from './ui'
 import Pagination from './Pagination'
 import EmptyState from './EmptyState'
@@ -28,6 +28,9 @@ const UserActionLogsList = ({ showMyActionsOnly = false }) => {
   // Пагинация
   const [currentPage, setCurrentPage] = useState(1)
   const [limit] = useState(50)
+  // Курсоры страниц (номер страницы -> next_cursor предыдущей) для текущих фильтров:
+  // следующие страницы запрашиваются по курсору без OFFSET и пересчета total
+  const cursorsRef = useRef({ key: null, pages: {} })
 
   const isAdmin = useMemo(
     () => currentUser && (currentUser.role === 'admin' || currentUser.is_superuser),
@@ -38,7 +41,16 @@ const UserActionLogsList = ({ showMyActionsOnly = false }) => {
     setLoading(true)
     try {
       const params = new URLSearchParams()
-      params.append('skip', ((currentPage - 1) * limit).toString())
+      const filtersKey = JSON.stringify([search, actionTypeFilter, actionCategoryFilter, entityTypeFilter, statusFilter, showMyActionsOnly])
+      if (cursorsRef.current.key !== filtersKey) {
+        cursorsRef.current = { key: filtersKey, pages: {} }
+      }
+      const cursor = currentPage > 1 ? cursorsRef.current.pages[currentPage] : null
+      if (cursor) {
+        params.append('cursor', cursor)
+      } else {
+        params.append('skip', ((currentPage - 1) * limit).toString())
+      }
       params.append('limit', limit.toString())
       if (search.trim()) {
         params.append('search', search.trim())
@@ -81,7 +93,13 @@ const UserActionLogsList = ({ showMyActionsOnly = false }) => {
       if (data && typeof data === 'object') {
         if (Array.isArray(data.items)) {
           setLogs([...data.items])
-          setTotal(data.total || data.items.length)
+          if (data.next_cursor) {
+            cursorsRef.current.pages[currentPage + 1] = data.next_cursor
+          }
+          // Для страниц по курсору total не вычисляется - оставляем прежнее значение
+          if (data.total !== null && data.total !== undefined) {
+            setTotal(data.total || data.items.length)
+          }
         } else if (Array.isArray(data)) {
           // Если вернулся массив напрямую
           setLogs(data)